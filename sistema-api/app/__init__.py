@@ -1,33 +1,63 @@
-from flask import Flask
-from flask_cors import CORS
 from .db import db
-from .api import products_bp, categories_bp, suppliers_bp, locations_bp, transactions_bp, transfers_bp, reports_bp, auth_bp, inventory_bp
+from . import models # Registers the tables on db.metadata (create_all, flask db migrate) even before routes load
+from .utils.pool_metrics import build_engine_options, register_engine_events
+from .utils.replicas import replica_binds, init_replicas
+from .utils.shards import shard_binds, init_shards
+from .utils.changes import init_changes
+from .utils.stream import init_stream
+from .utils.webhooks import init_webhooks
+from .utils.lazy_routes import LazyRoutesFlask
+from .utils.metrics import init_metrics
+from .utils.auth import init_auth
+from .utils.admission import init_admission_control
+from .utils.query_stats import init_query_stats, register_query_events
+from .utils.slow_queries import init_slow_query_log
+from .utils.edge import init_edge
+from .utils.profiler import init_profiler
+from .api import register_blueprints
+from .cli import register_commands
 from flask_migrate import Migrate
 
 migrate = Migrate()
 
 def create_app(config_object='config.DevelopmentConfig'):
-    app = Flask(__name__)
+    app = LazyRoutesFlask(__name__)
 
 
     # 2) Config y extensiones
     app.config.from_object(config_object)
 
-    CORS(app)   
+    if app.config.get('METRICS_ENABLED'):
+        init_metrics(app) # First, so the other request hooks are timed too
+    init_auth(app) # Before admission control, which keys its buckets by the authenticated user
+    if app.config.get('ADMISSION_CONTROL_ENABLED'):
+        init_admission_control(app) # Before the DB-bound hooks, so rejected requests stay cheap
 
+    app.config['SQLALCHEMY_BINDS'] = {
+        **app.config.get('SQLALCHEMY_BINDS', {}), **replica_binds(app.config), **shard_binds(app.config),
+    }
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = build_engine_options(app.config)
     db.init_app(app)
+    with app.app_context():
+        for engine in db.engines.values():
+            register_engine_events(engine, app.config)
+            register_query_events(engine)
+        init_slow_query_log(app, db.engines.values())
+    init_replicas(app, db)
+    init_shards(app, db)
+    init_changes(app)
+    init_stream(app)
+    init_webhooks(app)
+    if app.config.get('QUERY_STATS_ENABLED'):
+        init_query_stats(app)
     migrate.init_app(app, db)
+    register_commands(app)
 
-    # 3) Registro de blueprints
-    app.register_blueprint(products_bp)
-    app.register_blueprint(categories_bp)
-    app.register_blueprint(suppliers_bp)
-    app.register_blueprint(locations_bp)
-    app.register_blueprint(transactions_bp)
-    app.register_blueprint(transfers_bp)
-    app.register_blueprint(reports_bp)
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(inventory_bp)
+    # 3) Registro de blueprints (al primer uso del URL map: peticiones, url_for, `flask routes`)
+    app.defer_routes(register_blueprints)
+
+    init_edge(app) # CORS, security headers and HTTPS redirects, in front of Flask
+    init_profiler(app) # Last: it replaces app.wsgi_app while profiling
 
 
     return app
@@ -1,5 +1,6 @@
 # inventory_api/app/api/__init__.py
 
+from importlib import import_module
 from flask import Blueprint
 
 # Create Blueprints for each API section
@@ -12,18 +13,37 @@ transfers_bp = Blueprint('transfers_api', __name__, url_prefix='/api/transfers')
 reports_bp = Blueprint('reports_api', __name__, url_prefix='/api/reports') # Blueprint for reports group
 inventory_bp = Blueprint('inventory_api', __name__, url_prefix='/api/inventory') # <-- Add this line
 auth_bp = Blueprint('auth_api', __name__, url_prefix='/api/auth') # <-- Add this line for authentication
+internal_bp = Blueprint('internal_api', __name__, url_prefix='/api/internal') # Operational endpoints (token protected)
+metrics_bp = Blueprint('metrics', __name__) # Prometheus scrape endpoint (/metrics)
+changes_bp = Blueprint('changes_api', __name__, url_prefix='/api/changes') # Change feed for client sync
 
-# Import routes to associate them with the blueprints
-# The files below will define the routes and use these blueprint objects
-from . import products
-from . import categories
-from . import suppliers
-from . import locations
-from . import transactions # Handles /api/transactions and /api/stock-levels
-from . import transfers # Handles /api/transfers list/get
-from . import reports    # Handles /api/reports/low-stock, potentially others
-from . import inventory
-from . import login # <-- Add this line to import the login routes
+# Route modules: each one defines the routes of its blueprint (and builds its service
+# singletons) when imported. They are imported by register_blueprints, which create_app
+# defers until the URL map is first used (see app/utils/lazy_routes.py).
+ROUTE_MODULES = [
+    'products',
+    'categories',
+    'suppliers',
+    'locations',
+    'transactions', # Handles /api/transactions and /api/stock-levels
+    'transfers', # Handles /api/transfers list/get
+    'reports',    # Handles /api/reports/low-stock, potentially others
+    'inventory',
+    'login',
+    'internal',
+    'metrics',
+    'changes',
+]
 
-# This file will be imported in your Flask app factory (app/__init__.py)
-# to register the blueprints with the Flask application.
\ No newline at end of file
+BLUEPRINTS = [
+    products_bp, categories_bp, suppliers_bp, locations_bp, transactions_bp,
+    transfers_bp, reports_bp, auth_bp, inventory_bp, internal_bp, metrics_bp, changes_bp,
+]
+
+
+def register_blueprints(app):
+    """Imports the route modules and registers every blueprint with the app."""
+    for module in ROUTE_MODULES:
+        import_module(f"{__name__}.{module}")
+    for blueprint in BLUEPRINTS:
+        app.register_blueprint(blueprint)
@@ -0,0 +1,61 @@
+# inventory_api/app/api/changes.py
+
+import math
+from flask import current_app, request, jsonify
+from . import changes_bp
+from ..services.change_service import ChangeService
+from ..utils.exceptions import GoneException, InvalidInputException, DatabaseException, ServiceUnavailableException
+
+change_service = ChangeService()
+
+
+@changes_bp.route('/', methods=['GET'], strict_slashes=False)
+def get_changes():
+    """
+    GET /api/changes?since=<cursor>&wait=20&limit=500
+    Products, locations, stock levels and transactions changed since the cursor, and the cursor to send next.
+    Without `since`: only the current cursor (take it before fetching the full lists, then poll with it).
+    `wait` (seconds) long-polls: the response comes as soon as there are changes, or empty after `wait`.
+    410 when the cursor has expired: fetch the lists again. 503 (with Retry-After) when the worker already
+    has CHANGE_FEED_MAX_WAITERS long-polls waiting.
+    """
+    body, status, *headers = handle_get_changes(request.args)
+    return jsonify(body), status, *headers
+
+
+def handle_get_changes(args, long_poll=True):
+    """
+    Handles GET /api/changes (see get_changes). args is a mapping of query parameters.
+    long_poll=False answers at once whatever `wait` asks: the ASGI app (app/asgi.py) does the waiting.
+    """
+    try:
+        since = args.get('since')
+        if since is None:
+            return {'success': True, 'cursor': change_service.head()}, 200
+        try:
+            wait = float(args.get('wait', 0))
+            limit = int(args['limit']) if args.get('limit') else None
+        except ValueError:
+            return {'success': False, 'message': 'wait and limit must be numbers'}, 400
+        if limit is not None and limit < 1:
+            return {'success': False, 'message': 'limit must be positive'}, 400
+
+        if wait > 0 and long_poll:
+            feed = change_service.wait_for_changes(since, wait, limit)
+        else:
+            feed = change_service.changes_since(since, limit)
+        return {'success': True, **feed}, 200
+
+    except InvalidInputException as e:
+        return {'success': False, 'message': str(e)}, 400
+    except GoneException as e:
+        return {'success': False, 'message': e.message}, 410
+    except ServiceUnavailableException as e:
+        retry_after = max(1, math.ceil(current_app.config.get('CHANGE_FEED_POLL_INTERVAL_S', 0.5)))
+        return {'success': False, 'message': e.message}, 503, {'Retry-After': str(retry_after)}
+    except DatabaseException as e:
+        print(f"Database error fetching changes: {e}")
+        return {'success': False, 'message': 'Database error occurred while fetching changes.'}, 500
+    except Exception as e:
+        print(f"An unexpected error occurred fetching changes: {e}")
+        return {'success': False, 'message': 'An internal error occurred while fetching changes.'}, 500
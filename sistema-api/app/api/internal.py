@@ -0,0 +1,144 @@
+# inventory_api/app/api/internal.py
+
+from flask import request, jsonify, current_app, send_from_directory
+from . import internal_bp
+from ..db import db
+from ..utils.pool_metrics import pool_status
+from ..utils.profiler import MODES
+import hmac
+
+
+@internal_bp.before_request
+def require_internal_token():
+    """Every /api/internal endpoint requires the X-Internal-Token header; they are hidden when no token is configured."""
+    expected = current_app.config.get('INTERNAL_API_TOKEN')
+    if not expected:
+        return jsonify({'success': False, 'message': 'Resource not found'}), 404
+    provided = request.headers.get('X-Internal-Token', '')
+    if not hmac.compare_digest(provided.encode(), expected.encode()):
+        return jsonify({'success': False, 'message': 'Invalid internal token'}), 401
+
+
+@internal_bp.route('/pool', methods=['GET'])
+def get_pool_status():
+    """
+    GET /api/internal/pool
+    Live connection pool statistics for this worker process (one entry per database bind).
+    """
+    try:
+        data = {
+            'default' if bind is None else bind: pool_status(engine)
+            for bind, engine in db.engines.items()
+        }
+        return jsonify({'success': True, 'data': data}), 200
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
+
+
+@internal_bp.route('/replicas', methods=['GET'])
+def get_replica_status():
+    """
+    GET /api/internal/replicas
+    Health of the read replicas as seen by this worker process (empty when none are configured).
+    """
+    router = current_app.extensions.get('replica_router')
+    return jsonify({'success': True, 'data': router.status() if router else []}), 200
+
+
+@internal_bp.route('/slow-queries', methods=['GET'])
+def get_slow_queries():
+    """
+    GET /api/internal/slow-queries?limit=20
+    The most recent statements slower than SLOW_QUERY_THRESHOLD_MS in this worker process,
+    slowest first, with parameters, endpoint and (when sampled) the execution plan.
+    """
+    slow_log = current_app.extensions.get('slow_query_log')
+    if slow_log is None:
+        return jsonify({'success': False, 'message': 'The slow query log is disabled'}), 404
+    limit = request.args.get('limit', type=int)
+    return jsonify({'success': True, 'data': slow_log.entries(limit)}), 200
+
+
+@internal_bp.route('/slow-queries', methods=['DELETE'])
+def clear_slow_queries():
+    """DELETE /api/internal/slow-queries - Empties this worker's slow query buffer."""
+    slow_log = current_app.extensions.get('slow_query_log')
+    if slow_log is None:
+        return jsonify({'success': False, 'message': 'The slow query log is disabled'}), 404
+    slow_log.clear()
+    return jsonify({'success': True, 'message': 'Slow query log cleared'}), 200
+
+
+def _get_profiler():
+    return current_app.extensions.get('profiler')
+
+
+@internal_bp.route('/profiler', methods=['GET'])
+def get_profiler():
+    """
+    GET /api/internal/profiler
+    Current profiler settings (null when off) and the stored profiles, newest first.
+    """
+    profiler = _get_profiler()
+    if profiler is None:
+        return jsonify({'success': False, 'message': 'The profiler is disabled (PROFILER_ENABLED)'}), 404
+    try:
+        profiler.poll()
+        return jsonify({'success': True, 'data': {'settings': profiler.settings, 'profiles': profiler.profiles()}}), 200
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
+
+
+@internal_bp.route('/profiler', methods=['POST'])
+def enable_profiler():
+    """
+    POST /api/internal/profiler
+    Starts profiling requests in every worker for duration_s seconds.
+    Body: {"mode": "stack"|"cprofile", "sample_rate": 0.05, "endpoints": ["reports_api.get_stock_levels"], "duration_s": 300}
+    sample_rate is the fraction of (matching) requests profiled; no endpoints means all of them.
+    """
+    profiler = _get_profiler()
+    if profiler is None:
+        return jsonify({'success': False, 'message': 'The profiler is disabled (PROFILER_ENABLED)'}), 404
+    data = request.get_json(silent=True) or {}
+    mode = data.get('mode', 'stack')
+    endpoints = data.get('endpoints') or []
+    try:
+        sample_rate = float(data.get('sample_rate', 1.0))
+        duration = int(data.get('duration_s', 300))
+    except (TypeError, ValueError):
+        return jsonify({'success': False, 'message': 'sample_rate and duration_s must be numbers'}), 400
+    if mode not in MODES:
+        return jsonify({'success': False, 'message': f"mode must be one of: {', '.join(MODES)}"}), 400
+    if not 0 < sample_rate <= 1 or duration <= 0:
+        return jsonify({'success': False, 'message': 'sample_rate must be in (0, 1] and duration_s positive'}), 400
+    if not isinstance(endpoints, list):
+        return jsonify({'success': False, 'message': 'endpoints must be a list of endpoint names'}), 400
+    unknown = set(endpoints) - set(current_app.view_functions)
+    if unknown:
+        return jsonify({'success': False, 'message': f"Unknown endpoints: {', '.join(sorted(unknown))}"}), 400
+    settings = profiler.enable(mode=mode, sample_rate=sample_rate, endpoints=endpoints, duration=duration)
+    return jsonify({'success': True, 'data': settings}), 200
+
+
+@internal_bp.route('/profiler', methods=['DELETE'])
+def disable_profiler():
+    """DELETE /api/internal/profiler - Stops profiling in every worker."""
+    profiler = _get_profiler()
+    if profiler is None:
+        return jsonify({'success': False, 'message': 'The profiler is disabled (PROFILER_ENABLED)'}), 404
+    profiler.disable()
+    return jsonify({'success': True, 'message': 'Profiler stopped'}), 200
+
+
+@internal_bp.route('/profiler/profiles/<name>', methods=['GET'])
+def download_profile(name):
+    """GET /api/internal/profiler/profiles/<name> - Downloads a stored profile (.prof or .folded)."""
+    profiler = _get_profiler()
+    if profiler is None:
+        return jsonify({'success': False, 'message': 'The profiler is disabled (PROFILER_ENABLED)'}), 404
+    if name not in {profile['name'] for profile in profiler.profiles()}:
+        return jsonify({'success': False, 'message': 'Profile not found'}), 404
+    return send_from_directory(profiler.directory, name, as_attachment=True)
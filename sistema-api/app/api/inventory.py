@@ -5,12 +5,15 @@ from flask import request, jsonify, Blueprint
 # Import your backend service layer for inventory operations
 # Assuming you have a service like InventoryService to handle database interactions
 from . import inventory_bp
+from ..utils.auth import current_user_id
+from ..utils.shards import routed_by_location
 from ..services import InventoryService
 from ..utils.exceptions import (
     NotFoundException,
     ConflictException,
     DatabaseException,
     InsufficientStockException, # Important for removals/transfers
+    InvalidInputException,
 )
 
 # Define the blueprint for inventory routes
@@ -20,44 +23,40 @@ from ..utils.exceptions import (
 # This service class should contain the logic to interact with your models/DB
 inventory_service = InventoryService()
 
-@inventory_bp.route('/add', methods=['POST','OPTIONS'])
+
+@inventory_bp.route('/add', methods=['POST'])
 def add_stock():
     """POST /api/inventory/add - Registers an inventory addition."""
+    body, status = handle_add_stock(request.get_json(), current_user_id())
+    return jsonify(body), status
+
 
-    # --- NUEVA LÓGICA PARA MANEJAR SOLICITUDES OPTIONS ---
-    if request.method == 'OPTIONS':
-        # Flask-CORS debería manejar esto automáticamente si está configurado
-        # Pero si por alguna razón no lo hace, puedes añadir headers aquí manualmente
-        # Sin embargo, con Flask-CORS bien configurado, simplemente retornar 200 OK
-        # es suficiente, ya que Flask-CORS inyectará los headers.
-        response = jsonify({'message': 'Preflight request successful'}) # Cuerpo es opcional para OPTIONS 200
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000') # <-- Ejemplo, Flask-CORS lo hace
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization') # <-- Ejemplo
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS') # <-- Ejemplo
-        # Añadir otros headers necesarios si no usas Flask-CORS globalmente
-        return response, 200
-    # --- FIN LÓGICA OPTIONS ---
-
-    # --- LÓGICA EXISTENTE PARA MANEJAR SOLICITUDES POST ---
-    # Esta parte SOLO se ejecuta si request.method es 'POST'
-    data = request.get_json()
+@routed_by_location()
+def handle_add_stock(data, user_id=None):
+    """
+    Handles the body of POST /api/inventory/add.
+    user_id is the user authenticated by an access token, if any: it replaces the body's user_id.
+    Returns (response dict, status code) so the ASGI app (app/asgi.py) can reuse the same logic.
+    """
     if not data:
-        return jsonify({'success': False, 'message': 'Invalid JSON data'}), 400
+        return {'success': False, 'message': 'Invalid JSON data'}, 400
+    if user_id is not None:
+        data = {**data, 'user_id': user_id}
 
     # Validate required fields
     required_fields = ['product_id', 'location_id', 'quantity', 'user_id']
     if not all(field in data and data[field] is not None for field in required_fields):
-         return jsonify({'success': False, 'message': f'Missing or null required fields: {", ".join(required_fields)}'}), 400
+         return {'success': False, 'message': f'Missing or null required fields: {", ".join(required_fields)}'}, 400
 
     try:
         # Ensure quantity is a positive number
         try:
             quantity = float(data['quantity'])
         except (ValueError, TypeError):
-             return jsonify({'success': False, 'message': 'Invalid quantity value'}), 400
+             return {'success': False, 'message': 'Invalid quantity value'}, 400
 
         if quantity <= 0:
-             return jsonify({'success': False, 'message': 'Quantity must be positive for addition'}), 400
+             return {'success': False, 'message': 'Quantity must be positive for addition'}, 400
 
         # Prepare data for the service layer
         transaction_data = {
@@ -71,67 +70,60 @@ def add_stock():
         }
 
         # Call the service
-        new_transaction = inventory_service.create_inventory_transaction(transaction_data)
+        new_transaction = inventory_service.create_inventory_transaction(transaction_data, user_verified=user_id is not None)
 
         # Return success response
-        return jsonify({
+        return {
             'success': True,
             'message': 'Stock added successfully',
             'transaction_id': new_transaction.id,
             'data': new_transaction.to_dict()
-            }), 201
+            }, 201
 
     except NotFoundException as e:
-        return jsonify({'success': False, 'message': str(e)}), 404
+        return {'success': False, 'message': str(e)}, 404
     except DatabaseException as e:
          print(f"Database error during add_stock: {e}")
-         return jsonify({'success': False, 'message': 'Database error occurred during stock addition'}), 500
+         return {'success': False, 'message': 'Database error occurred during stock addition'}, 500
     except Exception as e:
         print(f"An unexpected error occurred in add_stock: {e}")
-        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
+        return {'success': False, 'message': 'An internal error occurred'}, 500
 
 
-@inventory_bp.route('/adjust', methods=['POST','OPTIONS'])
+@inventory_bp.route('/adjust', methods=['POST'])
 def adjust_stock():
+    """POST /api/inventory/adjust - Registers an inventory adjustment."""
+    body, status = handle_adjust_stock(request.get_json(), current_user_id())
+    return jsonify(body), status
 
-        # --- NUEVA LÓGICA PARA MANEJAR SOLICITUDES OPTIONS ---
-    if request.method == 'OPTIONS':
-        # Flask-CORS debería manejar esto automáticamente si está configurado
-        # Pero si por alguna razón no lo hace, puedes añadir headers aquí manualmente
-        # Sin embargo, con Flask-CORS bien configurado, simplemente retornar 200 OK
-        # es suficiente, ya que Flask-CORS inyectará los headers.
-        response = jsonify({'message': 'Preflight request successful'}) # Cuerpo es opcional para OPTIONS 200
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000') # <-- Ejemplo, Flask-CORS lo hace
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization') # <-- Ejemplo
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS') # <-- Ejemplo
-        # Añadir otros headers necesarios si no usas Flask-CORS globalmente
-        return response, 200
-    # --- FIN LÓGICA OPTIONS ---
 
-    """POST /api/inventory/adjust - Registers an inventory adjustment."""
-    data = request.get_json()
+@routed_by_location()
+def handle_adjust_stock(data, user_id=None):
+    """Handles the body of POST /api/inventory/adjust (see handle_add_stock)."""
     if not data:
-        return jsonify({'success': False, 'message': 'Invalid JSON data'}), 400
+        return {'success': False, 'message': 'Invalid JSON data'}, 400
+    if user_id is not None:
+        data = {**data, 'user_id': user_id}
 
     # Validate required fields for adjustment
     required_fields = ['product_id', 'location_id', 'quantity', 'user_id', 'notes']
     # Ensure all required fields are present and not None
     if not all(field in data and data[field] is not None for field in required_fields):
-         return jsonify({'success': False, 'message': f'Missing or null required fields: {", ".join(required_fields)}'}), 400
+         return {'success': False, 'message': f'Missing or null required fields: {", ".join(required_fields)}'}, 400
 
     # Additional validation for notes for adjustments
     if not data.get('notes', '').strip():
-        return jsonify({'success': False, 'message': 'Notes are required for stock adjustments to explain the reason.'}), 400
+        return {'success': False, 'message': 'Notes are required for stock adjustments to explain the reason.'}, 400
 
     try:
         # Ensure quantity is a valid number (can be positive or negative)
         try:
             quantity = float(data['quantity'])
         except (ValueError, TypeError):
-             return jsonify({'success': False, 'message': 'Invalid quantity value'}), 400
+             return {'success': False, 'message': 'Invalid quantity value'}, 400
 
         if quantity == 0:
-             return jsonify({'success': False, 'message': 'Adjustment quantity cannot be zero'}), 400
+             return {'success': False, 'message': 'Adjustment quantity cannot be zero'}, 400
 
         # Prepare data for the service layer
         transaction_data = {
@@ -146,73 +138,65 @@ def adjust_stock():
 
         # Call the service to create the transaction and update stock levels
         # The service needs to handle both positive and negative adjustments and potential InsufficientStockException
-        new_transaction = inventory_service.create_inventory_transaction(transaction_data)
+        new_transaction = inventory_service.create_inventory_transaction(transaction_data, user_verified=user_id is not None)
 
         # Return success response
-        return jsonify({
+        return {
             'success': True,
             'message': 'Stock adjusted successfully',
             'transaction_id': new_transaction.id, # Assuming the service returns the created object with an ID
             'data': new_transaction.to_dict() # Assuming your model/service returns a dict representation
-            }), 201 # 201 Created
+            }, 201 # 201 Created
 
     except (ValueError, TypeError) as e:
         # Handle cases where quantity or IDs are not valid numbers
-        return jsonify({'success': False, 'message': f'Invalid data type: {e}'}), 400
+        return {'success': False, 'message': f'Invalid data type: {e}'}, 400
     except NotFoundException as e:
         # Handle cases where product_id, location_id, or user_id do not exist
-        return jsonify({'success': False, 'message': str(e)}), 404
+        return {'success': False, 'message': str(e)}, 404
     except InsufficientStockException as e:
         # Handle cases where a negative adjustment would result in negative stock
         # Use 409 Conflict or 400 Bad Request depending on your API design philosophy
-        return jsonify({'success': False, 'message': str(e)}), 409
+        return {'success': False, 'message': str(e)}, 409
     except DatabaseException as e:
          # Handle database errors
          print(f"Database error during adjust_stock: {e}") # Log the error server-side
-         return jsonify({'success': False, 'message': 'Database error occurred during stock adjustment'}), 500
+         return {'success': False, 'message': 'Database error occurred during stock adjustment'}, 500
     except Exception as e:
         # Catch any other unexpected errors
         print(f"An unexpected error occurred in adjust_stock: {e}") # Log the error server-side
-        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
+        return {'success': False, 'message': 'An internal error occurred'}, 500
 
 
-@inventory_bp.route('/remove', methods=['POST','OPTIONS'])
+@inventory_bp.route('/remove', methods=['POST'])
 def remove_stock():
-
-        # --- NUEVA LÓGICA PARA MANEJAR SOLICITUDES OPTIONS ---
-    if request.method == 'OPTIONS':
-        # Flask-CORS debería manejar esto automáticamente si está configurado
-        # Pero si por alguna razón no lo hace, puedes añadir headers aquí manualmente
-        # Sin embargo, con Flask-CORS bien configurado, simplemente retornar 200 OK
-        # es suficiente, ya que Flask-CORS inyectará los headers.
-        response = jsonify({'message': 'Preflight request successful'}) # Cuerpo es opcional para OPTIONS 200
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000') # <-- Ejemplo, Flask-CORS lo hace
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization') # <-- Ejemplo
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS') # <-- Ejemplo
-        # Añadir otros headers necesarios si no usas Flask-CORS globalmente
-        return response, 200
-    # --- FIN LÓGICA OPTIONS ---
+    """POST /api/inventory/remove - Registers an inventory removal."""
+    body, status = handle_remove_stock(request.get_json(), current_user_id())
+    return jsonify(body), status
 
 
-    """POST /api/inventory/remove - Registers an inventory removal."""
-    data = request.get_json()
+@routed_by_location()
+def handle_remove_stock(data, user_id=None):
+    """Handles the body of POST /api/inventory/remove (see handle_add_stock)."""
     if not data:
-        return jsonify({'success': False, 'message': 'Invalid JSON data'}), 400
+        return {'success': False, 'message': 'Invalid JSON data'}, 400
+    if user_id is not None:
+        data = {**data, 'user_id': user_id}
 
     # Validate required fields for removal
     required_fields = ['product_id', 'location_id', 'quantity', 'user_id']
     if not all(field in data and data[field] is not None for field in required_fields):
-         return jsonify({'success': False, 'message': f'Missing or null required fields: {", ".join(required_fields)}'}), 400
+         return {'success': False, 'message': f'Missing or null required fields: {", ".join(required_fields)}'}, 400
 
     try:
         # Ensure quantity is a positive number
         try:
             quantity = float(data['quantity'])
         except (ValueError, TypeError):
-             return jsonify({'success': False, 'message': 'Invalid quantity value'}), 400
+             return {'success': False, 'message': 'Invalid quantity value'}, 400
 
         if quantity <= 0:
-             return jsonify({'success': False, 'message': 'Quantity must be positive for removal'}), 400
+             return {'success': False, 'message': 'Quantity must be positive for removal'}, 400
 
         # Prepare data for the service layer
         transaction_data = {
@@ -227,74 +211,66 @@ def remove_stock():
 
         # Call the service to create the transaction and update stock levels
         # This needs to handle InsufficientStockException if stock goes below zero
-        new_transaction = inventory_service.create_inventory_transaction(transaction_data)
+        new_transaction = inventory_service.create_inventory_transaction(transaction_data, user_verified=user_id is not None)
 
-        return jsonify({
+        return {
             'success': True,
             'message': 'Stock removed successfully',
             'transaction_id': new_transaction.id,
             'data': new_transaction.to_dict()
-            }), 201
+            }, 201
 
     except (ValueError, TypeError) as e:
-        return jsonify({'success': False, 'message': f'Invalid data type: {e}'}), 400
+        return {'success': False, 'message': f'Invalid data type: {e}'}, 400
     except NotFoundException as e:
-        return jsonify({'success': False, 'message': str(e)}), 404
+        return {'success': False, 'message': str(e)}, 404
     except InsufficientStockException as e:
         # Handle cases where removal quantity is more than available stock
-        return jsonify({'success': False, 'message': str(e)}), 409 # Or 400
+        return {'success': False, 'message': str(e)}, 409 # Or 400
     except DatabaseException as e:
          print(f"Database error during remove_stock: {e}")
-         return jsonify({'success': False, 'message': 'Database error occurred during stock removal'}), 500
+         return {'success': False, 'message': 'Database error occurred during stock removal'}, 500
     except Exception as e:
         print(f"An unexpected error occurred in remove_stock: {e}")
-        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
+        return {'success': False, 'message': 'An internal error occurred'}, 500
 
 
-@inventory_bp.route('/transfer', methods=['POST','OPTIONS'])
+@inventory_bp.route('/transfer', methods=['POST'])
 def transfer_stock():
+    """POST /api/inventory/transfer - Registers a stock transfer."""
+    body, status = handle_transfer_stock(request.get_json(silent=True), current_user_id())
+    return jsonify(body), status
 
-        # --- NUEVA LÓGICA PARA MANEJAR SOLICITUDES OPTIONS ---
-    if request.method == 'OPTIONS':
-        # Flask-CORS debería manejar esto automáticamente si está configurado
-        # Pero si por alguna razón no lo hace, puedes añadir headers aquí manualmente
-        # Sin embargo, con Flask-CORS bien configurado, simplemente retornar 200 OK
-        # es suficiente, ya que Flask-CORS inyectará los headers.
-        response = jsonify({'message': 'Preflight request successful'}) # Cuerpo es opcional para OPTIONS 200
-        response.headers.add('Access-Control-Allow-Origin', 'http://localhost:3000') # <-- Ejemplo, Flask-CORS lo hace
-        response.headers.add('Access-Control-Allow-Headers', 'Content-Type, Authorization') # <-- Ejemplo
-        response.headers.add('Access-Control-Allow-Methods', 'POST, OPTIONS') # <-- Ejemplo
-        # Añadir otros headers necesarios si no usas Flask-CORS globalmente
-        return response, 200
-    # --- FIN LÓGICA OPTIONS ---
-    
 
-    """POST /api/inventory/transfer - Registers a stock transfer."""
-    data = request.get_json(silent=True) # Use silent=True for robust error handling
+@routed_by_location('from_location_id')
+def handle_transfer_stock(data, user_id=None):
+    """Handles the body of POST /api/inventory/transfer (see handle_add_stock)."""
     if data is None: # Explicitly check if data is None
-        return jsonify({'success': False, 'message': 'Invalid JSON data'}), 400 
+        return {'success': False, 'message': 'Invalid JSON data'}, 400 
      
     if not data:
-        return jsonify({'success': False, 'message': 'Invalid JSON data'}), 400
+        return {'success': False, 'message': 'Invalid JSON data'}, 400
+    if user_id is not None:
+        data = {**data, 'user_id': user_id}
 
     # Validate required fields for transfer
     required_fields = ['product_id', 'from_location_id', 'to_location_id', 'quantity', 'user_id']
     if not all(field in data and data[field] is not None for field in required_fields):
-         return jsonify({'success': False, 'message': f'Missing or null required fields: {", ".join(required_fields)}'}), 400
+         return {'success': False, 'message': f'Missing or null required fields: {", ".join(required_fields)}'}, 400
 
     try:
         # Ensure quantity is a positive number
         try:
             quantity = float(data['quantity'])
         except (ValueError, TypeError):
-             return jsonify({'success': False, 'message': 'Invalid quantity value'}), 400
+             return {'success': False, 'message': 'Invalid quantity value'}, 400
 
         if quantity <= 0:
-             return jsonify({'success': False, 'message': 'Quantity must be positive for transfer'}), 400
+             return {'success': False, 'message': 'Quantity must be positive for transfer'}, 400
 
         # Ensure source and destination locations are different
         if data['from_location_id'] == data['to_location_id']:
-             return jsonify({'success': False, 'message': 'Source and destination locations cannot be the same'}), 400
+             return {'success': False, 'message': 'Source and destination locations cannot be the same'}, 400
 
         # Prepare data for the service layer
         transfer_data = {
@@ -308,26 +284,72 @@ def transfer_stock():
 
         # Call the service to create the transfer record and associated transactions
         # Assuming inventory_service.create_location_transfer handles this complex logic
-        new_transfer = inventory_service.create_location_transfer(transfer_data)
+        new_transfer = inventory_service.create_location_transfer(transfer_data, user_verified=user_id is not None)
 
-        return jsonify({
+        return {
             'success': True,
             'message': 'Stock transferred successfully',
             'transfer_id': new_transfer.id, # Assuming the service returns the created transfer object
             'data': new_transfer.to_dict() # Assuming your model/service returns a dict representation
-            }), 201
+            }, 201
 
     except (ValueError, TypeError) as e:
-        return jsonify({'success': False, 'message': f'Invalid data type: {e}'}), 400
+        return {'success': False, 'message': f'Invalid data type: {e}'}, 400
     except NotFoundException as e:
         # Handle cases where product_id, location_ids, or user_id do not exist
-        return jsonify({'success': False, 'message': str(e)}), 404
+        return {'success': False, 'message': str(e)}, 404
     except InsufficientStockException as e:
         # Handle cases where removal quantity from the source location is more than available stock
-        return jsonify({'success': False, 'message': str(e)}), 409 # Or 400
+        return {'success': False, 'message': str(e)}, 409 # Or 400
     except DatabaseException as e:
          print(f"Database error during transfer_stock: {e}")
-         return jsonify({'success': False, 'message': 'Database error occurred during stock transfer'}), 500
+         return {'success': False, 'message': 'Database error occurred during stock transfer'}, 500
     except Exception as e:
         print(f"An unexpected error occurred in transfer_stock: {e}")
-        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
+        return {'success': False, 'message': 'An internal error occurred'}, 500
+
+
+@inventory_bp.route('/barcode/<path:code>', methods=['GET'])
+def lookup_barcode(code):
+    """GET /api/inventory/barcode/{code} - Product and stock per location for a scanned barcode or SKU."""
+    body, status = handle_barcode_lookup(code)
+    return jsonify(body), status
+
+
+def handle_barcode_lookup(code):
+    """Handles GET /api/inventory/barcode/{code} (see handle_add_stock)."""
+    try:
+        return {'success': True, 'data': inventory_service.lookup_barcode(code)}, 200
+    except NotFoundException as e:
+        return {'success': False, 'message': str(e)}, 404
+    except Exception as e:
+        print(f"An unexpected error occurred in lookup_barcode: {e}")
+        return {'success': False, 'message': 'An internal error occurred'}, 500
+
+
+@inventory_bp.route('/stock', methods=['GET'])
+def get_stock():
+    """
+    GET /api/inventory/stock
+    Current stock for a product and/or a location.
+    Query Parameters: product_id, location_id (at least one)
+    """
+    body, status = handle_stock_query(request.args)
+    return jsonify(body), status
+
+
+def handle_stock_query(args):
+    """Handles GET /api/inventory/stock (see handle_add_stock). args is a mapping of query parameters."""
+    try:
+        product_id = int(args['product_id']) if args.get('product_id') else None
+        location_id = int(args['location_id']) if args.get('location_id') else None
+    except ValueError:
+        return {'success': False, 'message': 'product_id and location_id must be integers'}, 400
+
+    try:
+        return {'success': True, 'data': inventory_service.get_stock(product_id=product_id, location_id=location_id)}, 200
+    except InvalidInputException as e:
+        return {'success': False, 'message': str(e)}, 400
+    except Exception as e:
+        print(f"An unexpected error occurred in get_stock: {e}")
+        return {'success': False, 'message': 'An internal error occurred'}, 500
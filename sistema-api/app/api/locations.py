@@ -2,11 +2,12 @@
 
 from flask import request, jsonify
 from . import locations_bp
-from ..services import LocationService
-from ..utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException # Added InsufficientStockException back as it was missing
+from ..services import LocationService, CapacityService
+from ..utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException, InvalidInputException # Added InsufficientStockException back as it was missing
 
 
 location_service = LocationService()
+capacity_service = CapacityService()
 
 @locations_bp.route('/', methods=['GET'])
 def list_locations():
@@ -144,4 +145,52 @@ def delete_location(location_id):
          return jsonify({'success': False, 'message': str(e)}), 500
     except Exception as e:
         print(f"An unexpected error occurred: {e}")
-        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
+
+@locations_bp.route('/<int:location_id>/stock', methods=['GET'])
+def get_location_stock(location_id):
+    """
+    GET /api/locations/{id}/stock - Stock per product at a location.
+    With ?rollup=true, includes every location below it (e.g. a warehouse total over all its bins).
+    """
+    try:
+        rollup = request.args.get('rollup', '').lower() in ['true', '1']
+        stock_data = location_service.get_location_stock(location_id, rollup=rollup)
+        return jsonify({'success': True, 'rollup': rollup, 'data': stock_data}), 200
+    except NotFoundException as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except DatabaseException as e:
+         return jsonify({'success': False, 'message': str(e)}), 500
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
+
+
+@locations_bp.route('/<int:location_id>/capacity', methods=['GET'])
+def check_location_capacity(location_id):
+    """
+    GET /api/locations/{id}/capacity?volume=12.5 or ?product_id=1&quantity=10
+    Checks whether additional stock fits at a location (putaway check, one row read).
+    """
+    try:
+        volume = request.args.get('volume')
+        product_id = request.args.get('product_id')
+        quantity = request.args.get('quantity')
+        try:
+            volume = float(volume) if volume is not None else None
+            product_id = int(product_id) if product_id is not None else None
+            quantity = float(quantity) if quantity is not None else None
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid volume, product_id or quantity'}), 400
+
+        result = capacity_service.check_capacity(location_id, volume=volume, product_id=product_id, quantity=quantity)
+        return jsonify({'success': True, 'data': result}), 200
+    except InvalidInputException as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except NotFoundException as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except DatabaseException as e:
+         return jsonify({'success': False, 'message': str(e)}), 500
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
@@ -1,24 +1,17 @@
 # inventory_api/app/api/login.py
 
-from flask import request, jsonify
+from flask import request, jsonify, current_app
 from . import auth_bp # Use the existing auth_bp blueprint
 from ..services.login_service import LoginService
 # Import ConflictException for registration
 from ..utils.exceptions import AuthenticationException, DatabaseException, ApiException, ConflictException, ValueError
+from ..utils.auth import current_user_id
 
 login_service = LoginService()
 
-@auth_bp.route('/login', methods=['POST','OPTIONS'])
+@auth_bp.route('/login', methods=['POST'])
 def login():
     """POST /api/auth/login - Authenticates a user."""
-    # --- Manejo explícito de OPTIONS para CORS preflight ---
-    if request.method == 'OPTIONS':
-        # Flask-CORS debería manejar esto, pero lo añadimos como fallback.
-        # Si Flask-CORS está activo y configurado correctamente, esta línea
-        # puede que nunca se alcance.
-        return jsonify({}), 200
-    # --- Fin del manejo de OPTIONS ---
-
     data = request.get_json()
     if not data:
         return jsonify({'success': False, 'message': 'Invalid JSON data'}), 400
@@ -39,12 +32,14 @@ def login():
     try:
         user = login_service.authenticate_user(identifier.strip(), password.strip())
 
-        # Authentication successful
-        # You might return user data here, or generate a JWT token
-        # For simplicity, we return basic success and user info
+        # Authentication successful: the access token replaces the user_id in later request bodies
+        tokens = current_app.extensions['auth']
         return jsonify({
             'success': True,
             'message': 'Login successful',
+            'access_token': tokens.issue(user.id),
+            'token_type': 'Bearer',
+            'expires_in': tokens.max_age,
             'user': {
                 'id': user.id,
                 'username': user.username,
@@ -67,18 +62,29 @@ def login():
         return jsonify({'success': False, 'message': 'An internal error occurred during login'}), 500
 
 
+@auth_bp.route('/logout', methods=['POST'])
+def logout():
+    """POST /api/auth/logout - Revokes every access token of the authenticated user."""
+    user_id = current_user_id()
+    if user_id is None:
+        return jsonify({'success': False, 'message': 'Authentication required.'}), 401
+
+    try:
+        revoked_at = login_service.revoke_tokens(user_id)
+        # This worker stops accepting the tokens at once; the others when their status cache expires
+        current_app.extensions['auth'].remember(user_id, True, revoked_at)
+        return jsonify({'success': True, 'message': 'Logout successful'}), 200
+    except DatabaseException as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    except Exception as e:
+        print(f"An unexpected error occurred during logout: {e}")
+        return jsonify({'success': False, 'message': 'An internal error occurred during logout'}), 500
+
+
 # --- New Registration Endpoint ---
-@auth_bp.route('/register', methods=['POST','OPTIONS'])
+@auth_bp.route('/register', methods=['POST'])
 def register():
     """POST /api/auth/register - Registers a new user."""
-     # --- Manejo explícito de OPTIONS para CORS preflight ---
-    if request.method == 'OPTIONS':
-        # Flask-CORS debería manejar esto, pero lo añadimos como fallback.
-        # Si Flask-CORS está activo y configurado correctamente, esta línea
-        # puede que nunca se alcance.
-        return jsonify({}), 200
-    # --- Fin del manejo de OPTIONS ---
-
     data = request.get_json()
     if not data:
         return jsonify({'success': False, 'message': 'Invalid JSON data'}), 400
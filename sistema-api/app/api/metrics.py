@@ -0,0 +1,28 @@
+# inventory_api/app/api/metrics.py
+
+from flask import request, jsonify, current_app
+from . import metrics_bp
+from ..utils.metrics import render_metrics
+import hmac
+
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    GET /metrics
+    Request latency histograms, request counts and in-flight requests per blueprint and
+    endpoint, in Prometheus text format (all workers when PROMETHEUS_MULTIPROC_DIR is set).
+    """
+    if not current_app.config.get('METRICS_ENABLED'):
+        return jsonify({'success': False, 'message': 'Resource not found'}), 404
+    expected = current_app.config.get('METRICS_BEARER_TOKEN')
+    if expected:
+        provided = request.headers.get('Authorization', '')
+        if not hmac.compare_digest(provided.encode(), f"Bearer {expected}".encode()):
+            return jsonify({'success': False, 'message': 'Invalid metrics token'}), 401
+    try:
+        body, content_type = render_metrics()
+        return body, 200, {'Content-Type': content_type}
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
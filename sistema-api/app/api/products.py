@@ -1,16 +1,17 @@
 # inventory_api/app/api/products.py
 
-from flask import request, jsonify, redirect
+from flask import request, jsonify, current_app
 from . import products_bp
 from ..services import ProductService
-from ..utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException # Added InsufficientStockException back as it was missing
+from ..utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException, InvalidInputException # Added InsufficientStockException back as it was missing
 from datetime import datetime
 from werkzeug.exceptions import BadRequest
+import io
 
 # Instantiate the service
 product_service = ProductService()
 
-@products_bp.route('/', methods=['GET','OPTIONS'])
+@products_bp.route('/', methods=['GET'])
 def list_products():
     """
     GET /api/products
@@ -29,6 +30,9 @@ def list_products():
                 filters['category_id'] = int(request.args.get('category_id'))
              except ValueError:
                  return jsonify({'success': False, 'message': 'Invalid category_id'}), 400
+             # include_descendants=true also matches products in every subcategory
+             if request.args.get('include_descendants', '').lower() in ['true', '1']:
+                filters['include_descendants'] = True
         if 'supplier_id' in request.args:
              try:
                 filters['supplier_id'] = int(request.args.get('supplier_id'))
@@ -80,27 +84,6 @@ def list_products():
         print(f"An unexpected error occurred: {e}")
         return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
 
-@products_bp.after_request
-def add_security_headers(response):
-    headers = {
-        'Content-Security-Policy': "default-src 'self'",
-        'X-Content-Type-Options': 'nosniff',
-        'X-Frame-Options': 'DENY',
-        'X-XSS-Protection': '1; mode=block',
-        'Referrer-Policy': 'strict-origin-when-cross-origin',
-        'Strict-Transport-Security': 'max-age=31536000; includeSubDomains',
-        'Cache-Control': 'no-store, no-cache, must-revalidate, private' # Cache-Control añadido
-    }
-    for header, value in headers.items():
-        response.headers[header] = value
-    return response
-
-@products_bp.before_request
-def force_https():
-    if request.headers.get('X-Forwarded-Proto') == 'http':
-        url = request.url.replace('http://', 'https://', 1)
-        return redirect(url, code=301)
-    
 @products_bp.errorhandler(413)
 def handle_payload_too_large(e):
     return jsonify({
@@ -115,7 +98,7 @@ def handle_not_found(e):
         'message': str(e) if str(e) else 'Resource not found'
     }), 404
 
-@products_bp.route('/', methods=['POST','OPTIONS'])
+@products_bp.route('/', methods=['POST'])
 def create_product():
     """
     POST /api/products
@@ -171,7 +154,92 @@ def create_product():
         return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
 
 
-@products_bp.route('/<int:product_id>', methods=['GET','OPTIONS'])
+@products_bp.route('/bulk', methods=['PATCH'])
+def bulk_update_products():
+    """
+    PATCH /api/products/bulk
+    Updates many products with a single statement.
+    Expected JSON body, either:
+      {"items": [{"id": 1, "unit_price": 10.5, "min_stock": 5}, ...]}
+    or:
+      {"filter": {"supplier_id": 12, "category_id": 3, "include_descendants": true},
+       "changes": {"unit_price": {"percent": 4}, "unit_cost": {"amount": -0.5}, "min_stock": 10}}
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or ('items' not in data and 'changes' not in data):
+        return jsonify({'success': False, 'message': "Expected 'items' or 'filter' and 'changes'"}), 400
+    if 'changes' in data and not isinstance(data['changes'], dict):
+        return jsonify({'success': False, 'message': "'changes' must be an object"}), 400
+    if 'filter' in data and not isinstance(data['filter'], dict):
+        return jsonify({'success': False, 'message': "'filter' must be an object"}), 400
+
+    try:
+        updated = product_service.bulk_update_products(
+            items=data.get('items'),
+            filters=data.get('filter'),
+            changes=data.get('changes')
+        )
+        return jsonify({'success': True, 'message': f'{updated} products updated', 'updated': updated}), 200
+
+    except InvalidInputException as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except NotFoundException as e:
+        return jsonify({'success': False, 'message': str(e)}), 404
+    except ConflictException as e:
+        return jsonify({'success': False, 'message': str(e)}), 409
+    except DatabaseException as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
+
+
+@products_bp.route('/import', methods=['POST'])
+def import_products():
+    """
+    POST /api/products/import
+    Bulk-imports products from a CSV (header row) or NDJSON file, creating new SKUs and updating existing ones.
+    The file is sent as multipart field 'file' or as the raw request body.
+    Query Parameters: format (csv, ndjson; otherwise inferred from the content type or file name)
+    Returns counts of created/updated rows and the errors of rejected rows.
+    """
+    # Catalog files are larger than regular JSON payloads
+    request.max_content_length = current_app.config.get('PRODUCT_IMPORT_MAX_CONTENT_LENGTH')
+
+    try:
+        upload = request.files.get('file')
+        if upload is not None:
+            stream, filename, content_type = upload.stream, upload.filename or '', upload.mimetype
+        else:
+            stream, filename, content_type = request.stream, '', request.mimetype
+
+        file_format = request.args.get('format', '').lower()
+        if not file_format:
+            if 'ndjson' in content_type or 'jsonlines' in content_type or filename.lower().endswith(('.ndjson', '.jsonl')):
+                file_format = 'ndjson'
+            else:
+                file_format = 'csv'
+        if file_format not in ('csv', 'ndjson'):
+            return jsonify({'success': False, 'message': "Invalid format. Use 'csv' or 'ndjson'"}), 400
+
+        text_stream = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+        report = product_service.import_products(text_stream, file_format)
+        return jsonify({
+            'success': True,
+            'message': f"Imported {report['created'] + report['updated']} of {report['total_rows']} rows",
+            'data': report
+        }), 200
+
+    except InvalidInputException as e:
+        return jsonify({'success': False, 'message': str(e)}), 400
+    except DatabaseException as e:
+        return jsonify({'success': False, 'message': str(e)}), 500
+    except Exception as e:
+        print(f"An unexpected error occurred: {e}")
+        return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
+
+
+@products_bp.route('/<int:product_id>', methods=['GET'])
 def get_product(product_id):
     """
     GET /api/products/{product_id}
@@ -190,7 +258,7 @@ def get_product(product_id):
         return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
 
 
-@products_bp.route('/<int:product_id>', methods=['PUT', 'PATCH','OPTIONS'])
+@products_bp.route('/<int:product_id>', methods=['PUT', 'PATCH'])
 def update_product(product_id):
     """
     PUT /api/products/{product_id} or PATCH /api/products/{product_id}
@@ -222,7 +290,7 @@ def update_product(product_id):
         return jsonify({'success': False, 'message': 'An internal error occurred'}), 500
 
 
-@products_bp.route('/<int:product_id>', methods=['DELETE','OPTIONS'])
+@products_bp.route('/<int:product_id>', methods=['DELETE'])
 def delete_product(product_id):
     """
     DELETE /api/products/{product_id}
@@ -267,7 +335,7 @@ def validate_query_params(args):
         if param in ['name', 'sku', 'description'] and not validate_input_string(value):
             raise BadRequest(f"Invalid characters in {param} parameter")
 
-@products_bp.route('/<int:product_id>/stock-levels', methods=['GET','OPTIONS'])
+@products_bp.route('/<int:product_id>/stock-levels', methods=['GET'])
 def list_product_stock_levels(product_id):
     """GET /api/products/{product_id}/stock-levels - Lists stock levels for a specific product."""
     try:
@@ -1,7 +1,9 @@
 # app/api/reports.py
 from flask import Blueprint, request, jsonify
+from datetime import date
 # Import your backend service layers for reports
 from ..services.report_service import ReportService
+from ..services.capacity_service import CapacityService
 # Removed imports for Marshmallow schemas
 from . import reports_bp
 from ..utils.exceptions import (
@@ -15,22 +17,18 @@ from ..utils.exceptions import (
 
 # Instantiate your service class
 report_service = ReportService()
+capacity_service = CapacityService()
 # Removed instantiation for Marshmallow schemas
 
 
 # --- Rutas Simplificadas (sin lógica de filtros, paginación, ordenamiento) ---
 
-@reports_bp.route('/stock-levels', methods=['GET', 'OPTIONS'])
+@reports_bp.route('/stock-levels', methods=['GET'])
 def get_stock_levels():
     """
     GET /api/reports/stock-levels
     Obtener el nivel de stock actual para cada combinación producto/ubicación.
     """
-    # Flask-CORS handles the preflight response. This block is often redundant
-    # if CORS is configured correctly, but kept for clarity/fallback.
-    if request.method == 'OPTIONS':
-        return jsonify({}), 200
-
     try:
         # Llama al ReportService para obtener todos los niveles de stock
         # (asumiendo que el servicio devuelve datos sin necesidad de parámetros)
@@ -47,15 +45,12 @@ def get_stock_levels():
         return jsonify({'success': False, 'message': 'An internal error occurred while fetching stock levels.'}), 500
 
 
-@reports_bp.route('/low-stock', methods=['GET', 'OPTIONS'])
+@reports_bp.route('/low-stock', methods=['GET'])
 def get_low_stock_report():
     """
     GET /api/reports/low-stock
     Obtener una lista de productos/ubicaciones con stock bajo.
     """
-    if request.method == 'OPTIONS':
-        return jsonify({}), 200
-
     try:
         # Llama al ReportService para obtener el reporte de stock bajo
         low_stock_data = report_service.get_low_stock_items()
@@ -71,15 +66,12 @@ def get_low_stock_report():
         return jsonify({'success': False, 'message': 'An internal error occurred while fetching low stock report.'}), 500
 
 
-@reports_bp.route('/transactions', methods=['GET', 'OPTIONS'])
+@reports_bp.route('/transactions', methods=['GET'])
 def get_transaction_history():
     """
     GET /api/reports/transactions
     Obtener el historial de transacciones de inventario.
     """
-    if request.method == 'OPTIONS':
-        return jsonify({}), 200
-
     try:
         # Llama al ReportService para obtener el historial de transacciones
         transactions_data = report_service.get_transaction_history()
@@ -95,15 +87,12 @@ def get_transaction_history():
         return jsonify({'success': False, 'message': 'An internal error occurred while fetching transaction history.'}), 500
 
 
-@reports_bp.route('/transfers', methods=['GET', 'OPTIONS'])
+@reports_bp.route('/transfers', methods=['GET'])
 def get_transfer_history():
     """
     GET /api/reports/transfers
     Obtener el historial de transferencias de stock entre ubicaciones.
     """
-    if request.method == 'OPTIONS':
-        return jsonify({}), 200
-
     try:
         # Llama al ReportService para obtener el historial de transferencias
         transfers_data = report_service.get_transfer_history()
@@ -119,15 +108,12 @@ def get_transfer_history():
         return jsonify({'success': False, 'message': 'An internal error occurred while fetching transfer history.'}), 500
 
 # La ruta get_total_inventory_value ya estaba simplificada, solo llama al servicio
-@reports_bp.route('/total-value', methods=['GET', 'OPTIONS'])
+@reports_bp.route('/total-value', methods=['GET'])
 def get_total_inventory_value():
     """
     GET /api/reports/total-value
     Obtener el valor total del inventario.
     """
-    if request.method == 'OPTIONS':
-        return jsonify({}), 200
-
     try:
         # Asumiendo que report_service.get_inventory_total_value devuelve un valor escalar
         total_value = report_service.get_inventory_total_value()
@@ -138,4 +124,61 @@ def get_total_inventory_value():
         return jsonify({'success': False, 'message': str(e)}), 500
     except Exception as e:
         print(f"An unexpected error occurred fetching total inventory value: {e}")
-        return jsonify({'success': False, 'message': 'An internal error occurred.'}), 500
\ No newline at end of file
+        return jsonify({'success': False, 'message': 'An internal error occurred.'}), 500
+
+
+@reports_bp.route('/daily-movements', methods=['GET'])
+def get_daily_movements_report():
+    """
+    GET /api/reports/daily-movements?productId=1&locationId=2&startDate=2024-01-01&endDate=2024-01-31&page=1&limit=50
+    Entradas y salidas por día, producto y ubicación (proyección del libro de transacciones).
+    """
+    try:
+        filters = {}
+        try:
+            for param, key in (('productId', 'product_id'), ('locationId', 'location_id')):
+                if request.args.get(param):
+                    filters[key] = int(request.args.get(param))
+            for param, key in (('startDate', 'start_date'), ('endDate', 'end_date')):
+                if request.args.get(param):
+                    filters[key] = date.fromisoformat(request.args.get(param))
+            pagination = {'page': int(request.args['page']), 'limit': int(request.args['limit'])} \
+                if 'page' in request.args and 'limit' in request.args else None
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid filter: ids and page/limit must be integers, dates YYYY-MM-DD'}), 400
+
+        movements_data = report_service.get_daily_movements(filters=filters, pagination=pagination)
+        return jsonify({'success': True, 'data': movements_data}), 200
+
+    except DatabaseException as e:
+        print(f"Database error fetching daily movements report: {e}")
+        return jsonify({'success': False, 'message': 'Database error occurred while fetching daily movements report.'}), 500
+    except Exception as e:
+        print(f"An unexpected error occurred fetching daily movements report: {e}")
+        return jsonify({'success': False, 'message': 'An internal error occurred while fetching daily movements report.'}), 500
+
+
+@reports_bp.route('/utilization', methods=['GET'])
+def get_utilization_report():
+    """
+    GET /api/reports/utilization?order=desc&limit=10
+    Ubicaciones más llenas (order=desc) o más vacías (order=asc) según volumen usado / capacidad.
+    """
+    try:
+        order = request.args.get('order', 'desc').lower()
+        if order not in ['asc', 'desc']:
+            return jsonify({'success': False, 'message': 'order must be asc or desc'}), 400
+        try:
+            limit = int(request.args.get('limit', 10))
+        except ValueError:
+            return jsonify({'success': False, 'message': 'Invalid limit number'}), 400
+
+        utilization_data = capacity_service.get_utilization_report(order=order, limit=limit)
+        return jsonify({'success': True, 'data': utilization_data}), 200
+
+    except DatabaseException as e:
+        print(f"Database error fetching utilization report: {e}")
+        return jsonify({'success': False, 'message': 'Database error occurred while fetching utilization report.'}), 500
+    except Exception as e:
+        print(f"An unexpected error occurred fetching utilization report: {e}")
+        return jsonify({'success': False, 'message': 'An internal error occurred while fetching utilization report.'}), 500
@@ -4,6 +4,7 @@ from flask import request, jsonify
 from . import transactions_bp
 from ..services import TransactionService, ReportService # Import ReportService for stock levels
 from ..utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException # Added InsufficientStockException back as it was missing
+from ..utils.shards import routed_by_location
 from datetime import datetime, date
 
 transaction_service = TransactionService()
@@ -25,7 +26,12 @@ def create_transaction():
     for field in required_fields:
         if field not in data:
             return jsonify({'success': False, 'message': f'Missing required field: {field}'}), 400
+    return _create_transaction(data)
 
+
+@routed_by_location()
+def _create_transaction(data):
+    """The rest of create_transaction, on the shard holding the location's stock (app/utils/shards.py)."""
     try:
         # Convert quantity to float/Decimal early for validation
         try:
@@ -158,7 +164,7 @@ def get_stock_levels_report():
     """
     GET /api/transactions/stock-levels (or ideally /api/stock-levels as per structure)
     Gets current stock levels for all product/location combinations.
-    Filters can include: productId, locationId, categoryId, supplierId.
+    Filters can include: productId, locationId, categoryId (+ includeDescendants), supplierId.
     """
     # Note: The endpoint description suggested /api/stock-levels, but the file structure lists it under transactions.
     # Let's stick to /api/transactions/stock-levels as per the file structure definition,
@@ -182,6 +188,9 @@ def get_stock_levels_report():
                 filters['category_id'] = int(request.args.get('categoryId'))
              except ValueError:
                  return jsonify({'success': False, 'message': 'Invalid categoryId'}), 400
+             # includeDescendants=true also matches products in every subcategory
+             if request.args.get('includeDescendants', '').lower() in ['true', '1']:
+                filters['include_descendants'] = True
         if 'supplierId' in request.args:
              try:
                 filters['supplier_id'] = int(request.args.get('supplierId'))
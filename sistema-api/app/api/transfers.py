@@ -4,6 +4,7 @@ from flask import request, jsonify
 from . import transfers_bp
 from ..services import TransferService
 from ..utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException
+from ..utils.shards import routed_by_location
 from datetime import datetime, date, timezone # Import timezone for consistent comparisons
 
 transfer_service = TransferService()
@@ -101,7 +102,12 @@ def create_transfer():
         # Check if the key is missing OR if its value is explicitly None
         if field not in data or data[field] is None:
             return jsonify({'success': False, 'message': f'Missing or null required field: {field}'}), 400
+    return _create_transfer(data)
 
+
+@routed_by_location('from_location_id')
+def _create_transfer(data):
+    """The rest of create_transfer, on the source location's shard (app/utils/shards.py)."""
     try:
         # Convert quantity to float/Decimal early
         # We already checked if data['quantity'] is None in the required_fields loop
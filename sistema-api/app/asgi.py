@@ -0,0 +1,437 @@
+# inventory_api/app/asgi.py
+"""
+ASGI serving mode for the high-traffic inventory endpoints:
+
+    uvicorn --factory app.asgi:create_asgi_app --host 0.0.0.0 --port 8000
+
+Inventory add/remove/adjust/transfer, barcode lookup and stock queries run on an async
+engine (asyncpg for PostgreSQL, aiosqlite for SQLite), so a worker keeps accepting
+requests while others wait on the database. They reuse the Flask handlers and services:
+each request runs the same handler inside AsyncSession.run_sync, with db.session bound
+to that session. Every other path is served by the Flask (WSGI) app in a worker thread.
+With DATABASE_SHARD_URLS, each shard gets an async engine too and the sessions route by shard.
+
+It also serves GET /api/stream/stock-levels, the Server-Sent Events stream of stock-level
+changes (app/utils/stream.py), and the change feed's long-polls (GET /api/changes?wait=): both
+wait on the event loop, so thousands of idle ones hold no thread and no DB connection.
+
+Requires sqlalchemy[asyncio] plus the async driver (asyncpg / aiosqlite) and an ASGI server.
+"""
+
+import asyncio
+import io
+import json
+import os
+import re
+import sys
+import time
+from urllib.parse import parse_qsl
+from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import NullPool
+from . import create_app
+from .db import db
+from .api import changes, inventory
+from .services import ChangeService, ProjectionService
+from .utils.admission import client_identity, rejection_parts
+from .utils.auth import bearer_token
+from .utils.exceptions import AuthenticationException
+from .utils.metrics import REQUESTS_IN_FLIGHT, observe_request
+from .utils.query_stats import register_query_events
+from .utils.shards import current_shard, shard_engine
+from .utils.slow_queries import register_slow_query_events
+from .utils.stream import CLOSE, RESYNC
+
+STREAM_PATH = re.compile(r'^/api/stream/stock-levels/?$')
+MAX_STREAM_FILTER_IDS = 1000
+
+CONFIG_BY_ENV = {
+    'development': 'config.DevelopmentConfig',
+    'testing': 'config.TestingConfig',
+    'production': 'config.ProductionConfig',
+}
+
+
+def async_database_url(config):
+    """ASYNC_DATABASE_URL if set, otherwise SQLALCHEMY_DATABASE_URI with its async driver."""
+    if config.get('ASYNC_DATABASE_URL'):
+        return config['ASYNC_DATABASE_URL']
+    url = config['SQLALCHEMY_DATABASE_URI']
+    scheme, rest = url.split('://', 1)
+    if scheme in ('postgresql', 'postgresql+psycopg2', 'postgres'):
+        return f"postgresql+asyncpg://{rest}"
+    if scheme in ('sqlite', 'sqlite+pysqlite'):
+        return f"sqlite+aiosqlite://{rest}"
+    return url # e.g. postgresql+psycopg (psycopg 3 is async-capable)
+
+
+def async_engine_options(config, url):
+    """Engine options for the async engine, from the same DB_* settings as the sync engine."""
+    if not url.startswith('postgresql'):
+        return {}
+    timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+    if config.get('DB_PGBOUNCER'):
+        # asyncpg's prepared statement cache does not work behind a transaction pooler
+        return {'poolclass': NullPool, 'connect_args': {'statement_cache_size': 0}}
+    options = {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+        'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+    }
+    if timeout and url.startswith('postgresql+asyncpg'):
+        options['connect_args'] = {'server_settings': {'statement_timeout': str(int(timeout))}}
+    return options
+
+
+class ShardRoutingSession(Session):
+    """
+    The sync session behind the ASGI app's AsyncSessions. Like RoutingSession, inside on_shard() /
+    location_shard() statements on the sharded tables go to that shard, here through its async engine.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and shard_engine(mapper, clause) is not None:
+            return self.info['shard_engines'][current_shard()]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class InventoryASGI:
+    """Thin ASGI application: async routes for the hot endpoints, Flask for the rest."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        url = async_database_url(flask_app.config)
+        self.engine = create_async_engine(url, **async_engine_options(flask_app.config, url))
+        # engines[N] is shard N (engines[0] the primary), as in the Flask app's ShardRouter
+        self.engines = [self.engine]
+        for shard_url in flask_app.config.get('DATABASE_SHARD_URLS') or []:
+            shard_url = async_database_url({'SQLALCHEMY_DATABASE_URI': shard_url})
+            self.engines.append(create_async_engine(shard_url, **async_engine_options(flask_app.config, shard_url)))
+        slow_log = flask_app.extensions.get('slow_query_log') # Set when SLOW_QUERY_THRESHOLD_MS is
+        for engine in self.engines:
+            # The statement instrumentation of the Flask app's engines (query stats, slow query log)
+            register_query_events(engine.sync_engine)
+            if slow_log is not None:
+                register_slow_query_events(engine.sync_engine, slow_log)
+        self.sessions = async_sessionmaker(self.engine, sync_session_class=ShardRoutingSession,
+                                           info={'shard_engines': [engine.sync_engine for engine in self.engines]})
+        # (method, path, Flask endpoint name used as the metrics label, endpoint)
+        self.routes = [
+            ('POST', re.compile(r'^/api/inventory/add/?$'), 'inventory_api.add_stock', self.movement('inventory_api.add_stock', inventory.handle_add_stock)),
+            ('POST', re.compile(r'^/api/inventory/remove/?$'), 'inventory_api.remove_stock', self.movement('inventory_api.remove_stock', inventory.handle_remove_stock)),
+            ('POST', re.compile(r'^/api/inventory/adjust/?$'), 'inventory_api.adjust_stock', self.movement('inventory_api.adjust_stock', inventory.handle_adjust_stock)),
+            ('POST', re.compile(r'^/api/inventory/transfer/?$'), 'inventory_api.transfer_stock', self.movement('inventory_api.transfer_stock', inventory.handle_transfer_stock)),
+            ('GET', re.compile(r'^/api/inventory/barcode/(?P<code>.+)$'), 'inventory_api.lookup_barcode', self.barcode_lookup),
+            ('GET', re.compile(r'^/api/inventory/stock/?$'), 'inventory_api.get_stock', self.stock_query),
+            ('GET', re.compile(r'^/api/changes/?$'), 'changes_api.get_changes', self.change_feed),
+        ]
+        self.metrics = flask_app.config.get('METRICS_ENABLED', False)
+        self.admission = flask_app.extensions.get('admission') # Set when ADMISSION_CONTROL_ENABLED
+        self.edge = flask_app.extensions['edge']
+        self.stream = flask_app.extensions['stock_stream']
+        self.heartbeat_s = flask_app.config.get('STREAM_HEARTBEAT_S', 15)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+
+        method, path = scope['method'], scope['path']
+        if self.edge.force_https and method != 'OPTIONS' and (b'x-forwarded-proto', b'http') in scope['headers']:
+            return await self.call_wsgi(scope, receive, send) # The edge middleware redirects it
+        if STREAM_PATH.match(path):
+            if method == 'OPTIONS':
+                return await self.respond(scope, send, {}, 200, preflight=True)
+            if method == 'GET':
+                return await self.stock_stream(scope, receive, send)
+        for route_method, pattern, name, endpoint in self.routes:
+            match = pattern.match(path)
+            if match and method in (route_method, 'OPTIONS'):
+                if method == 'OPTIONS':
+                    return await self.respond(scope, send, {}, 200, preflight=True)
+                if not self.metrics:
+                    return await self.respond(scope, send, *await endpoint(scope, receive, **match.groupdict()))
+                return await self.timed(name, endpoint, scope, receive, send, match)
+        await self.call_wsgi(scope, receive, send)
+
+    async def timed(self, endpoint_name, endpoint, scope, receive, send, match):
+        """Runs an async route with the same request metrics the Flask hooks record."""
+        blueprint = endpoint_name.split('.', 1)[0]
+        in_flight = REQUESTS_IN_FLIGHT.labels(blueprint, endpoint_name)
+        in_flight.inc()
+        started = time.perf_counter()
+        status = 500
+        try:
+            response = await endpoint(scope, receive, **match.groupdict())
+            status = response[1]
+            await self.respond(scope, send, *response)
+        finally:
+            observe_request(blueprint, endpoint_name, scope['method'], status, time.perf_counter() - started)
+            in_flight.dec()
+
+    def check_legacy_triggers(self):
+        """Startup check (as in the WSGI warm-up): raises RuntimeError while trg_update_stock is installed."""
+        with self.flask_app.app_context():
+            try:
+                ProjectionService().check_legacy_triggers()
+            except SQLAlchemyError as e:
+                print(f"Startup check could not reach the database: {str(e).splitlines()[0]}")
+            finally:
+                db.session.remove()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await asyncio.to_thread(self.check_legacy_triggers)
+                except RuntimeError as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+                    return
+                await self.start_stream()
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if self.stream.loop is not None:
+                    self.stream.stop()
+                    await self.stream.backend.stop()
+                await self.dispose()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    # --- Endpoints ---
+
+    def movement(self, endpoint_name, handler):
+        async def endpoint(scope, receive):
+            try:
+                data = json.loads(await read_body(receive) or b'null')
+            except ValueError:
+                data = None
+            token = bearer_token(dict(scope['headers']).get(b'authorization', b'').decode('latin-1'))
+            if self.admission is None:
+                return await self.run_in_session(self.authenticated, handler, data, token)
+            return await self.admitted(endpoint_name, scope, data, handler, token)
+        return endpoint
+
+    def authenticated(self, handler, data, token):
+        """Runs a movement handler as the token's user (the same checks as app/utils/auth.py's hook)."""
+        if token is None:
+            if self.flask_app.config.get('AUTH_REQUIRED'):
+                return {'success': False, 'message': 'Authentication required.'}, 401, {'WWW-Authenticate': 'Bearer'}
+            return handler(data)
+        try:
+            user_id = self.flask_app.extensions['auth'].verify(token)
+        except AuthenticationException as e:
+            return {'success': False, 'message': str(e)}, 401, {'WWW-Authenticate': 'Bearer'}
+        return handler(data, user_id)
+
+    async def admitted(self, endpoint_name, scope, data, handler, token):
+        """Applies the Flask app's admission control; the slot is not waited for, to keep the loop free."""
+        # The token is verified by authenticated(); a valid signature is enough to pick the bucket
+        user_id = self.flask_app.extensions['auth'].signed_user_id(token) if token else None
+        client = client_identity(user_id, (scope.get('client') or ('unknown',))[0])
+        rejection = self.admission.check_rate(endpoint_name, scope['method'], client)
+        if rejection is None:
+            rejection, holds_slot = self.admission.acquire(endpoint_name.split('.', 1)[0], block=False)
+        if rejection is not None:
+            return rejection_parts(endpoint_name, rejection)
+        try:
+            return await self.run_in_session(self.authenticated, handler, data, token)
+        finally:
+            if holds_slot:
+                self.admission.release()
+
+    async def barcode_lookup(self, scope, receive, code):
+        return await self.run_in_session(inventory.handle_barcode_lookup, code)
+
+    async def stock_query(self, scope, receive):
+        args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        return await self.run_in_session(inventory.handle_stock_query, args)
+
+    async def change_feed(self, scope, receive):
+        """GET /api/changes: a long-poll (?wait=) sleeps on the event loop between reads of the feed."""
+        args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        try:
+            wait = ChangeService.max_wait(float(args.get('wait', 0)), self.flask_app.config)
+        except ValueError:
+            wait = 0 # The handler rejects it
+        deadline = time.monotonic() + wait
+        interval = self.flask_app.config.get('CHANGE_FEED_POLL_INTERVAL_S', 0.5)
+        while True:
+            # Each read in a session of its own: no connection is held while sleeping
+            response = await self.run_in_session(changes.handle_get_changes, args, False)
+            remaining = deadline - time.monotonic()
+            if response[1] != 200 or response[0]['cursor'] != args.get('since') or remaining <= 0:
+                return response
+            await asyncio.sleep(min(interval, remaining))
+
+    async def dispose(self):
+        for engine in self.engines:
+            await engine.dispose()
+
+    async def start_stream(self):
+        """Binds the stock broker to this event loop and starts its backend (at startup, or with the first stream)."""
+        if self.stream.loop is None:
+            self.stream.start(asyncio.get_running_loop())
+            await self.stream.backend.start()
+
+    async def stock_stream(self, scope, receive, send):
+        """
+        GET /api/stream/stock-levels?product_id=1,2&location_id=3
+        Server-Sent Events: a `stock_level` event ({product_id, location_id, quantity}; quantity null when the row
+        was deleted) for each committed change matching the filters (none: every change), and `resync` when
+        changes may have been missed (the client re-fetches /api/reports/stock-levels). Subscribe before fetching.
+        """
+        args = dict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        try:
+            products, locations = (stream_filter(args.get(name)) for name in ('product_id', 'location_id'))
+        except ValueError:
+            return await self.respond(scope, send, {'success': False, 'message': 'product_id and location_id must be comma-separated integers'}, 400)
+        await self.start_stream()
+        if self.stream.full:
+            return await self.respond(scope, send, {'success': False, 'message': 'Too many open streams, retry later.'}, 503,
+                                      {'Retry-After': str(self.heartbeat_s)})
+
+        subscription = self.stream.subscribe(products, locations)
+        disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+        try:
+            await send({'type': 'http.response.start', 'status': 200, 'headers': self.encode_headers(scope, {
+                'Content-Type': 'text/event-stream', 'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no',
+            })})
+            await send({'type': 'http.response.body', 'body': b'retry: 3000\n\n', 'more_body': True})
+            while True:
+                item = asyncio.ensure_future(subscription.queue.get())
+                await asyncio.wait({item, disconnected}, timeout=self.heartbeat_s, return_when=asyncio.FIRST_COMPLETED)
+                if disconnected.done() or (item.done() and item.result() is CLOSE):
+                    item.cancel()
+                    break
+                if not item.done():
+                    item.cancel()
+                    chunk = b': keepalive\n\n'
+                elif item.result() == RESYNC:
+                    chunk = b'event: resync\ndata: {}\n\n'
+                else:
+                    chunk = b'event: stock_level\ndata: ' + json.dumps(item.result()).encode('utf-8') + b'\n\n'
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+            if not disconnected.done():
+                await send({'type': 'http.response.body', 'body': b''})
+        except OSError:
+            pass # Client gone while sending
+        finally:
+            disconnected.cancel()
+            self.stream.unsubscribe(subscription)
+
+    async def run_in_session(self, handler, *args):
+        """Runs a sync handler (services, serialization) on an AsyncSession's connection."""
+        async with self.sessions() as session:
+            return await session.run_sync(self._call_with_session, handler, args)
+
+    def _call_with_session(self, sync_session, handler, args):
+        with self.flask_app.app_context():
+            # db.session (and Model.query) resolve to this session for the handler's duration
+            db.session.registry.set(sync_session)
+            try:
+                return handler(*args)
+            finally:
+                db.session.registry.clear()
+
+    # --- Responses and WSGI fallback ---
+
+    async def respond(self, scope, send, body, status, extra_headers=None, preflight=False):
+        payload = self.flask_app.json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Content-Length': str(len(payload)), **(extra_headers or {})}
+        await send({'type': 'http.response.start', 'status': status, 'headers': self.encode_headers(scope, headers, preflight)})
+        await send({'type': 'http.response.body', 'body': payload})
+
+    def encode_headers(self, scope, headers, preflight=False):
+        # The same precomputed security and CORS headers the edge middleware adds to Flask responses
+        origin = dict(scope['headers']).get(b'origin', b'').decode('latin-1')
+        header_list = list(headers.items()) + self.edge.security_headers + self.edge.cors_headers(origin, preflight)
+        return [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in header_list]
+
+    async def call_wsgi(self, scope, receive, send):
+        """Serves the request with the Flask app in a thread (the response is buffered)."""
+        environ = wsgi_environ(scope, await read_body(receive))
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = [(k.lower().encode('latin-1'), v.encode('latin-1')) for k, v in headers]
+            return response.setdefault('chunks', []).append
+
+        def run():
+            result = self.flask_app(environ, start_response)
+            try:
+                return b''.join(result)
+            finally:
+                if hasattr(result, 'close'):
+                    result.close()
+
+        body = await asyncio.to_thread(run)
+        chunks = b''.join(response.get('chunks', [])) + body
+        await send({'type': 'http.response.start', 'status': response['status'], 'headers': response['headers']})
+        await send({'type': 'http.response.body', 'body': chunks})
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+def stream_filter(value):
+    """The ids of a comma-separated filter parameter (None when absent); raises ValueError if malformed."""
+    if not value:
+        return None
+    ids = {int(part) for part in value.split(',') if part.strip()}
+    if len(ids) > MAX_STREAM_FILTER_IDS:
+        raise ValueError(value)
+    return ids
+
+
+def wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', ''),
+        'PATH_INFO': scope['path'],
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope['headers']:
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name == 'CONTENT_TYPE':
+            environ['CONTENT_TYPE'] = value
+        elif name != 'CONTENT_LENGTH':
+            key = f"HTTP_{name}"
+            environ[key] = f"{environ[key]},{value}" if key in environ else value
+    return environ
+
+
+def create_asgi_app(config_object=None):
+    """ASGI application factory (the config defaults to the one selected by FLASK_ENV, as in run.py)."""
+    config_object = config_object or CONFIG_BY_ENV.get(os.environ.get('FLASK_ENV', 'development'), 'config.DevelopmentConfig')
+    return InventoryASGI(create_app(config_object=config_object))
@@ -0,0 +1,277 @@
+# inventory_api/app/cli.py
+# Flask CLI commands (flask --app run <command>), registered by create_app.
+
+import time
+import click
+from flask.cli import with_appcontext
+from .utils.exceptions import ConflictException
+
+
+@click.command('seed-synthetic')
+@click.option('--seed', default=42, show_default=True, help='Random seed: same seed and options, same data.')
+@click.option('--prefix', default='SYN', show_default=True, help='Prefix of the SKUs and names generated.')
+@click.option('--products', default=10000, show_default=True)
+@click.option('--transactions', default=1000000, show_default=True, help='Stock movements (a transfer writes two transactions).')
+@click.option('--days', default=365, show_default=True, help='History length, ending at --end-date.')
+@click.option('--end-date', type=click.DateTime(formats=['%Y-%m-%d']), help='Defaults to today (UTC).')
+@click.option('--category-depth', default=3, show_default=True)
+@click.option('--category-fanout', default=5, show_default=True, help='Subcategories per category.')
+@click.option('--warehouses', default=3, show_default=True)
+@click.option('--location-depth', default=3, show_default=True, help='Levels: warehouse, zone, aisle, rack, shelf, bin.')
+@click.option('--location-fanout', default=4, show_default=True, help='Child locations per location.')
+@click.option('--suppliers', default=200, show_default=True)
+@click.option('--users', default=20, show_default=True)
+@click.option('--locations-per-product', default=3, show_default=True, help='Most locations a product starts at.')
+@click.option('--zipf', default=1.1, show_default=True, help='Skew of SKU popularity (0 = uniform).')
+@click.option('--seasonality', default=0.5, show_default=True, help='Amplitude of the yearly cycle (0 = flat).')
+@click.option('--transfer-ratio', default=0.05, show_default=True)
+@click.option('--receiving-ratio', default=0.2, show_default=True)
+@click.option('--adjustment-ratio', default=0.02, show_default=True)
+@click.option('--password', default='synthetic', show_default=True, help='Password of the generated users.')
+@click.option('--chunk-size', default=50000, show_default=True, help='Rows per COPY / INSERT batch.')
+@with_appcontext
+def seed_synthetic_command(**options):
+    """Generates a large synthetic inventory (catalog, locations, movement history, stock levels)."""
+    from .utils.synthetic import SyntheticDataset
+
+    started = time.perf_counter()
+    try:
+        counts = SyntheticDataset(progress=click.echo, **options).generate()
+    except (ConflictException, ValueError) as e:
+        raise click.ClickException(str(e))
+    elapsed = time.perf_counter() - started
+    click.echo(f"Done in {elapsed:.1f}s ({sum(counts.values()) / elapsed:,.0f} rows/s):")
+    for table, count in counts.items():
+        click.echo(f"  {table}: {count}")
+
+
+@click.command('categories-rebuild-closure')
+@with_appcontext
+def categories_rebuild_closure_command():
+    """Backfills category_closure from categories.parent_id (existing databases, categories imported with raw SQL)."""
+    from .services import CategoryService
+    from .models import CategoryClosure
+    from .utils.exceptions import DatabaseException
+
+    try:
+        CategoryService().rebuild_hierarchy()
+    except DatabaseException as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Rebuilt category_closure: {CategoryClosure.query.count()} rows.")
+
+
+@click.command('locations-rebuild-closure')
+@with_appcontext
+def locations_rebuild_closure_command():
+    """Backfills location_closure from locations.parent_location (existing databases, locations imported with raw SQL)."""
+    from .services import LocationService
+    from .models import LocationClosure
+    from .utils.exceptions import DatabaseException
+
+    try:
+        LocationService().rebuild_hierarchy()
+    except DatabaseException as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Rebuilt location_closure: {LocationClosure.query.count()} rows.")
+
+
+@click.command('shards-sync')
+@with_appcontext
+def shards_sync_command():
+    """Creates the missing tables on the shards and copies the reference tables (catalog, locations, users) to them."""
+    from .db import db
+    from .utils.shards import shard_router
+
+    router = shard_router()
+    if router is None:
+        raise click.ClickException('Sharding is not configured (DATABASE_SHARD_URLS).')
+    started = time.perf_counter()
+    router.create_all(db.metadata)
+    router.mirror(db.metadata)
+    click.echo(f"Synced {len(router.engines) - 1} shard(s) in {time.perf_counter() - started:.1f}s.")
+
+
+@click.command('shards-resolve-transfers')
+@click.option('--older-than', type=int, help='Seconds a transfer must have been pending. Defaults to SHARD_TRANSFER_RESOLVE_AFTER_S.')
+@with_appcontext
+def shards_resolve_transfers_command(older_than):
+    """Completes the transfers between shards left pending (run it periodically, e.g. from cron)."""
+    from flask import current_app
+    from .services import InventoryService
+
+    if older_than is None:
+        older_than = current_app.config.get('SHARD_TRANSFER_RESOLVE_AFTER_S', 60)
+    completed, reverted = InventoryService().resolve_pending_transfers(older_than_s=older_than)
+    click.echo(f"Transfers completed: {completed}, reverted: {reverted}")
+
+
+@click.command('projections-run')
+@click.option('--name', 'names', multiple=True, help='Projection to run (repeatable). Defaults to every non-inline one.')
+@click.option('--follow', is_flag=True, help='Keep running, polling the ledger every PROJECTION_POLL_INTERVAL_S when idle.')
+@with_appcontext
+def projections_run_command(names, follow):
+    """Applies the new ledger entries to the projections maintained by workers."""
+    from flask import current_app
+    from .services import ProjectionService
+    from .utils.exceptions import InvalidInputException
+
+    service = ProjectionService()
+    while True:
+        try:
+            applied = service.catch_up(list(names) or None)
+        except InvalidInputException as e:
+            raise click.ClickException(str(e))
+        if not follow:
+            click.echo(', '.join(f"{name}: {count}" for name, count in applied.items()) or 'No worker projections.')
+            return
+        if not any(applied.values()):
+            time.sleep(current_app.config.get('PROJECTION_POLL_INTERVAL_S', 1.0))
+
+
+@click.command('projections-rebuild')
+@click.argument('name')
+@with_appcontext
+def projections_rebuild_command(name):
+    """Recomputes a projection from the whole ledger."""
+    from .services import ProjectionService
+    from .utils.exceptions import InvalidInputException
+
+    started = time.perf_counter()
+    try:
+        applied = ProjectionService().rebuild(name)
+    except InvalidInputException as e:
+        raise click.ClickException(str(e))
+    click.echo(f"Rebuilt {name} from {applied} ledger entries in {time.perf_counter() - started:.1f}s.")
+
+
+@click.command('projections-status')
+@with_appcontext
+def projections_status_command():
+    """Shows each projection's mode, checkpoint and lag."""
+    from .services import ProjectionService
+
+    for item in ProjectionService().status():
+        shard = f"[shard {item['shard']}] " if 'shard' in item else ''
+        lag = '-' if item['lag'] is None else item['lag']
+        click.echo(f"{shard}{item['name']}: {item['mode']}, position {item['position']}/{item['ledger_head']}, lag {lag}")
+
+
+@click.command('projections-drop-trigger')
+@with_appcontext
+def projections_drop_trigger_command():
+    """Drops the trg_update_stock trigger, replaced by the stock_levels projection, from every database."""
+    from .services import ProjectionService
+    from .services.projection_service import LEGACY_STOCK_TRIGGER
+    from .utils.shards import shard_router
+
+    dropped = ProjectionService().drop_legacy_triggers()
+    for index, tables in dropped.items():
+        shard = f"[shard {index}] " if shard_router() is not None else ''
+        click.echo(f"{shard}Dropped {LEGACY_STOCK_TRIGGER} from {', '.join(tables)}.")
+    if not dropped:
+        click.echo(f"No {LEGACY_STOCK_TRIGGER} trigger found.")
+
+
+@click.command('changes-prune')
+@click.option('--older-than-days', type=int, help='Age of the changes to delete. Defaults to CHANGE_LOG_RETENTION_DAYS.')
+@with_appcontext
+def changes_prune_command(older_than_days):
+    """Deletes old change feed entries (run it periodically, e.g. from cron)."""
+    from flask import current_app
+    from .services import ChangeService
+
+    if older_than_days is None:
+        older_than_days = current_app.config.get('CHANGE_LOG_RETENTION_DAYS', 7)
+    click.echo(f"Deleted {ChangeService().prune(older_than_days)} change(s).")
+
+
+@click.command('webhooks-run')
+@click.option('--endpoint', 'names', multiple=True, help='Endpoint to deliver to (repeatable). Defaults to every one in WEBHOOK_ENDPOINTS.')
+@click.option('--follow', is_flag=True, help='Keep running, polling the outbox every WEBHOOK_POLL_INTERVAL_S when idle.')
+@with_appcontext
+def webhooks_run_command(names, follow):
+    """Delivers the webhook outbox to the endpoints."""
+    from flask import current_app
+    from .services import WebhookService
+    from .utils.exceptions import InvalidInputException
+
+    service = WebhookService()
+    try:
+        while True:
+            try:
+                delivered = service.dispatch(list(names) or None)
+            except InvalidInputException as e:
+                raise click.ClickException(str(e))
+            if not follow:
+                click.echo(', '.join(f"{name}: {count}" for name, count in delivered.items()) or 'No webhook endpoints configured.')
+                return
+            if not any(delivered.values()):
+                time.sleep(current_app.config.get('WEBHOOK_POLL_INTERVAL_S', 1.0))
+    finally:
+        service.client.close()
+
+
+@click.command('webhooks-status')
+@with_appcontext
+def webhooks_status_command():
+    """Shows each webhook endpoint's position, pending events, lag and last error."""
+    from .services import WebhookService
+
+    for item in WebhookService().status():
+        shard = f"[shard {item['shard']}] " if 'shard' in item else ''
+        retry = f", {item['attempts']} failed attempt(s), next at {item['next_attempt_at']}: {item['last_error']}" if item['attempts'] else ''
+        click.echo(f"{shard}{item['name']}: position {item['position']}, {item['pending']} pending, lag {item['lag_s']}s{retry}")
+
+
+@click.command('webhooks-prune')
+@click.option('--older-than-days', type=int, help='Age of the delivered events to delete. Defaults to WEBHOOK_OUTBOX_RETENTION_DAYS.')
+@with_appcontext
+def webhooks_prune_command(older_than_days):
+    """Deletes the outbox events every endpoint has received (run it periodically, e.g. from cron)."""
+    from flask import current_app
+    from .services import WebhookService
+
+    if older_than_days is None:
+        older_than_days = current_app.config.get('WEBHOOK_OUTBOX_RETENTION_DAYS', 1)
+    click.echo(f"Deleted {WebhookService().prune(older_than_days)} event(s).")
+
+
+@click.command('webhooks-receiver')
+@click.option('--host', default='127.0.0.1', show_default=True)
+@click.option('--port', default=8900, show_default=True)
+@with_appcontext
+def webhooks_receiver_command(host, port):
+    """Runs a local webhook endpoint that prints the batches it receives (for development)."""
+    from flask import current_app
+    from .utils.webhooks import StubReceiver
+
+    def show(batch, headers):
+        click.echo(f"{headers.get('X-Webhook-Delivery')}: {len(batch['events'])} event(s)")
+        for event_data in batch['events']:
+            click.echo(f"  {event_data['id']} {event_data['type']} {event_data['data']}")
+
+    receiver = StubReceiver(host, port, secret=current_app.config.get('WEBHOOK_SECRET'), on_batch=show)
+    click.echo(f"Listening on {receiver.url} (Ctrl+C to stop)")
+    try:
+        receiver.server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        receiver.server.server_close()
+
+
+def register_commands(app):
+    app.cli.add_command(seed_synthetic_command)
+    app.cli.add_command(categories_rebuild_closure_command)
+    app.cli.add_command(locations_rebuild_closure_command)
+    app.cli.add_command(shards_sync_command)
+    app.cli.add_command(shards_resolve_transfers_command)
+    app.cli.add_command(projections_run_command)
+    app.cli.add_command(projections_rebuild_command)
+    app.cli.add_command(projections_status_command)
+    app.cli.add_command(projections_drop_trigger_command)
+    app.cli.add_command(changes_prune_command)
+    app.cli.add_command(webhooks_run_command)
+    app.cli.add_command(webhooks_status_command)
+    app.cli.add_command(webhooks_prune_command)
+    app.cli.add_command(webhooks_receiver_command)
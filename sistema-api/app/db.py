@@ -1,6 +1,8 @@
 # app/db.py
 from flask_sqlalchemy import SQLAlchemy
+from .utils.replicas import RoutingSession
 
 # Inicializa la extensión SQLAlchemy.
 # Esta instancia 'db' se importará en la fábrica de la aplicación y en los modelos.
-db = SQLAlchemy()
+# RoutingSession envía las lecturas a las réplicas cuando están configuradas (ver utils/replicas.py).
+db = SQLAlchemy(session_options={'class_': RoutingSession})
@@ -2,15 +2,26 @@
 
 from ..db import db
 from .product import Product
+from .product_import import ProductImportRow
 from .category import Category
+from .category_closure import CategoryClosure
 from .supplier import Supplier
 from .location import Location
+from .location_closure import LocationClosure
+from .location_utilization import LocationUtilization
 from .inventory_transaction import InventoryTransaction
 from .location_transfer import LocationTransfer
 from .stock_level import StockLevel
 from .stock_level import LowStockItem
 from .user import User
 from .barcode import Barcode
+from .projection_checkpoint import ProjectionCheckpoint
+from .stock_daily_movement import StockDailyMovement
+from .stock_alert import StockAlert
+from .inventory_valuation import InventoryValuation
+from .change_log import ChangeLog
+from .webhook_outbox import WebhookOutbox
+from .webhook_endpoint import WebhookEndpoint
 
 # This file serves as a central point to import all models
 # and provides the db instance.
\ No newline at end of file
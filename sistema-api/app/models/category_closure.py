@@ -0,0 +1,38 @@
+# inventory_api/app/models/category_closure.py
+
+from ..db import db
+from sqlalchemy import select
+
+
+class CategoryClosure(db.Model):
+    """
+    Closure table for the category hierarchy.
+    Holds one row per (ancestor, descendant) pair, including the (category, category) row with depth 0,
+    so a whole subtree can be selected with a single indexed lookup on ancestor_id.
+    Rows are maintained by CategoryService on create/update/delete. Databases created before this table,
+    or categories written with raw SQL, are backfilled with `flask categories-rebuild-closure`.
+    """
+    __tablename__ = 'category_closure'
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('categories.category_id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('categories.category_id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    # The primary key (ancestor_id, descendant_id) serves subtree lookups;
+    # this index serves ancestor lookups (used when moving a subtree).
+    __table_args__ = (db.Index('ix_category_closure_descendant_id', 'descendant_id', 'depth'),)
+
+    def __repr__(self):
+        return f"<CategoryClosure {self.ancestor_id} -> {self.descendant_id} ({self.depth})>"
+
+    @classmethod
+    def descendant_ids(cls, category_id):
+        """Returns a SELECT of the IDs of a category and all of its subcategories (for use with .in_())."""
+        return select(cls.descendant_id).where(cls.ancestor_id == category_id)
+
+    def to_dict(self):
+        return {
+            'ancestor_id': self.ancestor_id,
+            'descendant_id': self.descendant_id,
+            'depth': self.depth,
+        }
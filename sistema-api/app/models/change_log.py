@@ -0,0 +1,23 @@
+# inventory_api/app/models/change_log.py
+
+from ..db import db
+from datetime import datetime
+
+
+class ChangeLog(db.Model):
+    """
+    One row per change to a synced entity, in commit order of the change sequence (id): the
+    cursor of GET /api/changes. Written by the session hooks of app/utils/changes.py.
+    """
+    __tablename__ = 'change_log'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True) # The change sequence
+    entity = db.Column(db.String(30), nullable=False) # products, locations, stock_levels, transactions
+    entity_key = db.Column(db.String(50), nullable=False) # Its id ("product_id:location_id" for stock levels), '*' for a bulk change
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Pruning by age (`flask changes-prune`)
+    __table_args__ = (db.Index('ix_change_log_created_at', 'created_at'),)
+
+    def __repr__(self):
+        return f"<ChangeLog {self.id}: {self.entity} {self.entity_key}>"
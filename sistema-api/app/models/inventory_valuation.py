@@ -0,0 +1,31 @@
+# inventory_api/app/models/inventory_valuation.py
+
+from ..db import db
+from datetime import datetime
+
+
+class InventoryValuation(db.Model):
+    """
+    Valuation projection of inventory_transactions (see ProjectionService): quantity on hand per product
+    and its value, each movement valued at the product's unit_cost when the projection applies it.
+    """
+    __tablename__ = 'inventory_valuation'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    quantity = db.Column(db.Numeric(15, 2), default=0, nullable=False)
+    value = db.Column(db.Numeric(18, 2), default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    product = db.relationship('Product')
+
+    def __repr__(self):
+        return f"<InventoryValuation Product {self.product_id}: {self.value}>"
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'product_name': self.product.name if self.product else None,
+            'quantity': str(self.quantity),
+            'value': str(self.value),
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
@@ -0,0 +1,44 @@
+# inventory_api/app/models/location_closure.py
+
+from ..db import db
+from sqlalchemy import select
+
+
+class LocationClosure(db.Model):
+    """
+    Closure table for the location hierarchy (warehouse -> aisle -> bin).
+    Holds one row per (ancestor, descendant) pair, including the (location, location) row with depth 0,
+    so a whole subtree can be selected with a single indexed lookup on ancestor_id.
+    Rows are maintained by LocationService on create/update (locations are only deleted logically).
+    Databases created before this table, or locations written with raw SQL, are backfilled with
+    `flask locations-rebuild-closure` (before enabling shards, which find a location's group through it).
+    """
+    __tablename__ = 'location_closure'
+
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('locations.location_id', ondelete='CASCADE'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('locations.location_id', ondelete='CASCADE'), primary_key=True)
+    depth = db.Column(db.Integer, nullable=False)
+
+    # The primary key (ancestor_id, descendant_id) serves subtree lookups;
+    # this index serves ancestor lookups (used when moving a subtree).
+    __table_args__ = (db.Index('ix_location_closure_descendant_id', 'descendant_id', 'depth'),)
+
+    def __repr__(self):
+        return f"<LocationClosure {self.ancestor_id} -> {self.descendant_id} ({self.depth})>"
+
+    @classmethod
+    def descendant_ids(cls, location_id):
+        """Returns a SELECT of the IDs of a location and every location below it (for use with .in_())."""
+        return select(cls.descendant_id).where(cls.ancestor_id == location_id)
+
+    @classmethod
+    def ancestor_ids(cls, location_id):
+        """Returns a SELECT of the IDs of a location and every location above it (for use with .in_())."""
+        return select(cls.ancestor_id).where(cls.descendant_id == location_id)
+
+    def to_dict(self):
+        return {
+            'ancestor_id': self.ancestor_id,
+            'descendant_id': self.descendant_id,
+            'depth': self.depth,
+        }
@@ -1,6 +1,7 @@
 # inventory_api/app/models/location_transfer.py
 
 from ..db import db
+from ..utils.enums import TransferStatus
 from datetime import datetime
 
 class LocationTransfer(db.Model):
@@ -17,6 +18,8 @@ class LocationTransfer(db.Model):
 
     notes = db.Column(db.Text, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False) # Schema is NOT NULL
+    # Transfers between shards are completed in steps (see InventoryService._create_cross_shard_transfer)
+    status = db.Column(db.Enum(TransferStatus), default=TransferStatus.completada, server_default='completada', nullable=False)
 
     # Schema DOES NOT have from_transaction_id or to_transaction_id in this table.
     # Remove these columns from the model to match the schema exactly.
@@ -52,6 +55,7 @@ class LocationTransfer(db.Model):
             'quantity': str(self.quantity),
             'notes': self.notes,
             'user_id': self.user_id,
+            'status': self.status.value if self.status else None,
             # Removed transaction IDs
             # 'from_transaction_id': self.from_transaction_id,
             # 'to_transaction_id': self.to_transaction_id,
@@ -0,0 +1,38 @@
+# inventory_api/app/models/location_utilization.py
+
+from ..db import db
+from datetime import datetime
+
+
+class LocationUtilization(db.Model):
+    """
+    Running storage usage per location, maintained incrementally on every stock movement
+    (see CapacityService) so capacity checks read one row instead of summing stock_levels.
+    Volumes are quantity * Product.volume, in the same unit as Location.storage_capacity.
+    """
+    __tablename__ = 'location_utilization'
+
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.location_id', ondelete='CASCADE'), primary_key=True)
+    # Volume of the stock held directly at this location
+    used_volume = db.Column(db.Numeric(18, 4), default=0, nullable=False)
+    # Volume of the stock held at this location and every location below it
+    rollup_volume = db.Column(db.Numeric(18, 4), default=0, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    # Relationships
+    location = db.relationship('Location', backref=db.backref('utilization', uselist=False, viewonly=True))
+
+    def __repr__(self):
+        return f"<LocationUtilization Location {self.location_id}: {self.rollup_volume}>"
+
+    def to_dict(self):
+        capacity = self.location.storage_capacity if self.location else None
+        return {
+            'location_id': self.location_id,
+            'location_name': self.location.name if self.location else None,
+            'storage_capacity': str(capacity) if capacity is not None else None,
+            'used_volume': str(self.used_volume),
+            'rollup_volume': str(self.rollup_volume),
+            'utilization': float(self.rollup_volume / capacity) if capacity else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
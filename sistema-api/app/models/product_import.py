@@ -0,0 +1,42 @@
+# inventory_api/app/models/product_import.py
+
+from ..db import db
+
+
+class ProductImportRow(db.Model):
+    """
+    Staging table for bulk product imports (see ProductService.import_products).
+    Each uploaded file gets a batch_id; rows are loaded here with COPY/executemany,
+    validated set-based, upserted into products and then deleted.
+    """
+    __tablename__ = 'product_import_staging'
+
+    batch_id = db.Column(db.String(36), primary_key=True)
+    row_number = db.Column(db.Integer, primary_key=True)
+
+    sku = db.Column(db.String(50), nullable=True)
+    name = db.Column(db.String(255), nullable=True)
+    description = db.Column(db.Text, nullable=True)
+    category_id = db.Column(db.Integer, nullable=True)
+    supplier_id = db.Column(db.Integer, nullable=True)
+    unit_cost = db.Column(db.Numeric(15, 2), nullable=True)
+    unit_price = db.Column(db.Numeric(15, 2), nullable=True)
+    unit_measure = db.Column(db.String(20), nullable=True)
+    weight = db.Column(db.Numeric(10, 2), nullable=True)
+    volume = db.Column(db.Numeric(10, 2), nullable=True)
+    min_stock = db.Column(db.Integer, nullable=True)
+    max_stock = db.Column(db.Integer, nullable=True)
+    is_active = db.Column(db.Boolean, nullable=True)
+
+    # Validation error for the row; NULL means the row is valid
+    error = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f"<ProductImportRow {self.batch_id}:{self.row_number} {self.sku}>"
+
+    def to_dict(self):
+        return {
+            'row': self.row_number,
+            'sku': self.sku,
+            'error': self.error,
+        }
@@ -0,0 +1,26 @@
+# inventory_api/app/models/projection_checkpoint.py
+
+from ..db import db
+from datetime import datetime
+
+
+class ProjectionCheckpoint(db.Model):
+    """
+    How far a ledger projection (see ProjectionService) has read inventory_transactions:
+    every transaction up to and including position has been applied to it.
+    """
+    __tablename__ = 'projection_checkpoints'
+
+    name = db.Column(db.String(50), primary_key=True)
+    position = db.Column(db.Integer, default=0, nullable=False) # A transaction_id
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<ProjectionCheckpoint {self.name} at {self.position}>"
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'position': self.position,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+        }
@@ -0,0 +1,38 @@
+# inventory_api/app/models/stock_alert.py
+
+from ..db import db
+
+
+class StockAlert(db.Model):
+    """
+    Low-stock projection of inventory_transactions (see ProjectionService): the running quantity of each
+    product at each location, flagged when it is at or below the product's min_stock.
+    """
+    __tablename__ = 'stock_alerts'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.location_id'), primary_key=True)
+    quantity = db.Column(db.Numeric(15, 2), default=0, nullable=False)
+    min_stock = db.Column(db.Integer, default=0, nullable=False) # As of the last movement
+    is_low = db.Column(db.Boolean, default=False, nullable=False)
+    low_since = db.Column(db.DateTime, nullable=True) # Date of the movement that made it low
+
+    __table_args__ = (db.Index('ix_stock_alerts_is_low', 'is_low'),)
+
+    product = db.relationship('Product')
+    location = db.relationship('Location')
+
+    def __repr__(self):
+        return f"<StockAlert Product {self.product_id} at Location {self.location_id}: {self.quantity}>"
+
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'product_name': self.product.name if self.product else None,
+            'location_id': self.location_id,
+            'location_name': self.location.name if self.location else None,
+            'quantity': str(self.quantity),
+            'min_stock': self.min_stock,
+            'is_low': self.is_low,
+            'low_since': self.low_since.isoformat() if self.low_since else None,
+        }
@@ -0,0 +1,32 @@
+# inventory_api/app/models/stock_daily_movement.py
+
+from ..db import db
+
+
+class StockDailyMovement(db.Model):
+    """Stock movements per day, product and location: a projection of inventory_transactions (see ProjectionService)."""
+    __tablename__ = 'stock_daily_movements'
+
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    location_id = db.Column(db.Integer, db.ForeignKey('locations.location_id'), primary_key=True)
+    quantity_in = db.Column(db.Numeric(15, 2), default=0, nullable=False)
+    quantity_out = db.Column(db.Numeric(15, 2), default=0, nullable=False)
+    movement_count = db.Column(db.Integer, default=0, nullable=False)
+
+    # Per-location history ("what moved here last week"); the primary key serves per-day lookups
+    __table_args__ = (db.Index('ix_stock_daily_movements_location_day', 'location_id', 'day'),)
+
+    def __repr__(self):
+        return f"<StockDailyMovement {self.day} Product {self.product_id} at Location {self.location_id}>"
+
+    def to_dict(self):
+        return {
+            'day': self.day.isoformat() if self.day else None,
+            'product_id': self.product_id,
+            'location_id': self.location_id,
+            'quantity_in': str(self.quantity_in),
+            'quantity_out': str(self.quantity_out),
+            'net_quantity': str(self.quantity_in - self.quantity_out),
+            'movement_count': self.movement_count,
+        }
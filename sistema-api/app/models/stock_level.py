@@ -19,11 +19,15 @@ class StockLevel(db.Model):
     last_updated = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False) # Schema default is CURRENT_TIMESTAMP
 
     # Explicitly define the unique constraint matching the schema
-    __table_args__ = (UniqueConstraint('product_id', 'location_id', name='stock_levels_product_id_location_id_key'),)
+    # The unique constraint leads with product_id; the location index serves per-location and rollup aggregates.
+    __table_args__ = (
+        UniqueConstraint('product_id', 'location_id', name='stock_levels_product_id_location_id_key'),
+        db.Index('ix_stock_levels_location_id', 'location_id'),
+    )
 
 
     # Relationships
-    # Using viewonly=True because updates to stock_levels are handled by the DB trigger,
+    # Using viewonly=True because updates to stock_levels are handled by the stock_levels projection,
     # not directly via model relationships from Product/Location instances.
     product = db.relationship('Product', backref=db.backref('stock_levels', lazy='dynamic', viewonly=True))
     location = db.relationship('Location', backref=db.backref('stock_levels', lazy='dynamic', viewonly=True))
@@ -0,0 +1,33 @@
+# inventory_api/app/models/webhook_endpoint.py
+
+from ..db import db
+from datetime import datetime
+
+
+class WebhookEndpoint(db.Model):
+    """
+    Delivery state of a webhook endpoint (WEBHOOK_ENDPOINTS): every outbox event up to and including
+    position has been delivered to it. A failed batch is retried, with backoff, from the same position.
+    """
+    __tablename__ = 'webhook_endpoints'
+
+    name = db.Column(db.String(50), primary_key=True)
+    position = db.Column(db.Integer, default=0, nullable=False) # A webhook_outbox id
+    attempts = db.Column(db.Integer, default=0, nullable=False) # Consecutive failed deliveries of the pending batch
+    next_attempt_at = db.Column(db.DateTime, nullable=True) # No delivery before (backoff)
+    last_error = db.Column(db.Text, nullable=True)
+    last_delivered_at = db.Column(db.DateTime, nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+    def __repr__(self):
+        return f"<WebhookEndpoint {self.name} at {self.position}>"
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'position': self.position,
+            'attempts': self.attempts,
+            'next_attempt_at': self.next_attempt_at.isoformat() if self.next_attempt_at else None,
+            'last_error': self.last_error,
+            'last_delivered_at': self.last_delivered_at.isoformat() if self.last_delivered_at else None,
+        }
@@ -0,0 +1,31 @@
+# inventory_api/app/models/webhook_outbox.py
+
+from ..db import db
+from datetime import datetime
+
+
+class WebhookOutbox(db.Model):
+    """
+    Events for the webhook endpoints, written by the session hooks of app/utils/webhooks.py in the
+    transaction of the movement that caused them, and delivered in id order by WebhookService.
+    """
+    __tablename__ = 'webhook_outbox'
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True) # Delivery order
+    event_type = db.Column(db.String(50), nullable=False) # inventory.movement, stock_level.changed, stock_levels.resync
+    payload = db.Column(db.JSON, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+    # Delivery lag and pruning by age (`flask webhooks-prune`)
+    __table_args__ = (db.Index('ix_webhook_outbox_created_at', 'created_at'),)
+
+    def __repr__(self):
+        return f"<WebhookOutbox {self.id}: {self.event_type}>"
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'type': self.event_type,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'data': self.payload,
+        }
@@ -1,26 +1,37 @@
 # inventory_api/app/services/__init__.py
 
-from .base_service import BaseService
-from .product_service import ProductService
-from .category_service import CategoryService
-from .supplier_service import SupplierService
-from .location_service import LocationService
-from .transaction_service import TransactionService
-from .transfer_service import TransferService
-from .report_service import ReportService
-from .inventory_service import InventoryService
-from .login_service import LoginService
+from importlib import import_module
+
+# Service class -> module. Modules are imported on first access (PEP 562), so importing
+# one service does not pull in the others and their dependencies.
+_SERVICE_MODULES = {
+    'InventoryService': 'inventory_service',
+    'BaseService': 'base_service',
+    'ProductService': 'product_service',
+    'CategoryService': 'category_service',
+    'SupplierService': 'supplier_service',
+    'LocationService': 'location_service',
+    'TransactionService': 'transaction_service',
+    'TransferService': 'transfer_service',
+    'ReportService': 'report_service',
+    'LoginService': 'login_service',
+    'CapacityService': 'capacity_service',
+    'ProjectionService': 'projection_service',
+    'ChangeService': 'change_service',
+    'WebhookService': 'webhook_service',
+}
 
 # Expose services for easy import
-__all__ = [
-    'InventoryService',
-    'BaseService',
-    'ProductService',
-    'CategoryService',
-    'SupplierService',
-    'LocationService',
-    'TransactionService',
-    'TransferService',
-    'ReportService',
-    'LoginService'
-]
\ No newline at end of file
+__all__ = list(_SERVICE_MODULES)
+
+
+def __getattr__(name):
+    if name not in _SERVICE_MODULES:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    service = getattr(import_module(f".{_SERVICE_MODULES[name]}", __name__), name)
+    globals()[name] = service
+    return service
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -1,8 +1,11 @@
 # inventory_api/app/services/base_service.py
 
+from sqlalchemy import select, insert, delete, literal, func, true
+from sqlalchemy.orm import aliased
 from sqlalchemy.exc import IntegrityError, OperationalError
 from ..db import db
 from ..utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException
+from ..utils.shards import MIRROR_SUBTREE_OPTION
 
 class BaseService:
     """Base class for all service classes providing common database operations."""
@@ -55,11 +58,18 @@ class BaseService:
             raise NotFoundException(f"{model.__name__} with ID {resource_id} not found")
         return item
 
-    def _create(self, model, data):
-        """Helper to create a new resource."""
+    def _create(self, model, data, before_commit=None):
+        """
+        Helper to create a new resource.
+        before_commit (optional) is called with the flushed item so services can write
+        dependent rows (e.g. hierarchy indexes) in the same database transaction.
+        """
         try:
             item = model(**data)
             db.session.add(item)
+            if before_commit:
+                db.session.flush() # Assigns the primary key before the callback runs
+                before_commit(item)
             db.session.commit()
             return item
         except IntegrityError:
@@ -76,8 +86,8 @@ class BaseService:
             raise DatabaseException(f"An unexpected error occurred during {model.__name__} creation.")
 
 
-    def _update(self, model, resource_id, data, id_column_name='id'):
-        """Helper to update an existing resource by ID."""
+    def _update(self, model, resource_id, data, id_column_name='id', before_commit=None):
+        """Helper to update an existing resource by ID. before_commit works as in _create."""
         try:
             item = self._get_by_id(model, resource_id, id_column_name=id_column_name)
             for field, value in data.items():
@@ -85,6 +95,9 @@ class BaseService:
                     setattr(item, field, value)
                 # Optionally handle setting relationship objects if data contains IDs
                 # e.g., if 'category_id' is in data, find the Category object and set item.category
+            if before_commit:
+                db.session.flush()
+                before_commit(item)
             db.session.commit()
             return item
         except NotFoundException:
@@ -102,10 +115,15 @@ class BaseService:
             raise DatabaseException(f"An unexpected error occurred during {model.__name__} update.")
 
 
-    def _delete(self, model, resource_id, id_column_name='id'):
-        """Helper to delete a resource by ID (physical delete)."""
+    def _delete(self, model, resource_id, id_column_name='id', before_commit=None):
+        """
+        Helper to delete a resource by ID (physical delete).
+        before_commit (optional) is called with the item before it is deleted, in the same transaction.
+        """
         try:
             item = self._get_by_id(model, resource_id, id_column_name=id_column_name)
+            if before_commit:
+                before_commit(item)
             db.session.delete(item)
             db.session.commit()
             return True
@@ -141,4 +159,101 @@ class BaseService:
         except Exception as e:
             db.session.rollback()
             print(f"An unexpected error occurred during {model.__name__} logical delete: {e}")
-            raise DatabaseException(f"An unexpected error occurred during {model.__name__} logical delete.")
\ No newline at end of file
+            raise DatabaseException(f"An unexpected error occurred during {model.__name__} logical delete.")
+
+    # --- Closure table helpers (hierarchies) ---
+    # A closure model has ancestor_id, descendant_id and depth columns, with one row per
+    # (ancestor, descendant) pair plus a depth-0 row for every node. These helpers keep it
+    # in sync with set-based statements and do not commit; call them from before_commit.
+    # Their statements carry MIRROR_SUBTREE_OPTION, so the shards only copy the subtree they change.
+
+    def _closure_add_node(self, closure_model, node_id, parent_id):
+        """Inserts the closure rows for a new node: its self row plus one row per ancestor of parent_id."""
+        subtree = {MIRROR_SUBTREE_OPTION: node_id}
+        db.session.execute(
+            insert(closure_model).values(ancestor_id=node_id, descendant_id=node_id, depth=0), execution_options=subtree
+        )
+        if parent_id is not None:
+            ancestors = select(
+                closure_model.ancestor_id, literal(node_id), closure_model.depth + 1
+            ).where(closure_model.descendant_id == parent_id)
+            db.session.execute(
+                insert(closure_model).from_select(['ancestor_id', 'descendant_id', 'depth'], ancestors),
+                execution_options=subtree
+            )
+
+    def _closure_is_descendant(self, closure_model, node_id, candidate_id):
+        """True if candidate_id is node_id itself or lies in its subtree (a single primary key lookup)."""
+        return db.session.execute(
+            select(closure_model.depth).where(
+                closure_model.ancestor_id == node_id,
+                closure_model.descendant_id == candidate_id
+            )
+        ).first() is not None
+
+    def _closure_move_subtree(self, closure_model, node_id, new_parent_id):
+        """Re-links the subtree rooted at node_id under new_parent_id (None moves it to the root)."""
+        subtree = select(closure_model.descendant_id).where(closure_model.ancestor_id == node_id)
+        old_ancestors = select(closure_model.ancestor_id).where(
+            closure_model.descendant_id == node_id,
+            closure_model.ancestor_id != node_id
+        )
+        # Detach: drop every path that enters the subtree from above node_id
+        db.session.execute(
+            delete(closure_model).where(
+                closure_model.descendant_id.in_(subtree),
+                closure_model.ancestor_id.in_(old_ancestors)
+            ).execution_options(synchronize_session=False, **{MIRROR_SUBTREE_OPTION: node_id})
+        )
+        if new_parent_id is None:
+            return
+        # Attach: cross product of the new parent's ancestors and the subtree
+        above = aliased(closure_model)
+        below = aliased(closure_model)
+        paths = select(
+            above.ancestor_id, below.descendant_id, above.depth + below.depth + 1
+        ).select_from(above).join(below, true()).where(
+            above.descendant_id == new_parent_id,
+            below.ancestor_id == node_id
+        )
+        db.session.execute(
+            insert(closure_model).from_select(['ancestor_id', 'descendant_id', 'depth'], paths),
+            execution_options={MIRROR_SUBTREE_OPTION: node_id}
+        )
+
+    def _closure_remove_node(self, closure_model, node_id):
+        """Deletes every closure row that references node_id."""
+        db.session.execute(
+            delete(closure_model).where(
+                (closure_model.ancestor_id == node_id) | (closure_model.descendant_id == node_id)
+            ).execution_options(synchronize_session=False, **{MIRROR_SUBTREE_OPTION: node_id})
+        )
+
+    def _closure_rebuild(self, closure_model, model, parent_column):
+        """
+        Rebuilds a closure table from the adjacency list (model.<parent_column>).
+        Walks the tree level by level, so it issues one INSERT per depth. Does not commit.
+        """
+        db.session.execute(delete(closure_model).execution_options(synchronize_session=False))
+        db.session.execute(
+            insert(closure_model).from_select(
+                ['ancestor_id', 'descendant_id', 'depth'],
+                select(model.id, model.id, literal(0))
+            )
+        )
+        # A valid tree cannot be deeper than its node count; the bound stops cyclic legacy data
+        node_count = db.session.execute(select(func.count()).select_from(model)).scalar()
+        depth = 0
+        while depth < node_count:
+            # Extend every path of the current depth by one child
+            paths = select(
+                closure_model.ancestor_id, model.id, literal(depth + 1)
+            ).join(
+                model, parent_column == closure_model.descendant_id
+            ).where(closure_model.depth == depth)
+            inserted = db.session.execute(
+                insert(closure_model).from_select(['ancestor_id', 'descendant_id', 'depth'], paths)
+            ).rowcount
+            if not inserted:
+                break
+            depth += 1
@@ -0,0 +1,194 @@
+# inventory_api/app/services/capacity_service.py
+
+from .base_service import BaseService
+from ..models import Location, LocationClosure, LocationUtilization, Product, StockLevel
+from ..db import db
+from ..utils.exceptions import NotFoundException, DatabaseException, InvalidInputException
+from sqlalchemy import select, insert, update, delete, func, literal
+from sqlalchemy.orm import contains_eager
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+
+class CapacityService(BaseService):
+    """
+    Tracks storage utilization per location (volume used vs Location.storage_capacity).
+    Usage is kept in location_utilization and updated incrementally, in the caller's
+    transaction, on every stock movement; rollup_volume includes every location below.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.model = LocationUtilization
+
+    # --- Incremental maintenance (no commits; called inside movement transactions) ---
+
+    def apply_stock_change(self, location_id, product, quantity_delta):
+        """
+        Adds the volume of a stock change at location_id to that location and all of its ancestors.
+        product is the Product being moved; products without a volume take no space.
+        """
+        if not product.volume or not quantity_delta:
+            return
+        volume_delta = Decimal(str(quantity_delta)) * product.volume
+
+        if not self._add_volume(location_id, volume_delta):
+            # First movement at a location created before utilization tracking existed
+            self._ensure_rows(location_id)
+            self._add_volume(location_id, volume_delta)
+
+    def add_location(self, location_id):
+        """Creates the (empty) utilization row for a new location."""
+        db.session.add(LocationUtilization(location_id=location_id, used_volume=0, rollup_volume=0))
+
+    def move_subtree(self, location_id, old_parent_id, new_parent_id):
+        """
+        Moves the rolled-up volume of a location from its old ancestors to its new ones.
+        Call before the closure table is re-linked, while old_parent_id's ancestors are still current.
+        """
+        volume = db.session.execute(
+            select(LocationUtilization.rollup_volume).where(LocationUtilization.location_id == location_id)
+        ).scalar()
+        if not volume:
+            return
+        if old_parent_id is not None:
+            self._add_rollup(LocationClosure.ancestor_ids(old_parent_id), -volume)
+        if new_parent_id is not None:
+            self._add_rollup(LocationClosure.ancestor_ids(new_parent_id), volume)
+
+    def _add_volume(self, location_id, volume_delta):
+        """Applies volume_delta to the location's own usage and to its ancestors' rollups. Returns False if the row is missing."""
+        updated = db.session.execute(
+            update(LocationUtilization)
+            .where(LocationUtilization.location_id == location_id)
+            .values(used_volume=LocationUtilization.used_volume + volume_delta, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not updated:
+            return False
+        self._add_rollup(LocationClosure.ancestor_ids(location_id), volume_delta)
+        return True
+
+    def _add_rollup(self, location_ids, volume_delta):
+        db.session.execute(
+            update(LocationUtilization)
+            .where(LocationUtilization.location_id.in_(location_ids))
+            .values(rollup_volume=LocationUtilization.rollup_volume + volume_delta, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+
+    def _ensure_rows(self, location_id):
+        """Inserts missing utilization rows for a location and its ancestors."""
+        missing = select(
+            LocationClosure.ancestor_id, literal(0), literal(0), literal(datetime.utcnow())
+        ).where(
+            LocationClosure.descendant_id == location_id,
+            LocationClosure.ancestor_id.not_in(select(LocationUtilization.location_id))
+        )
+        db.session.execute(
+            insert(LocationUtilization).from_select(
+                ['location_id', 'used_volume', 'rollup_volume', 'updated_at'], missing
+            )
+        )
+        if db.session.get(LocationUtilization, location_id) is None:
+            # Location not in the closure table yet either
+            self.add_location(location_id)
+            db.session.flush()
+
+    # --- Queries ---
+
+    def check_capacity(self, location_id, volume=None, product_id=None, quantity=None):
+        """
+        Checks whether additional stock fits at a location, reading a single utilization row.
+        The additional volume is given directly or as product_id + quantity.
+        Locations without storage_capacity are treated as unlimited.
+        Returns a dictionary.
+        """
+        if volume is None:
+            if product_id is None or quantity is None:
+                raise InvalidInputException("Provide either volume or product_id and quantity.")
+            quantity = self._finite_decimal(quantity, "Invalid quantity value")
+            product = db.session.get(Product, product_id)
+            if not product:
+                raise NotFoundException(f"Product with ID {product_id} not found.")
+            volume = quantity * (product.volume or 0)
+        else:
+            volume = self._finite_decimal(volume, "Invalid volume value")
+
+        row = db.session.execute(
+            select(Location.storage_capacity, LocationUtilization.rollup_volume)
+            .outerjoin(LocationUtilization, LocationUtilization.location_id == Location.id)
+            .where(Location.id == location_id)
+        ).first()
+        if row is None:
+            raise NotFoundException(f"Location with ID {location_id} not found")
+
+        capacity, used = row.storage_capacity, row.rollup_volume or Decimal('0')
+        available = capacity - used if capacity is not None else None
+        return {
+            'location_id': location_id,
+            'storage_capacity': str(capacity) if capacity is not None else None,
+            'used_volume': str(used),
+            'available_volume': str(available) if available is not None else None,
+            'requested_volume': str(volume),
+            'fits': available is None or volume <= available,
+        }
+
+    @staticmethod
+    def _finite_decimal(value, message):
+        """value as a Decimal; InvalidInputException for anything else, NaN and Infinity included."""
+        try:
+            value = Decimal(str(value))
+        except InvalidOperation:
+            raise InvalidInputException(message)
+        if not value.is_finite():
+            raise InvalidInputException(message)
+        return value
+
+    def get_utilization_report(self, order='desc', limit=10):
+        """
+        Gets the fullest (order='desc') or emptiest (order='asc') active locations
+        by rolled-up volume / storage_capacity. Locations without a capacity are skipped.
+        Returns a list of dictionaries.
+        """
+        ratio = LocationUtilization.rollup_volume / Location.storage_capacity
+        query = LocationUtilization.query.join(Location).options(
+            contains_eager(LocationUtilization.location)
+        ).filter(
+            Location.storage_capacity > 0,
+            Location.is_active == True
+        ).order_by(ratio.asc() if order == 'asc' else ratio.desc(), Location.id.asc())
+
+        return [item.to_dict() for item in query.limit(max(1, int(limit))).all()]
+
+    def rebuild(self):
+        """Recomputes every location's utilization from stock_levels (set-based)."""
+        try:
+            volume = StockLevel.quantity * Product.volume
+            used = select(
+                StockLevel.location_id.label('location_id'), func.sum(volume).label('volume')
+            ).join(Product, StockLevel.product_id == Product.id).group_by(StockLevel.location_id).subquery()
+            rolled = select(
+                LocationClosure.ancestor_id.label('location_id'), func.sum(volume).label('volume')
+            ).join(
+                StockLevel, StockLevel.location_id == LocationClosure.descendant_id
+            ).join(Product, StockLevel.product_id == Product.id).group_by(LocationClosure.ancestor_id).subquery()
+
+            rows = select(
+                Location.id,
+                func.coalesce(used.c.volume, 0),
+                func.coalesce(rolled.c.volume, 0),
+                literal(datetime.utcnow())
+            ).outerjoin(used, used.c.location_id == Location.id).outerjoin(rolled, rolled.c.location_id == Location.id)
+
+            db.session.execute(delete(LocationUtilization).execution_options(synchronize_session=False))
+            db.session.execute(
+                insert(LocationUtilization).from_select(
+                    ['location_id', 'used_volume', 'rollup_volume', 'updated_at'], rows
+                )
+            )
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"An unexpected error occurred while rebuilding location utilization: {e}")
+            raise DatabaseException("An unexpected error occurred while rebuilding location utilization.")
@@ -1,9 +1,9 @@
 # inventory_api/app/services/category_service.py
 
 from .base_service import BaseService
-from ..models import Category
+from ..models import Category, CategoryClosure
 from ..db import db
-from ..utils.exceptions import NotFoundException, ConflictException
+from ..utils.exceptions import NotFoundException, ConflictException, DatabaseException
 
 class CategoryService(BaseService):
     def __init__(self):
@@ -35,7 +35,11 @@ class CategoryService(BaseService):
             if not db.session.get(Category, data['parent_id']):
                  raise NotFoundException(f"Parent Category with ID {data['parent_id']} not found.")
 
-        return self._create(self.model, data)
+        # Keep the closure table in sync in the same transaction as the insert
+        return self._create(
+            self.model, data,
+            before_commit=lambda category: self._closure_add_node(CategoryClosure, category.id, category.parent_id)
+        )
 
     def update_category(self, category_id, data):
         """Updates an existing category."""
@@ -47,9 +51,18 @@ class CategoryService(BaseService):
         if 'parent_id' in data and data['parent_id'] is not None:
             if not db.session.get(Category, data['parent_id']):
                  raise NotFoundException(f"Parent Category with ID {data['parent_id']} not found.")
-            # Optional: Add logic to prevent creating cycles in the hierarchy
+            # The new parent must not be inside this category's own subtree (single closure lookup)
+            if self._closure_is_descendant(CategoryClosure, category_id, data['parent_id']):
+                 raise ConflictException("A category cannot be moved under one of its own subcategories.")
 
-        return self._update(self.model, category_id, data, id_column_name='category_id')
+        category = self._get_by_id(self.model, category_id, id_column_name='category_id')
+        old_parent_id = category.parent_id
+
+        def sync_hierarchy(item):
+            if item.parent_id != old_parent_id:
+                self._closure_move_subtree(CategoryClosure, item.id, item.parent_id)
+
+        return self._update(self.model, category_id, data, id_column_name='category_id', before_commit=sync_hierarchy)
 
     def delete_category(self, category_id):
         """Deletes a category (physical delete)."""
@@ -57,4 +70,21 @@ class CategoryService(BaseService):
         # The DB schema has ON DELETE RESTRICT/NO ACTION by default for FKs,
         # so deleting a category with associated products or child categories will raise IntegrityError.
         # The BaseService._delete helper handles the IntegrityError.
-        return self._delete(self.model, category_id, id_column_name='category_id')
\ No newline at end of file
+        return self._delete(
+            self.model, category_id, id_column_name='category_id',
+            before_commit=lambda category: self._closure_remove_node(CategoryClosure, category.id)
+        )
+
+    def get_descendant_ids(self, category_id):
+        """Returns the IDs of a category and all of its subcategories (one indexed query)."""
+        return db.session.execute(CategoryClosure.descendant_ids(category_id)).scalars().all()
+
+    def rebuild_hierarchy(self):
+        """Rebuilds the category closure table from parent_id (`flask categories-rebuild-closure`; e.g. after importing categories with raw SQL)."""
+        try:
+            self._closure_rebuild(CategoryClosure, self.model, self.model.parent_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"An unexpected error occurred while rebuilding the category hierarchy: {e}")
+            raise DatabaseException("An unexpected error occurred while rebuilding the category hierarchy.")
\ No newline at end of file
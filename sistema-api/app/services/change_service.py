@@ -0,0 +1,202 @@
+# inventory_api/app/services/change_service.py
+
+from .base_service import BaseService
+from ..models import ChangeLog, InventoryTransaction, Location, Product, StockLevel
+from ..db import db
+from ..utils.changes import ALL_KEYS
+from ..utils.exceptions import GoneException, InvalidInputException, ServiceUnavailableException
+from ..utils.helpers import settled_entries
+from ..utils.shards import current_shard, shard_router
+from flask import current_app
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.orm import joinedload
+from datetime import datetime, timedelta
+import time
+
+ENTITIES = ('products', 'locations', 'stock_levels', 'transactions')
+
+
+def _stock_key(key):
+    product_id, _, location_id = key.partition(':')
+    return int(product_id), int(location_id)
+
+
+class ChangeService(BaseService):
+    """
+    The change feed: what changed in products, locations, stock levels and transactions since a
+    cursor, read from change_log (app/utils/changes.py). A cursor is a position in the change
+    sequence, one per shard when sharded ("12.7.3"), opaque to clients. Changes are returned as the
+    rows' current state (several changes to one row give one row) plus the keys of deleted rows.
+    """
+
+    # --- Cursors ---
+
+    def _shard_count(self):
+        router = shard_router()
+        return 1 if router is None else len(router.engines)
+
+    def parse_cursor(self, cursor):
+        try:
+            positions = [int(position) for position in cursor.split('.')]
+        except (AttributeError, ValueError):
+            raise InvalidInputException(f"Invalid cursor: {cursor}")
+        if len(positions) != self._shard_count() or min(positions) < 0:
+            raise GoneException('Cursor no longer valid: fetch the lists again and start from the cursor of /api/changes.')
+        return positions
+
+    @staticmethod
+    def format_cursor(positions):
+        return '.'.join(str(position) for position in positions)
+
+    def head(self):
+        """
+        The cursor to start from after fetching the full lists (get it before fetching them): the last
+        change that cannot be preceded by one still being committed, so nothing is skipped.
+        """
+        return self.format_cursor(self._on_each_shard(self._head))
+
+    def _head(self):
+        settling_since = datetime.utcnow() - self._gap_timeout()
+        first_recent = db.session.execute(
+            select(func.min(ChangeLog.id)).where(ChangeLog.created_at >= settling_since)
+        ).scalar()
+        if first_recent is not None:
+            return first_recent - 1
+        return db.session.execute(select(func.max(ChangeLog.id))).scalar() or 0
+
+    # --- Feed ---
+
+    def changes_since(self, cursor, limit=None):
+        """
+        The changes after `cursor`: {'cursor', 'has_more', 'data': {entity: [rows]}, 'deleted': {entity: [keys]},
+        'resync': [entities changed in bulk, to re-fetch]}. At most `limit` changes per shard.
+        """
+        positions = self.parse_cursor(cursor)
+        page_size = current_app.config.get('CHANGE_FEED_PAGE_SIZE', 500)
+        limit = min(limit or page_size, page_size)
+        router = shard_router()
+        if router is None:
+            pages = [self._read(positions[0], limit)]
+        else:
+            pages = router.gather(lambda: self._read(positions[current_shard()], limit))
+
+        feed = {'data': {entity: [] for entity in ENTITIES}, 'deleted': {entity: [] for entity in ENTITIES}, 'resync': []}
+        for page in pages:
+            for entity in ENTITIES:
+                feed['data'][entity] += page['data'][entity]
+                feed['deleted'][entity] += page['deleted'][entity]
+            feed['resync'] += [entity for entity in page['resync'] if entity not in feed['resync']]
+        feed['cursor'] = self.format_cursor([page['position'] for page in pages])
+        feed['has_more'] = any(page['has_more'] for page in pages)
+        return feed
+
+    def wait_for_changes(self, cursor, wait_s, limit=None):
+        """
+        changes_since, long-polling up to wait_s seconds (at most CHANGE_FEED_MAX_WAIT_S) while there are none.
+        The wait holds the calling thread: at most CHANGE_FEED_MAX_WAITERS wait at once, the others get
+        ServiceUnavailableException.
+        """
+        waiters = current_app.extensions['change_feed_waiters']
+        if not waiters.acquire(blocking=False):
+            raise ServiceUnavailableException('Too many requests waiting for changes, retry later.')
+        try:
+            deadline = time.monotonic() + self.max_wait(wait_s)
+            interval = current_app.config.get('CHANGE_FEED_POLL_INTERVAL_S', 0.5)
+            while True:
+                feed = self.changes_since(cursor, limit)
+                remaining = deadline - time.monotonic()
+                if feed['cursor'] != cursor or remaining <= 0:
+                    return feed
+                db.session.close() # Give the connection back to the pool while waiting
+                time.sleep(min(interval, remaining))
+        finally:
+            waiters.release()
+
+    @staticmethod
+    def max_wait(wait_s, config=None):
+        """How long a long-poll asking for wait_s seconds waits: at most CHANGE_FEED_MAX_WAIT_S."""
+        config = current_app.config if config is None else config
+        return max(0, min(wait_s, config.get('CHANGE_FEED_MAX_WAIT_S', 25)))
+
+    def prune(self, older_than_days):
+        """Deletes the changes older than the given age, always keeping the newest one. Returns the rows deleted."""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+
+        def run():
+            newest = db.session.execute(select(func.max(ChangeLog.id))).scalar() or 0
+            result = db.session.execute(delete(ChangeLog).where(ChangeLog.created_at < cutoff, ChangeLog.id < newest))
+            db.session.commit()
+            return result.rowcount
+
+        return sum(self._on_each_shard(run))
+
+    # --- One shard ---
+
+    def _read(self, position, limit):
+        rows = db.session.execute(
+            select(ChangeLog.id, ChangeLog.entity, ChangeLog.entity_key, ChangeLog.created_at)
+            .where(ChangeLog.id > position).order_by(ChangeLog.id).limit(limit)
+        ).all()
+        first = db.session.execute(select(func.min(ChangeLog.id))).scalar()
+        if first is not None and first > position + 1:
+            # The changes after the cursor were pruned (`flask changes-prune`). A rolled-back id right after
+            # a pruned cursor looks the same, and only costs the client a resync
+            raise GoneException('Cursor expired: fetch the lists again and start from the cursor of /api/changes.')
+        settled = settled_entries(rows, position, self._gap_timeout())
+
+        keys = {entity: set() for entity in ENTITIES}
+        resync = []
+        for row in settled:
+            if row.entity_key == ALL_KEYS:
+                resync.append(row.entity)
+            elif row.entity in keys:
+                keys[row.entity].add(row.entity_key)
+        data, deleted = self._current_rows(keys, resync)
+        return {
+            'position': settled[-1].id if settled else position,
+            'has_more': len(settled) == limit,
+            'data': data,
+            'deleted': deleted,
+            'resync': sorted(set(resync)),
+        }
+
+    def _current_rows(self, keys, resync):
+        """The current state of the changed rows ({entity: [dicts]}), and the keys of those that no longer exist."""
+        data = {entity: [] for entity in ENTITIES}
+        deleted = {entity: [] for entity in ENTITIES}
+        loaders = {
+            'products': lambda ids: Product.query.options(joinedload(Product.category), joinedload(Product.supplier))
+                                    .filter(Product.id.in_(ids)),
+            'locations': lambda ids: Location.query.filter(Location.id.in_(ids)),
+            'transactions': lambda ids: InventoryTransaction.query.options(
+                joinedload(InventoryTransaction.product), joinedload(InventoryTransaction.location),
+                joinedload(InventoryTransaction.user)).filter(InventoryTransaction.id.in_(ids)),
+        }
+        for entity, load in loaders.items():
+            if entity in resync or not keys[entity]:
+                continue
+            ids = {int(key) for key in keys[entity]}
+            rows = load(ids).all()
+            data[entity] = [row.to_dict() for row in rows]
+            deleted[entity] = sorted(ids - {row.id for row in rows})
+
+        if 'stock_levels' not in resync and keys['stock_levels']:
+            stock_keys = {_stock_key(key) for key in keys['stock_levels']}
+            rows = StockLevel.query.options(joinedload(StockLevel.product), joinedload(StockLevel.location)).filter(
+                tuple_(StockLevel.product_id, StockLevel.location_id).in_(stock_keys)
+            ).all()
+            data['stock_levels'] = [row.to_dict() for row in rows]
+            deleted['stock_levels'] = [
+                {'product_id': product_id, 'location_id': location_id}
+                for product_id, location_id in sorted(stock_keys - {(row.product_id, row.location_id) for row in rows})
+            ]
+        return data, deleted
+
+    def _on_each_shard(self, fn):
+        router = shard_router()
+        if router is None:
+            return [fn()]
+        return [router.run_on(index, fn) for index in router.indexes]
+
+    def _gap_timeout(self):
+        return timedelta(seconds=current_app.config.get('CHANGE_FEED_GAP_TIMEOUT_S', 10))
@@ -8,6 +8,8 @@ from flask import request, jsonify, Blueprint
 
 # Import your backend service layer base class
 from ..services.base_service import BaseService
+from ..services.capacity_service import CapacityService
+from ..services.projection_service import ProjectionService
 
 # Import your SQLAlchemy database instance
 from ..db import db
@@ -20,6 +22,7 @@ from ..models import (
     Product, # Needed for validation
     Location, # Needed for validation
     User, # Needed for validation
+    Barcode, # Scanner lookups
 )
 
 # Import your custom exceptions and the TransactionType enum
@@ -31,36 +34,31 @@ from ..utils.exceptions import (
     InvalidInputException # Custom exception for bad data
 )
 # Corrected import for the TransactionType enum - using uppercase T
-from ..utils.enums import TransactionType
+from ..utils.enums import TransactionType, TransferStatus
+from ..utils.helpers import stock_delta
+from ..utils.shards import current_shard, location_shard, shard_router
 
 from sqlalchemy.exc import IntegrityError # To catch database constraint violations
+from sqlalchemy import select
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# Refusals by the destination of a cross-shard transfer, which send the stock back to the source.
+# Any other error (e.g. the destination shard is down) leaves the transfer pending, to be completed later.
+TRANSFER_REFUSALS = (NotFoundException, InvalidInputException, InsufficientStockException, ConflictException)
 
 
 class InventoryService(BaseService):
     def __init__(self):
         # InventoryService interacts with multiple models, so we don't set a single self.model here
         super().__init__()
+        self.capacity_service = CapacityService()
+        self.projection_service = ProjectionService()
 
-    def create_inventory_transaction(self, data):
+    def _parse_transaction_data(self, data):
         """
-        Creates a new inventory transaction (add, remove, or adjust)
-        and updates the corresponding stock level.
-
-        Args:
-            data (dict): A dictionary containing transaction details.
-                         Expected keys: product_id, location_id, quantity, user_id,
-                                        transaction_type ('entrada', 'salida', 'ajuste',
-                                        'transferencia_origen', 'transferencia_destino'),
-                                        reference_number (optional), notes (optional).
-
-        Returns:
-            InventoryTransaction: The newly created transaction object.
-
-        Raises:
-            NotFoundException: If product, location, or user not found.
-            InvalidInputException: If data is invalid (e.g., quantity type, transaction_type).
-            InsufficientStockException: If removing/adjusting more stock than available.
-            DatabaseException: For other database errors.
+        Validates and converts the fields of create_inventory_transaction (no database access).
+        Returns (product_id, location_id, user_id, quantity, TransactionType).
         """
         # Basic data validation
         required_fields = ['product_id', 'location_id', 'quantity', 'user_id', 'transaction_type']
@@ -91,6 +89,34 @@ class InventoryService(BaseService):
             # but can catch errors if other fields were expected to be int/float.
             raise InvalidInputException(f"Invalid data type for one or more fields: {e}")
 
+        return product_id, location_id, user_id, quantity, transaction_type_enum
+
+    def create_inventory_transaction(self, data, user_verified=False):
+        """
+        Creates a new inventory transaction (add, remove, or adjust)
+        and updates the corresponding stock level.
+
+        Args:
+            data (dict): A dictionary containing transaction details.
+                         Expected keys: product_id, location_id, quantity, user_id,
+                                        transaction_type ('entrada', 'salida', 'ajuste',
+                                        'transferencia_origen', 'transferencia_destino'),
+                                        reference_number (optional), notes (optional).
+            user_verified (bool): True when user_id comes from a verified access token (app/utils/auth.py),
+                                  which already checked the user: the user lookup is skipped.
+
+        Returns:
+            InventoryTransaction: The newly created transaction object.
+
+        Raises:
+            NotFoundException: If product, location, or user not found.
+            InvalidInputException: If data is invalid (e.g., quantity type, transaction_type).
+            InsufficientStockException: If removing/adjusting more stock than available.
+            DatabaseException: For other database errors.
+        """
+        product_id, location_id, user_id, quantity, transaction_type_enum = self._parse_transaction_data(data)
+        transaction_type_str = data['transaction_type']
+
         # Check if related entities exist
         product = db.session.get(Product, product_id)
         if not product:
@@ -100,49 +126,36 @@ class InventoryService(BaseService):
         if not location:
             raise NotFoundException(f"Location with ID {location_id} not found.")
 
-        user = db.session.get(User, user_id)
-        if not user:
-            # In a real app, user should be from authenticated context, not request body
+        if not user_verified and not db.session.get(User, user_id):
             raise NotFoundException(f"User with ID {user_id} not found.")
 
-        # --- Stock Level Update Logic ---
-        # Find or create the stock level entry for this product and location
-        stock_level = db.session.query(StockLevel).filter_by(
-            product_id=product_id,
-            location_id=location_id
-        ).first()
-
-        if not stock_level:
-            # If no stock level exists, create one with 0 quantity initially
-            stock_level = StockLevel(
-                product_id=product_id,
-                location_id=location_id,
-                quantity=0,
-                last_updated=db.func.current_timestamp()
-            )
-            db.session.add(stock_level)
-            # Flush to get the stock_id if needed later, but not strictly necessary here
+        # --- Stock Check ---
+        # The ledger (inventory_transactions) is the source of truth; stock_levels is one of its
+        # projections (ProjectionService), so the write path only reads it and appends the movement
+        current_quantity = self.projection_service.current_stock(product_id, location_id)
 
         # Calculate new quantity based on transaction type
-        new_stock_quantity = stock_level.quantity
+        # (stock is Numeric; do the arithmetic in Decimal rather than mixing in the float quantity)
+        new_stock_quantity = current_quantity
+        quantity_delta = Decimal(str(quantity))
 
         # Use the imported name: TransactionType
         if transaction_type_enum == TransactionType.entrada:
             if quantity <= 0:
                  raise InvalidInputException("Quantity must be positive for 'entrada' transaction.")
-            new_stock_quantity += quantity
+            new_stock_quantity += quantity_delta
             # For 'add', the transaction quantity is the positive amount added
 
         # Use the imported name: TransactionType
         elif transaction_type_enum == TransactionType.salida:
              if quantity <= 0:
                  raise InvalidInputException("Quantity must be positive for 'salida' transaction.")
-             if stock_level.quantity < quantity:
+             if current_quantity < quantity:
                  raise InsufficientStockException(
                      f"Insufficient stock for Product ID {product_id} at Location ID {location_id}. "
-                     f"Available: {stock_level.quantity}, Attempted Removal: {quantity}"
+                     f"Available: {current_quantity}, Attempted Removal: {quantity}"
                  )
-             new_stock_quantity -= quantity
+             new_stock_quantity -= quantity_delta
              # For 'remove', the transaction quantity is the positive amount removed
 
         # Use the imported name: TransactionType
@@ -150,7 +163,7 @@ class InventoryService(BaseService):
             if quantity == 0:
                  raise InvalidInputException("Adjustment quantity cannot be zero.")
             # For 'ajust', the transaction quantity is the signed amount of the adjustment
-            new_stock_quantity += quantity
+            new_stock_quantity += quantity_delta
             # Check for negative stock after adjustment
             if new_stock_quantity < 0:
                  # This might indicate an error in the adjustment logic or data
@@ -158,24 +171,24 @@ class InventoryService(BaseService):
                  # Raising InsufficientStockException for negative result is reasonable
                  raise InsufficientStockException(
                      f"Adjustment for Product ID {product_id} at Location ID {location_id} "
-                     f"would result in negative stock. Current: {stock_level.quantity}, Adjustment: {quantity}"
+                     f"would result in negative stock. Current: {current_quantity}, Adjustment: {quantity}"
                  )
         # Add handling for transfer types if create_inventory_transaction is used for them
         # Use the imported name: TransactionType
         elif transaction_type_enum == TransactionType.transferencia_origen:
              if quantity <= 0:
                  raise InvalidInputException("Quantity must be positive for 'transferencia_origen' transaction.")
-             if stock_level.quantity < quantity:
+             if current_quantity < quantity:
                  raise InsufficientStockException(
                      f"Insufficient stock for Product ID {product_id} at Source Location ID {location_id} for transfer. "
-                     f"Available: {stock_level.quantity}, Attempted Transfer Out: {quantity}"
+                     f"Available: {current_quantity}, Attempted Transfer Out: {quantity}"
                  )
-             new_stock_quantity -= quantity
+             new_stock_quantity -= quantity_delta
         # Use the imported name: TransactionType
         elif transaction_type_enum == TransactionType.transferencia_destino:
              if quantity <= 0:
                  raise InvalidInputException("Quantity must be positive for 'transferencia_destino' transaction.")
-             new_stock_quantity += quantity
+             new_stock_quantity += quantity_delta
 
         else:
             # This case should be caught by the initial transaction_type validation,
@@ -183,9 +196,8 @@ class InventoryService(BaseService):
             raise InvalidInputException(f"Unhandled transaction type: {transaction_type_str}")
 
 
-        # Update the stock level quantity and last updated time
-        stock_level.quantity = new_stock_quantity
-        stock_level.last_updated = db.func.current_timestamp()
+        # Keep location utilization (and its rollups) current in the same transaction
+        self.capacity_service.apply_stock_change(location_id, product, stock_delta(transaction_type_enum, quantity))
 
         # --- Create Inventory Transaction ---
         new_transaction = InventoryTransaction(
@@ -206,6 +218,8 @@ class InventoryService(BaseService):
         )
 
         db.session.add(new_transaction)
+        # Inline projections (stock_levels by default) follow the movement in the same transaction
+        self.projection_service.record([new_transaction])
 
         try:
             # Commit the session to save the new transaction and updated stock level
@@ -222,7 +236,7 @@ class InventoryService(BaseService):
             raise DatabaseException('Database error occurred during transaction commit')
 
 
-    def create_location_transfer(self, data):
+    def create_location_transfer(self, data, user_verified=False):
         """
         Creates a new location transfer and the associated inventory transactions.
 
@@ -230,6 +244,7 @@ class InventoryService(BaseService):
             data (dict): A dictionary containing transfer details.
                          Expected keys: product_id, from_location_id, to_location_id,
                                         quantity, user_id, notes (optional).
+            user_verified (bool): See create_inventory_transaction.
 
         Returns:
             LocationTransfer: The newly created transfer object.
@@ -279,21 +294,20 @@ class InventoryService(BaseService):
         if not to_location:
             raise NotFoundException(f"Destination Location with ID {to_location_id} not found.")
 
-        user = db.session.get(User, user_id)
-        if not user:
-             # In a real app, user should be from authenticated context
+        if not user_verified and not db.session.get(User, user_id):
             raise NotFoundException(f"User with ID {user_id} not found.")
 
+        router = shard_router()
+        if router is not None and router.shard_of(from_location_id) != router.shard_of(to_location_id):
+            return self._create_cross_shard_transfer(router, product_id, from_location, to_location, quantity, user_id, data.get('notes'))
+
         # --- Check Stock at Source ---
-        source_stock_level = db.session.query(StockLevel).filter_by(
-            product_id=product_id,
-            location_id=from_location_id
-        ).first()
+        source_quantity = self.projection_service.current_stock(product_id, from_location_id)
 
-        if not source_stock_level or source_stock_level.quantity < quantity:
+        if source_quantity < quantity:
              raise InsufficientStockException(
                  f"Insufficient stock for Product ID {product_id} at Source Location ID {from_location_id}. "
-                 f"Available: {source_stock_level.quantity if source_stock_level else 0}, Attempted Transfer: {quantity}"
+                 f"Available: {source_quantity}, Attempted Transfer: {quantity}"
              )
 
         # --- Create Location Transfer Record ---
@@ -308,7 +322,7 @@ class InventoryService(BaseService):
             created_at=db.func.current_timestamp()
         )
         db.session.add(new_transfer)
-        # Flush the session to get the transfer_id before creating transactions
+        # Flush the session to get the transfer id before creating transactions
         db.session.flush()
 
         # --- Create Associated Inventory Transactions ---
@@ -319,13 +333,13 @@ class InventoryService(BaseService):
             'location_id': from_location_id,
             'quantity': quantity, # Positive quantity for removal
             'user_id': user_id,
-            'reference_number': f"Transfer Out {new_transfer.transfer_id}", # Link to transfer
+            'reference_number': f"Transfer Out {new_transfer.id}", # Link to transfer
             'notes': f"Stock transferred to Location {to_location.name}. {data.get('notes', '')}".strip(),
             'transaction_type': 'transferencia_origen', # Use the specific transfer type
             'related_transaction': None # Will link later if needed
         }
         # Pass the session to create_inventory_transaction so it doesn't commit prematurely
-        remove_transaction = self.create_inventory_transaction(remove_transaction_data)
+        remove_transaction = self.create_inventory_transaction(remove_transaction_data, user_verified=True) # Checked above
 
 
         # Transaction for addition to destination
@@ -335,13 +349,13 @@ class InventoryService(BaseService):
             'location_id': to_location_id,
             'quantity': quantity, # Positive quantity for addition
             'user_id': user_id,
-            'reference_number': f"Transfer In {new_transfer.transfer_id}", # Link to transfer
+            'reference_number': f"Transfer In {new_transfer.id}", # Link to transfer
             'notes': f"Stock transferred from Location {from_location.name}. {data.get('notes', '')}".strip(),
             'transaction_type': 'transferencia_destino', # Use the specific transfer type
             'related_transaction': None # Will link later if needed
         }
          # Pass the session to create_inventory_transaction so it doesn't commit prematurely
-        add_transaction = self.create_inventory_transaction(add_transaction_data)
+        add_transaction = self.create_inventory_transaction(add_transaction_data, user_verified=True)
 
         # Optional: Link the two inventory transactions to each other if your schema supports it
         # This requires updating the transaction objects after they are created and added to the session
@@ -367,6 +381,178 @@ class InventoryService(BaseService):
             print(f"Database error during transfer commit: {e}")
             raise DatabaseException('Database error occurred during transfer commit')
 
+    def _create_cross_shard_transfer(self, router, product_id, from_location, to_location, quantity, user_id, notes=None):
+        """
+        Transfer between location groups on different shards (app/utils/shards.py), which no single database
+        transaction covers. Runs as a saga of local transactions, each leaving a record to resume from:
+          1. source shard: the transfer (pendiente), the outgoing movement and the debit, in one transaction
+          2. destination shard, in a session of its own: the incoming movement and the credit. Its reference
+             number makes the step idempotent, so resolve_pending_transfers can re-run it after a failure
+          3. source shard: the transfer becomes completada
+        When the destination refuses the stock (TRANSFER_REFUSALS), step 2 is compensated instead: the stock
+        goes back to the source and the transfer becomes revertida, and the refusal is raised.
+        Returns the transfer (still pendiente if the destination could not be reached).
+        """
+        source_shard = router.shard_of(from_location.id)
+        with location_shard(from_location.id):
+            transfer = LocationTransfer(
+                transfer_date=db.func.current_timestamp(),
+                product_id=product_id,
+                from_location_id=from_location.id,
+                to_location_id=to_location.id,
+                quantity=quantity,
+                notes=notes,
+                user_id=user_id,
+                status=TransferStatus.pendiente,
+                created_at=db.func.current_timestamp()
+            )
+            db.session.add(transfer)
+            try:
+                db.session.flush()
+                # Commits the transfer together with the debit
+                self.create_inventory_transaction({
+                    'product_id': product_id,
+                    'location_id': from_location.id,
+                    'quantity': quantity,
+                    'user_id': user_id,
+                    'reference_number': f"Transfer Out {transfer.id}",
+                    'notes': f"Stock transferred to Location {to_location.name}. {notes or ''}".strip(),
+                    'transaction_type': 'transferencia_origen',
+                }, user_verified=True)
+            except Exception:
+                db.session.rollback()
+                raise
+
+            try:
+                self._complete_transfer(router, source_shard, transfer, from_location.name)
+            except TRANSFER_REFUSALS:
+                raise
+            except Exception as e:
+                print(f"Cross-shard transfer {source_shard}:{transfer.id} left pending: {e}")
+            return transfer
+
+    def _complete_transfer(self, router, source_shard, transfer, from_location_name):
+        """Steps 2 and 3 of _create_cross_shard_transfer (or the compensation), run on the transfer's source shard."""
+        receipt = {
+            'product_id': transfer.product_id,
+            'location_id': transfer.to_location_id,
+            'quantity': float(transfer.quantity),
+            'user_id': transfer.user_id,
+            'reference_number': f"Transfer In {source_shard}:{transfer.id}",
+            'notes': f"Stock transferred from Location {from_location_name}. {transfer.notes or ''}".strip(),
+            'transaction_type': 'transferencia_destino',
+        }
+        try:
+            router.run_on(router.shard_of(transfer.to_location_id), lambda: self._receive_transfer(receipt))
+        except TRANSFER_REFUSALS:
+            transfer.status = TransferStatus.revertida
+            self.create_inventory_transaction({
+                **receipt,
+                'location_id': transfer.from_location_id,
+                'reference_number': f"Transfer Return {transfer.id}",
+                'notes': f"Transfer {transfer.id} refused by the destination.",
+            }, user_verified=True)
+            raise
+        transfer.status = TransferStatus.completada
+        db.session.commit()
+
+    def _receive_transfer(self, receipt):
+        """Step 2 of a cross-shard transfer, on the destination shard; does nothing if it was already applied."""
+        applied = db.session.execute(
+            select(InventoryTransaction.id).where(InventoryTransaction.reference_number == receipt['reference_number'])
+        ).first()
+        if applied is None:
+            self.create_inventory_transaction(receipt, user_verified=True)
+
+    def resolve_pending_transfers(self, older_than_s=60):
+        """
+        Completes the cross-shard transfers still pendiente after older_than_s seconds (the destination was
+        down, or the worker stopped between two steps). Returns (completed, reverted) counts.
+        """
+        router = shard_router()
+        if router is None:
+            return 0, 0
+        cutoff = datetime.utcnow() - timedelta(seconds=older_than_s)
+        counts = {TransferStatus.completada: 0, TransferStatus.revertida: 0}
+
+        def resolve(source_shard):
+            pending = db.session.execute(
+                select(LocationTransfer)
+                .where(LocationTransfer.status == TransferStatus.pendiente, LocationTransfer.created_at <= cutoff)
+                .order_by(LocationTransfer.id)
+            ).scalars().all()
+            for transfer in pending:
+                try:
+                    self._complete_transfer(router, source_shard, transfer, transfer.from_location.name)
+                except TRANSFER_REFUSALS as e:
+                    print(f"Cross-shard transfer {source_shard}:{transfer.id} reverted: {e}")
+                except Exception as e:
+                    db.session.rollback()
+                    print(f"Cross-shard transfer {source_shard}:{transfer.id} still pending: {e}")
+                    continue
+                counts[transfer.status] += 1
+
+        for index in router.indexes:
+            router.run_on(index, lambda: resolve(index))
+        return counts[TransferStatus.completada], counts[TransferStatus.revertida]
+
+    def lookup_barcode(self, code):
+        """
+        Finds the product for a scanned code (barcodes table first, then the SKU)
+        together with its stock per location. Returns a dictionary.
+        """
+        product = db.session.execute(
+            select(Product).join(Barcode, Barcode.product_id == Product.id).where(Barcode.barcode == code)
+        ).scalar_one_or_none()
+        if product is None:
+            product = db.session.execute(select(Product).where(Product.sku == code)).scalar_one_or_none()
+        if product is None:
+            raise NotFoundException(f"No product found for barcode {code}.")
+
+        return {
+            'barcode': code,
+            'product': product.to_dict(),
+            'stock': self.get_stock(product_id=product.id),
+        }
+
+    def get_stock(self, product_id=None, location_id=None):
+        """
+        Gets the current stock of a product (per location), of a location (per product),
+        or of one product at one location. Returns a list of dictionaries.
+        """
+        if product_id is None and location_id is None:
+            raise InvalidInputException("Provide product_id, location_id or both.")
+
+        router = shard_router()
+        if router is not None and current_shard() is None:
+            # Sharded: ask the location's shard, or every shard for a product
+            indexes = None if location_id is None else [router.shard_of(location_id)]
+            rows = [row for rows in router.gather(lambda: self.get_stock(product_id, location_id), indexes) for row in rows]
+            return sorted(rows, key=lambda row: (row['location_id'], row['product_id']))
+
+        query = select(
+            StockLevel.product_id, Product.sku, Product.name.label('product_name'),
+            StockLevel.location_id, Location.name.label('location_name'),
+            StockLevel.quantity, StockLevel.last_updated
+        ).join(Product, StockLevel.product_id == Product.id).join(Location, StockLevel.location_id == Location.id)
+        if product_id is not None:
+            query = query.where(StockLevel.product_id == product_id)
+        if location_id is not None:
+            query = query.where(StockLevel.location_id == location_id)
+
+        return [
+            {
+                'product_id': row.product_id,
+                'sku': row.sku,
+                'product_name': row.product_name,
+                'location_id': row.location_id,
+                'location_name': row.location_name,
+                'quantity': str(row.quantity),
+                'last_updated': row.last_updated.isoformat() if row.last_updated else None,
+            }
+            for row in db.session.execute(query.order_by(StockLevel.location_id, StockLevel.product_id))
+        ]
+
     # You might add other methods here for fetching inventory data,
     # like getting stock levels for a product across locations,
     # or fetching transaction/transfer history (though reportService might handle this).
@@ -1,14 +1,18 @@
 # inventory_api/app/services/location_service.py
 
 from .base_service import BaseService
-from ..models import Location
+from .capacity_service import CapacityService
+from ..models import Location, LocationClosure, StockLevel, Product
 from ..db import db
-from ..utils.exceptions import NotFoundException, ConflictException
+from ..utils.exceptions import NotFoundException, ConflictException, DatabaseException
+from ..utils.shards import location_shard, shard_router
+from sqlalchemy import func, select
 
 class LocationService(BaseService):
     def __init__(self):
         super().__init__()
         self.model = Location
+        self.capacity_service = CapacityService()
 
     def get_all_locations(self, filters=None, pagination=None, sorting=None):
         """Gets all locations with optional filtering, pagination, and sorting."""
@@ -38,7 +42,12 @@ class LocationService(BaseService):
             if not db.session.get(Location, data['parent_id']):
                  raise NotFoundException(f"Parent Location with ID {data['parent_id']} not found.")
 
-        return self._create(self.model, data)
+        def sync_hierarchy(location):
+            # Keep the closure table and utilization rows in sync in the same transaction as the insert
+            self._closure_add_node(LocationClosure, location.id, location.parent_id)
+            self.capacity_service.add_location(location.id)
+
+        return self._create(self.model, data, before_commit=sync_hierarchy)
 
     def update_location(self, location_id, data):
         """Updates an existing location."""
@@ -50,11 +59,82 @@ class LocationService(BaseService):
         if 'parent_id' in data and data['parent_id'] is not None:
             if not db.session.get(Location, data['parent_id']):
                  raise NotFoundException(f"Parent Location with ID {data['parent_id']} not found.")
-            # Optional: Add logic to prevent creating cycles
+            # The new parent must not be inside this location's own subtree (single closure lookup)
+            if self._closure_is_descendant(LocationClosure, location_id, data['parent_id']):
+                 raise ConflictException("A location cannot be moved under one of its own sub-locations.")
+
+        location = self._get_by_id(self.model, location_id, id_column_name='location_id')
+        old_parent_id = location.parent_id
+
+        router = shard_router()
+        if router is not None and 'parent_id' in data and data['parent_id'] != old_parent_id:
+            # The stock of a subtree stays on its group's shard: it cannot follow a move to another one
+            new_parent_id = data['parent_id']
+            new_shard = router.shard_of_group(location_id) if new_parent_id is None else router.shard_of(new_parent_id)
+            if new_shard != router.shard_of(location_id):
+                raise ConflictException("A location cannot be moved to a location group stored on another shard.")
 
-        return self._update(self.model, location_id, data, id_column_name='location_id')
+        def sync_hierarchy(item):
+            if item.parent_id != old_parent_id:
+                # Utilization first: it needs the old ancestors, which the closure move replaces
+                with location_shard(item.id):
+                    self.capacity_service.move_subtree(item.id, old_parent_id, item.parent_id)
+                self._closure_move_subtree(LocationClosure, item.id, item.parent_id)
+
+        return self._update(self.model, location_id, data, id_column_name='location_id', before_commit=sync_hierarchy)
 
     def delete_location(self, location_id):
         """Deletes a location (logical delete)."""
         # Schema has is_active for locations, so perform logical delete.
-        return self._logical_delete(self.model, location_id, id_column_name='location_id')
\ No newline at end of file
+        # The closure rows are kept: historical stock still rolls up through the hierarchy.
+        return self._logical_delete(self.model, location_id, id_column_name='location_id')
+
+    def get_location_stock(self, location_id, rollup=False):
+        """
+        Gets the stock per product held at a location.
+        With rollup=True, aggregates the stock of the location and every location below it
+        (one GROUP BY over stock_levels joined to the closure table).
+        Returns a list of dictionaries.
+        """
+        self.get_location_by_id(location_id) # Raises NotFoundException
+
+        query = select(
+            StockLevel.product_id,
+            Product.sku,
+            Product.name,
+            func.sum(StockLevel.quantity).label('quantity'),
+            func.count(StockLevel.location_id).label('location_count'),
+        ).join(Product, StockLevel.product_id == Product.id)
+
+        if rollup:
+            query = query.join(
+                LocationClosure, LocationClosure.descendant_id == StockLevel.location_id
+            ).where(LocationClosure.ancestor_id == location_id)
+        else:
+            query = query.where(StockLevel.location_id == location_id)
+
+        query = query.group_by(StockLevel.product_id, Product.sku, Product.name).order_by(Product.name.asc())
+
+        with location_shard(location_id): # A subtree never spans shards
+            rows = db.session.execute(query).all()
+        return [
+            {
+                'product_id': row.product_id,
+                'sku': row.sku,
+                'product_name': row.name,
+                'location_id': location_id,
+                'quantity': str(row.quantity),
+                'location_count': row.location_count,
+            }
+            for row in rows
+        ]
+
+    def rebuild_hierarchy(self):
+        """Rebuilds the location closure table from parent_location (`flask locations-rebuild-closure`; e.g. after importing locations with raw SQL)."""
+        try:
+            self._closure_rebuild(LocationClosure, self.model, self.model.parent_id)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"An unexpected error occurred while rebuilding the location hierarchy: {e}")
+            raise DatabaseException("An unexpected error occurred while rebuilding the location hierarchy.")
@@ -1,11 +1,12 @@
 # inventory_api/app/services/login_service.py
 
 from werkzeug.security import check_password_hash, generate_password_hash # Import generate_password_hash
+from sqlalchemy import update
 from ..models import User
 from ..db import db
 # Import ConflictException for handling duplicate users
 from ..utils.exceptions import AuthenticationException, DatabaseException, ConflictException, ApiException
-from datetime import datetime # Needed for timestamps
+from datetime import datetime, timezone # Needed for timestamps
 
 class LoginService:
     def __init__(self):
@@ -56,6 +57,29 @@ class LoginService:
             raise DatabaseException("An error occurred while trying to authenticate.")
 
 
+    def revoke_tokens(self, user_id):
+        """
+        Revokes every access token issued to the user until now (logout).
+
+        Returns:
+            float: The revocation time (epoch seconds), for the caller's token status cache.
+
+        Raises:
+            DatabaseException: If a database error occurs.
+        """
+        revoked_at = datetime.now(timezone.utc)
+        try:
+            db.session.execute(
+                update(User).where(User.id == user_id).values(tokens_revoked_at=revoked_at.replace(tzinfo=None))
+            )
+            db.session.commit()
+            return revoked_at.timestamp()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Database error during logout: {e}")
+            raise DatabaseException("An error occurred while trying to log out.")
+
+
     def register_user(self, data):
         """
         Registers a new user.
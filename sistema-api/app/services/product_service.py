@@ -1,10 +1,31 @@
 # inventory_api/app/services/product_service.py
 
 from .base_service import BaseService
-from ..models import Product, Category, Supplier, StockLevel
+from ..models import Product, ProductImportRow, Category, CategoryClosure, Supplier, StockLevel
 from ..db import db
-from ..utils.exceptions import NotFoundException, ConflictException
+from ..utils.exceptions import NotFoundException, ConflictException, DatabaseException, InvalidInputException
+from ..utils.enums import UnitMeasure
+from ..utils.bulk import copy_rows
 from sqlalchemy.orm import joinedload # Import joinedload
+from sqlalchemy import select, update, delete, func, cast, literal, true
+from sqlalchemy.dialects import postgresql, sqlite
+from decimal import Decimal, InvalidOperation
+from datetime import datetime
+import csv
+import json
+import uuid
+
+# Columns accepted by the bulk import, in staging-table order
+IMPORT_COLUMNS = [
+    'sku', 'name', 'description', 'category_id', 'supplier_id', 'unit_cost', 'unit_price',
+    'unit_measure', 'weight', 'volume', 'min_stock', 'max_stock', 'is_active'
+]
+
+# Fields that can be set per product by bulk_update_products (items mode), with their converters
+BULK_UPDATE_FIELDS = {
+    'name': str, 'description': str, 'is_active': bool,
+    'unit_cost': Decimal, 'unit_price': Decimal, 'min_stock': int, 'max_stock': int,
+}
 
 class ProductService(BaseService):
     def __init__(self):
@@ -15,8 +36,10 @@ class ProductService(BaseService):
         """
         Gets all products with optional filtering, pagination, and sorting.
         Filters can include: name, sku, category_id, supplier_id, is_active, min_stock_threshold (custom filter).
+        With include_descendants=True, category_id also matches every subcategory (via the closure table).
         """
-        query = self.model.query
+        # to_dict() reads category.name and supplier.name: load them in the same query
+        query = self.model.query.options(joinedload(self.model.category), joinedload(self.model.supplier))
 
         # Apply filters
         if filters:
@@ -25,7 +48,10 @@ class ProductService(BaseService):
             if 'name' in filters:
                 query = query.filter(self.model.name.ilike(f"%{filters['name']}%"))
             if 'category_id' in filters:
-                 query = query.filter(self.model.category_id == filters['category_id'])
+                 if filters.get('include_descendants'):
+                     query = query.filter(self.model.category_id.in_(CategoryClosure.descendant_ids(filters['category_id'])))
+                 else:
+                     query = query.filter(self.model.category_id == filters['category_id'])
             if 'supplier_id' in filters:
                  query = query.filter(self.model.supplier_id == filters['supplier_id'])
             if 'is_active' in filters is not None: # Allow explicit True/False/None filtering
@@ -126,4 +152,348 @@ class ProductService(BaseService):
         # stock_levels will be a list of StockLevel objects with relationships loaded.
         # The API endpoint will convert these to dictionaries using sl.to_dict().
         return stock_levels
-    # --- END METHOD ---
\ No newline at end of file
+    # --- END METHOD ---
+
+    # --- Bulk update ---
+
+    def bulk_update_products(self, items=None, filters=None, changes=None):
+        """
+        Updates many products in one statement, in one of two modes:
+        - items: explicit list of {"id": ..., <field>: <value>} (ORM bulk UPDATE by primary key).
+        - filters + changes: a single set-based UPDATE on every product matching the filters
+          (supplier_id, category_id with optional include_descendants, is_active). changes may hold
+          unit_price/unit_cost as {"percent": x} or {"amount": x} (rounded to 2 decimals)
+          and min_stock/max_stock as new values.
+        updated_at is set on every affected row. Returns the number of products updated.
+        """
+        try:
+            if items is not None:
+                count = self._bulk_update_items(items)
+            else:
+                count = self._bulk_update_filtered(filters or {}, changes or {})
+            db.session.commit()
+            return count
+        except (InvalidInputException, NotFoundException, ConflictException):
+            db.session.rollback()
+            raise
+        except Exception as e:
+            db.session.rollback()
+            print(f"An unexpected error occurred during bulk product update: {e}")
+            raise DatabaseException("An unexpected error occurred during bulk product update.")
+
+    def _bulk_update_items(self, items):
+        if not isinstance(items, list) or not items:
+            raise InvalidInputException("items must be a non-empty list.")
+
+        now = datetime.utcnow()
+        rows = []
+        for item in items:
+            if not isinstance(item, dict) or not isinstance(item.get('id'), int):
+                raise InvalidInputException("Each item must be an object with an integer 'id'.")
+            row = {'id': item['id'], 'updated_at': now}
+            for field, value in item.items():
+                if field == 'id':
+                    continue
+                if field not in BULK_UPDATE_FIELDS:
+                    raise InvalidInputException(f"Field '{field}' cannot be bulk updated.")
+                row[field] = self._convert_bulk_value(field, value)
+            rows.append(row)
+
+        ids = [row['id'] for row in rows]
+        if len(set(ids)) != len(ids):
+            raise InvalidInputException("Each product may appear only once in items.")
+        found = set(db.session.execute(select(Product.id).where(Product.id.in_(ids))).scalars())
+        missing = [product_id for product_id in ids if product_id not in found]
+        if missing:
+            raise NotFoundException(f"Products not found: {missing}")
+
+        # Rows are grouped by key set and sent as executemany UPDATE ... WHERE product_id = ?
+        db.session.execute(update(Product), rows)
+        return len(rows)
+
+    def _bulk_update_filtered(self, filters, changes):
+        conditions = []
+        if filters.get('category_id') is not None:
+            if filters.get('include_descendants'):
+                conditions.append(Product.category_id.in_(CategoryClosure.descendant_ids(filters['category_id'])))
+            else:
+                conditions.append(Product.category_id == filters['category_id'])
+        if filters.get('supplier_id') is not None:
+            conditions.append(Product.supplier_id == filters['supplier_id'])
+        if filters.get('is_active') is not None:
+            conditions.append(Product.is_active == filters['is_active'])
+        if not conditions:
+            # Refuse to silently reprice the whole catalog
+            raise InvalidInputException("A filter (category_id, supplier_id or is_active) is required.")
+
+        values = {}
+        for field in ('unit_price', 'unit_cost'):
+            if field in changes:
+                values[field] = self._price_expression(field, changes[field], conditions)
+        for field in ('min_stock', 'max_stock'):
+            if field in changes:
+                if changes[field] is None and field == 'max_stock':
+                    values[field] = None
+                else:
+                    values[field] = self._convert_bulk_value(field, changes[field])
+        unknown = set(changes) - {'unit_price', 'unit_cost', 'min_stock', 'max_stock'}
+        if unknown:
+            raise InvalidInputException(f"Unsupported changes: {sorted(unknown)}")
+        if not values:
+            raise InvalidInputException("No changes given.")
+
+        values['updated_at'] = datetime.utcnow()
+        result = db.session.execute(
+            update(Product).where(*conditions).values(**values).execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def _price_expression(self, field, change, conditions):
+        """Builds the SET expression for a percentage or absolute change to a price column."""
+        column = getattr(Product, field)
+        if not isinstance(change, dict) or len(change) != 1 or not set(change) <= {'percent', 'amount'}:
+            raise InvalidInputException(f"{field} change must be {{'percent': x}} or {{'amount': x}}.")
+        try:
+            delta = Decimal(str(next(iter(change.values()))))
+        except InvalidOperation:
+            raise InvalidInputException(f"Invalid {field} change value.")
+        if not delta.is_finite(): # NaN / Infinity parse, but cannot be compared or stored
+            raise InvalidInputException(f"Invalid {field} change value.")
+
+        if 'percent' in change:
+            if delta < -100:
+                raise InvalidInputException(f"{field} cannot be reduced by more than 100%.")
+            return func.round(column * (1 + delta / 100), 2)
+
+        if delta < 0:
+            below_zero = db.session.execute(
+                select(func.count()).where(*conditions, column + delta < 0)
+            ).scalar()
+            if below_zero:
+                raise ConflictException(f"The change would make {field} negative for {below_zero} products.")
+        return column + delta
+
+    def _convert_bulk_value(self, field, value):
+        converter = BULK_UPDATE_FIELDS[field]
+        if value is None:
+            if field in ('description', 'unit_cost', 'unit_price', 'max_stock'):
+                return None
+            raise InvalidInputException(f"{field} cannot be null.")
+        try:
+            if converter is bool:
+                if not isinstance(value, bool):
+                    raise ValueError
+                return value
+            if converter is int and (isinstance(value, bool) or int(value) != value): # int(inf) raises OverflowError
+                raise ValueError
+            if converter is str:
+                if not isinstance(value, str) or (field == 'name' and not value.strip()):
+                    raise ValueError
+                return value
+            converted = converter(str(value))
+            if converter is Decimal and not converted.is_finite():
+                raise ValueError
+        except (ValueError, TypeError, InvalidOperation, OverflowError):
+            raise InvalidInputException(f"Invalid value for {field}.")
+        if converted < 0:
+            raise InvalidInputException(f"{field} must not be negative.")
+        return converted
+
+    # --- Bulk import ---
+
+    def import_products(self, stream, file_format='csv'):
+        """
+        Bulk-imports products from a text stream (CSV with a header row, or NDJSON), upserting on SKU.
+        Rows are parsed one at a time and streamed into product_import_staging (COPY on PostgreSQL,
+        executemany elsewhere); category/supplier references and SKU uniqueness are then validated
+        set-based and valid rows are upserted into products with a single INSERT ... ON CONFLICT.
+        Everything runs in one transaction. Returns a report dictionary with per-row errors.
+        """
+        if file_format not in ('csv', 'ndjson'):
+            raise InvalidInputException("Import format must be 'csv' or 'ndjson'.")
+
+        batch_id = str(uuid.uuid4())
+        present_columns = set()
+        staging_columns = ['batch_id', 'row_number'] + IMPORT_COLUMNS + ['error']
+
+        def staged_rows():
+            for row_number, raw in enumerate(self._read_import_rows(stream, file_format), start=1):
+                if isinstance(raw, dict):
+                    present_columns.update(raw.keys())
+                values, errors = self._parse_import_row(raw)
+                yield (batch_id, row_number) + tuple(values[c] for c in IMPORT_COLUMNS) + ('; '.join(errors) or None,)
+
+        try:
+            total_rows = copy_rows(ProductImportRow.__table__, staging_columns, staged_rows())
+            self._validate_import_batch(batch_id)
+
+            staging = ProductImportRow
+            valid = (staging.batch_id == batch_id) & staging.error.is_(None)
+            valid_rows = db.session.execute(select(func.count()).where(valid)).scalar()
+            created = db.session.execute(
+                select(func.count()).where(valid, staging.sku.not_in(select(Product.sku)))
+            ).scalar()
+            if valid_rows:
+                self._upsert_import_batch(batch_id, present_columns)
+
+            errors = [
+                {'row': row.row_number, 'sku': row.sku, 'error': row.error}
+                for row in db.session.execute(
+                    select(staging.row_number, staging.sku, staging.error)
+                    .where(staging.batch_id == batch_id, staging.error.is_not(None))
+                    .order_by(staging.row_number)
+                )
+            ]
+            db.session.execute(
+                delete(staging).where(staging.batch_id == batch_id).execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+        except (InvalidInputException, UnicodeDecodeError, csv.Error) as e:
+            db.session.rollback()
+            raise InvalidInputException(f"Could not read import file: {e}")
+        except Exception as e:
+            db.session.rollback()
+            print(f"An unexpected error occurred during product import: {e}")
+            raise DatabaseException("An unexpected error occurred during product import.")
+
+        return {
+            'batch_id': batch_id,
+            'total_rows': total_rows,
+            'created': created,
+            'updated': valid_rows - created,
+            'failed': len(errors),
+            'errors': errors,
+        }
+
+    def _read_import_rows(self, stream, file_format):
+        """Yields one dict per input row (None for an NDJSON line that is not a JSON object)."""
+        if file_format == 'ndjson':
+            for line in stream:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    item = json.loads(line)
+                except ValueError:
+                    item = None
+                yield item if isinstance(item, dict) else None
+        else:
+            yield from csv.DictReader(stream)
+
+    def _parse_import_row(self, raw):
+        """Converts one raw row to typed staging values. Returns (values, errors)."""
+        values = dict.fromkeys(IMPORT_COLUMNS)
+        if raw is None:
+            return values, ['Row is not a valid JSON object']
+
+        errors = []
+
+        def clean(field):
+            value = raw.get(field)
+            if isinstance(value, str):
+                value = value.strip()
+            return None if value in ('', None) else value
+
+        def parse(field, converter, message):
+            value = clean(field)
+            if value is None:
+                return None
+            try:
+                value = converter(value)
+                if isinstance(value, Decimal) and not value.is_finite(): # NaN, Infinity
+                    raise ValueError(value)
+                return value
+            except (ValueError, TypeError, InvalidOperation, OverflowError):
+                errors.append(f"{field}: {message}")
+                return None
+
+        values['sku'] = clean('sku')
+        values['name'] = clean('name')
+        values['description'] = clean('description')
+        # name is only required for new SKUs, which needs the products table (_validate_import_batch)
+        if values['sku'] is None:
+            errors.append('sku is required')
+        elif len(str(values['sku'])) > 50 or len(str(values['name'] or '')) > 255:
+            errors.append('sku or name is too long')
+        values['sku'] = str(values['sku']) if values['sku'] is not None else None
+        values['name'] = str(values['name']) if values['name'] is not None else None
+
+        for field in ('category_id', 'supplier_id', 'min_stock', 'max_stock'):
+            values[field] = parse(field, int, 'must be an integer')
+        for field in ('unit_cost', 'unit_price', 'weight', 'volume'):
+            values[field] = parse(field, lambda v: Decimal(str(v)), 'must be a number')
+            if values[field] is not None and values[field] < 0:
+                errors.append(f"{field}: must not be negative")
+
+        unit_measure = clean('unit_measure')
+        if unit_measure is not None:
+            if unit_measure in UnitMeasure.__members__:
+                values['unit_measure'] = unit_measure
+            else:
+                errors.append(f"unit_measure: must be one of {list(UnitMeasure.__members__.keys())}")
+
+        is_active = clean('is_active')
+        if isinstance(is_active, bool) or is_active is None:
+            values['is_active'] = is_active
+        elif str(is_active).lower() in ('true', '1', 'yes'):
+            values['is_active'] = True
+        elif str(is_active).lower() in ('false', '0', 'no'):
+            values['is_active'] = False
+        else:
+            errors.append('is_active: must be true or false')
+
+        return values, errors
+
+    def _validate_import_batch(self, batch_id):
+        """Marks staged rows with unknown categories/suppliers, new SKUs without a name or repeated SKUs (set-based UPDATEs)."""
+        staging = ProductImportRow
+        valid = (staging.batch_id == batch_id) & staging.error.is_(None)
+        checks = [
+            (staging.name.is_(None) & staging.sku.not_in(select(Product.sku)),
+             'name: required for new products'),
+            (staging.category_id.is_not(None) & staging.category_id.not_in(select(Category.id)),
+             'category_id: category not found'),
+            (staging.supplier_id.is_not(None) & staging.supplier_id.not_in(select(Supplier.id)),
+             'supplier_id: supplier not found'),
+            # Only the first occurrence of a SKU in the file is imported
+            (staging.row_number.not_in(select(func.min(staging.row_number)).where(valid).group_by(staging.sku)),
+             'sku: duplicated in file'),
+        ]
+        for condition, message in checks:
+            db.session.execute(
+                update(staging).where(valid, condition).values(error=message)
+                .execution_options(synchronize_session=False)
+            )
+
+    def _upsert_import_batch(self, batch_id, present_columns):
+        """INSERT ... SELECT the valid staged rows into products, updating existing SKUs."""
+        dialect = db.session.connection().dialect.name
+        if dialect == 'postgresql':
+            insert_ = postgresql.insert
+        elif dialect == 'sqlite':
+            insert_ = sqlite.insert
+        else:
+            raise DatabaseException(f"Bulk import is not supported on {dialect}.")
+
+        staging = ProductImportRow
+        products = Product.__table__
+        now = datetime.utcnow()
+        source = select(
+            # A row without a name only passes validation for an existing SKU: keep its name (NOT NULL is
+            # checked on the proposed row, before the conflict turns the INSERT into an UPDATE)
+            staging.sku, func.coalesce(staging.name, select(Product.name).where(Product.sku == staging.sku).scalar_subquery()),
+            staging.description, staging.category_id, staging.supplier_id,
+            staging.unit_cost, staging.unit_price,
+            cast(func.coalesce(staging.unit_measure, UnitMeasure.unidad.name), products.c.unit_measure.type),
+            staging.weight, staging.volume, func.coalesce(staging.min_stock, 0), staging.max_stock,
+            func.coalesce(staging.is_active, true()), literal(now), literal(now)
+        ).where(staging.batch_id == batch_id, staging.error.is_(None))
+
+        statement = insert_(products).from_select(IMPORT_COLUMNS + ['created_at', 'updated_at'], source)
+        # Existing products only get the columns present in the file (sku is the conflict key)
+        update_columns = [c for c in IMPORT_COLUMNS if c in present_columns and c != 'sku']
+        statement = statement.on_conflict_do_update(
+            index_elements=[products.c.sku],
+            set_={**{c: statement.excluded[c] for c in update_columns}, 'updated_at': statement.excluded.updated_at}
+        )
+        db.session.execute(statement)
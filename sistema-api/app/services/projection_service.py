@@ -0,0 +1,412 @@
+# inventory_api/app/services/projection_service.py
+
+from .base_service import BaseService
+from ..models import (
+    InventoryTransaction,
+    StockLevel,
+    StockDailyMovement,
+    StockAlert,
+    InventoryValuation,
+    ProjectionCheckpoint,
+    Product,
+)
+from ..db import db
+from ..utils.exceptions import InvalidInputException
+from ..utils.helpers import settled_entries, stock_delta
+from ..utils.replicas import locking_read
+from ..utils.shards import shard_router
+from flask import current_app
+from sqlalchemy import delete, func, select, text, tuple_
+from collections import namedtuple
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+# The fields of an inventory_transactions row the projections read
+LedgerEntry = namedtuple('LedgerEntry', 'id transaction_type product_id location_id quantity transaction_date created_at')
+LEDGER_COLUMNS = (
+    InventoryTransaction.id, InventoryTransaction.transaction_type, InventoryTransaction.product_id,
+    InventoryTransaction.location_id, InventoryTransaction.quantity, InventoryTransaction.transaction_date,
+    InventoryTransaction.created_at,
+)
+KEY_CHUNK_SIZE = 500
+
+
+def ledger_entry(transaction):
+    """The LedgerEntry of an InventoryTransaction being written (its dates may still be SQL expressions)."""
+    now = datetime.utcnow()
+    return LedgerEntry(
+        transaction.id, transaction.transaction_type, transaction.product_id, transaction.location_id,
+        Decimal(str(transaction.quantity)),
+        transaction.transaction_date if isinstance(transaction.transaction_date, datetime) else now,
+        transaction.created_at if isinstance(transaction.created_at, datetime) else now,
+    )
+
+
+class Projection:
+    """
+    A read model folded from the ledger. apply() must only depend on the entries and on reference data,
+    so that replaying the ledger from the start (ProjectionService.rebuild) gives the same rows.
+    """
+    name = None
+    model = None
+    key_columns = ()
+
+    def apply(self, entries):
+        raise NotImplementedError
+
+    def reset(self):
+        db.session.execute(delete(self.model).execution_options(synchronize_session=False))
+
+    def new_row(self, key):
+        return self.model(**{column.key: value for column, value in zip(self.key_columns, key)})
+
+    def rows(self, keys):
+        """The model rows for the given keys (tuples of key_columns values), created empty where missing."""
+        keys = list(keys)
+        rows = {}
+        for start in range(0, len(keys), KEY_CHUNK_SIZE):
+            chunk = keys[start:start + KEY_CHUNK_SIZE]
+            if len(self.key_columns) == 1:
+                condition = self.key_columns[0].in_([key[0] for key in chunk])
+            else:
+                condition = tuple_(*self.key_columns).in_(chunk)
+            for row in db.session.execute(select(self.model).where(condition)).scalars():
+                rows[tuple(getattr(row, column.key) for column in self.key_columns)] = row
+        for key in keys:
+            if key not in rows:
+                rows[key] = self.new_row(key)
+                db.session.add(rows[key])
+        return rows
+
+
+def sum_deltas(entries, key):
+    """{key(entry): signed stock change of its entries}."""
+    deltas = {}
+    for entry in entries:
+        deltas[key(entry)] = deltas.get(key(entry), Decimal(0)) + stock_delta(entry.transaction_type, entry.quantity)
+    return deltas
+
+
+class StockLevelProjection(Projection):
+    """stock_levels: quantity per product and location."""
+    name = 'stock_levels'
+    model = StockLevel
+    key_columns = (StockLevel.product_id, StockLevel.location_id)
+
+    def new_row(self, key):
+        return StockLevel(product_id=key[0], location_id=key[1], quantity=0)
+
+    def apply(self, entries):
+        deltas = sum_deltas(entries, lambda entry: (entry.product_id, entry.location_id))
+        rows = self.rows(deltas)
+        for key, delta in deltas.items():
+            rows[key].quantity = Decimal(str(rows[key].quantity)) + delta
+            rows[key].last_updated = db.func.current_timestamp()
+
+
+class DailyMovementProjection(Projection):
+    """stock_daily_movements: quantities in and out per day (of transaction_date), product and location."""
+    name = 'daily_movements'
+    model = StockDailyMovement
+    key_columns = (StockDailyMovement.day, StockDailyMovement.product_id, StockDailyMovement.location_id)
+
+    def new_row(self, key):
+        return StockDailyMovement(day=key[0], product_id=key[1], location_id=key[2], quantity_in=0, quantity_out=0, movement_count=0)
+
+    def apply(self, entries):
+        keyed = [((entry.transaction_date.date(), entry.product_id, entry.location_id), entry) for entry in entries]
+        rows = self.rows(dict(keyed))
+        for key, entry in keyed:
+            delta = stock_delta(entry.transaction_type, entry.quantity)
+            row = rows[key]
+            if delta >= 0:
+                row.quantity_in = Decimal(str(row.quantity_in)) + delta
+            else:
+                row.quantity_out = Decimal(str(row.quantity_out)) - delta
+            row.movement_count += 1
+
+
+class LowStockProjection(Projection):
+    """stock_alerts: running quantity per product and location, flagged at or below the product's min_stock."""
+    name = 'low_stock'
+    model = StockAlert
+    key_columns = (StockAlert.product_id, StockAlert.location_id)
+
+    def new_row(self, key):
+        return StockAlert(product_id=key[0], location_id=key[1], quantity=0, min_stock=0, is_low=False)
+
+    def apply(self, entries):
+        deltas = sum_deltas(entries, lambda entry: (entry.product_id, entry.location_id))
+        last_dates = {(entry.product_id, entry.location_id): entry.transaction_date for entry in entries}
+        min_stock = dict(db.session.execute(
+            select(Product.id, Product.min_stock).where(Product.id.in_({product_id for product_id, _ in deltas}))
+        ).all())
+        rows = self.rows(deltas)
+        for key, delta in deltas.items():
+            row = rows[key]
+            row.quantity = Decimal(str(row.quantity)) + delta
+            row.min_stock = min_stock.get(key[0]) or 0
+            is_low = row.quantity <= row.min_stock
+            if is_low and not row.is_low:
+                row.low_since = last_dates[key]
+            elif not is_low:
+                row.low_since = None
+            row.is_low = is_low
+
+
+class ValuationProjection(Projection):
+    """inventory_valuation: quantity on hand and value per product (movements valued at the current unit_cost)."""
+    name = 'valuation'
+    model = InventoryValuation
+    key_columns = (InventoryValuation.product_id,)
+
+    def new_row(self, key):
+        return InventoryValuation(product_id=key[0], quantity=0, value=0)
+
+    def apply(self, entries):
+        deltas = sum_deltas(entries, lambda entry: (entry.product_id,))
+        unit_costs = dict(db.session.execute(
+            select(Product.id, Product.unit_cost).where(Product.id.in_({key[0] for key in deltas}))
+        ).all())
+        rows = self.rows(deltas)
+        for key, delta in deltas.items():
+            row = rows[key]
+            row.quantity = Decimal(str(row.quantity)) + delta
+            row.value = Decimal(str(row.value)) + delta * (unit_costs.get(key[0]) or 0)
+            row.updated_at = datetime.utcnow()
+
+
+PROJECTIONS = (StockLevelProjection(), DailyMovementProjection(), LowStockProjection(), ValuationProjection())
+
+# The trigger of the original schema that added every inventory_transactions insert to stock_levels. The
+# stock_levels projection does that now: where the trigger is left in place, every movement counts twice.
+LEGACY_STOCK_TRIGGER = 'trg_update_stock'
+
+
+def legacy_stock_trigger_tables(connection):
+    """The tables of the connection's database that still carry trg_update_stock (PostgreSQL and SQLite)."""
+    if connection.dialect.name == 'postgresql':
+        query = text("SELECT tgrelid::regclass::text FROM pg_trigger WHERE tgname = :name AND NOT tgisinternal")
+    elif connection.dialect.name == 'sqlite':
+        query = text("SELECT tbl_name FROM sqlite_master WHERE type = 'trigger' AND name = :name")
+    else:
+        return []
+    return list(connection.execute(query, {'name': LEGACY_STOCK_TRIGGER}).scalars())
+
+
+def drop_legacy_stock_trigger(connection):
+    """Drops trg_update_stock from the connection's database. Returns the tables it was on."""
+    tables = legacy_stock_trigger_tables(connection)
+    for table in tables:
+        target = f"{LEGACY_STOCK_TRIGGER} ON {table}" if connection.dialect.name == 'postgresql' else LEGACY_STOCK_TRIGGER
+        connection.execute(text(f"DROP TRIGGER IF EXISTS {target}"))
+    return tables
+
+
+class ProjectionService(BaseService):
+    """
+    Read models built from inventory_transactions, the append-only ledger and the only thing the write
+    paths write stock changes to. Each projection has a checkpoint (projection_checkpoints) and is
+    either inline (PROJECTIONS_INLINE: applied by record(), in the transaction of the write) or
+    maintained by the workers (`flask projections-run`), which apply new ledger entries in order.
+    Any projection can be rebuilt from the ledger; a new one only needs a Projection subclass.
+    With shards, every shard projects its own ledger. The servers refuse to start while the original
+    schema's trg_update_stock trigger is installed (`flask projections-drop-trigger`).
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.projections = {projection.name: projection for projection in PROJECTIONS}
+
+    def _get(self, name):
+        if name not in self.projections:
+            raise InvalidInputException(f"Unknown projection: {name}. Must be one of {list(self.projections)}")
+        return self.projections[name]
+
+    def inline_names(self):
+        return [name for name in current_app.config.get('PROJECTIONS_INLINE', ['stock_levels']) if name in self.projections]
+
+    def worker_names(self):
+        inline = self.inline_names()
+        return [name for name in self.projections if name not in inline]
+
+    # --- Write path (no commits; called inside movement transactions) ---
+
+    def record(self, transactions):
+        """Applies a write's new ledger entries (InventoryTransaction objects) to the inline projections."""
+        entries = [ledger_entry(transaction) for transaction in transactions]
+        for name in self.inline_names():
+            self.projections[name].apply(entries)
+
+    def current_stock(self, product_id, location_id):
+        """
+        Stock of a product at a location as the write path must see it: stock_levels, plus the ledger
+        entries the workers have not applied yet when stock_levels is not inline.
+        """
+        quantity = db.session.execute(
+            select(StockLevel.quantity).where(StockLevel.product_id == product_id, StockLevel.location_id == location_id)
+        ).scalar()
+        quantity = Decimal(str(quantity)) if quantity is not None else Decimal(0)
+        if 'stock_levels' not in self.inline_names():
+            tail = db.session.execute(
+                select(InventoryTransaction.transaction_type, InventoryTransaction.quantity).where(
+                    InventoryTransaction.product_id == product_id,
+                    InventoryTransaction.location_id == location_id,
+                    InventoryTransaction.id > self._position('stock_levels'),
+                )
+            )
+            quantity += sum((stock_delta(transaction_type, Decimal(str(amount))) for transaction_type, amount in tail), Decimal(0))
+        return quantity
+
+    # --- Workers ---
+
+    def catch_up(self, names=None, batch_size=None):
+        """
+        Applies the new ledger entries to the given worker projections (default: all of them), one
+        transaction per batch that also moves the checkpoint. Returns {name: entries applied}.
+        """
+        batch_size = batch_size or current_app.config.get('PROJECTION_BATCH_SIZE', 1000)
+        names = names or self.worker_names()
+        for name in names:
+            self._get(name)
+
+        def run():
+            applied = {}
+            for name in names:
+                applied[name] = 0
+                while True:
+                    count = self._apply_batch(self.projections[name], batch_size)
+                    if not count:
+                        break
+                    applied[name] += count
+            return applied
+
+        return self._sum_over_shards(run)
+
+    def rebuild(self, name):
+        """
+        Recomputes a projection from the whole ledger, in one transaction. Writes to an inline
+        projection wait for it (its rows are locked) and then apply on top. Returns the entries applied.
+        """
+        projection = self._get(name)
+        batch_size = current_app.config.get('PROJECTION_BATCH_SIZE', 1000)
+
+        def run():
+            checkpoint = self._checkpoint(name)
+            projection.reset()
+            db.session.flush()
+            checkpoint.position = 0
+            applied = 0
+            while True:
+                entries = self._ledger_after(checkpoint.position, batch_size)
+                if name not in self.inline_names():
+                    entries = settled_entries(entries, checkpoint.position, self._gap_timeout())
+                if not entries:
+                    break
+                projection.apply(entries)
+                db.session.flush()
+                checkpoint.position = entries[-1].id
+                applied += len(entries)
+            db.session.commit()
+            return {name: applied}
+
+        return self._sum_over_shards(run)[name]
+
+    def status(self):
+        """Per projection: mode, checkpoint and lag (ledger entries past the checkpoint). Per shard when sharded."""
+        inline = self.inline_names()
+
+        def run():
+            head = db.session.execute(select(func.max(InventoryTransaction.id))).scalar() or 0
+            positions = dict(db.session.execute(select(ProjectionCheckpoint.name, ProjectionCheckpoint.position)).all())
+            return [
+                {
+                    'name': name,
+                    'mode': 'inline' if name in inline else 'worker',
+                    'position': positions.get(name, 0),
+                    'lag': None if name in inline else db.session.execute(
+                        select(func.count()).where(InventoryTransaction.id > positions.get(name, 0))
+                    ).scalar(),
+                    'ledger_head': head,
+                }
+                for name in self.projections
+            ]
+
+        router = shard_router()
+        if router is None:
+            return run()
+        return [{**item, 'shard': index} for index in router.indexes for item in router.run_on(index, run)]
+
+    def legacy_triggers(self):
+        """{shard index: tables} of the databases still carrying trg_update_stock (index 0 without shards)."""
+        return self._on_every_database(legacy_stock_trigger_tables)
+
+    def drop_legacy_triggers(self):
+        """Drops trg_update_stock from the primary and every shard. Returns {shard index: tables} it was on."""
+        return self._on_every_database(drop_legacy_stock_trigger)
+
+    def check_legacy_triggers(self):
+        """Servers' startup check: raises RuntimeError while trg_update_stock is installed on any database."""
+        found = self.legacy_triggers()
+        if found:
+            sharded = shard_router() is not None
+            where = ', '.join(f"{table} (shard {index})" if sharded else table for index, tables in found.items() for table in tables)
+            raise RuntimeError(
+                f"The {LEGACY_STOCK_TRIGGER} trigger is still installed on {where}: stock_levels would count every "
+                f"movement twice. Drop it with `flask projections-drop-trigger`."
+            )
+
+    def _on_every_database(self, fn):
+        router = shard_router()
+        found = {}
+        for index, engine in enumerate([db.engine] if router is None else router.engines):
+            with engine.begin() as connection:
+                tables = fn(connection)
+            if tables:
+                found[index] = tables
+        return found
+
+    def _sum_over_shards(self, run):
+        router = shard_router()
+        if router is None:
+            return run()
+        totals = {}
+        for index in router.indexes:
+            for name, count in router.run_on(index, run).items():
+                totals[name] = totals.get(name, 0) + count
+        return totals
+
+    def _apply_batch(self, projection, batch_size):
+        checkpoint = self._checkpoint(projection.name, lock=True) # One worker per projection at a time
+        # Up to the first gap left by a movement still being committed (PROJECTION_GAP_TIMEOUT_S)
+        entries = settled_entries(self._ledger_after(checkpoint.position, batch_size), checkpoint.position, self._gap_timeout())
+        if not entries:
+            db.session.commit()
+            return 0
+        projection.apply(entries)
+        checkpoint.position = entries[-1].id
+        db.session.commit()
+        return len(entries)
+
+    def _checkpoint(self, name, lock=False):
+        query = select(ProjectionCheckpoint).where(ProjectionCheckpoint.name == name)
+        checkpoint = db.session.execute(locking_read(query) if lock else query).scalar_one_or_none()
+        if checkpoint is None:
+            checkpoint = ProjectionCheckpoint(name=name, position=0)
+            db.session.add(checkpoint)
+            db.session.flush()
+        return checkpoint
+
+    def _position(self, name):
+        return db.session.execute(
+            select(ProjectionCheckpoint.position).where(ProjectionCheckpoint.name == name)
+        ).scalar() or 0
+
+    def _ledger_after(self, position, limit):
+        rows = db.session.execute(
+            select(*LEDGER_COLUMNS).where(InventoryTransaction.id > position).order_by(InventoryTransaction.id).limit(limit)
+        )
+        return [LedgerEntry(*row) for row in rows]
+
+    def _gap_timeout(self):
+        return timedelta(seconds=current_app.config.get('PROJECTION_GAP_TIMEOUT_S', 10))
@@ -7,17 +7,38 @@ from ..models import (
     LowStockItem,
     Product,
     Location,
+    CategoryClosure,
     InventoryTransaction, # Import InventoryTransaction model
     LocationTransfer, # Import LocationTransfer model
-    User # Import User model for joins/filters
+    User, # Import User model for joins/filters
+    StockDailyMovement,
 )
 from ..db import db
 from ..utils.exceptions import DatabaseException
+from ..utils.replicas import replica_reads
+from ..utils.shards import gather_pagination, merge_pages, shard_router
 from sqlalchemy import func, and_ # For calling DB functions and combining filters
 from sqlalchemy.exc import OperationalError
 from datetime import datetime, timedelta # Import timedelta for date range filtering
 from sqlalchemy.orm import aliased
 
+# Aliases for joining locations twice in the transfer report. Created once: building an alias
+# costs more than the rest of the query construction (see benchmarks/micro.py).
+FromLocation = aliased(Location, name='from_location')
+ToLocation = aliased(Location, name='to_location')
+
+# Sort keys of each report -> keys of its result dicts, to merge the pages of several shards (app/utils/shards.py)
+STOCK_LEVEL_ORDER = {'product_name': 'product_name', 'location_name': 'location_name', 'quantity': 'quantity', 'last_updated': 'last_updated'}
+TRANSACTION_ORDER = {
+    'transaction_date': 'transaction_date', 'product_name': 'product_name', 'location_name': 'location_name',
+    'user_username': 'user_name', 'quantity': 'quantity', 'transaction_type': 'transaction_type',
+}
+TRANSFER_ORDER = {
+    'transfer_date': 'transfer_date', 'product_name': 'product_name', 'from_location_name': 'from_location_name',
+    'to_location_name': 'to_location_name', 'user_username': 'user_name', 'quantity': 'quantity',
+}
+DAILY_MOVEMENT_ORDER = [('day', True), ('product_id', False), ('location_id', False)]
+NUMERIC_KEYS = ('quantity', 'min_stock', 'product_id', 'location_id')
 
 
 class ReportService(BaseService):
@@ -25,15 +46,27 @@ class ReportService(BaseService):
     Service class for generating various inventory reports.
     Handles fetching data for stock levels, low stock, transactions, and transfers.
     Converts SQLAlchemy objects to dictionaries for API response.
+    Queries run on a read replica when DATABASE_REPLICA_URLS is configured, and on every shard
+    in parallel (scatter-gather) when DATABASE_SHARD_URLS is.
     """
 
+    @replica_reads()
     def get_stock_levels(self, filters=None, pagination=None, sorting=None):
         """
         Gets current stock levels for each product/location combination.
-        Reads from the 'stock_levels' table (updated by trigger).
-        Filters can include: product_id, location_id, category_id, supplier_id.
+        Reads from the 'stock_levels' table (a projection of the ledger, see ProjectionService).
+        Filters can include: product_id, location_id, category_id, supplier_id,
+        include_descendants (category_id also matches subcategories).
         Supports pagination and sorting. Returns a list of dictionaries.
         """
+        if shard_router() is not None:
+            return self._gather(self._build_stock_levels_query, filters, pagination, sorting, STOCK_LEVEL_ORDER,
+                                [('product_name', False), ('location_name', False)])
+        query = self._build_stock_levels_query(filters, sorting)
+        return [item.to_dict() for item in self._paginate(query, pagination)]
+
+    def _build_stock_levels_query(self, filters=None, sorting=None):
+        """The get_stock_levels query, without pagination (kept apart so its construction can be benchmarked)."""
         # Start with the base query joining StockLevel with Product and Location
         # Ensure relationships are defined in your models for these joins to work
         query = StockLevel.query.join(Product).join(Location)
@@ -46,7 +79,10 @@ class ReportService(BaseService):
                 query = query.filter(StockLevel.location_id == filters['location_id'])
             # Filter via joined Product table (assuming Product model has category_id and supplier_id)
             if 'category_id' in filters and filters['category_id'] is not None:
-                 query = query.filter(Product.category_id == filters['category_id'])
+                 if filters.get('include_descendants'):
+                     query = query.filter(Product.category_id.in_(CategoryClosure.descendant_ids(filters['category_id'])))
+                 else:
+                     query = query.filter(Product.category_id == filters['category_id'])
             if 'supplier_id' in filters and filters['supplier_id'] is not None:
                  query = query.filter(Product.supplier_id == filters['supplier_id'])
             # Add more filters as needed based on StockLevel, Product, Location fields
@@ -77,22 +113,10 @@ class ReportService(BaseService):
              # Default sort by product name and then location name
              query = query.order_by(Product.name.asc(), Location.name.asc())
 
-        # Apply pagination
-        if pagination and 'page' in pagination and 'limit' in pagination:
-            page = max(1, int(pagination['page'])) # Ensure page is at least 1
-            limit = max(1, int(pagination['limit'])) # Ensure limit is at least 1
-            offset = (page - 1) * limit
-            items = query.limit(limit).offset(offset).all()
-        else:
-            # If no pagination, return all results
-            items = query.all()
-
-        # --- Convert list of SQLAlchemy objects to list of dictionaries ---
-        # This assumes your StockLevel model (or related models) have a .to_dict() method
-        return [item.to_dict() for item in items]
-        # -----------------------------------------------------------------
+        return query
 
 
+    @replica_reads()
     def get_low_stock_items(self, filters=None, pagination=None, sorting=None):
         """
         Gets items where current stock is at or below the minimum stock level.
@@ -100,6 +124,15 @@ class ReportService(BaseService):
         Filters can be applied based on view columns (product_id, location_id, etc.).
         Supports pagination and sorting. Returns a list of dictionaries.
         """
+        if shard_router() is not None:
+            order = {key: key for key in (sorting or {}) if hasattr(LowStockItem, key)}
+            return self._gather(self._build_low_stock_query, filters, pagination, sorting, order,
+                                [('product_name', False), ('location_name', False)])
+        query = self._build_low_stock_query(filters, sorting)
+        return [item.to_dict() for item in self._paginate(query, pagination)]
+
+    def _build_low_stock_query(self, filters=None, sorting=None):
+        """The get_low_stock_items query, without pagination."""
         # Query the model mapped to the low_stock view
         query = LowStockItem.query
 
@@ -130,21 +163,36 @@ class ReportService(BaseService):
              # Default sort by product name and then location name in the view
              query = query.order_by(LowStockItem.product_name.asc(), LowStockItem.location_name.asc())
 
-        # Apply pagination
-        if pagination and 'page' in pagination and 'limit' in pagination:
-            page = max(1, int(pagination['page']))
-            limit = max(1, int(pagination['limit']))
-            offset = (page - 1) * limit
-            items = query.limit(limit).offset(offset).all()
-        else:
-            items = query.all()
-
-        # --- Convert list of SQLAlchemy objects to list of dictionaries ---
-        # This assumes your LowStockItem model has a .to_dict() method
-        return [item.to_dict() for item in items]
-        # -----------------------------------------------------------------
+        return query
 
 
+    @replica_reads()
+    def get_daily_movements(self, filters=None, pagination=None):
+        """
+        Quantities in and out per day, product and location, newest day first.
+        Reads from the 'stock_daily_movements' projection, which lags the ledger by the projection workers' delay.
+        Filters can include: product_id, location_id, start_date, end_date (dates, inclusive).
+        """
+        if shard_router() is not None:
+            return self._gather(self._build_daily_movements_query, filters, pagination, None, {}, DAILY_MOVEMENT_ORDER)
+        query = self._build_daily_movements_query(filters)
+        return [item.to_dict() for item in self._paginate(query, pagination)]
+
+    def _build_daily_movements_query(self, filters=None, sorting=None):
+        """The get_daily_movements query, without pagination."""
+        query = StockDailyMovement.query
+        filters = filters or {}
+        if filters.get('product_id') is not None:
+            query = query.filter(StockDailyMovement.product_id == filters['product_id'])
+        if filters.get('location_id') is not None:
+            query = query.filter(StockDailyMovement.location_id == filters['location_id'])
+        if filters.get('start_date') is not None:
+            query = query.filter(StockDailyMovement.day >= filters['start_date'])
+        if filters.get('end_date') is not None:
+            query = query.filter(StockDailyMovement.day <= filters['end_date'])
+        return query.order_by(StockDailyMovement.day.desc(), StockDailyMovement.product_id.asc(), StockDailyMovement.location_id.asc())
+
+    @replica_reads()
     def get_inventory_total_value(self):
         """
         Calls the database function get_inventory_value() to get the total inventory value.
@@ -167,12 +215,21 @@ class ReportService(BaseService):
              raise DatabaseException("An unexpected error occurred while calculating total inventory value.")
 
 
+    @replica_reads()
     def get_transaction_history(self, filters=None, pagination=None, sorting=None):
         """
         Gets the history of inventory transactions.
         Filters can include: product_id, location_id, user_id, transaction_type, date range.
         Supports pagination and sorting. Returns a list of dictionaries.
         """
+        if shard_router() is not None:
+            return self._gather(self._build_transaction_history_query, filters, pagination, sorting, TRANSACTION_ORDER,
+                                [('transaction_date', True)])
+        query = self._build_transaction_history_query(filters, sorting)
+        return [item.to_dict() for item in self._paginate(query, pagination)]
+
+    def _build_transaction_history_query(self, filters=None, sorting=None):
+        """The get_transaction_history query, without pagination."""
         # Start with the base query for InventoryTransaction
         # Join with Product, Location, and User for filtering and sorting on related fields
         # Ensure relationships are defined in your models for these joins to work
@@ -239,32 +296,28 @@ class ReportService(BaseService):
              # Default sort by transaction date descending
              query = query.order_by(InventoryTransaction.transaction_date.desc())
 
-        # Apply pagination
-        if pagination and 'page' in pagination and 'limit' in pagination:
-            page = max(1, int(pagination['page']))
-            limit = max(1, int(pagination['limit']))
-            offset = (page - 1) * limit
-            items = query.limit(limit).offset(offset).all()
-        else:
-            # If no pagination, return all results
-            items = query.all()
-
-        # --- Convert list of SQLAlchemy objects to list of dictionaries ---
-        # This assumes your InventoryTransaction model has a .to_dict() method
-        return [item.to_dict() for item in items]
-        # -----------------------------------------------------------------
+        return query
 
 
+    @replica_reads()
     def get_transfer_history(self, filters=None, pagination=None, sorting=None):
         """
         Gets the history of location transfers.
         Filters can include: product_id, from_location_id, to_location_id, user_id, date range.
         Supports pagination and sorting. Returns a list of dictionaries.
         """
-        # Define aliases for the Location model for joining it twice
-        FromLocation = aliased(Location)
-        ToLocation = aliased(Location)
-
+        if shard_router() is not None:
+            # Transfers are stored on their source location's shard
+            return self._gather(self._build_transfer_history_query, filters, pagination, sorting, TRANSFER_ORDER,
+                                [('transfer_date', True)], location_key='from_location_id')
+        query = self._build_transfer_history_query(filters, sorting)
+        # Your LocationTransfer model's .to_dict() method can access the related objects via
+        # relationships (e.g., transfer.from_location.name, transfer.to_location.name)
+        return [item.to_dict() for item in self._paginate(query, pagination)]
+
+    def _build_transfer_history_query(self, filters=None, sorting=None):
+        """The get_transfer_history query, without pagination."""
+        # FromLocation / ToLocation (module level) are aliases of Location for joining it twice
         # Start with the base query for LocationTransfer
         # Join with Product, From Location (aliased), To Location (aliased), and User
         # Use the aliases and the correct primary key column name (likely 'id') for Location
@@ -336,24 +389,39 @@ class ReportService(BaseService):
              # Consider adding secondary sort by location names if desired after fixing aliases
              # query = query.order_by(LocationTransfer.transfer_date.desc(), FromLocation.name.asc(), ToLocation.name.asc())
 
+        return query
 
-        # Apply pagination
-        if pagination and 'page' in pagination and 'limit' in pagination:
-            page = max(1, int(pagination['page']))
-            limit = max(1, int(pagination['limit']))
-            offset = (page - 1) * limit
-            items = query.limit(limit).offset(offset).all()
+    def _gather(self, build_query, filters, pagination, sorting, sort_keys, default_order, location_key='location_id'):
+        """
+        Runs a report query on every shard in parallel and merges the pages. Each shard returns its first
+        page*limit rows, so deep pages cost more than on a single database. A location filter narrows the
+        query to that location's shard.
+        """
+        router = shard_router()
+        location_id = (filters or {}).get(location_key)
+        indexes = None if location_id is None else [router.shard_of(int(location_id))]
+        shard_pagination = gather_pagination(pagination)
+        pages = router.gather(
+            lambda: [item.to_dict() for item in self._paginate(build_query(filters, sorting), shard_pagination)], indexes
+        )
+        if sorting:
+            order = [(sort_keys[key], direction.lower() == 'desc') for key, direction in sorting.items() if key in sort_keys]
         else:
-            items = query.all()
+            order = default_order
+        return merge_pages(pages, order, pagination, numeric=NUMERIC_KEYS)
 
-        # --- Convert list of SQLAlchemy objects to list of dictionaries ---
-        # Your LocationTransfer model's .to_dict() method should now be able
-        # to access the related objects via relationships (e.g., transfer.from_location.name, transfer.to_location.name)
-        # because the joins in the query made them available.
-        return [item.to_dict() for item in items]
-        # -----------------------------------------------------------------
+    def _paginate(self, query, pagination=None):
+        """Runs a report query, limited to one page when pagination has both page and limit."""
+        if pagination and 'page' in pagination and 'limit' in pagination:
+            page = max(1, int(pagination['page'])) # Ensure page is at least 1
+            limit = max(1, int(pagination['limit'])) # Ensure limit is at least 1
+            offset = (page - 1) * limit
+            return query.limit(limit).offset(offset).all()
+        # If no pagination, return all results
+        return query.all()
 
 
+    @replica_reads()
     def get_inventory_total_value(self):
         """
         Calls the database function get_inventory_value() to get the total inventory value.
@@ -363,7 +431,11 @@ class ReportService(BaseService):
         try:
             # Use sqlalchemy.func to call the database function
             # The function is expected to return a single numeric value
-            total_value = db.session.query(func.get_inventory_value()).scalar()
+            router = shard_router()
+            if router is not None:
+                total_value = sum(value or 0 for value in router.gather(lambda: db.session.query(func.get_inventory_value()).scalar()))
+            else:
+                total_value = db.session.query(func.get_inventory_value()).scalar()
             # Return 0.00 if the function returns None (e.g., empty inventory)
             return total_value if total_value is not None else 0.00
         except OperationalError as e:
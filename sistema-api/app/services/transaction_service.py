@@ -1,8 +1,11 @@
 # inventory_api/app/services/transaction_service.py
 
 from .base_service import BaseService
+from .capacity_service import CapacityService
+from .projection_service import ProjectionService
 from ..models import InventoryTransaction, Product, Location, User
 from ..utils.enums import TransactionType
+from ..utils.helpers import stock_delta
 from ..db import db
 from ..utils.exceptions import NotFoundException, ConflictException, InsufficientStockException
 from sqlalchemy import desc, asc
@@ -11,6 +14,8 @@ class TransactionService(BaseService):
     def __init__(self):
         super().__init__()
         self.model = InventoryTransaction
+        self.capacity_service = CapacityService()
+        self.projection_service = ProjectionService()
 
     def get_all_transactions(self, filters=None, pagination=None, sorting=None):
         """
@@ -97,8 +102,8 @@ class TransactionService(BaseService):
     def create_transaction(self, data):
         """
         Registers a new inventory transaction.
-        NOTE: Stock level updates are handled by the database trigger.
-        This method only inserts the transaction record.
+        NOTE: The transaction is the source of truth for stock; stock_levels and the other
+        projections follow it (inline in this transaction, or later through the projection workers).
         """
         # Validate required fields and check if related entities exist
         required_fields = ['product_id', 'location_id', 'quantity', 'transaction_type', 'user_id']
@@ -122,7 +127,7 @@ class TransactionService(BaseService):
              raise NotFoundException(f"User with ID {data['user_id']} not found.")
 
         # If it's an 'salida' or 'ajuste' with negative quantity, check stock BEFORE inserting
-        # NOTE: The DB trigger handles the *actual* stock update based on quantity sign.
+        # NOTE: The projections handle the *actual* stock update based on the transaction type.
         # However, checking *before* insertion gives a faster feedback to the user.
         # This check might be redundant if the DB procedure handles insufficient stock elegantly,
         # but checking here is safer for the API layer.
@@ -137,20 +142,21 @@ class TransactionService(BaseService):
         # Use the create helper
         # Remove keys from data that are not columns if necessary (e.g., user_name from API input)
         transaction_data = {k: v for k, v in data.items() if hasattr(self.model, k)}
-        new_transaction = self._create(self.model, transaction_data)
-
-        # The DB trigger will automatically update stock_levels AFTER the commit.
-        # If you needed to access the *new* stock level immediately after this function call,
-        # you might need to re-query the stock_levels table or the database function.
+        # Location utilization and the inline projections are maintained here, in the same transaction as the insert
+        new_transaction = self._create(self.model, transaction_data, before_commit=self._apply_movement)
 
         return new_transaction
 
+    def _apply_movement(self, tx):
+        self.capacity_service.apply_stock_change(
+            tx.location_id, db.session.get(Product, tx.product_id), stock_delta(tx.transaction_type, tx.quantity)
+        )
+        self.projection_service.record([tx])
+
     # Helper method to get current stock level (useful for checks)
     def _get_current_stock(self, product_id, location_id):
         """Helper to get the current stock quantity for a product at a location."""
-        from ..models import StockLevel # Import here to avoid circular dependency if StockLevel imports this service
-        stock_item = StockLevel.query.filter_by(product_id=product_id, location_id=location_id).first()
-        return stock_item.quantity if stock_item else 0 # Return 0 if no stock record exists
+        return self.projection_service.current_stock(product_id, location_id)
 
     # Update/Delete methods for transactions might be restricted in a real system
     # as they represent historical events. If needed, they'd be implemented carefully.
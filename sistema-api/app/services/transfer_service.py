@@ -4,10 +4,12 @@ from .base_service import BaseService
 from ..models import LocationTransfer, Product, Location, User, InventoryTransaction, StockLevel
 from ..utils.enums import TransactionType
 from ..db import db
-from ..utils.exceptions import NotFoundException, ConflictException, InsufficientStockException, DatabaseException
+from ..utils.exceptions import NotFoundException, ConflictException, InsufficientStockException, DatabaseException, InvalidInputException
+from ..utils.shards import shard_router
 from sqlalchemy.exc import OperationalError,IntegrityError
 from datetime import datetime
 from .transaction_service import TransactionService
+from .inventory_service import InventoryService
 
 
 class TransferService(BaseService):
@@ -137,6 +139,14 @@ class TransferService(BaseService):
         if not user:
              raise NotFoundException(f"User with ID {user_id} not found.")
 
+        router = shard_router()
+        if router is not None and router.shard_of(from_location_id) != router.shard_of(to_location_id):
+            # No database transaction spans both shards: run InventoryService's transfer saga instead
+            try:
+                return InventoryService().create_location_transfer(data, user_verified=True)
+            except InvalidInputException as e:
+                raise ValueError(str(e))
+
         # Check if sufficient stock exists at the source location BEFORE creating transactions
         current_stock_at_source = self.transaction_service._get_current_stock(product_id, from_location_id)
         if current_stock_at_source < quantity:
@@ -174,8 +184,9 @@ class TransferService(BaseService):
             db.session.flush() # Flush to get the transaction_id
 
             # 3. Link the two transactions using related_transaction_id in inventory_transactions table
-            outgoing_transaction.related_transaction = incoming_transaction
-            incoming_transaction.related_transaction = outgoing_transaction
+            # (by id: both rows are flushed, and assigning the relationship both ways is a flush cycle)
+            outgoing_transaction.related_transaction_id = incoming_transaction.id
+            incoming_transaction.related_transaction_id = outgoing_transaction.id
 
             # 4. Create the location_transfer record
             transfer_record_data = {
@@ -190,12 +201,12 @@ class TransferService(BaseService):
             new_transfer = LocationTransfer(**transfer_record_data)
             db.session.add(new_transfer)
 
+            # 5. Inline projections (stock_levels by default) follow both movements
+            self.transaction_service.projection_service.record([outgoing_transaction, incoming_transaction])
+
             # Commit the entire transaction
             db.session.commit()
 
-            # The DB trigger trg_update_stock will automatically update stock_levels
-            # after these inserts are committed.
-
             return new_transfer
 
         except IntegrityError as e:
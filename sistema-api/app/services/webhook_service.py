@@ -0,0 +1,213 @@
+# inventory_api/app/services/webhook_service.py
+
+from .base_service import BaseService
+from ..models import WebhookEndpoint, WebhookOutbox
+from ..db import db
+from ..utils.exceptions import InvalidInputException
+from ..utils.helpers import settled_entries
+from ..utils.metrics import WEBHOOK_DELIVERIES, WEBHOOK_DELIVERY_DURATION, WEBHOOK_EVENTS_DELIVERED, WEBHOOK_LAG
+from ..utils.replicas import locking_read
+from ..utils.shards import current_shard, shard_router
+from ..utils.webhooks import WebhookClient, signature
+from flask import current_app
+from sqlalchemy import delete, func, select
+from datetime import datetime, timedelta
+import http.client
+import json
+import random
+import time
+
+
+class WebhookService(BaseService):
+    """
+    Delivery of the webhook outbox (app/utils/webhooks.py) to the WEBHOOK_ENDPOINTS, by the dispatcher
+    (`flask webhooks-run`). Each endpoint receives the events in outbox order, in batches of up to
+    WEBHOOK_BATCH_SIZE ({"events": [...]}), from its own position (webhook_endpoints): a failing endpoint
+    is retried with exponential backoff from the same batch and only holds back its own deliveries.
+    Delivery is at least once: receivers skip the event ids they have seen (per shard when sharded).
+    """
+
+    def __init__(self, client=None):
+        super().__init__()
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = WebhookClient(timeout=current_app.config.get('WEBHOOK_TIMEOUT_S', 10))
+        return self._client
+
+    def endpoints(self, names=None):
+        """The configured endpoints ({name: url}), restricted to `names` when given."""
+        configured = current_app.config.get('WEBHOOK_ENDPOINTS') or {}
+        for name in names or ():
+            if name not in configured:
+                raise InvalidInputException(f"Unknown webhook endpoint: {name}. Must be one of {list(configured)}")
+        return {name: url for name, url in configured.items() if not names or name in names}
+
+    # --- Dispatcher ---
+
+    def dispatch(self, names=None):
+        """
+        Delivers the pending events to the given endpoints (default: all of them) until each is caught up,
+        failing or backing off. Updates the lag gauges. Returns {name: events delivered}.
+        """
+        endpoints = self.endpoints(names)
+        batch_size = current_app.config.get('WEBHOOK_BATCH_SIZE', 100)
+
+        def run():
+            self._ensure_endpoints(endpoints)
+            results = {}
+            for name, url in endpoints.items():
+                delivered = 0
+                while True:
+                    count = self._deliver_batch(name, url, batch_size)
+                    if not count:
+                        break
+                    delivered += count
+                results[name] = (delivered, self._lag(self._position(name)))
+            return results
+
+        router = shard_router()
+        shard_results = [run()] if router is None else [router.run_on(index, run) for index in router.indexes]
+        delivered = {}
+        for name in endpoints:
+            delivered[name] = sum(results[name][0] for results in shard_results)
+            WEBHOOK_LAG.labels(name).set(max(results[name][1] for results in shard_results))
+        return delivered
+
+    def status(self):
+        """Per endpoint: position, pending events, lag and retry state. Per shard when sharded."""
+        endpoints = self.endpoints()
+
+        def run():
+            rows = {endpoint.name: endpoint for endpoint in WebhookEndpoint.query.filter(WebhookEndpoint.name.in_(endpoints))}
+            items = []
+            for name in endpoints:
+                endpoint = rows.get(name) or WebhookEndpoint(name=name, position=0, attempts=0)
+                items.append({
+                    **endpoint.to_dict(),
+                    'pending': db.session.execute(
+                        select(func.count()).where(WebhookOutbox.id > endpoint.position)
+                    ).scalar(),
+                    'lag_s': round(self._lag(endpoint.position), 3),
+                })
+            return items
+
+        router = shard_router()
+        if router is None:
+            return run()
+        return [{**item, 'shard': index} for index in router.indexes for item in router.run_on(index, run)]
+
+    def prune(self, older_than_days):
+        """Deletes the events every configured endpoint has received, once older than the given age. Returns the rows deleted."""
+        cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+        endpoints = self.endpoints()
+
+        def run():
+            positions = dict(db.session.execute(
+                select(WebhookEndpoint.name, WebhookEndpoint.position).where(WebhookEndpoint.name.in_(endpoints))
+            ).all())
+            delivered_up_to = min((positions.get(name, 0) for name in endpoints), default=None)
+            query = delete(WebhookOutbox).where(WebhookOutbox.created_at < cutoff)
+            if delivered_up_to is not None:
+                query = query.where(WebhookOutbox.id <= delivered_up_to)
+            result = db.session.execute(query)
+            db.session.commit()
+            return result.rowcount
+
+        router = shard_router()
+        if router is None:
+            return run()
+        return sum(router.run_on(index, run) for index in router.indexes)
+
+    # --- One shard ---
+
+    def _deliver_batch(self, name, url, batch_size):
+        # The endpoint row stays locked while its batch is posted: one dispatcher per endpoint (and shard) at a
+        # time, the others skip it
+        endpoint = db.session.execute(
+            locking_read(select(WebhookEndpoint).where(WebhookEndpoint.name == name), skip_locked=True)
+        ).scalar_one_or_none()
+        now = datetime.utcnow()
+        if endpoint is None or (endpoint.next_attempt_at and endpoint.next_attempt_at > now):
+            db.session.commit()
+            return 0
+        # Up to the first gap left by a movement still being committed (WEBHOOK_GAP_TIMEOUT_S)
+        events = settled_entries(self._outbox_after(endpoint.position, batch_size), endpoint.position, self._gap_timeout())
+        if not events:
+            db.session.commit()
+            return 0
+
+        body = json.dumps({'events': [event_row.to_dict() for event_row in events]}).encode('utf-8')
+        error = None
+        started = time.perf_counter()
+        try:
+            status = self.client.post(url, body, self._headers(name, events, body))
+            if not 200 <= status < 300:
+                error = f"HTTP {status}"
+        except (OSError, http.client.HTTPException, ValueError) as e:
+            error = str(e) or e.__class__.__name__
+        WEBHOOK_DELIVERY_DURATION.labels(name).observe(time.perf_counter() - started)
+
+        if error:
+            endpoint.attempts += 1
+            endpoint.next_attempt_at = now + self._backoff(endpoint.attempts)
+            endpoint.last_error = error[:500]
+            db.session.commit()
+            WEBHOOK_DELIVERIES.labels(name, 'failed').inc()
+            print(f"Webhook delivery to {name} failed (attempt {endpoint.attempts}): {error}")
+            return 0
+        endpoint.position = events[-1].id
+        endpoint.attempts = 0
+        endpoint.next_attempt_at = None
+        endpoint.last_error = None
+        endpoint.last_delivered_at = now
+        db.session.commit()
+        WEBHOOK_DELIVERIES.labels(name, 'delivered').inc()
+        WEBHOOK_EVENTS_DELIVERED.labels(name).inc(len(events))
+        return len(events)
+
+    def _headers(self, name, events, body):
+        shard = current_shard()
+        headers = {
+            'User-Agent': 'inventory-api-webhooks',
+            # Same batch, same id: lets receivers recognise a redelivery
+            'X-Webhook-Delivery': f"{name}:{shard or 0}:{events[0].id}-{events[-1].id}",
+        }
+        secret = current_app.config.get('WEBHOOK_SECRET')
+        if secret:
+            headers['X-Webhook-Signature'] = signature(secret, body)
+        return headers
+
+    def _ensure_endpoints(self, endpoints):
+        existing = set(db.session.execute(
+            select(WebhookEndpoint.name).where(WebhookEndpoint.name.in_(endpoints))
+        ).scalars())
+        missing = [name for name in endpoints if name not in existing]
+        if missing:
+            # A new endpoint receives the events still in the outbox
+            db.session.add_all([WebhookEndpoint(name=name, position=0, attempts=0) for name in missing])
+        db.session.commit()
+
+    def _position(self, name):
+        return db.session.execute(select(WebhookEndpoint.position).where(WebhookEndpoint.name == name)).scalar() or 0
+
+    def _lag(self, position):
+        """Seconds since the oldest event after position was written (0 when there is none)."""
+        oldest = db.session.execute(select(func.min(WebhookOutbox.created_at)).where(WebhookOutbox.id > position)).scalar()
+        db.session.commit()
+        return max((datetime.utcnow() - oldest).total_seconds(), 0) if oldest else 0
+
+    def _outbox_after(self, position, limit):
+        return db.session.execute(
+            select(WebhookOutbox).where(WebhookOutbox.id > position).order_by(WebhookOutbox.id).limit(limit)
+        ).scalars().all()
+
+    def _backoff(self, attempts):
+        base = current_app.config.get('WEBHOOK_BACKOFF_BASE_S', 1.0)
+        delay = min(base * 2 ** (attempts - 1), current_app.config.get('WEBHOOK_BACKOFF_MAX_S', 300.0))
+        return timedelta(seconds=delay * random.uniform(0.5, 1)) # Jitter: endpoints failing together retry apart
+
+    def _gap_timeout(self):
+        return timedelta(seconds=current_app.config.get('WEBHOOK_GAP_TIMEOUT_S', 10))
@@ -0,0 +1,200 @@
+# inventory_api/app/utils/admission.py
+"""
+Admission control: sheds excess load early and cheaply, before it reaches the connection pool.
+
+  - per-client token buckets on writes (one bucket per client and endpoint; the client is the
+    token's user, else the remote address): a client retrying in a tight loop gets
+    429 responses while everyone else's buckets stay full. The user_id of a body is not trusted, as
+    any client could otherwise spread its requests over fresh buckets or drain someone else's
+  - per-endpoint token buckets on writes, shared by all clients
+  - a cap on concurrent requests to DB-heavy blueprints: past it, a request waits at most
+    ADMISSION_QUEUE_TIMEOUT_MS for a slot and then gets a 503 instead of queueing on the pool
+
+Rejections carry Retry-After. Buckets live in process memory, or in Redis when
+RATE_LIMIT_STORAGE_URL is a redis:// URL (limits then hold across workers and hosts).
+"""
+
+import math
+import threading
+import time
+from collections import namedtuple
+from flask import g, jsonify, request
+from .metrics import ADMISSION_REJECTIONS
+
+WRITE_METHODS = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+EXEMPT_BLUEPRINTS = frozenset(('internal_api', 'metrics'))
+
+Rejection = namedtuple('Rejection', ['status', 'retry_after', 'reason', 'message'])
+
+
+class MemoryBucketStore:
+    """Token buckets of this process, as {key: [tokens, updated_at]}."""
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key, rate, burst, cost=1):
+        """Takes `cost` tokens; returns 0 when admitted, else the seconds until enough tokens refill."""
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_keys:
+                    self._prune(now)
+                bucket = self._buckets[key] = [burst, now]
+            tokens = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            if tokens >= cost:
+                bucket[0] = tokens - cost
+                return 0
+            bucket[0] = tokens
+            return (cost - tokens) / rate
+
+    def _prune(self, now):
+        # Buckets that have refilled completely carry no state: forget them (keys are not known here, so
+        # "completely" is judged with the slowest plausible refill of one token per minute)
+        self._buckets = {key: bucket for key, bucket in self._buckets.items() if now - bucket[1] < 60}
+
+
+# Atomic refill-and-take in Redis; the time comes from the Redis server so every worker shares one clock
+REDIS_TAKE_SCRIPT = """
+local rate, burst, cost = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'at')
+local tokens = tonumber(state[1]) or burst
+local at = tonumber(state[2]) or now
+tokens = math.min(burst, tokens + math.max(0, now - at) * rate)
+local wait = 0
+if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'at', tostring(now))
+redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+return tostring(wait)
+"""
+
+
+class RedisBucketStore:
+    """Token buckets shared through Redis (needs the redis package). Fails open if Redis is unreachable."""
+
+    def __init__(self, url, prefix='inventory:ratelimit:'):
+        import redis # Optional dependency, only needed for a shared backend
+        self.client = redis.Redis.from_url(url, socket_timeout=0.05, socket_connect_timeout=0.05)
+        self.prefix = prefix
+        self._take = self.client.register_script(REDIS_TAKE_SCRIPT)
+
+    def take(self, key, rate, burst, cost=1):
+        try:
+            return float(self._take(keys=[self.prefix + key], args=[rate, burst, cost]))
+        except Exception as e:
+            # Admission control must never take the API down with it
+            print(f"Rate limit backend unavailable, admitting request: {e}")
+            return 0
+
+
+def create_bucket_store(url):
+    if url and url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBucketStore(url)
+    return MemoryBucketStore()
+
+
+class AdmissionController:
+    """Admission decisions for one app (app.extensions['admission'])."""
+
+    def __init__(self, store, user_limit, endpoint_limit=None, endpoint_user_limits=None,
+                 heavy_blueprints=(), max_concurrent=0, queue_timeout=0.05):
+        self.store = store
+        self.user_limit = user_limit # (rate per second, burst), or None
+        self.endpoint_limit = endpoint_limit
+        self.endpoint_user_limits = endpoint_user_limits or {}
+        self.heavy_blueprints = frozenset(heavy_blueprints)
+        self.max_concurrent = max_concurrent
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(max_concurrent) if max_concurrent else None
+
+    def check_rate(self, endpoint, method, client):
+        """Returns a 429 Rejection when a write exceeds its client's or its endpoint's bucket."""
+        if method not in WRITE_METHODS:
+            return None
+        user_limit = self.endpoint_user_limits.get(endpoint, self.user_limit)
+        if user_limit:
+            wait = self.store.take(f"client:{client}:{endpoint}", *user_limit)
+            if wait:
+                return Rejection(429, wait, 'client_rate', 'Too many requests: slow down and retry later.')
+        if self.endpoint_limit:
+            wait = self.store.take(f"endpoint:{endpoint}", *self.endpoint_limit)
+            if wait:
+                return Rejection(429, wait, 'endpoint_rate', 'This operation is receiving too many requests; retry later.')
+        return None
+
+    def acquire(self, blueprint, block=True):
+        """
+        Takes a concurrency slot for a DB-heavy request. Returns (rejection, holds_slot):
+        call release() afterwards when holds_slot is true.
+        """
+        if self._slots is None or blueprint not in self.heavy_blueprints:
+            return None, False
+        if self._slots.acquire(timeout=self.queue_timeout) if block else self._slots.acquire(blocking=False):
+            return None, True
+        return Rejection(503, 1, 'capacity', 'The server is busy; retry shortly.'), False
+
+    def release(self):
+        self._slots.release()
+
+
+def client_identity(user_id, remote_addr):
+    """The client a bucket belongs to: the user of a valid access token (None without one), else the remote address."""
+    return f"user:{user_id}" if user_id is not None else f"ip:{remote_addr}"
+
+
+def rejection_parts(endpoint, rejection):
+    """(body, status, headers) of a rejection; counts it in the admission metrics."""
+    ADMISSION_REJECTIONS.labels(endpoint, rejection.reason).inc()
+    headers = {'Retry-After': str(max(1, math.ceil(rejection.retry_after)))}
+    return {'success': False, 'message': rejection.message}, rejection.status, headers
+
+
+def rejection_response(rejection):
+    body, status, headers = rejection_parts(request.endpoint, rejection)
+    return jsonify(body), status, headers
+
+
+def _request_identity():
+    return client_identity(g.get('user_id'), request.remote_addr) # g.user_id: set by app/utils/auth.py's hook
+
+
+def init_admission_control(app):
+    """Creates the app's AdmissionController and the request hooks that apply it."""
+    max_concurrent = app.config.get('ADMISSION_MAX_CONCURRENT') or (
+        app.config.get('DB_POOL_SIZE', 5) + app.config.get('DB_MAX_OVERFLOW', 10))
+    user_rate = app.config.get('RATE_LIMIT_USER_RATE', 0)
+    endpoint_rate = app.config.get('RATE_LIMIT_ENDPOINT_RATE', 0)
+    controller = AdmissionController(
+        create_bucket_store(app.config.get('RATE_LIMIT_STORAGE_URL')),
+        user_limit=(user_rate, app.config.get('RATE_LIMIT_USER_BURST', 20)) if user_rate else None,
+        endpoint_limit=(endpoint_rate, app.config.get('RATE_LIMIT_ENDPOINT_BURST', 100)) if endpoint_rate else None,
+        endpoint_user_limits=app.config.get('RATE_LIMITS', {}),
+        heavy_blueprints=app.config.get('ADMISSION_DB_HEAVY_BLUEPRINTS', []),
+        max_concurrent=max_concurrent,
+        queue_timeout=app.config.get('ADMISSION_QUEUE_TIMEOUT_MS', 50) / 1000,
+    )
+    app.extensions['admission'] = controller
+
+    @app.before_request
+    def admit_request():
+        if request.method == 'OPTIONS' or request.endpoint is None or request.blueprint in EXEMPT_BLUEPRINTS:
+            return None
+        rejection = None
+        if request.method in WRITE_METHODS:
+            rejection = controller.check_rate(request.endpoint, request.method, _request_identity())
+        if rejection is None:
+            rejection, g.admission_slot = controller.acquire(request.blueprint)
+        return rejection_response(rejection) if rejection else None
+
+    @app.teardown_request
+    def release_slot(exc):
+        if g.pop('admission_slot', False):
+            controller.release()
+
+    return controller
@@ -0,0 +1,138 @@
+# inventory_api/app/utils/auth.py
+"""
+Stateless access tokens (issued by POST /api/auth/login, sent as "Authorization: Bearer <token>").
+
+A token is the user id and issue time, signed with SECRET_KEY (itsdangerous), so verifying one is
+an HMAC check in memory. What a signature cannot tell (whether the user is still active, whether
+they logged out since) comes from a small per-worker cache of user status, refreshed from the
+users table at most every AUTH_STATUS_CACHE_TTL seconds per user: a deactivation or logout made in
+another worker takes effect within that delay, and immediately in the worker that made it.
+
+Authenticated requests have g.user_id set; the inventory movements then use it instead of the
+body's user_id and skip the user lookup.
+"""
+
+import threading
+import time
+from datetime import timezone
+from flask import g, jsonify, request
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from sqlalchemy import select
+from ..db import db
+from ..models import User
+from .exceptions import AuthenticationException
+
+TOKEN_SALT = 'inventory-access-token'
+WRITE_METHODS = frozenset(('POST', 'PUT', 'PATCH', 'DELETE'))
+OWN_AUTH_BLUEPRINTS = frozenset(('internal_api', 'metrics')) # Check their own tokens in the Authorization header
+
+
+class AccessTokens:
+    """Token issuing and verification for one app (app.extensions['auth'])."""
+
+    def __init__(self, secret_key, max_age=28800, status_ttl=30, cache_size=10000):
+        self.serializer = URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT)
+        self.max_age = max_age
+        self.status_ttl = status_ttl
+        self.cache_size = cache_size
+        self._status = {} # user_id -> (is_active, tokens revoked at (epoch seconds) or None, cached until)
+        self._lock = threading.Lock()
+
+    def issue(self, user_id):
+        # Issue time with sub-second precision: a login right after a logout must not look revoked
+        return self.serializer.dumps({'uid': user_id, 'iat': time.time()})
+
+    def verify(self, token):
+        """Returns the token's user id; raises AuthenticationException if it is invalid, expired or revoked."""
+        try:
+            payload = self.serializer.loads(token, max_age=self.max_age)
+        except SignatureExpired:
+            raise AuthenticationException('Access token expired.')
+        except BadSignature:
+            raise AuthenticationException('Invalid access token.')
+
+        user_id = payload.get('uid')
+        is_active, revoked_at = self.user_status(user_id)
+        if not is_active:
+            raise AuthenticationException('User account is inactive.')
+        if revoked_at is not None and payload.get('iat', 0) <= revoked_at:
+            raise AuthenticationException('Access token revoked.')
+        return user_id
+
+    def signed_user_id(self, token):
+        """The user id of a correctly signed, unexpired token, else None. Skips the status check (and its query):
+        enough to key rate limits before verify() runs."""
+        try:
+            return self.serializer.loads(token, max_age=self.max_age).get('uid')
+        except BadSignature: # SignatureExpired included
+            return None
+
+    def user_status(self, user_id):
+        """(is_active, revoked_at) from the cache, or from the users table when missing or stale."""
+        cached = self._status.get(user_id)
+        if cached is not None and cached[2] > time.monotonic():
+            return cached[0], cached[1]
+
+        row = db.session.execute(
+            select(User.is_active, User.tokens_revoked_at).where(User.id == user_id)
+        ).first()
+        is_active = bool(row and row.is_active)
+        revoked_at = row.tokens_revoked_at.replace(tzinfo=timezone.utc).timestamp() if row and row.tokens_revoked_at else None
+        self.remember(user_id, is_active, revoked_at)
+        return is_active, revoked_at
+
+    def remember(self, user_id, is_active, revoked_at):
+        """Caches a user's status (also called after a logout, so this worker sees it at once)."""
+        with self._lock:
+            if len(self._status) >= self.cache_size:
+                self._status.clear()
+            self._status[user_id] = (is_active, revoked_at, time.monotonic() + self.status_ttl)
+
+    def forget(self, user_id):
+        with self._lock:
+            self._status.pop(user_id, None)
+
+
+def bearer_token(authorization):
+    """The token of an "Authorization: Bearer <token>" header value, else None."""
+    scheme, _, token = (authorization or '').partition(' ')
+    return (token.strip() or None) if scheme.lower() == 'bearer' else None
+
+
+def current_user_id():
+    """The authenticated user of the current request (None without a valid token)."""
+    return g.get('user_id')
+
+
+def unauthorized(message):
+    return jsonify({'success': False, 'message': message}), 401, {'WWW-Authenticate': 'Bearer'}
+
+
+def init_auth(app):
+    """Creates the app's AccessTokens and the hook that authenticates requests carrying a token."""
+    tokens = AccessTokens(
+        app.config['SECRET_KEY'],
+        max_age=app.config.get('AUTH_TOKEN_MAX_AGE', 28800),
+        status_ttl=app.config.get('AUTH_STATUS_CACHE_TTL', 30),
+        cache_size=app.config.get('AUTH_STATUS_CACHE_SIZE', 10000),
+    )
+    app.extensions['auth'] = tokens
+    required = app.config.get('AUTH_REQUIRED', False)
+
+    @app.before_request
+    def authenticate_request():
+        if request.blueprint in OWN_AUTH_BLUEPRINTS:
+            return None
+        token = bearer_token(request.headers.get('Authorization'))
+        if token is None:
+            # Login and registration are the writes that cannot carry a token yet
+            if required and request.method in WRITE_METHODS and request.blueprint not in (None, 'auth_api'):
+                return unauthorized('Authentication required.')
+            return None
+        try:
+            g.user_id = tokens.verify(token)
+        except AuthenticationException as e:
+            return unauthorized(str(e))
+        return None
+
+    return tokens
@@ -0,0 +1,63 @@
+# inventory_api/app/utils/bulk.py
+# Helpers for loading many rows at once inside the current db.session transaction.
+
+import csv
+import io
+from itertools import islice
+from sqlalchemy import insert
+from ..db import db
+
+
+def chunked(iterable, size):
+    """Yields lists of up to size items from any iterable (lets callers stream large inputs)."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _copy_value(value):
+    # COPY ... (FORMAT csv) reads an unquoted empty field as NULL
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 't' if value else 'f'
+    return value
+
+
+def copy_rows(table, columns, rows, chunk_size=5000):
+    """
+    Bulk-inserts rows (tuples ordered like columns) into table within the session's transaction.
+    Uses COPY FROM STDIN on PostgreSQL and executemany INSERTs on other databases.
+    rows may be any iterable (e.g. a generator); it is consumed in chunks of chunk_size.
+    Returns the number of rows written.
+    """
+    connection = db.session.connection()
+    total = 0
+
+    if connection.dialect.name == 'postgresql':
+        cursor = connection.connection.driver_connection.cursor()
+        copy_sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        try:
+            for chunk in chunked(rows, chunk_size):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                writer.writerows([_copy_value(v) for v in row] for row in chunk)
+                buffer.seek(0)
+                if hasattr(cursor, 'copy_expert'): # psycopg2
+                    cursor.copy_expert(copy_sql, buffer)
+                else: # psycopg 3
+                    with cursor.copy(copy_sql) as copy:
+                        copy.write(buffer.getvalue())
+                total += len(chunk)
+        finally:
+            cursor.close()
+        return total
+
+    statement = insert(table)
+    for chunk in chunked(rows, chunk_size):
+        connection.execute(statement, [dict(zip(columns, row)) for row in chunk])
+        total += len(chunk)
+    return total
@@ -0,0 +1,78 @@
+# inventory_api/app/utils/changes.py
+"""
+Change capture for the change feed (GET /api/changes, ChangeService).
+
+Every flush that writes a product, location, stock level or inventory transaction appends one
+change_log row per changed row, in the same transaction, so the log holds exactly the committed
+changes and its id is the feed's change sequence. INSERT/UPDATE/DELETE statements run through the
+session (bulk imports, projection rebuilds) log a '*' key instead: clients re-fetch that list.
+Writes outside the session (raw SQL, COPY, the shard mirroring) are not logged.
+
+The hooks are on the Session base class, so the sessions of the ASGI app (app/asgi.py) log too.
+With shards, each change is logged on the shard it is written to (change_log is a sharded table).
+"""
+
+import threading
+from datetime import datetime
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session, object_mapper
+from ..models import ChangeLog
+
+# Table -> entity name in the feed
+TRACKED_TABLES = {
+    'products': 'products',
+    'locations': 'locations',
+    'stock_levels': 'stock_levels',
+    'inventory_transactions': 'transactions',
+}
+ALL_KEYS = '*'
+
+
+def entity_key(table, instance):
+    """The change_log key of a row: its id, or "product_id:location_id" for a stock level."""
+    if table == 'stock_levels':
+        return f"{instance.product_id}:{instance.location_id}"
+    return str(object_mapper(instance).primary_key_from_instance(instance)[0])
+
+
+def init_changes(app):
+    """Enables change capture for the app (CHANGE_FEED_ENABLED) and registers the session hooks once."""
+    app.extensions['changes'] = app.config.get('CHANGE_FEED_ENABLED', True)
+    # Long-polls waiting in this worker's request threads (ChangeService.wait_for_changes)
+    app.extensions['change_feed_waiters'] = threading.BoundedSemaphore(app.config.get('CHANGE_FEED_MAX_WAITERS', 2))
+    if not event.contains(Session, 'after_flush', _log_flushed_rows):
+        event.listen(Session, 'after_flush', _log_flushed_rows)
+        event.listen(Session, 'do_orm_execute', _log_bulk_statements)
+
+
+def _enabled():
+    return has_app_context() and current_app.extensions.get('changes', False)
+
+
+def _log(session, keys):
+    if keys:
+        now = datetime.utcnow()
+        session.execute(
+            insert(ChangeLog.__table__),
+            [{'entity': entity, 'entity_key': key, 'created_at': now} for entity, key in sorted(keys)],
+        )
+
+
+def _log_flushed_rows(session, flush_context):
+    if not _enabled():
+        return
+    keys = set()
+    for instance in session.new | session.dirty | session.deleted:
+        table = object_mapper(instance).local_table.name
+        if table in TRACKED_TABLES and (instance not in session.dirty or session.is_modified(instance)):
+            keys.add((TRACKED_TABLES[table], entity_key(table, instance)))
+    _log(session, keys)
+
+
+def _log_bulk_statements(orm_execute_state):
+    if orm_execute_state.is_select or not _enabled():
+        return
+    name = getattr(getattr(orm_execute_state.statement, 'table', None), 'name', None)
+    if name in TRACKED_TABLES:
+        _log(orm_execute_state.session, {(TRACKED_TABLES[name], ALL_KEYS)})
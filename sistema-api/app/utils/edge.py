@@ -0,0 +1,95 @@
+# inventory_api/app/utils/edge.py
+"""
+Edge middleware: the cross-cutting response work done in front of Flask, on the raw WSGI environ.
+
+  - CORS preflights (every OPTIONS request) are answered here, before routing, with
+    Access-Control-Max-Age so browsers cache them instead of repeating them before each write
+  - requests that reached the proxy over plain HTTP (X-Forwarded-Proto: http) are redirected to HTTPS
+  - every response gets the security headers and, for allowed origins, the CORS headers; all header
+    sets are built once from the config, so per response this is a list append
+
+Replaces Flask-CORS, the products blueprint's header/redirect hooks and the per-view OPTIONS branches.
+"""
+
+PREFLIGHT_BODY = b'{}'
+SECURITY_HEADERS = { # Default for the SECURITY_HEADERS setting
+    'Content-Security-Policy': "default-src 'self'",
+    'X-Content-Type-Options': 'nosniff',
+    'X-Frame-Options': 'DENY',
+    'X-XSS-Protection': '1; mode=block',
+    'Referrer-Policy': 'strict-origin-when-cross-origin',
+    'Strict-Transport-Security': 'max-age=31536000; includeSubDomains',
+    'Cache-Control': 'no-store, no-cache, must-revalidate, private',
+}
+SAFE_REDIRECT_METHODS = frozenset(('GET', 'HEAD'))
+
+
+class EdgeMiddleware:
+    """WSGI middleware wrapping app.wsgi_app (app.extensions['edge'])."""
+
+    def __init__(self, wsgi_app, config):
+        self.wsgi_app = wsgi_app
+        self.force_https = config.get('EDGE_FORCE_HTTPS', True)
+        self.security_headers = [(name, str(value)) for name, value in config.get('SECURITY_HEADERS', SECURITY_HEADERS).items()]
+        self._security_names = frozenset(name.lower() for name, _ in self.security_headers)
+
+        origins = config.get('CORS_ORIGINS', [])
+        self.any_origin = '*' in origins
+        self.origins = frozenset(origins)
+        self.preflight_cors = [
+            ('Access-Control-Allow-Methods', ', '.join(config.get('CORS_METHODS', []))),
+            ('Access-Control-Allow-Headers', ', '.join(config.get('CORS_HEADERS', []))),
+            ('Access-Control-Max-Age', str(config.get('EDGE_PREFLIGHT_MAX_AGE', 86400))),
+        ]
+        self.preflight_headers = [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(PREFLIGHT_BODY))),
+        ] + self.security_headers
+
+    def cors_headers(self, origin, preflight=False):
+        """CORS headers for a request from `origin` ([] when the origin is not allowed)."""
+        if not origin or not (self.any_origin or origin in self.origins):
+            return []
+        headers = [('Access-Control-Allow-Origin', '*' if self.any_origin else origin), ('Vary', 'Origin')]
+        return headers + self.preflight_cors if preflight else headers
+
+    def __call__(self, environ, start_response):
+        origin = environ.get('HTTP_ORIGIN')
+        if environ['REQUEST_METHOD'] == 'OPTIONS':
+            start_response('200 OK', self.preflight_headers + self.cors_headers(origin, preflight=True))
+            return [PREFLIGHT_BODY]
+        if self.force_https and environ.get('HTTP_X_FORWARDED_PROTO') == 'http':
+            return self.redirect_to_https(environ, start_response)
+
+        extra = self.cors_headers(origin)
+
+        def edge_start_response(status, headers, exc_info=None):
+            present = {name.lower() for name, _ in headers}
+            if present.isdisjoint(self._security_names):
+                headers.extend(self.security_headers)
+            else:
+                # The view set some of them itself (e.g. its own Cache-Control): keep its values
+                headers.extend(header for header in self.security_headers if header[0].lower() not in present)
+            headers.extend(extra)
+            return start_response(status, headers, exc_info)
+
+        return self.wsgi_app(environ, edge_start_response)
+
+    def redirect_to_https(self, environ, start_response):
+        # Never X-Forwarded-Host: any client can send it, and a cached 301 would send other users to its host
+        host = environ.get('HTTP_HOST') or environ['SERVER_NAME']
+        location = f"https://{host}{environ.get('SCRIPT_NAME', '')}{environ.get('PATH_INFO', '')}"
+        if environ.get('QUERY_STRING'):
+            location += f"?{environ['QUERY_STRING']}"
+        # 308 keeps the method and body of writes; reads get the cacheable 301
+        status = '301 Moved Permanently' if environ['REQUEST_METHOD'] in SAFE_REDIRECT_METHODS else '308 Permanent Redirect'
+        start_response(status, [('Location', location), ('Content-Length', '0')] + self.security_headers)
+        return [b'']
+
+
+def init_edge(app):
+    """Wraps app.wsgi_app with the edge middleware (before the profiler, which swaps wsgi_app)."""
+    edge = EdgeMiddleware(app.wsgi_app, app.config)
+    app.wsgi_app = edge
+    app.extensions['edge'] = edge
+    return edge
@@ -16,6 +16,15 @@ class TransactionType(enum.Enum):
     def __str__(self):
         return self.value
 
+class TransferStatus(enum.Enum):
+    """State of a location transfer. Only transfers between shards (app/utils/shards.py) are ever pending or reverted."""
+    completada = 'completada'
+    pendiente = 'pendiente' # Taken from the source; not yet added at the destination
+    revertida = 'revertida' # The destination refused it; the stock went back to the source
+
+    def __str__(self):
+        return self.value
+
 class UnitMeasure(enum.Enum):
     """Defines allowed unit measures for products."""
     unidad = 'unidad'
@@ -59,4 +59,12 @@ class InsufficientStockException(ApiException):
 class AuthenticationException(ApiException):
     """Exception raised for authentication failures (HTTP 401)."""
     def __init__(self, message="Authentication failed"):
-        super().__init__(message, status_code=401)
\ No newline at end of file
+        super().__init__(message, status_code=401)
+class GoneException(ApiException):
+    """Exception raised when a resource (e.g. an expired change feed cursor) is no longer available (HTTP 410)."""
+    def __init__(self, message="Resource no longer available"):
+        super().__init__(message, status_code=410)
+class ServiceUnavailableException(ApiException):
+    """Exception raised when a request cannot be served right now and should be retried (HTTP 503)."""
+    def __init__(self, message="Service unavailable, retry later"):
+        super().__init__(message, status_code=503)
@@ -0,0 +1,32 @@
+# inventory_api/app/utils/helpers.py
+
+from datetime import datetime
+from .enums import TransactionType
+
+
+def stock_delta(transaction_type, quantity):
+    """
+    Returns the signed change in stock caused by a transaction.
+    entrada/transferencia_destino add stock, salida/transferencia_origen remove it
+    (whatever the sign of the stored quantity), and ajuste carries its own sign.
+    """
+    if transaction_type in (TransactionType.entrada, TransactionType.transferencia_destino):
+        return abs(quantity)
+    if transaction_type in (TransactionType.salida, TransactionType.transferencia_origen):
+        return -abs(quantity)
+    return quantity
+
+
+def settled_entries(entries, position, gap_timeout):
+    """
+    The entries (rows with id and created_at, in id order, all after `position`) up to the first gap
+    in the ids that may still be filled: ids are taken at insert but become visible at commit, so a
+    gap is a transaction in flight, unless the entry after it is older than gap_timeout (a timedelta;
+    the missing id was then rolled back).
+    """
+    expected = position + 1
+    for index, entry in enumerate(entries):
+        if entry.id != expected and entry.created_at and datetime.utcnow() - entry.created_at < gap_timeout:
+            return entries[:index]
+        expected = entry.id + 1
+    return entries
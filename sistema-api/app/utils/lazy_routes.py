@@ -0,0 +1,71 @@
+# inventory_api/app/utils/lazy_routes.py
+# Defers importing the route modules (and the services they instantiate) until the URL map is first used.
+
+import threading
+from flask import Flask
+from werkzeug.routing import Map
+
+
+class LazyRouteMap(Map):
+    """
+    URL map that runs its loader (which registers the blueprints) the first time it is
+    matched, built from or iterated. Serving a request, url_for, `flask routes` and the
+    test client all go through one of these; `flask db ...`, `flask shell` and other CLI
+    commands never do, so they skip the route modules entirely.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.loader = None
+        self._loaded = True
+        self._loading = False
+        self._load_lock = threading.RLock()
+
+    def defer(self, loader):
+        self.loader = loader
+        self._loaded = False
+
+    def load(self):
+        if self._loaded:
+            return
+        # Other threads wait for the loader to finish; the loading thread itself
+        # (registering rules) must not run it again
+        with self._load_lock:
+            if self._loaded or self._loading:
+                return
+            self._loading = True
+            try:
+                self.loader()
+                self._loaded = True
+            finally:
+                self._loading = False
+
+    def bind(self, *args, **kwargs):
+        self.load()
+        return super().bind(*args, **kwargs)
+
+    def bind_to_environ(self, *args, **kwargs):
+        self.load()
+        return super().bind_to_environ(*args, **kwargs)
+
+    def iter_rules(self, *args, **kwargs):
+        self.load()
+        return super().iter_rules(*args, **kwargs)
+
+    def update(self):
+        self.load()
+        super().update()
+
+
+class LazyRoutesFlask(Flask):
+    """Flask application whose routes are registered on first use (see LazyRouteMap)."""
+
+    url_map_class = LazyRouteMap
+
+    def defer_routes(self, loader):
+        """Registers loader(app) to run when the URL map is first needed."""
+        self.url_map.defer(lambda: loader(self))
+
+    def load_routes(self):
+        """Registers the deferred routes now (e.g. before forking workers)."""
+        self.url_map.load()
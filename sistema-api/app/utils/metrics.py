@@ -0,0 +1,117 @@
+# inventory_api/app/utils/metrics.py
+# Request instrumentation exported in Prometheus text format at /metrics (app/api/metrics.py).
+#
+# Under gunicorn (or any prefork server) set PROMETHEUS_MULTIPROC_DIR before the app is imported
+# (gunicorn.conf.py does it): every worker then writes its samples to mmap'd files in that directory
+# and /metrics aggregates all workers, whichever one serves the scrape.
+
+import os
+import time
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest,
+)
+from prometheus_client import multiprocess
+
+UNMATCHED = 'none' # Endpoint/blueprint label for requests that matched no route (404s, preflights)
+
+REQUEST_LATENCY = Histogram(
+    'inventory_http_request_duration_seconds',
+    'Time spent handling a request, from routing to the response being built',
+    ['blueprint', 'endpoint'],
+)
+REQUEST_COUNT = Counter(
+    'inventory_http_requests',
+    'Requests handled, by response status',
+    ['blueprint', 'endpoint', 'method', 'status'],
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    'inventory_http_requests_in_flight',
+    'Requests currently being handled',
+    ['blueprint', 'endpoint'],
+    multiprocess_mode='livesum', # Summed over the live workers
+)
+STREAM_SUBSCRIBERS = Gauge(
+    'inventory_stream_subscribers',
+    'Open Server-Sent Events streams (app/utils/stream.py)',
+    multiprocess_mode='livesum',
+)
+# Webhook dispatcher (WebhookService, `flask webhooks-run`): run it with the API's PROMETHEUS_MULTIPROC_DIR
+# for /metrics to include these
+WEBHOOK_DELIVERIES = Counter(
+    'inventory_webhook_deliveries',
+    'Webhook batch deliveries, by outcome (delivered, failed)',
+    ['endpoint', 'outcome'],
+)
+WEBHOOK_EVENTS_DELIVERED = Counter(
+    'inventory_webhook_events_delivered',
+    'Outbox events delivered to a webhook endpoint',
+    ['endpoint'],
+)
+WEBHOOK_DELIVERY_DURATION = Histogram(
+    'inventory_webhook_delivery_duration_seconds',
+    'Time to POST one batch to a webhook endpoint',
+    ['endpoint'],
+)
+WEBHOOK_LAG = Gauge(
+    'inventory_webhook_lag_seconds',
+    'Age of the oldest outbox event not yet delivered to the endpoint (0 when caught up)',
+    ['endpoint'],
+    multiprocess_mode='livemax',
+)
+ADMISSION_REJECTIONS = Counter(
+    'inventory_admission_rejections',
+    'Requests turned away by admission control (app/utils/admission.py)',
+    ['endpoint', 'reason'],
+)
+
+
+def observe_request(blueprint, endpoint, method, status, seconds):
+    REQUEST_LATENCY.labels(blueprint, endpoint).observe(seconds)
+    REQUEST_COUNT.labels(blueprint, endpoint, method, str(status)).inc()
+
+
+def render_metrics():
+    """Returns (body, content type) for a scrape, aggregating every worker in multiprocess mode."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid):
+    """Drops a dead worker's live gauges (called from gunicorn's child_exit hook)."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        multiprocess.mark_process_dead(pid)
+
+
+def _labels():
+    return request.blueprint or UNMATCHED, request.endpoint or UNMATCHED
+
+
+def init_metrics(app):
+    """Registers the request hooks (call before the other extensions so their time is included)."""
+
+    @app.before_request
+    def start_timer():
+        if request.endpoint == 'metrics.get_metrics':
+            return
+        g.metrics_labels = _labels()
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.labels(*g.metrics_labels).inc()
+
+    @app.after_request
+    def record_request(response):
+        started = g.pop('metrics_started', None)
+        if started is not None:
+            blueprint, endpoint = g.metrics_labels
+            observe_request(blueprint, endpoint, request.method, response.status_code, time.perf_counter() - started)
+        return response
+
+    @app.teardown_request
+    def end_request(exc):
+        labels = g.pop('metrics_labels', None)
+        if labels is not None:
+            REQUESTS_IN_FLIGHT.labels(*labels).dec()
@@ -0,0 +1,141 @@
+# inventory_api/app/utils/pool_metrics.py
+# Engine/pool configuration built from the DB_* config values, plus live pool statistics.
+
+import threading
+import time
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, NullPool
+
+
+class PoolMetrics:
+    """Per-process counters for one pool (checkouts, time spent waiting for a connection, timeouts)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.peak_checked_out = 0
+
+    def record_checkout(self, wait_time, checked_out):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+            self.peak_checked_out = max(self.peak_checked_out, checked_out)
+
+    def record_timeout(self, wait_time):
+        with self._lock:
+            self.timeouts += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'wait_time_total_ms': round(self.wait_time_total * 1000, 3),
+                'wait_time_avg_ms': round(self.wait_time_total * 1000 / self.checkouts, 3) if self.checkouts else 0.0,
+                'wait_time_max_ms': round(self.wait_time_max * 1000, 3),
+                'peak_checked_out': self.peak_checked_out,
+            }
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a connection."""
+
+    def __init__(self, creator, pool_size=5, max_overflow=10, **kwargs):
+        super().__init__(creator, pool_size=pool_size, max_overflow=max_overflow, **kwargs)
+        self.max_overflow = max_overflow # QueuePool keeps it private
+        self.metrics = PoolMetrics()
+        self._checkout_depth = threading.local()
+
+    def _do_get(self):
+        # QueuePool._do_get retries by calling itself; only time the outermost call
+        depth = getattr(self._checkout_depth, 'value', 0)
+        if depth:
+            return super()._do_get()
+
+        self._checkout_depth.value = 1
+        start = time.perf_counter()
+        try:
+            record = super()._do_get()
+        except exc.TimeoutError:
+            self.metrics.record_timeout(time.perf_counter() - start)
+            raise
+        finally:
+            self._checkout_depth.value = 0
+        self.metrics.record_checkout(time.perf_counter() - start, self.checkedout())
+        return record
+
+
+def build_engine_options(config):
+    """
+    Returns SQLALCHEMY_ENGINE_OPTIONS for the configured database from the DB_* settings.
+    With DB_PGBOUNCER the application keeps no pool of its own (NullPool; PgBouncer in
+    transaction mode does the pooling) and session-level startup options are not used.
+    Options given explicitly in SQLALCHEMY_ENGINE_OPTIONS take precedence.
+    """
+    explicit = dict(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    uri = config.get('SQLALCHEMY_DATABASE_URI') or ''
+    if not uri.startswith('postgresql'):
+        # SQLite (tests, local runs) keeps Flask-SQLAlchemy's own pool choice
+        return explicit
+
+    if config.get('DB_PGBOUNCER'):
+        options = {'poolclass': NullPool}
+        if uri.startswith('postgresql+psycopg:'):
+            # psycopg 3 server-side prepared statements do not survive transaction pooling
+            options['connect_args'] = {'prepare_threshold': None}
+    else:
+        options = {
+            'poolclass': InstrumentedQueuePool,
+            'pool_size': config.get('DB_POOL_SIZE', 5),
+            'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+            'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+            'pool_recycle': config.get('DB_POOL_RECYCLE', 1800),
+            'pool_pre_ping': config.get('DB_POOL_PRE_PING', True),
+        }
+        timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+        if timeout:
+            options['connect_args'] = {'options': f"-c statement_timeout={int(timeout)}"}
+
+    options.update(explicit)
+    return options
+
+
+def register_engine_events(engine, config):
+    """
+    Attaches per-transaction settings to an engine. In PgBouncer mode the statement
+    timeout is applied with SET LOCAL at the start of every transaction, since startup
+    options are not passed through by a transaction pooler.
+    """
+    timeout = config.get('DB_STATEMENT_TIMEOUT_MS')
+    if not (config.get('DB_PGBOUNCER') and timeout and engine.dialect.name == 'postgresql'):
+        return
+
+    @event.listens_for(engine, 'begin')
+    def set_statement_timeout(connection):
+        connection.exec_driver_sql(f"SET LOCAL statement_timeout = {int(timeout)}")
+
+
+def pool_status(engine):
+    """Returns a dictionary with the current state of an engine's pool."""
+    pool = engine.pool
+    status = {'pool_class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update({
+            'size': pool.size(),
+            'checked_in': pool.checkedin(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(), # Negative while the pool has not been filled yet
+            'overflow_in_use': max(pool.overflow(), 0),
+            'max_overflow': getattr(pool, 'max_overflow', None), # Known for InstrumentedQueuePool only
+            'timeout': pool.timeout(),
+        })
+    metrics = getattr(pool, 'metrics', None)
+    if metrics is not None:
+        status['metrics'] = metrics.to_dict()
+    return status
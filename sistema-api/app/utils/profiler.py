@@ -0,0 +1,254 @@
+# inventory_api/app/utils/profiler.py
+"""
+Opt-in request profiler (PROFILER_ENABLED), switched on at runtime from /api/internal/profiler.
+
+While it is off, app.wsgi_app is the plain Flask callable: no per-request cost at all. Turning it
+on writes the settings to PROFILER_DIR/settings.json; every worker process polls that file every
+PROFILER_POLL_INTERVAL_S seconds and wraps its wsgi_app while the settings are active.
+
+Profiles are written to PROFILER_DIR:
+  cprofile  <name>.prof    pstats data (snakeviz, or flameprof for a flamegraph)
+  stack     <name>.folded  wall-clock stack samples in collapsed format (flamegraph.pl, speedscope,
+                           inferno). Frames waiting on the database show up as cursor.execute etc.,
+                           which separates DB-bound from CPU-bound requests.
+"""
+
+import cProfile
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from werkzeug.exceptions import HTTPException
+
+MODES = ('cprofile', 'stack')
+EXTENSIONS = {'cprofile': '.prof', 'stack': '.folded'}
+SETTINGS_FILE = 'settings.json'
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_current_profiler = None # Of the last app set up in this process: the one forked workers serve
+
+
+class StackSampler:
+    """Samples one thread's Python stack every `interval` seconds from a helper thread."""
+
+    def __init__(self, interval, stop_code):
+        self.interval = interval
+        self.stop_code = stop_code # Frames above this one (the server's) are left out
+        self.samples = Counter()
+        self._done = threading.Event()
+
+    def run(self, thread_id):
+        while not self._done.wait(self.interval):
+            frame = sys._current_frames().get(thread_id)
+            stack = []
+            while frame is not None and frame.f_code is not self.stop_code:
+                if frame.f_code is StackSampler.__exit__.__code__:
+                    stack = [] # The request is over: waiting for this thread
+                    break
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.run, args=(threading.get_ident(),), daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._done.set()
+        self._thread.join()
+
+    def folded(self):
+        return ''.join(f"{stack} {count}\n" for stack, count in self.samples.most_common())
+
+
+def _frame_label(frame):
+    filename = frame.f_code.co_filename
+    if filename.startswith(PROJECT_ROOT):
+        filename = os.path.relpath(filename, PROJECT_ROOT)
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    return f"{frame.f_code.co_name} ({filename}:{frame.f_code.co_firstlineno})"
+
+
+class Profiler:
+    """Per-process profiler state for one Flask app (app.extensions['profiler'])."""
+
+    def __init__(self, app, directory, poll_interval=2, sample_interval=0.005, max_files=200):
+        self.app = app
+        self.directory = directory
+        self.poll_interval = poll_interval
+        self.sample_interval = sample_interval
+        self.max_files = max_files
+        self.settings = None
+        self._plain_wsgi_app = app.wsgi_app
+        self._settings_mtime = None
+        os.makedirs(directory, exist_ok=True)
+
+    # --- Settings (shared by every worker through the settings file) ---
+
+    def enable(self, mode='stack', sample_rate=1.0, endpoints=None, duration=300):
+        settings = {
+            'mode': mode,
+            'sample_rate': sample_rate,
+            'endpoints': sorted(endpoints or []),
+            'expires_at': time.time() + duration,
+        }
+        path = os.path.join(self.directory, SETTINGS_FILE)
+        with open(f"{path}.{os.getpid()}.tmp", 'w') as handle:
+            json.dump(settings, handle)
+        os.replace(f"{path}.{os.getpid()}.tmp", path) # Atomic for the workers polling it
+        self._settings_mtime = os.stat(path).st_mtime
+        self.apply(settings)
+        return settings
+
+    def disable(self):
+        try:
+            os.remove(os.path.join(self.directory, SETTINGS_FILE))
+        except FileNotFoundError:
+            pass
+        self._settings_mtime = None
+        self.apply(None)
+
+    def apply(self, settings):
+        if settings is not None and settings['expires_at'] <= time.time():
+            settings = None
+        self.settings = settings
+        self.app.wsgi_app = self._plain_wsgi_app if settings is None else self.profiled_wsgi_app
+
+    def poll(self):
+        """Picks up settings written by another worker (or their expiry)."""
+        path = os.path.join(self.directory, SETTINGS_FILE)
+        try:
+            mtime = os.stat(path).st_mtime
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._settings_mtime:
+            self._settings_mtime = mtime
+            settings = None
+            if mtime is not None:
+                try:
+                    with open(path) as handle:
+                        settings = json.load(handle)
+                except ValueError:
+                    return
+            self.apply(settings)
+        elif self.settings is not None and self.settings['expires_at'] <= time.time():
+            self.apply(None)
+
+    def start_polling(self):
+        def loop():
+            while True:
+                time.sleep(self.poll_interval)
+                try:
+                    self.poll()
+                except Exception as e:
+                    print(f"Profiler settings could not be read: {e}")
+        threading.Thread(target=loop, name='profiler-settings', daemon=True).start()
+
+    # --- Profiling ---
+
+    def profiled_wsgi_app(self, environ, start_response):
+        settings = self.settings
+        if settings is None:
+            return self._plain_wsgi_app(environ, start_response)
+        endpoint = self._endpoint(environ)
+        if settings['endpoints'] and endpoint not in settings['endpoints']:
+            return self._plain_wsgi_app(environ, start_response)
+        if random.random() >= settings['sample_rate']:
+            return self._plain_wsgi_app(environ, start_response)
+
+        started = time.perf_counter()
+        if settings['mode'] == 'cprofile':
+            profile = cProfile.Profile()
+            response = profile.runcall(self._plain_wsgi_app, environ, start_response)
+            self._save(endpoint, started, 'cprofile', profile.dump_stats)
+        else:
+            with StackSampler(self.sample_interval, self.profiled_wsgi_app.__code__) as sampler:
+                response = self._plain_wsgi_app(environ, start_response)
+            folded = sampler.folded()
+            if folded: # Requests shorter than the sampling interval leave nothing to save
+                self._save(endpoint, started, 'stack', lambda path: _write_text(path, folded))
+        return response
+
+    def _endpoint(self, environ):
+        try:
+            endpoint, _ = self.app.url_map.bind_to_environ(environ).match()
+            return endpoint
+        except HTTPException:
+            return None
+
+    def _save(self, endpoint, started, mode, write):
+        elapsed_ms = round((time.perf_counter() - started) * 1000)
+        name = (f"{time.strftime('%Y%m%d-%H%M%S')}_{re.sub(r'[^A-Za-z0-9_.-]', '_', endpoint or 'unmatched')}"
+                f"_{elapsed_ms}ms_{os.getpid()}_{random.randrange(16 ** 4):04x}{EXTENSIONS[mode]}")
+        try:
+            write(os.path.join(self.directory, name))
+            self._prune()
+        except OSError as e:
+            print(f"Could not save profile {name}: {e}")
+
+    def _prune(self):
+        profiles = self.profiles()
+        for profile in profiles[self.max_files:]:
+            try:
+                os.remove(os.path.join(self.directory, profile['name']))
+            except FileNotFoundError:
+                pass
+
+    def profiles(self):
+        """Stored profiles, newest first."""
+        entries = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith(tuple(EXTENSIONS.values())):
+                continue
+            parts = entry.name.rsplit('.', 1)[0].split('_')
+            stat = entry.stat()
+            entries.append({
+                'name': entry.name,
+                'endpoint': '_'.join(parts[1:-3]),
+                'duration_ms': int(parts[-3].rstrip('ms')) if parts[-3].endswith('ms') else None,
+                'mode': 'cprofile' if entry.name.endswith('.prof') else 'stack',
+                'size_bytes': stat.st_size,
+                'created_at': stat.st_mtime,
+            })
+        return sorted(entries, key=lambda profile: profile['created_at'], reverse=True)
+
+
+def _write_text(path, text):
+    with open(path, 'w') as handle:
+        handle.write(text)
+
+
+def init_profiler(app):
+    """Sets up the profiler when PROFILER_ENABLED (call last in create_app: it swaps app.wsgi_app)."""
+    if not app.config.get('PROFILER_ENABLED'):
+        return None
+    profiler = Profiler(
+        app,
+        app.config['PROFILER_DIR'],
+        poll_interval=app.config.get('PROFILER_POLL_INTERVAL_S', 2),
+        sample_interval=app.config.get('PROFILER_SAMPLE_INTERVAL_MS', 5) / 1000,
+        max_files=app.config.get('PROFILER_MAX_FILES', 200),
+    )
+    app.extensions['profiler'] = profiler
+    profiler.poll()
+    profiler.start_polling()
+    global _current_profiler
+    _current_profiler = profiler
+    return profiler
+
+
+def _start_polling_after_fork():
+    # Threads do not survive fork: every gunicorn worker needs its own poller
+    if _current_profiler is not None:
+        _current_profiler.start_polling()
+
+
+# Registered once per process, not per app: callbacks cannot be unregistered
+os.register_at_fork(after_in_child=_start_polling_after_fork)
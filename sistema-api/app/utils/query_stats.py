@@ -0,0 +1,108 @@
+# inventory_api/app/utils/query_stats.py
+# Counts and times the SQL statements run while tracking is active (per request, see init_query_stats).
+
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import g, request
+from sqlalchemy import event
+
+_current_stats = ContextVar('query_stats', default=None)
+
+
+class QueryStats:
+    """Statements executed inside a track_queries() block (nested blocks also count towards their parents)."""
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def record(self, statement, seconds, executemany=False):
+        # An executemany (or one of its insertmanyvalues batches) is one statement sent with many
+        # parameter sets, not a loop: it counts once in `statements`, so it is never taken for an N+1
+        stats = self
+        while stats is not None:
+            stats.count += 1
+            stats.duration += seconds
+            if not executemany or statement not in stats.statements:
+                stats.statements[statement] += 1
+            stats = stats.parent
+
+    def repeated(self, threshold):
+        """Statements run at least `threshold` times: usually a relationship lazy-loaded in a loop (N+1)."""
+        return [(statement, count) for statement, count in self.statements.most_common() if count >= threshold]
+
+    def report(self):
+        lines = [f"{self.count} queries in {self.duration * 1000:.1f}ms"]
+        lines += [f"  {count}x {' '.join(statement.split())}" for statement, count in self.statements.most_common()]
+        return '\n'.join(lines)
+
+
+@contextmanager
+def track_queries():
+    """Collects the statements executed inside the block (in this thread/task) into a QueryStats."""
+    stats = QueryStats(parent=_current_stats.get())
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def register_query_events(engine):
+    """Times every statement on the engine; the cost is a context variable lookup when nothing is tracking."""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_query_timer(connection, cursor, statement, parameters, context, executemany):
+        if _current_stats.get() is not None:
+            connection.info.setdefault('query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def record_query(connection, cursor, statement, parameters, context, executemany):
+        stats = _current_stats.get()
+        started = connection.info.get('query_started')
+        if stats is not None and started:
+            stats.record(statement, time.perf_counter() - started.pop(), executemany)
+
+    @event.listens_for(engine, 'handle_error')
+    def drop_query_timer(context):
+        # A failed statement never reaches after_cursor_execute
+        if context.connection is not None and context.connection.info.get('query_started'):
+            context.connection.info['query_started'].pop()
+
+
+def init_query_stats(app):
+    """
+    Tracks the queries of every request. Statements repeated QUERY_N_PLUS_ONE_THRESHOLD times
+    are logged as a likely N+1; in debug mode (or with QUERY_STATS_SERVER_TIMING) the totals
+    are returned in a Server-Timing header.
+    """
+
+    @app.before_request
+    def start_query_stats():
+        g.query_stats = QueryStats(parent=_current_stats.get())
+        g.query_stats_token = _current_stats.set(g.query_stats)
+
+    @app.after_request
+    def add_server_timing(response):
+        stats = g.get('query_stats')
+        if stats is not None and (app.debug or app.config.get('QUERY_STATS_SERVER_TIMING')):
+            response.headers.add(
+                'Server-Timing', f'db;dur={stats.duration * 1000:.2f};desc="{stats.count} queries"'
+            )
+        return response
+
+    @app.teardown_request
+    def end_query_stats(exc):
+        token = g.pop('query_stats_token', None)
+        stats = g.pop('query_stats', None)
+        if token is None:
+            return
+        _current_stats.reset(token)
+        threshold = app.config.get('QUERY_N_PLUS_ONE_THRESHOLD', 0)
+        for statement, count in stats.repeated(threshold) if threshold else []:
+            print(f"Possible N+1 in {request.method} {request.path} ({request.endpoint}): "
+                  f"{count}x {' '.join(statement.split())[:200]}")
@@ -0,0 +1,206 @@
+# inventory_api/app/utils/replicas.py
+# Routes read-only queries to read replicas (SQLALCHEMY_BINDS 'replica_N', from DATABASE_REPLICA_URLS).
+
+import itertools
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from flask import current_app, g, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from .pool_metrics import build_engine_options
+from .shards import shard_engine
+
+REPLICA_BIND_PREFIX = 'replica_'
+PRIMARY_COOKIE = 'db_primary_until'
+# Execution option keeping a SELECT on the primary (locking_read)
+PRIMARY_OPTION = 'db_primary'
+# Session.info key set once the session's transaction has flushed: it reads its own writes from the primary
+_FLUSHED_KEY = 'replica_flushed'
+
+# Set while SELECTs may go to a replica, and when the client must read its own writes from the primary
+_read_from_replica = ContextVar('read_from_replica', default=False)
+_pinned_to_primary = ContextVar('pinned_to_primary', default=False)
+
+
+@contextmanager
+def replica_reads():
+    """Sends the SELECTs run inside the block to a replica (no-op without replicas). Usable as a decorator."""
+    token = _read_from_replica.set(True)
+    try:
+        yield
+    finally:
+        _read_from_replica.reset(token)
+
+
+def locking_read(statement, **kwargs):
+    """statement.with_for_update(**kwargs), kept on the primary when replica reads are enabled."""
+    return statement.with_for_update(**kwargs).execution_options(**{PRIMARY_OPTION: True})
+
+
+class RoutingSession(Session):
+    """
+    Flask-SQLAlchemy session that sends plain SELECTs to a healthy replica while replica
+    reads are enabled (chosen by the do_orm_execute hook below). Locking reads (locking_read),
+    flushes and transactions with pending or flushed changes use the primary. Inside
+    utils.shards.on_shard(), statements on the sharded tables go to that shard instead.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, replica=False, **kwargs):
+        if bind is None:
+            engine = shard_engine(mapper, clause)
+            if engine is not None:
+                return engine
+        if bind is None and replica:
+            router = current_app.extensions.get('replica_router')
+            if router is not None:
+                engine = router.choose(self._db.engines)
+                if engine is not None:
+                    return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _route_to_replica(orm_execute_state):
+    # Decided per statement, before get_bind: flushes do not come through here, so they stay on the primary
+    session = orm_execute_state.session
+    if (orm_execute_state.is_select and _read_from_replica.get() and not _pinned_to_primary.get()
+            and not orm_execute_state.execution_options.get(PRIMARY_OPTION)
+            and not (session.new or session.dirty or session.deleted or session.info.get(_FLUSHED_KEY))):
+        orm_execute_state.bind_arguments['replica'] = True
+
+
+@event.listens_for(RoutingSession, 'after_flush')
+def _pin_transaction(session, flush_context):
+    session.info[_FLUSHED_KEY] = True
+
+
+@event.listens_for(RoutingSession, 'after_transaction_end')
+def _unpin_transaction(session, transaction):
+    if transaction.parent is None:
+        session.info.pop(_FLUSHED_KEY, None)
+
+
+class ReplicaRouter:
+    """
+    Round-robin over the replica binds, skipping unhealthy ones.
+    A replica is re-checked (SELECT 1, plus replay lag on PostgreSQL) at most every
+    health_interval seconds and is taken out of rotation for retry_after seconds when
+    a check or a query on it fails with a disconnect.
+    """
+
+    def __init__(self, bind_keys, health_interval=10, retry_after=30, max_lag=0):
+        self.bind_keys = list(bind_keys)
+        self.health_interval = health_interval
+        self.retry_after = retry_after
+        self.max_lag = max_lag
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._down_until = {}
+        self._checked_at = {}
+
+    def choose(self, engines):
+        """Returns the next healthy replica engine, or None to fall back to the primary."""
+        for _ in range(len(self.bind_keys)):
+            key = self.bind_keys[next(self._counter) % len(self.bind_keys)]
+            if self._is_healthy(key, engines[key]):
+                return engines[key]
+        return None
+
+    def mark_down(self, key):
+        with self._lock:
+            self._down_until[key] = time.monotonic() + self.retry_after
+
+    def _is_healthy(self, key, engine):
+        now = time.monotonic()
+        with self._lock:
+            if self._down_until.get(key, 0) > now:
+                return False
+            if now - self._checked_at.get(key, float('-inf')) < self.health_interval:
+                return True
+            self._checked_at[key] = now
+
+        try:
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+                if self.max_lag and engine.dialect.name == 'postgresql':
+                    lag = connection.execute(text(
+                        "SELECT COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)"
+                    )).scalar()
+                    if lag > self.max_lag:
+                        raise RuntimeError(f"replication lag {lag:.1f}s")
+        except Exception as e:
+            print(f"Replica {key} failed its health check: {e}")
+            self.mark_down(key)
+            return False
+        return True
+
+    def status(self):
+        now = time.monotonic()
+        with self._lock:
+            return [
+                {'bind': key, 'healthy': self._down_until.get(key, 0) <= now}
+                for key in self.bind_keys
+            ]
+
+
+def replica_binds(config):
+    """Returns SQLALCHEMY_BINDS entries for DATABASE_REPLICA_URLS, with the same engine options as the primary."""
+    binds = {}
+    for index, url in enumerate(config.get('DATABASE_REPLICA_URLS') or []):
+        options = build_engine_options({**config, 'SQLALCHEMY_DATABASE_URI': url})
+        binds[f"{REPLICA_BIND_PREFIX}{index}"] = {**options, 'url': url}
+    return binds
+
+
+def init_replicas(app, db):
+    """Registers the replica router and the request hooks (call after db.init_app)."""
+    with app.app_context():
+        bind_keys = [key for key in db.engines if key and key.startswith(REPLICA_BIND_PREFIX)]
+        # No model is bound to a replica: drop the empty MetaData db.init_app made for each
+        # bind so create_all/drop_all (and later apps sharing db) ignore the replicas
+        for key in bind_keys:
+            db.metadatas.pop(key, None)
+        if bind_keys:
+            router = ReplicaRouter(
+                bind_keys,
+                health_interval=app.config.get('DB_REPLICA_HEALTH_INTERVAL', 10),
+                retry_after=app.config.get('DB_REPLICA_RETRY_AFTER', 30),
+                max_lag=app.config.get('DB_REPLICA_MAX_LAG_S', 0),
+            )
+            app.extensions['replica_router'] = router
+            for key in bind_keys:
+                _watch_disconnects(db.engines[key], key, router)
+
+    @app.before_request
+    def route_reads():
+        g.replica_tokens = []
+        # Read-your-writes: after a write, this client reads from the primary until the cookie expires
+        pinned_until = request.cookies.get(PRIMARY_COOKIE)
+        try:
+            if pinned_until and float(pinned_until) > time.time():
+                g.replica_tokens.append((_pinned_to_primary, _pinned_to_primary.set(True)))
+        except ValueError:
+            pass
+        if request.method in ('GET', 'HEAD') and request.blueprint in app.config.get('DB_REPLICA_BLUEPRINTS', ()):
+            g.replica_tokens.append((_read_from_replica, _read_from_replica.set(True)))
+
+    @app.after_request
+    def pin_after_write(response):
+        window = app.config.get('READ_YOUR_WRITES_SECONDS', 0)
+        if window and request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400:
+            response.set_cookie(PRIMARY_COOKIE, str(time.time() + window), max_age=window, httponly=True, samesite='Lax')
+        return response
+
+    @app.teardown_request
+    def reset_routing(exc):
+        for var, token in reversed(g.pop('replica_tokens', [])):
+            var.reset(token)
+
+
+def _watch_disconnects(engine, key, router):
+    @event.listens_for(engine, 'handle_error')
+    def take_out_of_rotation(context):
+        if context.is_disconnect:
+            router.mark_down(key)
@@ -0,0 +1,393 @@
+# inventory_api/app/utils/shards.py
+"""
+Optional sharding of the stock data by location group (DATABASE_SHARD_URLS, SQLALCHEMY_BINDS 'shard_N').
+
+A location group is a root of the location tree (a store or warehouse) with everything below it, so a
+movement and the utilization rollups it updates always stay on one shard. Shard 0 is the primary
+database; DATABASE_SHARD_URLS adds shards 1..N. A group lives on SHARD_LOCATION_GROUPS[root id] when
+set, else on shard (root id % shard count).
+
+  - SHARDED_TABLES (stock, movements, utilization, transfers) hold the rows of the groups on each shard
+  - REFERENCE_TABLES (catalog, locations, users) are written to the primary and mirrored to every other
+    shard after each commit, so shard queries can join them and foreign keys hold there; writes that do
+    not go through the session (raw SQL, COPY) need `flask shards-sync`
+  - inside location_shard(location_id), statements touching a sharded table go to that location's shard,
+    the others to the primary
+  - ShardRouter.gather runs a query on every shard in parallel (ReportService), each in its own session
+
+Transfers between groups on different shards are done by InventoryService as a saga, see
+InventoryService._create_cross_shard_transfer.
+"""
+
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from decimal import Decimal
+from flask import current_app, has_app_context
+from sqlalchemy import delete, event, select, tuple_
+from sqlalchemy.orm import Session, object_mapper
+from sqlalchemy.sql.util import find_tables
+from .pool_metrics import build_engine_options
+
+SHARD_BIND_PREFIX = 'shard_'
+SHARDED_TABLES = frozenset((
+    'stock_levels', 'low_stock', 'inventory_transactions', 'location_utilization', 'location_transfers',
+    # Ledger projections (ProjectionService), each shard projecting its own ledger
+    'projection_checkpoints', 'stock_daily_movements', 'stock_alerts', 'inventory_valuation',
+    # Change feed (app/utils/changes.py): each shard logs the changes it commits, catalog changes go to the primary's
+    'change_log',
+    # Webhook outbox (app/utils/webhooks.py): written with the movement on its shard, delivered from each shard
+    'webhook_outbox', 'webhook_endpoints',
+))
+REFERENCE_TABLES = frozenset((
+    'users', 'suppliers', 'categories', 'category_closure', 'products', 'barcodes', 'locations', 'location_closure',
+))
+# Derived tables, mirrored by replacing their content: their rows are deleted on the primary with set-based DELETEs
+REPLACED_TABLES = frozenset(('category_closure', 'location_closure'))
+# Execution option of the closure helpers' statements (BaseService._closure_*): the id of the node whose subtree
+# they change, so only that subtree's closure rows are mirrored instead of the whole table
+MIRROR_SUBTREE_OPTION = 'shard_mirror_subtree'
+MIRROR_CHUNK_SIZE = 1000
+_MIRROR_INFO_KEY = 'shard_mirror'
+_ALL_ROWS = None
+
+# (shard index, whole_session) while a block runs on a shard; whole_session sends every statement there
+_current_shard = ContextVar('current_shard', default=None)
+
+
+@contextmanager
+def on_shard(index, whole_session=False):
+    """Runs the block on shard `index` (whole_session: reference tables are read from the shard's mirror too)."""
+    token = _current_shard.set((index, whole_session))
+    try:
+        yield index
+    finally:
+        _current_shard.reset(token)
+
+
+def current_shard():
+    """The index of the shard the current block runs on, or None."""
+    routed = _current_shard.get()
+    return routed[0] if routed else None
+
+
+def shard_router():
+    """The app's ShardRouter, or None when sharding is not configured."""
+    return current_app.extensions.get('shard_router') if has_app_context() else None
+
+
+@contextmanager
+def location_shard(location_id):
+    """Runs the block on the shard holding location_id's stock. No-op without shards or without a location."""
+    router = shard_router()
+    if router is None or location_id is None:
+        yield None
+        return
+    with on_shard(router.shard_of(location_id)) as index:
+        yield index
+
+
+def routed_by_location(field='location_id'):
+    """Decorator for the handle_*(data, ...) functions: the whole handler, response included, runs on data[field]'s shard."""
+    def decorator(handler):
+        @functools.wraps(handler)
+        def wrapper(data, *args, **kwargs):
+            try:
+                location_id = int(data[field])
+            except (KeyError, TypeError, ValueError):
+                location_id = None # The handler rejects it
+            with location_shard(location_id):
+                return handler(data, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def shard_engine(mapper=None, clause=None):
+    """The engine RoutingSession.get_bind should use inside on_shard(), or None for the default bind."""
+    routed = _current_shard.get()
+    if not routed or not routed[0]: # Shard 0 is the primary
+        return None
+    router = shard_router()
+    if router is None:
+        return None
+    index, whole_session = routed
+    if whole_session or (mapper is not None and mapper.local_table.name in SHARDED_TABLES):
+        return router.engines[index]
+    if clause is not None and any(getattr(table, 'name', None) in SHARDED_TABLES
+                                  for table in find_tables(clause, include_crud=True)):
+        return router.engines[index]
+    return None
+
+
+class ShardRouter:
+    """
+    The shards of an app (app.extensions['shard_router']): engines[0] is the primary, engines[N] bind 'shard_N'.
+    Maps locations to shards (cached per worker: LocationService refuses to move a location to another
+    shard) and runs scatter-gather queries on a thread pool.
+    """
+
+    def __init__(self, engines, groups=None, gather_workers=0, cache_size=100000):
+        self.engines = list(engines)
+        self.groups = {int(root): int(index) for root, index in (groups or {}).items()}
+        for root, index in self.groups.items():
+            if not 0 <= index < len(self.engines):
+                raise ValueError(f"SHARD_LOCATION_GROUPS maps location {root} to shard {index}, which does not exist.")
+        self.cache_size = cache_size
+        self._shard_of = {}
+        self._pool = ThreadPoolExecutor(max_workers=gather_workers or len(self.engines), thread_name_prefix='shard-gather')
+
+    @property
+    def indexes(self):
+        return range(len(self.engines))
+
+    def shard_of(self, location_id):
+        """The shard holding the stock of location_id."""
+        index = self._shard_of.get(location_id)
+        if index is None:
+            root = self.group_of(location_id)
+            if root is None:
+                # Not a location (yet): not cached, it may be created under any group
+                return self.shard_of_group(location_id)
+            index = self.shard_of_group(root)
+            if len(self._shard_of) >= self.cache_size:
+                self._shard_of.clear()
+            self._shard_of[location_id] = index
+        return index
+
+    def shard_of_group(self, root_id):
+        return self.groups.get(root_id, root_id % len(self.engines))
+
+    def group_of(self, location_id):
+        """The root of location_id's tree (itself for a root), or None for an unknown location."""
+        from ..models import LocationClosure
+        with self.engines[0].connect() as connection:
+            root = connection.execute(
+                select(LocationClosure.ancestor_id)
+                .where(LocationClosure.descendant_id == location_id)
+                .order_by(LocationClosure.depth.desc())
+                .limit(1)
+            ).scalar()
+        return root
+
+    def run_on(self, index, fn):
+        """Runs fn() on shard `index` in a session of its own (a new app context), in this thread."""
+        with current_app.app_context(), on_shard(index):
+            return fn()
+
+    def gather(self, fn, indexes=None):
+        """Runs fn() on the given shards (default: all) in parallel, each in its own session; results in shard order."""
+        app = current_app._get_current_object()
+
+        def run(index):
+            with app.app_context(), on_shard(index, whole_session=True):
+                return fn()
+
+        futures = [self._pool.submit(run, index) for index in (self.indexes if indexes is None else indexes)]
+        return [future.result() for future in futures]
+
+    def create_all(self, metadata):
+        """Creates the missing tables of metadata on the shards other than the primary."""
+        for engine in self.engines[1:]:
+            metadata.create_all(engine)
+
+    def mirror(self, metadata, changes=None):
+        """
+        Copies reference rows from the primary to the other shards.
+        changes: {table name: {'upsert': primary keys or None (all rows), 'delete': primary keys, 'subtrees': closure
+        node ids}}; default: every reference table, whole. Each shard is written in one transaction.
+        """
+        tables = [table for table in metadata.sorted_tables if table.name in REFERENCE_TABLES]
+        if changes is None:
+            changes = {table.name: {'upsert': _ALL_ROWS} for table in tables}
+        if len(self.engines) < 2 or not changes:
+            return
+
+        with ExitStack() as stack:
+            primary = stack.enter_context(self.engines[0].connect())
+            shards = [stack.enter_context(engine.begin()) for engine in self.engines[1:]]
+            for table in reversed(tables): # Children first
+                deleted = (changes.get(table.name) or {}).get('delete')
+                if deleted:
+                    for connection in shards:
+                        for chunk in _chunks(sorted(deleted)):
+                            connection.execute(delete(table).where(_key_in(table, chunk)))
+            for table in tables: # Parents first
+                entry = changes.get(table.name) or {}
+                if entry.get('subtrees') and entry.get('upsert', ()) is not _ALL_ROWS:
+                    _mirror_subtrees(primary, shards, table, entry['subtrees'])
+                if 'upsert' not in entry:
+                    continue
+                keys = entry['upsert']
+                replace = keys is _ALL_ROWS and table.name in REPLACED_TABLES
+                if replace:
+                    for connection in shards:
+                        connection.execute(delete(table))
+                query = select(table).order_by(*table.primary_key.columns)
+                for chunk in ([None] if keys is _ALL_ROWS else _chunks(sorted(keys))):
+                    selected = query if chunk is None else query.where(_key_in(table, chunk))
+                    result = primary.execution_options(stream_results=True).execute(selected)
+                    for rows in result.mappings().partitions(MIRROR_CHUNK_SIZE):
+                        rows = [dict(row) for row in rows]
+                        for connection in shards:
+                            if replace:
+                                connection.execute(table.insert(), rows)
+                            else:
+                                _upsert(connection, table, rows)
+
+
+def _chunks(keys):
+    for start in range(0, len(keys), MIRROR_CHUNK_SIZE):
+        yield keys[start:start + MIRROR_CHUNK_SIZE]
+
+
+def _mirror_subtrees(primary, shards, table, nodes):
+    """
+    Replaces the closure rows below `nodes` on the shards: the rows whose descendant is in one of their subtrees,
+    as the shard's mirror still has them (before the change) or as the primary has them now.
+    """
+    descendant = table.c.descendant_id
+    below = select(descendant).where(table.c.ancestor_id.in_(sorted(nodes)))
+    current = set(primary.execute(below).scalars())
+    for connection in shards:
+        for chunk in _chunks(sorted(current | set(connection.execute(below).scalars()))):
+            connection.execute(delete(table).where(descendant.in_(chunk)))
+            rows = primary.execute(select(table).where(descendant.in_(chunk))).mappings().all()
+            if rows:
+                connection.execute(table.insert(), [dict(row) for row in rows])
+
+
+def _key_in(table, keys):
+    columns = list(table.primary_key.columns)
+    if len(columns) == 1:
+        return columns[0].in_([key[0] for key in keys])
+    return tuple_(*columns).in_(keys)
+
+
+def _upsert(connection, table, rows):
+    """INSERT ... ON CONFLICT (primary key) DO UPDATE where the dialect has it; delete and insert elsewhere."""
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table)
+        keys = [column.name for column in table.primary_key.columns]
+        values = {column.name: statement.excluded[column.name] for column in table.columns if not column.primary_key}
+        if values:
+            statement = statement.on_conflict_do_update(index_elements=keys, set_=values)
+        else:
+            statement = statement.on_conflict_do_nothing(index_elements=keys)
+        connection.execute(statement, rows)
+        return
+    keys = [tuple(row[column.name] for column in table.primary_key.columns) for row in rows]
+    connection.execute(delete(table).where(_key_in(table, keys)))
+    connection.execute(table.insert(), rows)
+
+
+def merge_pages(pages, order, pagination=None, numeric=()):
+    """
+    Merges the result dicts of several shards into one page.
+    order is a list of (dict key, descending); each shard must have returned its first page*limit rows in that order.
+    """
+    rows = [row for page in pages for row in page]
+    for key, descending in reversed(order): # Stable sorts, least significant key first
+        convert = Decimal if key in numeric else (lambda value: value)
+        rows.sort(key=lambda row: (0, 0) if row.get(key) is None else (1, convert(row[key])), reverse=descending)
+    if pagination and 'page' in pagination and 'limit' in pagination:
+        limit = max(1, int(pagination['limit']))
+        offset = (max(1, int(pagination['page'])) - 1) * limit
+        return rows[offset:offset + limit]
+    return rows
+
+
+def gather_pagination(pagination=None):
+    """The pagination each shard runs for merge_pages: its first page*limit rows."""
+    if pagination and 'page' in pagination and 'limit' in pagination:
+        return {'page': 1, 'limit': max(1, int(pagination['page'])) * max(1, int(pagination['limit']))}
+    return pagination
+
+
+def shard_binds(config):
+    """Returns SQLALCHEMY_BINDS entries for DATABASE_SHARD_URLS (shards 1..N), with the same engine options as the primary."""
+    binds = {}
+    for index, url in enumerate(config.get('DATABASE_SHARD_URLS') or [], start=1):
+        options = build_engine_options({**config, 'SQLALCHEMY_DATABASE_URI': url})
+        binds[f"{SHARD_BIND_PREFIX}{index}"] = {**options, 'url': url}
+    return binds
+
+
+def init_shards(app, db):
+    """Registers the shard router and the reference-table mirroring (call after db.init_app)."""
+    with app.app_context():
+        bind_keys = sorted((key for key in db.engines if key and key.startswith(SHARD_BIND_PREFIX)),
+                           key=lambda key: int(key[len(SHARD_BIND_PREFIX):]))
+        # No model is bound to a shard (routing is per statement): like the replicas, drop their empty MetaData
+        for key in bind_keys:
+            db.metadatas.pop(key, None)
+        if not bind_keys:
+            return None
+        router = ShardRouter(
+            [db.engines[None]] + [db.engines[key] for key in bind_keys],
+            groups=app.config.get('SHARD_LOCATION_GROUPS'),
+            gather_workers=app.config.get('SHARD_GATHER_WORKERS', 0),
+        )
+    app.extensions['shard_router'] = router
+    _listen_for_reference_changes(db)
+    return router
+
+
+def _listen_for_reference_changes(db):
+    # On the Session base class, so the sessions of the ASGI app (app/asgi.py) are mirrored too
+    if event.contains(Session, 'after_flush', _track_flushed_rows):
+        return
+    event.listen(Session, 'after_flush', _track_flushed_rows)
+    event.listen(Session, 'do_orm_execute', _track_bulk_statements)
+    event.listen(Session, 'after_commit', _mirror_committed_rows)
+    event.listen(Session, 'after_rollback', lambda session: session.info.pop(_MIRROR_INFO_KEY, None))
+
+
+def _changes(session):
+    return session.info.setdefault(_MIRROR_INFO_KEY, {})
+
+
+def _track_flushed_rows(session, flush_context):
+    if shard_router() is None:
+        return
+    for kind, instances in (('upsert', session.new | session.dirty), ('delete', session.deleted)):
+        for instance in instances:
+            mapper = object_mapper(instance)
+            name = mapper.local_table.name
+            if name in REFERENCE_TABLES:
+                keys = _changes(session).setdefault(name, {})
+                if keys.get(kind, ()) is not _ALL_ROWS:
+                    keys.setdefault(kind, set()).add(tuple(mapper.primary_key_from_instance(instance)))
+
+
+def _track_bulk_statements(orm_execute_state):
+    # INSERT/UPDATE/DELETE statements: closure maintenance mirrors the subtree it names (MIRROR_SUBTREE_OPTION),
+    # anything else (bulk updates, imports, closure rebuilds) the whole table
+    if orm_execute_state.is_select or shard_router() is None:
+        return
+    table = getattr(orm_execute_state.statement, 'table', None)
+    name = getattr(table, 'name', None)
+    if name in REFERENCE_TABLES:
+        keys = _changes(orm_execute_state.session).setdefault(name, {})
+        node_id = orm_execute_state.execution_options.get(MIRROR_SUBTREE_OPTION)
+        if node_id is not None and name in REPLACED_TABLES:
+            keys.setdefault('subtrees', set()).add(node_id)
+        else:
+            keys['upsert'] = _ALL_ROWS
+
+
+def _mirror_committed_rows(session):
+    changes = session.info.pop(_MIRROR_INFO_KEY, None)
+    router = shard_router()
+    if not changes or router is None:
+        return
+    try:
+        router.mirror(current_app.extensions['sqlalchemy'].metadata, changes)
+    except Exception as e:
+        # The primary has committed: the shards catch up at the next change of these rows or `flask shards-sync`
+        print(f"Could not mirror {', '.join(sorted(changes))} to the shards: {e}")
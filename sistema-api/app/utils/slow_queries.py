@@ -0,0 +1,153 @@
+# inventory_api/app/utils/slow_queries.py
+# Logs statements slower than SLOW_QUERY_THRESHOLD_MS, with a sampled execution plan, and keeps
+# the most recent ones in memory for GET /api/internal/slow-queries.
+
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from flask import has_request_context, request
+from sqlalchemy import event
+
+MAX_PARAMETER_LENGTH = 200
+
+
+class SlowQueryLog:
+    """
+    Bounded buffer (per process) of the last `size` slow statements.
+    EXPLAIN is captured for a `sample_rate` fraction of slow SELECTs, and at most once every
+    `cooldown` seconds for the same statement. The plan is estimated (plain EXPLAIN) unless `analyze`
+    is set: EXPLAIN ANALYZE runs the already slow query again, on the request's connection.
+    """
+
+    def __init__(self, threshold_ms, size=100, sample_rate=0.1, cooldown=60, analyze=False):
+        self.threshold = threshold_ms / 1000
+        self.sample_rate = sample_rate
+        self.cooldown = cooldown
+        self.analyze = analyze
+        self._entries = deque(maxlen=size)
+        self._explained_at = {}
+        self._lock = threading.Lock()
+
+    def entries(self, limit=None):
+        """The buffered slow queries, slowest first."""
+        with self._lock:
+            entries = sorted(self._entries, key=lambda entry: entry['duration_ms'], reverse=True)
+        return entries[:limit] if limit else entries
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def should_explain(self, statement):
+        if statement.split(None, 1)[0].upper() not in ('SELECT', 'WITH'):
+            return False # Never re-run writes
+        if random.random() >= self.sample_rate:
+            return False
+        now = time.monotonic()
+        with self._lock:
+            if now - self._explained_at.get(statement, float('-inf')) < self.cooldown:
+                return False
+            self._explained_at[statement] = now
+            if len(self._explained_at) > 1000: # Forget old statements
+                self._explained_at = {key: at for key, at in self._explained_at.items() if now - at < self.cooldown}
+        return True
+
+    def record(self, connection, statement, parameters, seconds, executemany):
+        entry = {
+            'statement': ' '.join(statement.split()),
+            'parameters': _format_parameters(parameters) if not executemany else '<executemany>',
+            'duration_ms': round(seconds * 1000, 1),
+            'at': datetime.now(timezone.utc).isoformat(),
+            'endpoint': request.endpoint if has_request_context() else None,
+            'request': f"{request.method} {request.full_path.rstrip('?')}" if has_request_context() else None,
+            'plan': None,
+        }
+        if not executemany and self.should_explain(statement):
+            entry['plan'] = self.explain(connection, statement, parameters)
+        with self._lock:
+            self._entries.append(entry)
+
+        print(f"Slow query ({entry['duration_ms']}ms) in {entry['request'] or 'no request'} "
+              f"[{entry['endpoint']}]: {entry['statement'][:500]} -- parameters: {entry['parameters']}")
+        if entry['plan']:
+            print(entry['plan'])
+
+    def explain(self, connection, statement, parameters):
+        """Returns the plan of a statement, run on the same connection (and transaction) as the query."""
+        dbapi_connection = connection.connection.dbapi_connection
+        cursor = dbapi_connection.cursor()
+        postgresql = connection.dialect.name == 'postgresql'
+        try:
+            if postgresql:
+                prefix = 'EXPLAIN (ANALYZE, BUFFERS) ' if self.analyze else 'EXPLAIN '
+                # A failing EXPLAIN must not abort the caller's transaction
+                cursor.execute('SAVEPOINT slow_query_explain')
+            else:
+                prefix = 'EXPLAIN QUERY PLAN ' if connection.dialect.name == 'sqlite' else 'EXPLAIN '
+            try:
+                cursor.execute(prefix + statement, parameters)
+                rows = cursor.fetchall()
+            finally:
+                if postgresql:
+                    cursor.execute('ROLLBACK TO SAVEPOINT slow_query_explain')
+                    cursor.execute('RELEASE SAVEPOINT slow_query_explain')
+            return '\n'.join(' | '.join(str(value) for value in row) for row in rows)
+        except Exception as e:
+            print(f"Could not EXPLAIN slow query: {str(e).splitlines()[0]}")
+            return None
+        finally:
+            cursor.close()
+
+
+def _format_parameters(parameters):
+    def short(value):
+        text = repr(value)
+        return text if len(text) <= MAX_PARAMETER_LENGTH else f"{text[:MAX_PARAMETER_LENGTH]}..."
+    if isinstance(parameters, dict):
+        return {key: short(value) for key, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return [short(value) for value in parameters]
+    return short(parameters)
+
+
+def register_slow_query_events(engine, slow_log):
+    """Times every statement on the engine and hands the slow ones to slow_log."""
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_slow_query_timer(connection, cursor, statement, parameters, context, executemany):
+        connection.info.setdefault('slow_query_started', []).append(time.perf_counter())
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def check_slow_query(connection, cursor, statement, parameters, context, executemany):
+        started = connection.info.get('slow_query_started')
+        if not started:
+            return
+        elapsed = time.perf_counter() - started.pop()
+        if elapsed >= slow_log.threshold:
+            slow_log.record(connection, statement, parameters, elapsed, executemany)
+
+    @event.listens_for(engine, 'handle_error')
+    def drop_slow_query_timer(context):
+        # A failed statement never reaches after_cursor_execute
+        if context.connection is not None and context.connection.info.get('slow_query_started'):
+            context.connection.info['slow_query_started'].pop()
+
+
+def init_slow_query_log(app, engines):
+    """Creates the app's SlowQueryLog (when SLOW_QUERY_THRESHOLD_MS is set) and attaches it to the engines."""
+    threshold = app.config.get('SLOW_QUERY_THRESHOLD_MS', 0)
+    if not threshold:
+        return None
+    slow_log = SlowQueryLog(
+        threshold,
+        size=app.config.get('SLOW_QUERY_BUFFER_SIZE', 100),
+        sample_rate=app.config.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', 0.1),
+        cooldown=app.config.get('SLOW_QUERY_EXPLAIN_COOLDOWN_S', 60),
+        analyze=app.config.get('SLOW_QUERY_EXPLAIN_ANALYZE', False),
+    )
+    app.extensions['slow_query_log'] = slow_log
+    for engine in engines:
+        register_slow_query_events(engine, slow_log)
+    return slow_log
@@ -0,0 +1,301 @@
+# inventory_api/app/utils/stream.py
+"""
+Live stock-level updates for the Server-Sent Events endpoint of the ASGI app
+(GET /api/stream/stock-levels, app/asgi.py).
+
+Capture: session hooks collect the stock_levels rows each transaction writes and hand them to the
+backend (STREAM_BACKEND):
+  - 'local': after the commit, to this process's broker. Enough when the movements are served by
+    the same process as the streams
+  - 'postgres': NOTIFY on STREAM_CHANNEL, sent inside the writing transaction (PostgreSQL delivers
+    it only if that commits) from any process (WSGI workers, projection workers); every ASGI worker
+    LISTENs on one asyncpg connection of its own and feeds its broker
+A bulk statement on stock_levels (a projection rebuild) sends a resync instead of rows.
+
+Fan-out: StockBroker indexes the streams' subscriptions (product and location filters) by product
+and location, and gives each stream a bounded queue on the event loop. An idle stream costs a
+queue and a suspended coroutine: no thread, no DB connection. A stream that falls more than
+STREAM_QUEUE_SIZE events behind gets a resync event in place of its backlog (the client re-fetches).
+"""
+
+import asyncio
+import json
+from collections import defaultdict
+from decimal import Decimal
+from flask import current_app, has_app_context
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session, object_mapper
+from .metrics import STREAM_SUBSCRIBERS
+
+RESYNC = 'resync' # Delivered in place of events the subscribers may have missed
+CLOSE = object() # Ends a stream (server shutdown)
+NOTIFY_EVENTS = 100 # Events per NOTIFY: PostgreSQL payloads must stay under 8000 bytes
+_EVENTS_INFO_KEY = 'stream_events'
+CENTS = Decimal('0.01') # Quantities as the API formats them (Numeric(15, 2))
+
+
+class Subscription:
+    """One stream's filters (None: any) and queue."""
+
+    def __init__(self, products, locations, queue_size):
+        self.products = frozenset(products) if products else None
+        self.locations = frozenset(locations) if locations else None
+        self.queue = asyncio.Queue(maxsize=queue_size)
+
+
+class StockBroker:
+    """
+    In-process fan-out of stock-level events to the subscriptions of the ASGI app's event loop.
+    subscribe/unsubscribe run on the loop; publish can be called from any thread.
+    """
+
+    def __init__(self, queue_size=100, max_subscribers=10000):
+        self.queue_size = queue_size
+        self.max_subscribers = max_subscribers
+        self.loop = None
+        self.backend = None
+        self.count = 0
+        self._by_product = defaultdict(set) # Subscriptions with a product filter, under each of their products
+        self._by_location = defaultdict(set) # Those with only a location filter, under each of their locations
+        self._everyone = set() # Those without filters
+
+    def start(self, loop):
+        self.loop = loop
+
+    def stop(self):
+        """Ends every stream (on the loop)."""
+        for subscription in self._all():
+            self._put(subscription, CLOSE)
+        self.loop = None
+
+    @property
+    def full(self):
+        return self.count >= self.max_subscribers
+
+    def subscribe(self, products=None, locations=None):
+        subscription = Subscription(products, locations, self.queue_size)
+        for index, key in self._index_keys(subscription):
+            if key is None:
+                self._everyone.add(subscription)
+            else:
+                index[key].add(subscription)
+        self.count += 1
+        STREAM_SUBSCRIBERS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        for index, key in self._index_keys(subscription):
+            if key is None:
+                self._everyone.discard(subscription)
+            else:
+                index[key].discard(subscription)
+                if not index[key]:
+                    del index[key]
+        self.count -= 1
+        STREAM_SUBSCRIBERS.dec()
+
+    def publish(self, events):
+        """Schedules the delivery of stock-level events (dicts), or of RESYNC to every stream. Thread-safe."""
+        loop = self.loop
+        if loop is None or not self.count:
+            return
+        try:
+            loop.call_soon_threadsafe(self._dispatch, events)
+        except RuntimeError: # Loop closed (shutdown)
+            pass
+
+    def _index_keys(self, subscription):
+        if subscription.products is not None:
+            return [(self._by_product, product_id) for product_id in subscription.products]
+        if subscription.locations is not None:
+            return [(self._by_location, location_id) for location_id in subscription.locations]
+        return [(None, None)]
+
+    def _all(self):
+        subscriptions = set(self._everyone)
+        for index in (self._by_product, self._by_location):
+            for group in index.values():
+                subscriptions |= group
+        return subscriptions
+
+    def _dispatch(self, events):
+        if events == RESYNC:
+            for subscription in self._all():
+                self._put(subscription, RESYNC)
+            return
+        for event_data in events:
+            for subscription in self._by_product.get(event_data['product_id'], ()):
+                if subscription.locations is None or event_data['location_id'] in subscription.locations:
+                    self._put(subscription, event_data)
+            for subscription in self._by_location.get(event_data['location_id'], ()):
+                self._put(subscription, event_data)
+            for subscription in self._everyone:
+                self._put(subscription, event_data)
+
+    def _put(self, subscription, item):
+        try:
+            subscription.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Slow reader: drop its backlog, it re-fetches instead
+            while not subscription.queue.empty():
+                subscription.queue.get_nowait()
+            subscription.queue.put_nowait(CLOSE if item is CLOSE else RESYNC)
+
+
+class LocalBackend:
+    """Delivers the changes committed by this process, after each commit."""
+
+    def __init__(self, broker):
+        self.broker = broker
+
+    def send(self, session, events):
+        pass
+
+    def committed(self, events):
+        self.broker.publish(events)
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class PostgresNotifyBackend:
+    """NOTIFY in the writing transaction, LISTEN in each ASGI worker (needs asyncpg and a direct, non-pooled connection)."""
+
+    def __init__(self, broker, dsn, channel='stock_levels', reconnect_s=2):
+        self.broker = broker
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_s = reconnect_s
+        self._task = None
+
+    def send(self, session, events):
+        payloads = [RESYNC] if events == RESYNC else [
+            events[start:start + NOTIFY_EVENTS] for start in range(0, len(events), NOTIFY_EVENTS)
+        ]
+        for payload in payloads:
+            session.execute(text('SELECT pg_notify(:channel, :payload)'),
+                            {'channel': self.channel, 'payload': json.dumps(payload)})
+
+    def committed(self, events):
+        pass # The notification reaches this process's listener too
+
+    async def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        import asyncpg
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(self.dsn)
+                closed = asyncio.Event()
+                connection.add_termination_listener(lambda _: closed.set())
+                await connection.add_listener(self.channel, self._notified)
+                self.broker.publish(RESYNC) # Anything sent while not listening was missed
+                await closed.wait()
+            except asyncio.CancelledError:
+                if connection is not None:
+                    await connection.close()
+                raise
+            except Exception as e:
+                print(f"Stock stream listener error (reconnecting in {self.reconnect_s}s): {e}")
+            await asyncio.sleep(self.reconnect_s)
+
+    def _notified(self, connection, pid, channel, payload):
+        try:
+            self.broker.publish(json.loads(payload))
+        except ValueError:
+            print(f"Ignoring malformed stock stream notification: {payload[:200]}")
+
+
+def listen_dsn(config):
+    """The LISTEN connection's DSN: STREAM_DATABASE_URL, else SQLALCHEMY_DATABASE_URI, without the SQLAlchemy driver."""
+    url = config.get('STREAM_DATABASE_URL') or config['SQLALCHEMY_DATABASE_URI']
+    scheme, rest = url.split('://', 1)
+    return f"{scheme.split('+', 1)[0]}://{rest}"
+
+
+def init_stream(app):
+    """Creates the app's StockBroker and backend, and registers the capture hooks once."""
+    broker = StockBroker(
+        queue_size=app.config.get('STREAM_QUEUE_SIZE', 100),
+        max_subscribers=app.config.get('STREAM_MAX_SUBSCRIBERS', 10000),
+    )
+    backend = app.config.get('STREAM_BACKEND', 'local')
+    if backend == 'postgres':
+        broker.backend = PostgresNotifyBackend(
+            broker, listen_dsn(app.config), channel=app.config.get('STREAM_CHANNEL', 'stock_levels'),
+            reconnect_s=app.config.get('STREAM_RECONNECT_S', 2),
+        )
+    elif backend == 'local':
+        broker.backend = LocalBackend(broker)
+    else:
+        raise ValueError(f"Unknown STREAM_BACKEND: {backend}. Must be 'local' or 'postgres'.")
+    app.extensions['stock_stream'] = broker
+
+    if not event.contains(Session, 'after_flush', _capture_flushed_rows):
+        event.listen(Session, 'after_flush', _capture_flushed_rows)
+        event.listen(Session, 'do_orm_execute', _capture_bulk_statements)
+        event.listen(Session, 'after_commit', _deliver_committed)
+        event.listen(Session, 'after_rollback', lambda session: session.info.pop(_EVENTS_INFO_KEY, None))
+    return broker
+
+
+def _broker():
+    return current_app.extensions.get('stock_stream') if has_app_context() else None
+
+
+def _capture_flushed_rows(session, flush_context):
+    broker = _broker()
+    if broker is None:
+        return
+    events = {}
+    for instance in session.new | session.dirty | session.deleted:
+        if object_mapper(instance).local_table.name != 'stock_levels':
+            continue
+        if instance in session.dirty and not session.is_modified(instance):
+            continue
+        events[(instance.product_id, instance.location_id)] = {
+            'product_id': instance.product_id,
+            'location_id': instance.location_id,
+            'quantity': None if instance in session.deleted else str(Decimal(str(instance.quantity)).quantize(CENTS)),
+        }
+    if events:
+        _record(session, broker, list(events.values()))
+
+
+def _capture_bulk_statements(orm_execute_state):
+    if orm_execute_state.is_select:
+        return
+    broker = _broker()
+    if broker is not None and getattr(getattr(orm_execute_state.statement, 'table', None), 'name', None) == 'stock_levels':
+        _record(orm_execute_state.session, broker, RESYNC)
+
+
+def _record(session, broker, events):
+    broker.backend.send(session, events)
+    pending = session.info.get(_EVENTS_INFO_KEY)
+    if events == RESYNC or pending == RESYNC:
+        session.info[_EVENTS_INFO_KEY] = RESYNC
+    else:
+        session.info[_EVENTS_INFO_KEY] = (pending or []) + events
+
+
+def _deliver_committed(session):
+    events = session.info.pop(_EVENTS_INFO_KEY, None)
+    broker = _broker()
+    if events and broker is not None:
+        broker.backend.committed(events)
@@ -0,0 +1,333 @@
+# inventory_api/app/utils/synthetic.py
+"""
+Synthetic inventory datasets for reproducing production-scale behaviour locally (`flask seed-synthetic`).
+
+Everything is derived from one random seed, so the same options on the same (empty) database
+produce the same rows. Generated rows get explicit ids (continuing after the current maximum)
+and are streamed to the database in chunks with copy_rows (COPY on PostgreSQL).
+
+Movements follow the usual shape of warehouse traffic:
+  - SKU popularity is Zipfian: the product at popularity rank r is picked with weight 1 / r**zipf
+  - volume varies by season (peaking in late November), weekday and hour of the day
+  - stock never goes negative: a pick that finds too little stock becomes a delivery, and
+    stock_levels are written from the running balances, so they match the transactions
+"""
+
+import math
+import random
+import time
+from datetime import datetime, timedelta
+from itertools import accumulate
+from sqlalchemy import func, select, text
+from werkzeug.security import generate_password_hash
+from ..db import db
+from ..models import (
+    Barcode, Category, InventoryTransaction, Location, LocationTransfer, Product, StockLevel, Supplier, User,
+)
+from .bulk import copy_rows
+from .enums import TransactionType, UnitMeasure
+from .exceptions import ConflictException
+
+LOCATION_LEVELS = ['Warehouse', 'Zone', 'Aisle', 'Rack', 'Shelf', 'Bin']
+ADJECTIVES = ['steel', 'brass', 'nylon', 'heavy-duty', 'compact', 'industrial', 'coated', 'threaded', 'insulated', 'mini']
+NOUNS = ['bolt', 'screw', 'washer', 'bracket', 'hinge', 'cable', 'valve', 'filter', 'pump', 'sensor', 'gasket', 'fuse']
+# Relative activity per hour of the day (one shift 07-19, a smaller evening shift) and per weekday (Monday first)
+HOUR_WEIGHTS = [0, 0, 0, 0, 0, 1, 3, 8, 12, 14, 14, 12, 8, 11, 13, 12, 10, 7, 4, 2, 1, 1, 0, 0]
+WEEKDAY_WEIGHTS = [1.0, 1.05, 1.05, 1.0, 1.1, 0.5, 0.2]
+PEAK_DAY_OF_YEAR = 330 # Late November
+RESTOCK_QUANTITIES = (12, 24, 48, 96, 120, 240)
+
+TRANSACTION_COLUMNS = [
+    'transaction_id', 'transaction_date', 'transaction_type', 'product_id', 'location_id', 'quantity',
+    'reference_number', 'notes', 'user_id', 'related_transaction', 'created_at',
+]
+TRANSFER_COLUMNS = [
+    'transfer_id', 'transfer_date', 'product_id', 'from_location_id', 'to_location_id', 'quantity',
+    'notes', 'user_id', 'created_at',
+]
+
+
+class SyntheticDataset:
+    """Generates one synthetic dataset; call generate() inside an app context."""
+
+    def __init__(self, seed=42, prefix='SYN', products=10000, transactions=1000000, days=365, end_date=None,
+                 category_depth=3, category_fanout=5, warehouses=3, location_depth=3, location_fanout=4,
+                 suppliers=200, users=20, locations_per_product=3, zipf=1.1, seasonality=0.5,
+                 transfer_ratio=0.05, receiving_ratio=0.2, adjustment_ratio=0.02, password='synthetic',
+                 chunk_size=50000, progress=None):
+        if location_depth > len(LOCATION_LEVELS):
+            raise ValueError(f"location_depth can be at most {len(LOCATION_LEVELS)}")
+        self.rng = random.Random(seed)
+        self.prefix = prefix
+        self.product_count = products
+        self.transaction_count = transactions
+        self.days = days
+        self.end_date = end_date or datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
+        self.category_depth = category_depth
+        self.category_fanout = category_fanout
+        self.warehouses = warehouses
+        self.location_depth = location_depth
+        self.location_fanout = location_fanout
+        self.supplier_count = suppliers
+        self.user_count = users
+        self.locations_per_product = locations_per_product
+        self.zipf = zipf
+        self.seasonality = seasonality
+        self.transfer_ratio = transfer_ratio
+        self.receiving_ratio = receiving_ratio
+        self.adjustment_ratio = adjustment_ratio
+        self.password = password
+        self.chunk_size = chunk_size
+        self.progress = progress or (lambda message: None)
+        self.counts = {}
+
+    # --- Entry point ---
+
+    def generate(self):
+        """Writes the dataset and commits; returns the number of rows written per table."""
+        if db.session.execute(select(Product.id).where(Product.sku.like(f"{self.prefix}-%")).limit(1)).first():
+            raise ConflictException(f"The database already contains {self.prefix}-* products; use another prefix.")
+        try:
+            self._write(Category, ['category_id', 'name', 'parent_id', 'created_at', 'updated_at'],
+                        self._tree_rows(Category, 'category', self.category_fanout, self.category_fanout,
+                                        self.category_depth, 'categories'))
+            self._write(Location, ['location_id', 'name', 'parent_location', 'is_active', 'created_at', 'updated_at'],
+                        self._tree_rows(Location, None, self.warehouses, self.location_fanout,
+                                        self.location_depth, 'locations'))
+            self._write(Supplier, ['supplier_id', 'name', 'email', 'created_at', 'updated_at'], self._supplier_rows())
+            self._write(User, ['id', 'username', 'email', 'password_hash', 'is_active', 'created_at', 'updated_at'],
+                        self._user_rows())
+            self._write(Product, ['product_id', 'sku', 'name', 'category_id', 'supplier_id', 'unit_cost', 'unit_price',
+                                  'unit_measure', 'volume', 'min_stock', 'is_active', 'created_at', 'updated_at'],
+                        self._product_rows())
+            self._write(Barcode, ['barcode_id', 'product_id', 'barcode', 'is_primary', 'created_at'], self._barcode_rows())
+            self._write_movements()
+            self._write(StockLevel, ['stock_id', 'product_id', 'location_id', 'quantity', 'last_updated'],
+                        self._stock_rows())
+            self._reset_sequences()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Derived tables, rebuilt set-based from what was just loaded
+        from ..services.category_service import CategoryService
+        from ..services.location_service import LocationService
+        from ..services.capacity_service import CapacityService
+        self.progress('Rebuilding category and location hierarchies and utilization...')
+        CategoryService().rebuild_hierarchy()
+        LocationService().rebuild_hierarchy()
+        CapacityService().rebuild()
+        if db.session.connection().dialect.name == 'postgresql':
+            db.session.execute(text('ANALYZE'))
+            db.session.commit()
+        return self.counts
+
+    # --- Helpers ---
+
+    def _next_id(self, model):
+        return (db.session.execute(select(func.max(model.id))).scalar() or 0) + 1
+
+    def _write(self, model, columns, rows):
+        started = time.perf_counter()
+        total = copy_rows(model.__table__, columns, rows, chunk_size=self.chunk_size)
+        self.counts[model.__tablename__] = self.counts.get(model.__tablename__, 0) + total
+        self.progress(f"{model.__tablename__}: {total} rows in {time.perf_counter() - started:.1f}s")
+        return total
+
+    def _tree_rows(self, model, label, roots, fanout, depth, attribute):
+        """Rows of a tree `depth` levels deep; keeps the leaf ids in self.<attribute>."""
+        now = self.end_date
+        next_id = self._next_id(model)
+        rows, level = [], [(None, '')]
+        for d in range(depth):
+            children = []
+            for parent_id, path in level:
+                for i in range(1, (roots if d == 0 else fanout) + 1):
+                    child_path = f"{path}.{i}" if path else str(i)
+                    name = f"{self.prefix} {label or LOCATION_LEVELS[d]} {child_path}"
+                    if model is Location:
+                        rows.append((next_id, name, parent_id, True, now, now))
+                    else:
+                        rows.append((next_id, name, parent_id, now, now))
+                    children.append((next_id, child_path))
+                    next_id += 1
+            level = children
+        setattr(self, attribute, [node_id for node_id, _ in level])
+        return rows
+
+    def _supplier_rows(self):
+        first_id = self._next_id(Supplier)
+        self.suppliers = list(range(first_id, first_id + self.supplier_count))
+        return [(supplier_id, f"{self.prefix} supplier {i}", f"{self.prefix.lower()}-supplier-{i}@example.com",
+                 self.end_date, self.end_date) for i, supplier_id in enumerate(self.suppliers)]
+
+    def _user_rows(self):
+        first_id = self._next_id(User)
+        self.users = list(range(first_id, first_id + self.user_count))
+        password_hash = generate_password_hash(self.password)
+        return [(user_id, f"{self.prefix.lower()}-user-{i}", f"{self.prefix.lower()}-user-{i}@example.com",
+                 password_hash, True, self.end_date, self.end_date) for i, user_id in enumerate(self.users)]
+
+    def _product_rows(self):
+        rng = self.rng
+        first_id = self._next_id(Product)
+        self.products = list(range(first_id, first_id + self.product_count))
+        units = list(UnitMeasure)
+        for i, product_id in enumerate(self.products):
+            cost = round(rng.lognormvariate(2.5, 1.0), 2)
+            yield (product_id, f"{self.prefix}-{i:07d}", f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+                   rng.choice(self.categories), rng.choice(self.suppliers), cost, round(cost * rng.uniform(1.2, 2.0), 2),
+                   rng.choice(units), round(rng.uniform(0.01, 2.0), 2), rng.choice((0, 5, 10, 20, 50)), True,
+                   self.end_date, self.end_date)
+
+    def _barcode_rows(self):
+        """
+        One primary barcode per product, a second one for one in ten: EAN-13 codes in the
+        restricted-circulation range (prefix 2), built from the product id so they never collide.
+        """
+        next_id = self._next_id(Barcode)
+        for product_id in self.products:
+            for n, is_primary in enumerate((True, False) if self.rng.random() < 0.1 else (True,)):
+                yield (next_id, product_id, _ean13(int(f"2{product_id:010d}{n}")), is_primary, self.end_date)
+                next_id += 1
+
+    def _day_quotas(self):
+        """Stock movements per day over the window: seasonal and weekday weights, apportioned exactly."""
+        start = self.end_date - timedelta(days=self.days)
+        days = [start + timedelta(days=i) for i in range(self.days)]
+        weights = [
+            (1 + self.seasonality * math.cos(2 * math.pi * (day.timetuple().tm_yday - PEAK_DAY_OF_YEAR) / 365.25))
+            * WEEKDAY_WEIGHTS[day.weekday()]
+            for day in days
+        ]
+        total = sum(weights)
+        exact = [self.transaction_count * weight / total for weight in weights]
+        quotas = [int(value) for value in exact]
+        # Largest remainders get the rows lost to rounding
+        for i in sorted(range(len(days)), key=lambda i: exact[i] - quotas[i], reverse=True)[:self.transaction_count - sum(quotas)]:
+            quotas[i] += 1
+        return zip(days, quotas)
+
+    # --- Movements ---
+
+    def _write_movements(self):
+        rng = self.rng
+        popularity = self.products[:]
+        rng.shuffle(popularity) # Popular SKUs are spread over the catalog, not the first ids
+        popularity_weights = list(accumulate(1 / (rank + 1) ** self.zipf for rank in range(len(popularity))))
+        hour_weights = list(accumulate(HOUR_WEIGHTS))
+        leaves = self.locations
+        self.product_locations = {
+            product_id: rng.sample(leaves, min(len(leaves), rng.randint(1, self.locations_per_product)))
+            for product_id in self.products
+        }
+        self.stock = {}
+        stock = self.stock
+        transaction_id = self._next_id(InventoryTransaction)
+        transfer_id = self._next_id(LocationTransfer)
+        users = self.users
+        transfer_limit = self.transfer_ratio
+        adjustment_limit = transfer_limit + self.adjustment_ratio
+        receiving_limit = adjustment_limit + self.receiving_ratio
+        entrada, salida, ajuste = TransactionType.entrada, TransactionType.salida, TransactionType.ajuste
+        origen, destino = TransactionType.transferencia_origen, TransactionType.transferencia_destino
+
+        transactions, transfers = [], []
+        totals = {'inventory_transactions': 0, 'location_transfers': 0}
+        started = time.perf_counter()
+
+        def flush():
+            totals['inventory_transactions'] += copy_rows(
+                InventoryTransaction.__table__, TRANSACTION_COLUMNS, transactions, chunk_size=self.chunk_size)
+            totals['location_transfers'] += copy_rows(
+                LocationTransfer.__table__, TRANSFER_COLUMNS, transfers, chunk_size=self.chunk_size)
+            transactions.clear()
+            transfers.clear()
+            self.progress(f"inventory_transactions: {totals['inventory_transactions']} rows "
+                          f"({time.perf_counter() - started:.1f}s)")
+
+        for day, quota in self._day_quotas():
+            if not quota:
+                continue
+            seconds = sorted(hour * 3600 + rng.random() * 3600
+                             for hour in rng.choices(range(24), cum_weights=hour_weights, k=quota))
+            picks = rng.choices(popularity, cum_weights=popularity_weights, k=quota)
+            for offset, product_id in zip(seconds, picks):
+                at = day + timedelta(seconds=offset)
+                user_id = users[int(rng.random() * len(users))]
+                locations = self.product_locations[product_id]
+                location_id = locations[int(rng.random() * len(locations))]
+                key = (product_id, location_id)
+                on_hand = stock.get(key, 0)
+                roll = rng.random()
+
+                if roll < transfer_limit and on_hand > 0:
+                    # Rebalance to another of the product's locations, or open a new one
+                    destinations = ([location for location in locations if location != location_id]
+                                    or [location for location in (rng.choice(leaves),) if location != location_id])
+                    if destinations:
+                        to_location = rng.choice(destinations)
+                        if to_location not in locations:
+                            locations.append(to_location)
+                        quantity = rng.randint(1, max(1, on_hand // 2))
+                        stock[key] = on_hand - quantity
+                        stock[(product_id, to_location)] = stock.get((product_id, to_location), 0) + quantity
+                        transfers.append((transfer_id, at, product_id, location_id, to_location, quantity, None, user_id, at))
+                        transactions.append((transaction_id, at, origen, product_id, location_id, quantity,
+                                             f"Transfer Out {transfer_id}", None, user_id, transaction_id + 1, at))
+                        transactions.append((transaction_id + 1, at, destino, product_id, to_location, quantity,
+                                             f"Transfer In {transfer_id}", None, user_id, transaction_id, at))
+                        transaction_id += 2
+                        transfer_id += 1
+                        continue
+
+                if roll < adjustment_limit and on_hand > 0:
+                    transaction_type, quantity = ajuste, rng.choice((-2, -1, 1, 2, 3))
+                    if on_hand + quantity < 0:
+                        quantity = -quantity
+                    stock[key] = on_hand + quantity
+                    notes = 'Cycle count'
+                else:
+                    quantity = max(1, int(rng.expovariate(1 / 3)))
+                    if roll < receiving_limit or on_hand < quantity:
+                        # Stock-outs are resolved by a delivery
+                        transaction_type, quantity = entrada, rng.choice(RESTOCK_QUANTITIES)
+                        stock[key] = on_hand + quantity
+                    else:
+                        transaction_type = salida
+                        stock[key] = on_hand - quantity
+                    notes = None
+                transactions.append((transaction_id, at, transaction_type, product_id, location_id, quantity,
+                                     None, notes, user_id, None, at))
+                transaction_id += 1
+
+            if len(transactions) >= self.chunk_size:
+                flush()
+        flush()
+        self.counts.update(totals)
+
+    def _stock_rows(self):
+        next_id = self._next_id(StockLevel)
+        for product_id in self.products:
+            for location_id in self.product_locations[product_id]:
+                yield (next_id, product_id, location_id, self.stock.get((product_id, location_id), 0), self.end_date)
+                next_id += 1
+
+    def _reset_sequences(self):
+        """Moves PostgreSQL's id sequences past the explicit ids written above."""
+        if db.session.connection().dialect.name != 'postgresql':
+            return
+        for model in (Category, Location, Supplier, User, Product, Barcode, InventoryTransaction,
+                      LocationTransfer, StockLevel):
+            table, column = model.__tablename__, model.__table__.primary_key.columns[0].name
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table}', '{column}'), (SELECT MAX({column}) FROM {table}))"
+            ))
+
+
+def _ean13(digits):
+    """Appends the EAN-13 check digit to a 12-digit number."""
+    code = f"{digits:012d}"
+    total = sum(int(digit) * (3 if i % 2 else 1) for i, digit in enumerate(code))
+    return code + str((10 - total % 10) % 10)
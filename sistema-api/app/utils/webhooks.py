@@ -0,0 +1,229 @@
+# inventory_api/app/utils/webhooks.py
+"""
+Webhooks for downstream systems (ERP, storefront): capture into the outbox, and the HTTP side of
+the delivery done by WebhookService (`flask webhooks-run`).
+
+Capture: while WEBHOOK_ENDPOINTS is set, every flush that writes an inventory transaction or a stock
+level appends webhook_outbox rows in the same transaction (so an event exists if and only if its
+movement committed), and the request returns without calling anyone:
+  - inventory.movement: a new inventory transaction
+  - stock_level.changed: the resulting quantity of a product at a location (null when deleted)
+  - stock_levels.resync: stock_levels changed in bulk (a projection rebuild): re-fetch the levels
+The hooks are on the Session base class (ASGI sessions included); with shards, the outbox is a sharded table.
+
+Delivery: WebhookClient keeps one HTTP/1.1 connection open per endpoint origin, reused across batches.
+Bodies are signed with WEBHOOK_SECRET (X-Webhook-Signature: sha256=<HMAC of the body>).
+StubReceiver is a local endpoint for tests and development (`flask webhooks-receiver`).
+"""
+
+import hashlib
+import hmac
+import http.client
+import json
+import threading
+from datetime import datetime
+from decimal import Decimal
+from urllib.parse import urlsplit
+from flask import current_app, has_app_context
+from sqlalchemy import event, insert
+from sqlalchemy.orm import Session, object_mapper
+from ..models import WebhookOutbox
+
+MOVEMENT = 'inventory.movement'
+STOCK_LEVEL_CHANGED = 'stock_level.changed'
+STOCK_LEVELS_RESYNC = 'stock_levels.resync'
+CENTS = Decimal('0.01')
+
+
+def init_webhooks(app):
+    """Enables the outbox when endpoints are configured (WEBHOOK_ENDPOINTS) and registers the session hooks once."""
+    app.extensions['webhooks'] = bool(app.config.get('WEBHOOK_ENDPOINTS'))
+    if not event.contains(Session, 'after_flush', _enqueue_flushed_rows):
+        event.listen(Session, 'after_flush', _enqueue_flushed_rows)
+        event.listen(Session, 'do_orm_execute', _enqueue_bulk_statements)
+
+
+def _enabled():
+    return has_app_context() and current_app.extensions.get('webhooks', False)
+
+
+def _quantity(value):
+    return str(Decimal(str(value)).quantize(CENTS))
+
+
+def _date(value):
+    # Dates may still be SQL expressions (server-side now()) right after the flush
+    return (value if isinstance(value, datetime) else datetime.utcnow()).isoformat()
+
+
+def _enqueue(session, events):
+    if events:
+        now = datetime.utcnow()
+        session.execute(
+            insert(WebhookOutbox.__table__),
+            [{'event_type': event_type, 'payload': payload, 'created_at': now} for event_type, payload in events],
+        )
+
+
+def _enqueue_flushed_rows(session, flush_context):
+    if not _enabled():
+        return
+    movements, levels = [], {}
+    for instance in session.new | session.dirty | session.deleted:
+        table = object_mapper(instance).local_table.name
+        if table == 'inventory_transactions' and instance in session.new:
+            movements.append((MOVEMENT, {
+                'transaction_id': instance.id,
+                'transaction_type': instance.transaction_type.value,
+                'product_id': instance.product_id,
+                'location_id': instance.location_id,
+                'quantity': _quantity(instance.quantity),
+                'reference_number': instance.reference_number,
+                'user_id': instance.user_id,
+                'related_transaction_id': instance.related_transaction_id,
+                'transaction_date': _date(instance.transaction_date),
+            }))
+        elif table == 'stock_levels' and (instance not in session.dirty or session.is_modified(instance)):
+            levels[(instance.product_id, instance.location_id)] = (STOCK_LEVEL_CHANGED, {
+                'product_id': instance.product_id,
+                'location_id': instance.location_id,
+                'quantity': None if instance in session.deleted else _quantity(instance.quantity),
+            })
+    movements.sort(key=lambda item: item[1]['transaction_id'])
+    _enqueue(session, movements + [levels[key] for key in sorted(levels)])
+
+
+def _enqueue_bulk_statements(orm_execute_state):
+    if orm_execute_state.is_select or not _enabled():
+        return
+    if getattr(getattr(orm_execute_state.statement, 'table', None), 'name', None) == 'stock_levels':
+        _enqueue(orm_execute_state.session, [(STOCK_LEVELS_RESYNC, {})])
+
+
+# --- Delivery ---
+
+def signature(secret, body):
+    """The X-Webhook-Signature of a body (bytes): sha256=<hex HMAC>."""
+    return 'sha256=' + hmac.new(secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+
+
+class WebhookClient:
+    """
+    POSTs to webhook endpoints over kept-alive connections, one per origin (scheme, host, port),
+    so a batch costs no TCP/TLS handshake. Not thread-safe: one client per dispatcher.
+    """
+
+    def __init__(self, timeout=10):
+        self.timeout = timeout
+        self._connections = {}
+
+    def post(self, url, body, headers):
+        """Sends a body (bytes); returns the response status. Raises OSError/HTTPException when the request fails."""
+        parts = urlsplit(url)
+        origin = (parts.scheme, parts.netloc)
+        path = (parts.path or '/') + (f"?{parts.query}" if parts.query else '')
+        headers = {'Content-Type': 'application/json', 'Content-Length': str(len(body)), **headers}
+        while True:
+            reused = origin in self._connections
+            connection = self._connections.get(origin) or self._connect(parts)
+            self._connections[origin] = connection
+            try:
+                connection.request('POST', path, body=body, headers=headers)
+                response = connection.getresponse()
+                response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                self._drop(origin)
+                if reused:
+                    continue # The server closed the idle connection: retry once on a new one
+                raise
+            except (OSError, http.client.HTTPException):
+                self._drop(origin)
+                raise
+            if response.will_close:
+                self._drop(origin)
+            return response.status
+
+    def close(self):
+        for origin in list(self._connections):
+            self._drop(origin)
+
+    def _connect(self, parts):
+        if parts.scheme == 'https':
+            return http.client.HTTPSConnection(parts.hostname, parts.port, timeout=self.timeout)
+        if parts.scheme == 'http':
+            return http.client.HTTPConnection(parts.hostname, parts.port, timeout=self.timeout)
+        raise ValueError(f"Unsupported webhook URL: {parts.geturl()}")
+
+    def _drop(self, origin):
+        connection = self._connections.pop(origin, None)
+        if connection is not None:
+            connection.close()
+
+
+class StubReceiver:
+    """
+    A local webhook endpoint: records the batches POSTed to it (`batches`, `events`) and answers 200,
+    or `fail_with` to the next `failures` requests. With a secret, unsigned or badly signed bodies get 401.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, secret=None, on_batch=None):
+        self.secret = secret
+        self.on_batch = on_batch
+        self.batches = []
+        self.failures = 0
+        self.fail_with = 503
+        self._lock = threading.Lock()
+        from http.server import ThreadingHTTPServer # Only tests and `flask webhooks-receiver` need it
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/"
+
+    @property
+    def events(self):
+        return [event_data for batch in self.batches for event_data in batch['events']]
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def receive(self, body, headers):
+        """Returns the status for a request (bytes body, headers mapping)."""
+        if self.secret and not hmac.compare_digest(headers.get('X-Webhook-Signature', ''), signature(self.secret, body)):
+            return 401
+        with self._lock:
+            if self.failures:
+                self.failures -= 1
+                return self.fail_with
+            batch = json.loads(body)
+            self.batches.append(batch)
+        if self.on_batch:
+            self.on_batch(batch, headers)
+        return 200
+
+    def _handler(self):
+        from http.server import BaseHTTPRequestHandler
+        receiver = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1' # Keep-alive, as the dispatcher expects
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                status = receiver.receive(body, self.headers)
+                self.send_response(status)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
@@ -0,0 +1,80 @@
+# inventory_api/app/warmup.py
+# Startup work for prefork servers (see gunicorn.conf.py): what can be shared is done once
+# in the master before fork, what cannot (connections) is redone in each worker.
+
+import gc
+from sqlalchemy.orm import configure_mappers
+from sqlalchemy.pool import NullPool
+from .db import db
+from .utils.exceptions import NotFoundException
+
+
+def preload(app):
+    """
+    Runs in the master before fork: configures the mappers and builds the URL map so
+    every worker inherits them (copy-on-write) instead of redoing them on its first request.
+    """
+    configure_mappers()
+    app.load_routes() # Route modules and services are otherwise imported on the first request
+    app.url_map.update()
+    with app.app_context():
+        # Nothing opened before fork may be used by the workers
+        for engine in db.engines.values():
+            engine.dispose()
+    # Move everything loaded so far out of the GC's reach; collections in the workers
+    # would otherwise touch (and copy) these pages
+    gc.collect()
+    gc.freeze()
+
+
+def after_fork(app):
+    """Runs in each worker right after fork: drop pool state inherited from the master."""
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def warm_up(app):
+    """
+    Runs in each worker before it accepts requests: opens DB_WARMUP_CONNECTIONS pool
+    connections per engine and runs the hot read paths once, so SQLAlchemy's compiled
+    statement cache and the URL map are ready for the first real request.
+    A database that is down only produces a warning; the worker still starts. A database still
+    carrying the trg_update_stock trigger stops it (RuntimeError), as it would double-count stock.
+    """
+    from .services import InventoryService, ProductService, ProjectionService
+
+    connections = app.config.get('DB_WARMUP_CONNECTIONS', 2)
+    legacy_triggers = None
+    with app.app_context():
+        try:
+            for engine in db.engines.values():
+                if isinstance(engine.pool, NullPool):
+                    continue
+                held = []
+                try:
+                    for _ in range(connections):
+                        held.append(engine.connect())
+                finally:
+                    for connection in held:
+                        connection.close()
+
+            inventory_service = InventoryService()
+            try:
+                inventory_service.lookup_barcode('__warmup__')
+            except NotFoundException:
+                pass
+            inventory_service.get_stock(product_id=-1)
+            ProductService().get_all_products(pagination={'page': 1, 'limit': 1})
+            try:
+                ProjectionService().check_legacy_triggers()
+            except RuntimeError as e:
+                legacy_triggers = e
+        except Exception as e:
+            print(f"Worker warm-up could not reach the database: {str(e).splitlines()[0]}")
+        finally:
+            db.session.remove()
+    if legacy_triggers is not None:
+        raise legacy_triggers
+
+    app.url_map.update() # No-op when preloaded
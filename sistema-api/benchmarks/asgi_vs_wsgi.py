@@ -0,0 +1,222 @@
+# inventory_api/benchmarks/asgi_vs_wsgi.py
+"""
+Compares concurrent-connection throughput of the WSGI app (threaded server) and the
+ASGI mode (app/asgi.py under uvicorn) on the hot inventory endpoints.
+
+    python benchmarks/asgi_vs_wsgi.py --concurrency 200 --requests 5000 --endpoint barcode
+    python benchmarks/asgi_vs_wsgi.py --database-url postgresql://... --seed --endpoint add
+
+Without --database-url a temporary SQLite database is created and seeded. SQLite answers
+in microseconds, so the gap between the two modes shows up mainly against a networked
+PostgreSQL, where WSGI threads sit blocked on the database.
+Results are printed (and optionally written with --output) as JSON.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+SEED_PRODUCTS = 200
+SEED_LOCATIONS = 10
+
+WSGI_SERVER = """
+import sys
+from werkzeug.serving import make_server
+from app import create_app
+app = create_app('config.ProductionConfig')
+make_server('127.0.0.1', int(sys.argv[1]), app, threaded=True).serve_forever()
+"""
+
+
+def seed(database_url):
+    """Creates the schema and benchmark rows (SKUs BENCH-00000...), with stock at every location."""
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app
+    from app.db import db
+    from app.models import Product, Location, User, StockLevel
+
+    app = create_app('config.ProductionConfig')
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Product).filter(Product.sku == 'BENCH-00000').first():
+            return
+        user = User(username='bench', email='bench@example.com', password_hash='x')
+        products = [Product(sku=f"BENCH-{i:05d}", name=f"Bench product {i}") for i in range(SEED_PRODUCTS)]
+        locations = [Location(name=f"Bench location {i}") for i in range(SEED_LOCATIONS)]
+        db.session.add_all([user] + products + locations)
+        db.session.flush()
+        db.session.add_all([
+            StockLevel(product_id=product.id, location_id=location.id, quantity=1000000)
+            for product in products for location in locations
+        ])
+        db.session.commit()
+
+
+def bench_ids(database_url):
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app
+    from app.db import db
+    from app.models import Product, Location, User
+
+    app = create_app('config.ProductionConfig')
+    with app.app_context():
+        products = [row.id for row in db.session.query(Product.id).filter(Product.sku.like('BENCH-%'))]
+        locations = [row.id for row in db.session.query(Location.id).filter(Location.name.like('Bench location %'))]
+        user = db.session.query(User.id).filter(User.username == 'bench').scalar()
+    return products, locations, user
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_server(mode, port, database_url, workers, extra_env=None):
+    env = {**os.environ, 'DATABASE_URL': database_url, 'FLASK_ENV': 'production', 'PYTHONPATH': BASE_DIR,
+           'ADMISSION_CONTROL_ENABLED': 'false'} # A handful of benchmark users would be rate limited
+    env.update(extra_env or {})
+    if mode == 'wsgi':
+        command = [sys.executable, '-c', WSGI_SERVER, str(port)]
+    elif mode == 'gunicorn':
+        # The production launcher (serve.py / gunicorn.conf.py)
+        command = [sys.executable, 'serve.py']
+        env.update({'GUNICORN_BIND': f"127.0.0.1:{port}", 'WEB_CONCURRENCY': str(workers), 'GUNICORN_ACCESS_LOG': ''})
+    else:
+        command = [sys.executable, '-m', 'uvicorn', '--factory', 'app.asgi:create_asgi_app',
+                   '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers), '--log-level', 'warning']
+    process = subprocess.Popen(command, cwd=BASE_DIR, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=0.5).close()
+            return process
+        except OSError:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode} server did not start")
+
+
+def make_request(endpoint, ids):
+    products, locations, user = ids
+    if endpoint == 'barcode':
+        return 'GET', f"/api/inventory/barcode/BENCH-{random.randrange(SEED_PRODUCTS):05d}", None
+    if endpoint == 'stock':
+        return 'GET', f"/api/inventory/stock?product_id={random.choice(products)}", None
+    body = {'product_id': random.choice(products), 'location_id': random.choice(locations), 'quantity': 1, 'user_id': user}
+    return 'POST', '/api/inventory/add', json.dumps(body).encode()
+
+
+async def send_request(reader, writer, method, path, body):
+    headers = f"{method} {path} HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+    if body is not None:
+        headers += f"Content-Type: application/json\r\nContent-Length: {len(body)}\r\n"
+    writer.write(headers.encode() + b"\r\n" + (body or b''))
+    await writer.drain()
+
+    status = int((await reader.readline()).split()[1])
+    length, close = 0, False
+    while True:
+        line = (await reader.readline()).strip()
+        if not line:
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        if name.lower() == 'content-length':
+            length = int(value)
+        elif name.lower() == 'connection' and value.strip().lower() == 'close':
+            close = True
+    await reader.readexactly(length)
+    return status, close
+
+
+async def run_load(port, endpoint, ids, total, concurrency):
+    latencies, errors = [], 0
+    remaining = iter(range(total))
+
+    async def client():
+        nonlocal errors
+        reader = writer = None
+        for _ in remaining:
+            if writer is None:
+                reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            method, path, body = make_request(endpoint, ids)
+            start = time.perf_counter()
+            try:
+                status, close = await send_request(reader, writer, method, path, body)
+            except (OSError, asyncio.IncompleteReadError, IndexError, ValueError):
+                errors += 1
+                writer.close()
+                writer = None
+                continue
+            latencies.append(time.perf_counter() - start)
+            if status >= 400:
+                errors += 1
+            if close:
+                writer.close()
+                writer = None
+        if writer is not None:
+            writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    duration = time.perf_counter() - started
+
+    latencies.sort()
+    def percentile(p):
+        return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+    return {
+        'requests': total,
+        'errors': errors,
+        'duration_s': round(duration, 3),
+        'throughput_rps': round(total / duration, 1),
+        'latency_ms': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99), 'max': percentile(1.0)},
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Database to test against (default: temporary SQLite)')
+    parser.add_argument('--seed', action='store_true', help='Create tables and BENCH-* rows in --database-url')
+    parser.add_argument('--endpoint', choices=['barcode', 'stock', 'add'], default='barcode')
+    parser.add_argument('--requests', type=int, default=2000, help='Requests per mode')
+    parser.add_argument('--concurrency', type=int, default=100, help='Concurrent connections')
+    parser.add_argument('--workers', type=int, default=1, help='uvicorn worker processes')
+    parser.add_argument('--modes', default='wsgi,asgi')
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    if args.seed or not args.database_url:
+        seed(database_url)
+    ids = bench_ids(database_url)
+
+    results = {'endpoint': args.endpoint, 'concurrency': args.concurrency, 'modes': {}}
+    for mode in args.modes.split(','):
+        port = free_port()
+        server = start_server(mode, port, database_url, args.workers)
+        try:
+            asyncio.run(run_load(port, args.endpoint, ids, min(50, args.requests), 5)) # warm-up
+            results['modes'][mode] = asyncio.run(run_load(port, args.endpoint, ids, args.requests, args.concurrency))
+        finally:
+            server.terminate()
+            server.wait()
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output)
+
+
+if __name__ == '__main__':
+    main()
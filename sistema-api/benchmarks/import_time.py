@@ -0,0 +1,124 @@
+# inventory_api/benchmarks/import_time.py
+"""
+Tracks application startup cost with `python -X importtime`.
+
+    python benchmarks/import_time.py                          # print results
+    python benchmarks/import_time.py --save startup.json      # record a baseline
+    python benchmarks/import_time.py --baseline startup.json  # exit 1 on a regression
+
+Each scenario runs in a fresh interpreter (--runs times, median reported):
+  create_app     the app factory alone, i.e. what every CLI command and test process pays
+  first_request  create_app plus one request, which loads the route modules and services
+For each one the JSON output has the wall time, the total import time reported by
+-X importtime, the number of modules imported and the slowest imports (top two levels).
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+SCENARIOS = {
+    'create_app': "from app import create_app\ncreate_app('config.TestingConfig')",
+    'first_request': (
+        "from app import create_app\n"
+        "create_app('config.TestingConfig').test_client().get('/api/internal/pool')"
+    ),
+}
+
+
+def parse_importtime(stderr):
+    """Returns [(module, depth, self_us, cumulative_us)] from -X importtime output."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, module = line[len('import time:'):].split('|')
+        # Nested imports are indented by two spaces per level
+        depth = (len(module) - len(module.lstrip()) - 1) // 2
+        rows.append((module.strip(), depth, int(self_us), int(cumulative_us)))
+    return rows
+
+
+def run_scenario(code):
+    env = {**os.environ, 'PYTHONPATH': BASE_DIR}
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=BASE_DIR, env=env, capture_output=True, text=True,
+    )
+    wall = time.perf_counter() - started
+    if result.returncode != 0:
+        raise RuntimeError(f"scenario failed:\n{result.stderr[-2000:]}")
+    rows = parse_importtime(result.stderr)
+    return wall, rows
+
+
+def measure(code, runs, top):
+    walls, imports, modules = [], [], []
+    slowest = None
+    for _ in range(runs):
+        wall, rows = run_scenario(code)
+        walls.append(wall)
+        imports.append(sum(row[2] for row in rows))
+        modules.append(len(rows))
+        if slowest is None:
+            # Top-level imports and what they import directly (e.g. app -> flask_migrate)
+            shallow = sorted((row for row in rows if row[1] <= 1), key=lambda row: row[3], reverse=True)
+            slowest = [{'module': row[0], 'cumulative_ms': round(row[3] / 1000, 1)} for row in shallow[:top]]
+    return {
+        'wall_ms': round(statistics.median(walls) * 1000, 1),
+        'import_ms': round(statistics.median(imports) / 1000, 1),
+        'modules': int(statistics.median(modules)),
+        'slowest_imports': slowest,
+    }
+
+
+def regressions(results, baseline, tolerance):
+    """Scenarios whose import time grew more than `tolerance` (a fraction) over the baseline."""
+    found = []
+    for name, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(name)
+        if previous and current['import_ms'] > previous['import_ms'] * (1 + tolerance):
+            found.append(f"{name}: import time {previous['import_ms']}ms -> {current['import_ms']}ms")
+        if previous and current['modules'] > previous['modules'] * (1 + tolerance):
+            found.append(f"{name}: modules imported {previous['modules']} -> {current['modules']}")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--runs', type=int, default=5, help='Interpreter runs per scenario')
+    parser.add_argument('--top', type=int, default=10, help='Slowest imports to list')
+    parser.add_argument('--scenarios', default=','.join(SCENARIOS))
+    parser.add_argument('--save', help='Write the JSON results to this file (e.g. as the new baseline)')
+    parser.add_argument('--baseline', help='Compare against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed growth over the baseline (default 20%%)')
+    args = parser.parse_args()
+
+    results = {'python': sys.version.split()[0], 'runs': args.runs, 'scenarios': {}}
+    for name in args.scenarios.split(','):
+        results['scenarios'][name] = measure(SCENARIOS[name], args.runs, args.top)
+
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.save:
+        with open(args.save, 'w') as handle:
+            handle.write(output)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            found = regressions(results, json.load(handle), args.tolerance)
+        for message in found:
+            print(f"Startup regression: {message}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
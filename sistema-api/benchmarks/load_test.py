@@ -0,0 +1,387 @@
+# inventory_api/benchmarks/load_test.py
+"""
+End-to-end load harness: starts the API against a real database, seeds a synthetic catalog
+and drives a weighted mix of warehouse workloads over keep-alive HTTP connections.
+
+    python benchmarks/load_test.py --duration 30 --concurrency 50
+    python benchmarks/load_test.py --server gunicorn --workers 4 --mix picking=60,search=40
+    python benchmarks/load_test.py --database-url postgresql://... --seed --products 50000 \\
+        --burst-size 100 --burst-every 10 --compare benchmarks/results/previous.json
+    python benchmarks/load_test.py --url http://staging:8000 --database-url postgresql://...
+
+Workloads (--mix name=weight,...; or a preset: default, receiving, picking, reporting):
+  search      product search by name / SKU fragment, paginated
+  picking     barcode scan followed by a stock removal at one location
+  receiving   stock additions (plus --burst-size concurrent additions every --burst-every s)
+  transfers   stock transfers between two locations
+  reports     low-stock and stock-level reports, transaction history of a product
+
+Without --database-url a temporary SQLite file is used. Results (throughput, p50/p95/p99
+latency, status codes and error rate per endpoint) are printed and saved as JSON under
+--output-dir, named after the time and git commit, so runs can be compared over time.
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import subprocess
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+from asgi_vs_wsgi import BASE_DIR, free_port, send_request, start_server
+
+SKU_PREFIX = 'LOAD-'
+NOUNS = ['bolt', 'screw', 'washer', 'bracket', 'hinge', 'cable', 'valve', 'filter', 'pump', 'sensor']
+ADJECTIVES = ['steel', 'brass', 'nylon', 'heavy', 'compact', 'industrial', 'coated', 'threaded']
+
+MIXES = {
+    'default': {'search': 35, 'picking': 30, 'receiving': 15, 'reports': 10, 'transfers': 10},
+    'receiving': {'receiving': 70, 'search': 20, 'picking': 10},
+    'picking': {'picking': 70, 'search': 25, 'receiving': 5},
+    'reporting': {'reports': 60, 'search': 40},
+}
+
+
+# --- Synthetic data ---
+
+def seed_catalog(database_url, products, locations, stocked_locations=3):
+    """
+    Creates the schema and a synthetic catalog (SKUs LOAD-00000...), unless already there:
+    categories, suppliers, `locations` locations, `products` products with one barcode each,
+    stocked at `stocked_locations` random locations.
+    """
+    os.environ['DATABASE_URL'] = database_url
+    from sqlalchemy import insert
+    from app import create_app
+    from app.db import db
+    from app.models import Product, Category, Supplier, Location, User, StockLevel, Barcode
+
+    app = create_app('config.ProductionConfig')
+    with app.app_context():
+        db.create_all()
+        if db.session.query(Product.id).filter(Product.sku == f"{SKU_PREFIX}00000").first():
+            return
+        rng = random.Random(42)
+        db.session.add(User(username='load', email='load@example.com', password_hash='x'))
+        db.session.execute(insert(Category), [{'name': f"Load category {i}"} for i in range(50)])
+        db.session.execute(insert(Supplier), [{'name': f"Load supplier {i}"} for i in range(100)])
+        db.session.execute(insert(Location), [{'name': f"Load location {i}"} for i in range(locations)])
+        category_ids = [row.id for row in db.session.query(Category.id).filter(Category.name.like('Load category %'))]
+        supplier_ids = [row.id for row in db.session.query(Supplier.id).filter(Supplier.name.like('Load supplier %'))]
+        location_ids = [row.id for row in db.session.query(Location.id).filter(Location.name.like('Load location %'))]
+
+        for start in range(0, products, 5000):
+            batch = range(start, min(start + 5000, products))
+            db.session.execute(insert(Product), [{
+                'sku': f"{SKU_PREFIX}{i:05d}",
+                'name': f"{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {i}",
+                'category_id': rng.choice(category_ids),
+                'supplier_id': rng.choice(supplier_ids),
+                'unit_price': round(rng.uniform(0.5, 500), 2),
+                'min_stock': rng.randint(0, 50),
+            } for i in batch])
+            rows = db.session.query(Product.id, Product.sku).filter(
+                Product.sku.between(f"{SKU_PREFIX}{batch[0]:05d}", f"{SKU_PREFIX}{batch[-1]:05d}")
+            ).all()
+            db.session.execute(insert(Barcode), [
+                {'product_id': row.id, 'barcode': f"LB{row.sku[len(SKU_PREFIX):]}", 'is_primary': True} for row in rows
+            ])
+            db.session.execute(insert(StockLevel), [
+                {'product_id': row.id, 'location_id': location_id, 'quantity': rng.randint(100, 1000)}
+                for row in rows for location_id in rng.sample(location_ids, min(stocked_locations, len(location_ids)))
+            ])
+        db.session.commit()
+
+
+def load_catalog(database_url):
+    """Returns the ids the workloads pick from: products (id, barcode), locations and the load user."""
+    os.environ['DATABASE_URL'] = database_url
+    from app import create_app
+    from app.db import db
+    from app.models import Product, Location, User, StockLevel
+
+    app = create_app('config.ProductionConfig')
+    with app.app_context():
+        products = [(row.id, f"LB{row.sku[len(SKU_PREFIX):]}")
+                    for row in db.session.query(Product.id, Product.sku).filter(Product.sku.like(f"{SKU_PREFIX}%"))]
+        stock = defaultdict(list)
+        for row in db.session.query(StockLevel.product_id, StockLevel.location_id).join(Product).filter(
+                Product.sku.like(f"{SKU_PREFIX}%")):
+            stock[row.product_id].append(row.location_id)
+        locations = [row.id for row in db.session.query(Location.id).filter(Location.name.like('Load location %'))]
+        user = db.session.query(User.id).filter(User.username == 'load').scalar()
+    if not products:
+        raise SystemExit('No LOAD-* products in the database: run with --seed')
+    return {'products': products, 'stock': dict(stock), 'locations': locations, 'user': user}
+
+
+# --- Workloads: each returns the requests of one user action as (label, method, path, body) ---
+
+def search(catalog, rng):
+    if rng.random() < 0.7:
+        path = f"/api/products/?name={rng.choice(NOUNS)}&page={rng.randint(1, 5)}&limit=20"
+    else:
+        # A SKU fragment: matches up to ten products
+        path = f"/api/products/?sku={SKU_PREFIX}{rng.randrange(len(catalog['products'])) // 10:04d}&page=1&limit=20"
+    return [('GET /api/products/?name|sku', 'GET', path, None)]
+
+
+def picking(catalog, rng):
+    product_id, barcode = rng.choice(catalog['products'])
+    location_id = rng.choice(catalog['stock'].get(product_id) or catalog['locations'])
+    body = {'product_id': product_id, 'location_id': location_id, 'quantity': rng.randint(1, 3), 'user_id': catalog['user']}
+    return [
+        ('GET /api/inventory/barcode/<code>', 'GET', f"/api/inventory/barcode/{barcode}", None),
+        ('POST /api/inventory/remove', 'POST', '/api/inventory/remove', body),
+    ]
+
+
+def receiving(catalog, rng):
+    product_id, _ = rng.choice(catalog['products'])
+    body = {'product_id': product_id, 'location_id': rng.choice(catalog['locations']),
+            'quantity': rng.randint(10, 200), 'user_id': catalog['user']}
+    return [('POST /api/inventory/add', 'POST', '/api/inventory/add', body)]
+
+
+def transfers(catalog, rng):
+    product_id, _ = rng.choice(catalog['products'])
+    from_location = rng.choice(catalog['stock'].get(product_id) or catalog['locations'])
+    to_location = rng.choice([location for location in catalog['locations'] if location != from_location])
+    body = {'product_id': product_id, 'from_location_id': from_location, 'to_location_id': to_location,
+            'quantity': 1, 'user_id': catalog['user']}
+    return [('POST /api/inventory/transfer', 'POST', '/api/inventory/transfer', body)]
+
+
+def reports(catalog, rng):
+    roll = rng.random()
+    if roll < 0.5:
+        return [('GET /api/reports/low-stock', 'GET', '/api/reports/low-stock', None)]
+    if roll < 0.6:
+        return [('GET /api/reports/stock-levels', 'GET', '/api/reports/stock-levels', None)]
+    product_id, _ = rng.choice(catalog['products'])
+    return [('GET /api/transactions/?productId', 'GET', f"/api/transactions/?productId={product_id}&page=1&limit=50", None)]
+
+
+WORKLOADS = {'search': search, 'picking': picking, 'receiving': receiving, 'transfers': transfers, 'reports': reports}
+
+
+def parse_mix(value):
+    if value in MIXES:
+        return MIXES[value]
+    mix = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        if name.strip() not in WORKLOADS:
+            raise SystemExit(f"Unknown workload {name!r}; choose from {', '.join(WORKLOADS)}")
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+# --- Driver ---
+
+class Results:
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(Counter)
+
+    def record(self, label, status, seconds):
+        self.statuses[label][status] += 1
+        if seconds is not None and status < 400: # Error responses are often fast: they would flatter the percentiles
+            self.latencies[label].append(seconds)
+
+    def summary(self, duration):
+        def stats(latencies, statuses):
+            latencies = sorted(latencies)
+            total = sum(statuses.values())
+            errors = sum(count for status, count in statuses.items() if status == 'error' or int(status) >= 400)
+
+            def percentile(p):
+                return round(latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1000, 2) if latencies else None
+            return {
+                'failing': bool(total) and errors == total, # No latency to publish: fix the endpoint first
+                'requests': total,
+                'throughput_rps': round(total / duration, 1),
+                'error_rate': round(errors / total, 4) if total else 0,
+                'statuses': {str(status): count for status, count in sorted(statuses.items(), key=str)},
+                # Of the successful responses only
+                'latency_ms': {'p50': percentile(0.50), 'p95': percentile(0.95), 'p99': percentile(0.99),
+                               'max': percentile(1.0)},
+            }
+
+        all_statuses = Counter()
+        for statuses in self.statuses.values():
+            all_statuses.update(statuses)
+        return {
+            'overall': stats([s for values in self.latencies.values() for s in values], all_statuses),
+            'endpoints': {label: stats(self.latencies[label], self.statuses[label]) for label in sorted(self.statuses)},
+        }
+
+
+class Client:
+    """One keep-alive connection; reconnects after errors or Connection: close."""
+
+    def __init__(self, host, port, results):
+        self.host, self.port, self.results = host, port, results
+        self.reader = self.writer = None
+
+    async def request(self, label, method, path, body):
+        payload = json.dumps(body).encode() if body is not None else None
+        started = time.perf_counter()
+        try:
+            if self.writer is None:
+                self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+            status, close = await send_request(self.reader, self.writer, method, path, payload)
+        except (OSError, asyncio.IncompleteReadError, IndexError, ValueError):
+            self.results.record(label, 'error', None)
+            self.close()
+            return
+        self.results.record(label, status, time.perf_counter() - started)
+        if close:
+            self.close()
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+async def user(client, catalog, mix, rng, deadline):
+    names, weights = list(mix), list(mix.values())
+    while time.perf_counter() < deadline:
+        for request in WORKLOADS[rng.choices(names, weights)[0]](catalog, rng):
+            await client.request(*request)
+    client.close()
+
+
+async def receiving_bursts(host, port, results, catalog, rng, size, every, deadline):
+    """A delivery arrives: `size` stock additions at once, every `every` seconds."""
+    while time.perf_counter() + every < deadline:
+        await asyncio.sleep(every)
+        clients = [Client(host, port, results) for _ in range(size)]
+        await asyncio.gather(*(client.request(*receiving(catalog, rng)[0]) for client in clients))
+        for client in clients:
+            client.close()
+
+
+async def run_load(host, port, catalog, mix, concurrency, duration, burst_size, burst_every, seed):
+    results = Results()
+    deadline = time.perf_counter() + duration
+    tasks = [user(Client(host, port, results), catalog, mix, random.Random(seed + i), deadline) for i in range(concurrency)]
+    if burst_size and burst_every:
+        tasks.append(receiving_bursts(host, port, results, catalog, random.Random(seed - 1), burst_size, burst_every, deadline))
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    return results.summary(time.perf_counter() - started)
+
+
+# --- Reporting ---
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(current, previous):
+    """Prints throughput and p95 changes per endpoint against an earlier result file."""
+    rows = [('overall', current['results']['overall'], previous['results']['overall'])]
+    rows += [(label, values, previous['results']['endpoints'].get(label))
+             for label, values in current['results']['endpoints'].items()]
+    print(f"\nCompared with {previous['meta'].get('started_at')} ({previous['meta'].get('git_commit')}):")
+    for label, now, before in rows:
+        if not before or now.get('failing') or before.get('failing'):
+            continue
+        def change(new, old):
+            return f"{(new - old) / old * 100:+.1f}%" if new is not None and old else 'n/a'
+        print(f"  {label:40} rps {now['throughput_rps']:>9} ({change(now['throughput_rps'], before['throughput_rps'])})"
+              f"  p95 {now['latency_ms']['p95']}ms ({change(now['latency_ms']['p95'], before['latency_ms']['p95'])})"
+              f"  errors {now['error_rate']:.2%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Database the server uses (default: temporary SQLite file)')
+    parser.add_argument('--seed', action='store_true', help='Seed the synthetic catalog into --database-url')
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--locations', type=int, default=20)
+    parser.add_argument('--server', choices=['wsgi', 'gunicorn', 'asgi'], default='gunicorn')
+    parser.add_argument('--workers', type=int, default=2, help='Worker processes (gunicorn / asgi)')
+    parser.add_argument('--url', help='Test an already running server instead of starting one')
+    parser.add_argument('--mix', default='default', help=f"Preset ({', '.join(MIXES)}) or name=weight,...")
+    parser.add_argument('--concurrency', type=int, default=20, help='Simulated users (one connection each)')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds of load')
+    parser.add_argument('--warmup', type=float, default=3, help='Seconds of unrecorded load first')
+    parser.add_argument('--burst-size', type=int, default=0, help='Concurrent additions per receiving burst')
+    parser.add_argument('--burst-every', type=float, default=10, help='Seconds between receiving bursts')
+    parser.add_argument('--random-seed', type=int, default=1)
+    parser.add_argument('--output-dir', default=os.path.join(BASE_DIR, 'benchmarks', 'results'))
+    parser.add_argument('--compare', help='Earlier result file to compare with')
+    parser.add_argument('--rate-limits', action='store_true',
+                        help='Keep admission control on in the server started (off by default: few users, many writes)')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'load.db')}"
+    if args.seed or not args.database_url:
+        seed_catalog(database_url, args.products, args.locations)
+    catalog = load_catalog(database_url)
+    mix = parse_mix(args.mix)
+
+    server = None
+    if args.url:
+        host, _, port = args.url.split('://', 1)[-1].rstrip('/').partition(':')
+        port = int(port or 80)
+    else:
+        host, port = '127.0.0.1', free_port()
+        server = start_server(args.server, port, database_url, args.workers,
+                              {'ADMISSION_CONTROL_ENABLED': 'true'} if args.rate_limits else None)
+    started_at = datetime.now(timezone.utc).isoformat(timespec='seconds')
+    try:
+        if args.warmup:
+            asyncio.run(run_load(host, port, catalog, mix, min(args.concurrency, 5), args.warmup, 0, 0, args.random_seed))
+        results = asyncio.run(run_load(host, port, catalog, mix, args.concurrency, args.duration,
+                                       args.burst_size, args.burst_every, args.random_seed))
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    report = {
+        'meta': {
+            'started_at': started_at,
+            'git_commit': git_commit(),
+            'server': args.url or args.server,
+            'workers': None if args.url else args.workers,
+            'database': database_url.split('://', 1)[0],
+            'products': len(catalog['products']),
+            'locations': len(catalog['locations']),
+            'mix': mix,
+            'concurrency': args.concurrency,
+            'duration_s': args.duration,
+            'burst': {'size': args.burst_size, 'every_s': args.burst_every} if args.burst_size else None,
+        },
+        'results': results,
+    }
+    output = json.dumps(report, indent=2)
+    print(output)
+    failing = [label for label, values in results['endpoints'].items() if values['failing']]
+    if failing:
+        print(f"WARNING: every request failed on {', '.join(failing)}: their numbers measure errors, not the endpoint")
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"load-{started_at.replace(':', '')[:17]}-{report['meta']['git_commit'] or 'nogit'}.json")
+    with open(path, 'w') as handle:
+        handle.write(output)
+    print(f"Saved {path}")
+
+    if args.compare:
+        with open(args.compare) as handle:
+            compare(report, json.load(handle))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,325 @@
+# inventory_api/benchmarks/micro.py
+"""
+Micro-benchmarks for the Python costs on the request hot paths.
+
+    python benchmarks/micro.py                                # run everything
+    python benchmarks/micro.py --groups query --filter transfers  # some benchmarks only
+    python benchmarks/micro.py --save micro.json              # record a baseline
+    python benchmarks/micro.py --baseline micro.json          # exit 1 on a significant regression
+
+Groups:
+  serialize.<table>.<rows>   to_dict() over 1k / 10k loaded rows of a synthetic dataset
+                             (app/utils/synthetic.py, in-memory SQLite; relationships preloaded)
+  validate.<endpoint>.<case> the inventory request handlers up to the service call, for a valid body
+                             and typical rejected ones, plus the service-side parsing (TransactionType)
+  query.<report>.build       construction of every filter/sort combination of a ReportService query
+  query.<report>.compile     construction plus SQL compilation (PostgreSQL dialect, statement cache
+                             bypassed), i.e. the cost of a statement-cache miss
+
+Each benchmark is calibrated to run loops of at least --min-time seconds, warmed up, then timed
+--samples times with the garbage collector off; the median time per call and the interquartile
+range are reported. Against a baseline, a benchmark regresses when its median grew by more than
+--tolerance and a Mann-Whitney U test on the samples gives p < --alpha, so noise alone does not
+fail a run. Compare runs on the same machine and Python version.
+"""
+
+import argparse
+import gc
+import itertools
+import json
+import math
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from types import SimpleNamespace
+from unittest import mock
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, BASE_DIR)
+
+SERIALIZE_SIZES = (1000, 10000)
+
+
+# --- Harness ---
+
+def time_loops(func, loops):
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        started = time.perf_counter()
+        for _ in range(loops):
+            func()
+        return time.perf_counter() - started
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+
+def calibrate(func, min_time):
+    """Smallest loop count (1, 2, 5, 10, 20, ...) whose run takes at least min_time."""
+    for exponent in itertools.count():
+        for factor in (1, 2, 5):
+            loops = factor * 10 ** exponent
+            if time_loops(func, loops) >= min_time:
+                return loops
+
+
+def run_benchmark(func, samples, warmup, min_time):
+    loops = calibrate(func, min_time)
+    for _ in range(warmup):
+        time_loops(func, loops)
+    timings = [time_loops(func, loops) / loops * 1e6 for _ in range(samples)]
+    quartiles = statistics.quantiles(timings, n=4)
+    return {
+        'loops': loops,
+        'median_us': round(statistics.median(timings), 3),
+        'iqr_us': round(quartiles[2] - quartiles[0], 3),
+        'min_us': round(min(timings), 3),
+        'samples_us': [round(timing, 3) for timing in timings],
+    }
+
+
+def mann_whitney_p(a, b):
+    """Two-sided p-value of the Mann-Whitney U test (normal approximation, tie-corrected)."""
+    values = sorted([(value, 0) for value in a] + [(value, 1) for value in b])
+    ranks, ties, i = [0.0] * len(values), 0, 0
+    while i < len(values):
+        j = i
+        while j + 1 < len(values) and values[j + 1][0] == values[i][0]:
+            j += 1
+        for k in range(i, j + 1):
+            ranks[k] = (i + j) / 2 + 1
+        ties += (j - i + 1) ** 3 - (j - i + 1)
+        i = j + 1
+    n1, n2 = len(a), len(b)
+    n = n1 + n2
+    u = sum(rank for rank, (_, group) in zip(ranks, values) if group == 0) - n1 * (n1 + 1) / 2
+    sigma = math.sqrt(n1 * n2 / 12 * ((n + 1) - ties / (n * (n - 1))))
+    if sigma == 0:
+        return 1.0
+    return math.erfc(abs(u - n1 * n2 / 2) / sigma / math.sqrt(2))
+
+
+def compare(results, baseline, tolerance, alpha):
+    """Prints the change of every benchmark against the baseline; returns the regressions."""
+    found = []
+    print(f"\n{'benchmark':45} {'baseline':>12} {'current':>12} {'change':>8}  p-value")
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous:
+            continue
+        change = current['median_us'] / previous['median_us'] - 1
+        p = mann_whitney_p(previous['samples_us'], current['samples_us'])
+        flag = ''
+        if change > tolerance and p < alpha:
+            flag = '  REGRESSION'
+            found.append(f"{name}: {previous['median_us']}us -> {current['median_us']}us ({change:+.1%}, p={p:.4f})")
+        elif change < -tolerance and p < alpha:
+            flag = '  faster'
+        print(f"{name:45} {_us(previous['median_us']):>12} {_us(current['median_us']):>12} {change:>+8.1%}  {p:.4f}{flag}")
+    return found
+
+
+def _us(value):
+    return f"{value / 1000:.2f}ms" if value >= 1000 else f"{value:.2f}us"
+
+
+# --- Benchmarks (each group returns {name: zero-argument callable}) ---
+
+def serialization_benchmarks():
+    from datetime import datetime
+    from sqlalchemy import select
+    from sqlalchemy.orm import selectinload
+    from app.db import db
+    from app.models import Barcode, InventoryTransaction, LocationTransfer, Product, StockLevel
+    from app.utils.synthetic import SyntheticDataset
+
+    # Enough transfers for 10k LocationTransfer rows; fixed end date so every run sees the same rows
+    SyntheticDataset(products=max(SERIALIZE_SIZES), transactions=4 * max(SERIALIZE_SIZES), transfer_ratio=0.5,
+                     end_date=datetime(2025, 1, 1)).generate()
+
+    relationships = {
+        Product: ('category', 'supplier'),
+        StockLevel: ('product', 'location'),
+        InventoryTransaction: ('product', 'location', 'user'),
+        LocationTransfer: ('product', 'from_location', 'to_location', 'user'),
+        Barcode: (),
+    }
+    benchmarks = {}
+    for model, names in relationships.items():
+        for size in SERIALIZE_SIZES:
+            rows = db.session.scalars(
+                select(model).options(*(selectinload(getattr(model, name)) for name in names))
+                .order_by(model.id).limit(size)
+            ).all()
+            if len(rows) < size:
+                continue
+            benchmarks[f"serialize.{model.__tablename__}.{size // 1000}k"] = lambda rows=rows: [row.to_dict() for row in rows]
+    return benchmarks
+
+
+def validation_benchmarks():
+    from app.api import inventory
+    from app.services.inventory_service import InventoryService
+
+    # Stop at the service boundary: only the handlers' own parsing and validation is timed
+    # (plain functions rather than mocks, whose call overhead would dominate)
+    created = SimpleNamespace(id=1, to_dict=dict)
+    for method, value in (('create_inventory_transaction', created), ('create_location_transfer', created),
+                          ('get_stock', [])):
+        mock.patch.object(inventory.inventory_service, method, new=lambda *args, value=value, **kwargs: value).start()
+
+    movement = {'product_id': 1, 'location_id': 2, 'quantity': '5', 'user_id': 3, 'reference_number': 'PO-1'}
+    transfer = {'product_id': 1, 'from_location_id': 2, 'to_location_id': 3, 'quantity': 5, 'user_id': 3}
+    cases = {
+        'validate.add.valid': (inventory.handle_add_stock, movement),
+        'validate.add.missing_field': (inventory.handle_add_stock, {'product_id': 1, 'quantity': 5}),
+        'validate.add.bad_quantity': (inventory.handle_add_stock, {**movement, 'quantity': 'five'}),
+        'validate.remove.valid': (inventory.handle_remove_stock, movement),
+        'validate.remove.negative_quantity': (inventory.handle_remove_stock, {**movement, 'quantity': -1}),
+        'validate.adjust.valid': (inventory.handle_adjust_stock, {**movement, 'quantity': -2, 'notes': 'Cycle count'}),
+        'validate.adjust.missing_notes': (inventory.handle_adjust_stock, {**movement, 'notes': '  '}),
+        'validate.transfer.valid': (inventory.handle_transfer_stock, transfer),
+        'validate.transfer.same_location': (inventory.handle_transfer_stock, {**transfer, 'to_location_id': 2}),
+        'validate.stock.valid': (inventory.handle_stock_query, {'product_id': '1', 'location_id': '2'}),
+        'validate.stock.bad_id': (inventory.handle_stock_query, {'product_id': 'x'}),
+    }
+    benchmarks = {name: (lambda handler=handler, body=body: handler(body)) for name, (handler, body) in cases.items()}
+
+    service = InventoryService()
+
+    def parse_invalid_type():
+        try:
+            service._parse_transaction_data({**movement, 'transaction_type': 'devolucion'})
+        except Exception:
+            pass
+    benchmarks['validate.service.parse_transaction'] = (
+        lambda: service._parse_transaction_data({**movement, 'transaction_type': 'salida'}))
+    benchmarks['validate.service.invalid_type'] = parse_invalid_type
+    return benchmarks
+
+
+def _combinations(filters, sort_keys):
+    """Every subset of the filters, each with no sorting or one sort key in either order."""
+    sortings = [None] + [{key: order} for key in sort_keys for order in ('asc', 'desc')]
+    names = list(filters)
+    for size in range(len(names) + 1):
+        for subset in itertools.combinations(names, size):
+            for sorting in sortings:
+                yield {name: filters[name] for name in subset}, sorting
+
+
+def query_benchmarks():
+    from sqlalchemy.dialects import postgresql
+    from app.services.report_service import ReportService
+
+    service = ReportService()
+    dialect = postgresql.dialect()
+    dates = {'start_date': '2025-01-01', 'end_date': '2025-03-31'}
+    reports = {
+        'stock_levels': (service._build_stock_levels_query, _combinations(
+            {'product_id': 1, 'location_id': 2, 'category_id': 3, 'supplier_id': 4, 'include_descendants': True},
+            ['product_name', 'location_name', 'quantity', 'last_updated'])),
+        'low_stock': (service._build_low_stock_query, _combinations(
+            {'product_id': 1, 'location_id': 2},
+            ['product_name', 'location_name', 'sku', 'quantity', 'min_stock'])),
+        'transactions': (service._build_transaction_history_query, _combinations(
+            {'product_id': 1, 'location_id': 2, 'user_id': 3, 'transaction_type': 'salida', **dates},
+            ['transaction_date', 'product_name', 'location_name', 'user_username', 'quantity', 'transaction_type'])),
+        'transfers': (service._build_transfer_history_query, _combinations(
+            {'product_id': 1, 'from_location_id': 2, 'to_location_id': 3, 'user_id': 4, **dates},
+            ['transfer_date', 'product_name', 'from_location_name', 'to_location_name', 'user_username', 'quantity'])),
+    }
+    benchmarks = {}
+    for report, (build, combinations) in reports.items():
+        combinations = list(combinations)
+
+        def build_all(build=build, combinations=combinations):
+            for filters, sorting in combinations:
+                build(filters, sorting)
+
+        def compile_all(build=build, combinations=combinations):
+            for filters, sorting in combinations:
+                build(filters, sorting).statement.compile(dialect=dialect)
+
+        benchmarks[f"query.{report}.build"] = build_all
+        benchmarks[f"query.{report}.compile"] = compile_all
+        benchmarks[f"query.{report}.build"].combinations = len(combinations)
+        benchmarks[f"query.{report}.compile"].combinations = len(combinations)
+    return benchmarks
+
+
+GROUPS = {'serialize': serialization_benchmarks, 'validate': validation_benchmarks, 'query': query_benchmarks}
+
+
+# --- Main ---
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BASE_DIR, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--groups', default=','.join(GROUPS), help='Groups to set up and run')
+    parser.add_argument('--filter', default='', help='Only benchmarks whose name contains this')
+    parser.add_argument('--samples', type=int, default=15, help='Timed samples per benchmark')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed samples first')
+    parser.add_argument('--min-time', type=float, default=0.05, help='Minimum seconds per sample (sets the loop count)')
+    parser.add_argument('--save', help='Write the JSON results to this file (e.g. as the new baseline)')
+    parser.add_argument('--baseline', help='Compare against results saved with --save')
+    parser.add_argument('--tolerance', type=float, default=0.1, help='Allowed growth of the median (default 10%%)')
+    parser.add_argument('--alpha', type=float, default=0.01, help='Significance level of the comparison')
+    args = parser.parse_args()
+
+    import sqlalchemy
+    from app import create_app
+    from app.db import db
+
+    app = create_app('config.TestingConfig')
+    results = {
+        'meta': {
+            'python': sys.version.split()[0],
+            'implementation': platform.python_implementation(),
+            'sqlalchemy': sqlalchemy.__version__,
+            'machine': platform.machine(),
+            'git_commit': git_commit(),
+            'samples': args.samples,
+        },
+        'benchmarks': {},
+    }
+    with app.app_context():
+        db.create_all()
+        for group in args.groups.split(','):
+            benchmarks = {name: func for name, func in GROUPS[group]().items() if args.filter in name}
+            for name, func in benchmarks.items():
+                result = run_benchmark(func, args.samples, args.warmup, args.min_time)
+                combinations = getattr(func, 'combinations', None)
+                if combinations:
+                    result['combinations'] = combinations
+                    result['per_combination_us'] = round(result['median_us'] / combinations, 3)
+                results['benchmarks'][name] = result
+                extra = f"  ({_us(result['per_combination_us'])} x {combinations})" if combinations else ''
+                print(f"{name:45} {_us(result['median_us']):>12}  +- {_us(result['iqr_us'] / 2)}{extra}")
+
+    if args.save:
+        with open(args.save, 'w') as handle:
+            json.dump(results, handle, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as handle:
+            found = compare(results, json.load(handle), args.tolerance, args.alpha)
+        for message in found:
+            print(f"Micro-benchmark regression: {message}", file=sys.stderr)
+        if found:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
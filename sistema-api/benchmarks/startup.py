@@ -0,0 +1,114 @@
+# inventory_api/benchmarks/startup.py
+"""
+Measures cold start to first response and per-worker memory of the production
+launcher (serve.py / gunicorn.conf.py), with and without preload_app.
+
+    python benchmarks/startup.py --workers 4
+    python benchmarks/startup.py --database-url postgresql://... --workers 8
+
+Memory is read from /proc/<pid>/smaps_rollup (Linux): RSS counts shared pages in every
+worker, PSS splits them between the processes sharing them, USS (private) is what each
+extra worker really costs. Results are printed (and optionally written with --output) as JSON.
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+from asgi_vs_wsgi import BASE_DIR, free_port, seed
+
+
+def worker_pids(master_pid):
+    pids = []
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as handle:
+                    if int(handle.read().rsplit(')', 1)[1].split()[1]) == master_pid:
+                        pids.append(int(entry))
+            except (OSError, IndexError, ValueError):
+                continue
+    return pids
+
+
+def memory_kb(pid):
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as handle:
+        for line in handle:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                values[parts[0].rstrip(':')] = int(parts[1])
+    private = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return {'rss_kb': values.get('Rss', 0), 'pss_kb': values.get('Pss', 0), 'uss_kb': private}
+
+
+def first_response(port, deadline):
+    url = f"http://127.0.0.1:{port}/api/inventory/stock?product_id=1"
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=1).read()
+            return True
+        except urllib.error.HTTPError:
+            return True # Any HTTP answer means a worker is serving
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.02)
+    return False
+
+
+def measure(preload, workers, database_url):
+    port = free_port()
+    env = {**os.environ, 'DATABASE_URL': database_url, 'GUNICORN_PRELOAD': '1' if preload else '0',
+           'WEB_CONCURRENCY': str(workers), 'GUNICORN_BIND': f"127.0.0.1:{port}", 'GUNICORN_ACCESS_LOG': ''}
+    started = time.time()
+    master = subprocess.Popen([sys.executable, 'serve.py'], cwd=BASE_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not first_response(port, started + 60):
+            raise RuntimeError('server did not answer')
+        first_request_s = time.time() - started
+        # Let every worker finish booting and warming up before reading memory
+        deadline = time.time() + 30
+        while len(worker_pids(master.pid)) < workers and time.time() < deadline:
+            time.sleep(0.1)
+        time.sleep(1)
+        per_worker = [memory_kb(pid) for pid in worker_pids(master.pid)]
+        return {
+            'preload_app': preload,
+            'workers': len(per_worker),
+            'cold_start_to_first_response_s': round(first_request_s, 3),
+            'master': memory_kb(master.pid),
+            'worker_avg': {key: round(sum(w[key] for w in per_worker) / len(per_worker)) for key in per_worker[0]},
+        }
+    finally:
+        master.terminate()
+        master.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-url', help='Database to start against (default: temporary SQLite)')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--output', help='Also write the JSON results to this file')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'startup.db')}"
+    if not args.database_url:
+        seed(database_url)
+
+    results = [measure(preload, args.workers, database_url) for preload in (False, True)]
+    output = json.dumps(results, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, 'w') as handle:
+            handle.write(output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+# inventory_api/gunicorn.conf.py
+# Gunicorn settings for production (used by serve.py). Every value can be overridden from the environment.
+#
+# Reloading:
+#   kill -HUP <master>   re-reads this file and replaces the workers gracefully. With preload_app
+#                        the application code itself is NOT re-imported (it lives in the master).
+#   kill -USR2 <master>  starts a new master with the new code next to the old one; then send
+#                        kill -QUIT <old master> once the new workers are up (zero-downtime deploy).
+
+import glob
+import multiprocessing
+import os
+import tempfile
+
+# Workers share request metrics through files in this directory (app/utils/metrics.py); it has to be
+# set before the app (and prometheus_client) is imported
+if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='inventory-metrics-')
+
+wsgi_app = 'wsgi:application'
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', 4)) # Keep DB_POOL_SIZE + DB_MAX_OVERFLOW >= threads
+
+# Import the app, its models and mappers once in the master; workers share those pages copy-on-write
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') != '0'
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+# Recycle workers periodically to bound memory growth (0 = never)
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 0))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-') or None # Empty disables the access log
+errorlog = '-'
+
+
+def on_starting(server):
+    """Master, before anything else. Stale metric files from a previous run are removed,
+    except when this master was started by USR2 (GUNICORN_PID is set) and shares them."""
+    if 'GUNICORN_PID' not in os.environ:
+        for path in glob.glob(os.path.join(os.environ['PROMETHEUS_MULTIPROC_DIR'], '*.db')):
+            os.remove(path)
+
+
+def when_ready(server):
+    """Master, after loading the app (only with preload_app)."""
+    if preload_app:
+        from wsgi import app
+        from app.warmup import preload
+        preload(app)
+
+
+def post_fork(server, worker):
+    if preload_app:
+        from wsgi import app
+        from app.warmup import after_fork
+        after_fork(app)
+
+
+def post_worker_init(worker):
+    """Worker, after loading the app and before accepting connections."""
+    from wsgi import app
+    from app.warmup import warm_up
+    warm_up(app)
+
+
+def child_exit(server, worker):
+    """Master, after a worker exited: its in-flight gauges no longer count."""
+    from app.utils.metrics import mark_process_dead
+    mark_process_dead(worker.pid)
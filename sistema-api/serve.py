@@ -0,0 +1,17 @@
+# inventory_api/serve.py
+# Production launcher: prefork gunicorn workers with the settings in gunicorn.conf.py.
+#
+#   python serve.py                      # same as: gunicorn -c gunicorn.conf.py
+#   python serve.py --workers 8 --bind 0.0.0.0:9000
+#
+# (For development keep using `flask run`, which loads run.py.)
+
+import os
+import sys
+
+from gunicorn.app.wsgiapp import run
+
+if __name__ == '__main__':
+    config_file = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'gunicorn.conf.py')
+    sys.argv[1:1] = ['-c', config_file]
+    sys.exit(run())
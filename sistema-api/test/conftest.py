@@ -0,0 +1,81 @@
+import pytest
+from contextlib import contextmanager
+from werkzeug.security import generate_password_hash
+from config import TestingConfig
+from app import create_app
+from app.db import db
+from app.models import Location, Product, User
+from app.utils.query_stats import track_queries
+
+PICKER_PASSWORD_HASH = generate_password_hash('secret1') # Hashed once: it is slow on purpose
+
+
+def seed_rows():
+    """The rows a seeded app starts with: product 1 (SKU001), location 1 and user 1 ('picker' / 'secret1')."""
+    return [
+        Product(sku='SKU001', name='Product A'),
+        Location(name='Shelf 1'),
+        User(username='picker', email='picker@example.com', password_hash=PICKER_PASSWORD_HASH),
+    ]
+
+def make_seeded_app(config, rows=None):
+    """An app on `config` with its tables created and `rows` (default: seed_rows()) committed."""
+    app_instance = create_app(config_object=config)
+    with app_instance.app_context():
+        db.create_all()
+        db.session.add_all(seed_rows() if rows is None else rows)
+        db.session.commit()
+    return app_instance
+
+def add_stock(client, quantity=5, headers=None, status=201, **body):
+    """
+    POST /api/inventory/add of product 1 at location 1 by user 1; any field can be overridden through
+    `body` (None leaves it out). Asserts the response status unless status is None; returns the response.
+    """
+    payload = {'product_id': 1, 'location_id': 1, 'quantity': quantity, 'user_id': 1, **body}
+    response = client.post('/api/inventory/add', json={key: value for key, value in payload.items() if value is not None}, headers=headers)
+    if status is not None:
+        assert response.status_code == status, response.json
+    return response
+
+# --- Fixtures ---
+@pytest.fixture
+def app_config():
+    """The config of the `app` fixture: a test module overrides it to pass its TestingConfig subclass."""
+    return TestingConfig
+
+@pytest.fixture
+def seed():
+    """The rows of the `app` fixture: a test module overrides it to seed other rows."""
+    return seed_rows()
+
+@pytest.fixture
+def app(app_config, seed):
+    """A seeded app (make_seeded_app) on `app_config`, dropped afterwards. Modules that need another setup define their own."""
+    app_instance = make_seeded_app(app_config, seed)
+    yield app_instance
+    with app_instance.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def test_client(app):
+    with app.test_client() as client:
+        yield client
+
+@pytest.fixture
+def query_budget():
+    """
+    Asserts that a block runs at most `max_queries` SQL statements, e.g.
+
+        with query_budget(2):
+            test_client.get('/api/products/')
+
+    The failure message lists every statement and how many times it ran.
+    """
+    @contextmanager
+    def budget(max_queries):
+        with track_queries() as stats:
+            yield stats
+        assert stats.count <= max_queries, f"Query budget of {max_queries} exceeded:\n{stats.report()}"
+    return budget
@@ -0,0 +1,108 @@
+import pytest
+from unittest.mock import patch
+from config import TestingConfig
+from app import create_app
+from app.utils.admission import MemoryBucketStore, client_identity
+
+
+class AdmissionConfig(TestingConfig):
+    ADMISSION_CONTROL_ENABLED = True
+    RATE_LIMIT_USER_RATE = 1
+    RATE_LIMIT_USER_BURST = 3
+    RATE_LIMIT_ENDPOINT_RATE = 1
+    RATE_LIMIT_ENDPOINT_BURST = 5
+    RATE_LIMITS = {'products_api.import_products': (0.1, 1)}
+    ADMISSION_MAX_CONCURRENT = 2
+    ADMISSION_QUEUE_TIMEOUT_MS = 1
+
+# --- Fixtures ---
+@pytest.fixture
+def app():
+    app_instance = create_app(config_object=AdmissionConfig)
+    yield app_instance
+
+@pytest.fixture
+def test_client(app):
+    with app.test_client() as client:
+        yield client
+
+def add_stock(client, remote_addr='10.0.0.1', user_id=1):
+    # Fails validation (no quantity), which still costs a token and never reaches the database
+    return client.post('/api/inventory/add', json={'product_id': 1, 'location_id': 1, 'user_id': user_id},
+                       environ_base={'REMOTE_ADDR': remote_addr})
+
+# --- Tests ---
+
+def test_client_over_its_burst_gets_429_with_retry_after(test_client):
+    """Test that a client retrying past its burst is rejected before the view runs."""
+    assert [add_stock(test_client).status_code for _ in range(3)] == [400, 400, 400]
+
+    response = add_stock(test_client)
+    assert response.status_code == 429
+    assert response.json['success'] is False
+    assert int(response.headers['Retry-After']) >= 1
+
+def test_other_clients_keep_their_own_bucket(test_client):
+    """Test that one client's retries do not throttle another client."""
+    for _ in range(4):
+        add_stock(test_client)
+    assert add_stock(test_client, '10.0.0.2').status_code == 400
+
+def test_body_user_id_does_not_pick_the_bucket(test_client):
+    """Test that a client cannot get fresh buckets by changing the user_id of its bodies."""
+    assert [add_stock(test_client, user_id=user_id).status_code for user_id in range(1, 5)] == [400, 400, 400, 429]
+
+def test_endpoint_bucket_is_shared_by_all_clients(test_client):
+    """Test that an endpoint's own bucket caps the total rate over many clients."""
+    statuses = [add_stock(test_client, f"10.0.0.{n}").status_code for n in range(1, 7)]
+    assert statuses == [400] * 5 + [429]
+
+@patch('app.api.products.product_service.import_products', side_effect=ValueError('bad file'))
+def test_per_endpoint_override(mock_import, test_client):
+    """Test that RATE_LIMITS gives an endpoint its own per-client bucket."""
+    assert test_client.post('/api/products/import').status_code != 429
+    assert test_client.post('/api/products/import').status_code == 429
+    assert mock_import.call_count <= 1
+
+def test_reads_are_not_rate_limited(test_client):
+    """Test that GET requests never consume tokens."""
+    with patch('app.api.reports.report_service.get_stock_levels', return_value=[]):
+        assert all(test_client.get('/api/reports/stock-levels').status_code == 200 for _ in range(10))
+
+@patch('app.api.reports.report_service.get_stock_levels', return_value=[])
+def test_db_heavy_requests_get_503_when_no_slot_frees_up(mock_stock_levels, app, test_client):
+    """Test the concurrency cap: with every slot taken the request is shed, not queued on the pool."""
+    controller = app.extensions['admission']
+    held = [controller.acquire('reports_api') for _ in range(2)]
+    assert all(holds_slot for _, holds_slot in held)
+
+    response = test_client.get('/api/reports/stock-levels')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '1'
+    mock_stock_levels.assert_not_called()
+
+    controller.release()
+    assert test_client.get('/api/reports/stock-levels').status_code == 200
+    controller.release()
+    # The slots taken by requests were given back in teardown
+    assert [controller.acquire('reports_api')[1] for _ in range(2)] == [True, True]
+
+def test_admission_control_is_off_by_default_in_tests():
+    """Test that TestingConfig leaves the other suites unthrottled."""
+    assert 'admission' not in create_app(config_object='config.TestingConfig').extensions
+
+def test_bucket_refills_over_time():
+    """Test the token bucket arithmetic (rate 2/s, burst 2)."""
+    store = MemoryBucketStore()
+    with patch('app.utils.admission.time.monotonic', return_value=100.0):
+        assert store.take('k', 2, 2) == 0
+        assert store.take('k', 2, 2) == 0
+        assert store.take('k', 2, 2) == pytest.approx(0.5)
+    with patch('app.utils.admission.time.monotonic', return_value=100.5):
+        assert store.take('k', 2, 2) == 0
+        assert store.take('k', 2, 2) > 0
+
+def test_client_identity():
+    """Test that buckets are keyed by the authenticated user, else by address."""
+    assert client_identity(5, '10.0.0.1') == 'user:5'
+    assert client_identity(None, '10.0.0.1') == 'ip:10.0.0.1'
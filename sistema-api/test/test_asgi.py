@@ -0,0 +1,235 @@
+import pytest
+import asyncio
+import json
+import time
+
+pytest.importorskip('aiosqlite')
+pytest.importorskip('greenlet')
+
+from config import TestingConfig
+from app.asgi import InventoryASGI, async_database_url, wsgi_environ
+from app.utils.admission import AdmissionController, MemoryBucketStore
+from app.utils.query_stats import track_queries
+from app.utils.slow_queries import SlowQueryLog
+from app.db import db
+from app.models import Barcode, StockLevel
+from .conftest import make_seeded_app
+
+# --- Fixtures ---
+@pytest.fixture
+def asgi_app(tmp_path):
+    """ASGI app over a SQLite file (shared by the sync and the aiosqlite engines)."""
+    class AsgiConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'asgi.db'}"
+
+    flask_app = make_seeded_app(AsgiConfig)
+    with flask_app.app_context():
+        db.session.add_all([
+            Barcode(product_id=1, barcode='7501234567890'),
+            StockLevel(product_id=1, location_id=1, quantity=10),
+        ])
+        db.session.commit()
+
+    app_instance = InventoryASGI(flask_app)
+    yield app_instance
+    asyncio.run(app_instance.dispose())
+
+def call(app, method, path, body=None, query_string=b'', headers=()):
+    """Sends one HTTP request through the ASGI interface; returns (status, json body)."""
+    messages = [{'type': 'http.request', 'body': json.dumps(body).encode() if body is not None else b''}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {'type': 'http', 'method': method, 'path': path, 'query_string': query_string,
+             'headers': [(b'content-type', b'application/json'), *headers]}
+    asyncio.run(app(scope, receive, send))
+    return sent[0]['status'], json.loads(sent[1]['body'])
+
+# --- Tests ---
+
+def test_async_database_url():
+    """Test that sync URLs are mapped to their async drivers."""
+    assert async_database_url({'SQLALCHEMY_DATABASE_URI': 'postgresql://u:p@db/inv'}) == 'postgresql+asyncpg://u:p@db/inv'
+    assert async_database_url({'SQLALCHEMY_DATABASE_URI': 'sqlite:///x.db'}) == 'sqlite+aiosqlite:///x.db'
+    assert async_database_url({'SQLALCHEMY_DATABASE_URI': 'sqlite:///x.db', 'ASYNC_DATABASE_URL': 'custom://'}) == 'custom://'
+
+def test_add_and_remove_stock(asgi_app):
+    """Test that movements run through the shared handlers on the async engine."""
+    status, body = call(asgi_app, 'POST', '/api/inventory/add', {'product_id': 1, 'location_id': 1, 'quantity': 5, 'user_id': 1})
+    assert status == 201
+    assert body['success'] is True
+
+    status, body = call(asgi_app, 'POST', '/api/inventory/remove', {'product_id': 1, 'location_id': 1, 'quantity': 100, 'user_id': 1})
+    assert status == 409
+
+    status, body = call(asgi_app, 'GET', '/api/inventory/stock', query_string=b'product_id=1')
+    assert status == 200
+    assert body['data'][0]['quantity'] == '15.00'
+
+def test_movement_validation_is_shared(asgi_app):
+    """Test that the ASGI endpoints return the same validation errors as the Flask views."""
+    status, body = call(asgi_app, 'POST', '/api/inventory/add', {'product_id': 1, 'location_id': 1, 'quantity': -1, 'user_id': 1})
+    assert status == 400
+    assert body['message'] == 'Quantity must be positive for addition'
+
+def test_movements_go_through_admission_control(asgi_app):
+    """Test that the async routes apply the same per-client buckets as the Flask hooks."""
+    asgi_app.admission = AdmissionController(MemoryBucketStore(), user_limit=(0.01, 1))
+    movement = {'product_id': 1, 'location_id': 1, 'quantity': -1, 'user_id': 1}
+    assert call(asgi_app, 'POST', '/api/inventory/add', movement)[0] == 400
+    status, body = call(asgi_app, 'POST', '/api/inventory/add', {**movement, 'user_id': 2}) # Same address
+    assert status == 429
+    assert body['success'] is False
+    token = asgi_app.flask_app.extensions['auth'].issue(1)
+    headers = [(b'authorization', f"Bearer {token}".encode())]
+    assert call(asgi_app, 'POST', '/api/inventory/add', movement, headers=headers)[0] == 400
+
+def test_barcode_lookup(asgi_app):
+    """Test barcode lookup via the barcodes table and via the SKU."""
+    status, body = call(asgi_app, 'GET', '/api/inventory/barcode/7501234567890')
+    assert status == 200
+    assert body['data']['product']['sku'] == 'SKU001'
+    assert body['data']['stock'][0]['location_name'] == 'Shelf 1'
+
+    assert call(asgi_app, 'GET', '/api/inventory/barcode/SKU001')[0] == 200
+    assert call(asgi_app, 'GET', '/api/inventory/barcode/unknown')[0] == 404
+
+def test_other_paths_fall_back_to_flask(asgi_app):
+    """Test that non-hot endpoints are served by the WSGI app."""
+    status, body = call(asgi_app, 'GET', '/api/products/')
+    assert status == 200
+    assert body['data'][0]['sku'] == 'SKU001'
+
+def test_async_statements_are_instrumented(asgi_app):
+    """Test that the async engine's statements reach the query stats and the slow query log."""
+    flask_app = asgi_app.flask_app
+    slow_log = flask_app.extensions['slow_query_log'] = SlowQueryLog(threshold_ms=0.0001, sample_rate=0)
+    app_instance = InventoryASGI(flask_app)
+    try:
+        with track_queries() as stats:
+            status, _ = call(app_instance, 'GET', '/api/inventory/barcode/7501234567890')
+        assert status == 200
+        assert any('JOIN barcodes' in statement for statement in stats.statements)
+        assert any('JOIN barcodes' in entry['statement'] for entry in slow_log.entries())
+    finally:
+        asyncio.run(app_instance.dispose())
+
+def test_wsgi_environ_headers():
+    """Test the ASGI scope to WSGI environ conversion."""
+    scope = {'type': 'http', 'method': 'POST', 'path': '/api/products/', 'query_string': b'a=1',
+             'headers': [(b'content-type', b'application/json'), (b'x-forwarded-proto', b'https')]}
+    environ = wsgi_environ(scope, b'{}')
+    assert environ['CONTENT_TYPE'] == 'application/json'
+    assert environ['CONTENT_LENGTH'] == '2'
+    assert environ['HTTP_X_FORWARDED_PROTO'] == 'https'
+    assert environ['wsgi.input'].read() == b'{}'
+
+def test_stock_level_stream(asgi_app):
+    """Test that a committed movement reaches a subscribed stream, and not one filtered on another product."""
+    async def scenario():
+        disconnect = asyncio.Event()
+        streams = {}
+
+        async def open_stream(name, query_string):
+            sent = streams[name] = []
+
+            async def receive():
+                await disconnect.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {'type': 'http', 'method': 'GET', 'path': '/api/stream/stock-levels', 'query_string': query_string, 'headers': []}
+            await asgi_app(scope, receive, send)
+
+        tasks = [asyncio.ensure_future(open_stream('product_1', b'product_id=1')),
+                 asyncio.ensure_future(open_stream('product_2', b'product_id=2&location_id=1'))]
+        while asgi_app.stream.count < 2:
+            await asyncio.sleep(0.01)
+
+        movement = {'product_id': 1, 'location_id': 1, 'quantity': 5, 'user_id': 1}
+        await asyncio.get_running_loop().run_in_executor(None, lambda: call_in_loop(asgi_app, movement))
+        for _ in range(100):
+            if len(streams['product_1']) > 2:
+                break
+            await asyncio.sleep(0.01)
+        disconnect.set()
+        await asyncio.gather(*tasks)
+        asgi_app.stream.stop()
+        return streams
+
+    streams = asyncio.run(scenario())
+    start = streams['product_1'][0]
+    assert start['status'] == 200
+    assert (b'content-type', b'text/event-stream') in start['headers']
+    body = b''.join(message.get('body', b'') for message in streams['product_1'][1:])
+    assert b'event: stock_level\ndata: {"product_id": 1, "location_id": 1, "quantity": "15.00"}\n\n' in body
+    assert b'stock_level' not in b''.join(message.get('body', b'') for message in streams['product_2'][1:])
+    assert asgi_app.stream.count == 0
+
+def call_in_loop(app, movement):
+    """Posts a movement from another thread, through the app's event loop (as a concurrent client would)."""
+    future = asyncio.run_coroutine_threadsafe(post(app, movement), app.stream.loop)
+    assert future.result(timeout=10) == 201
+
+async def post(app, body):
+    sent = []
+    messages = [{'type': 'http.request', 'body': json.dumps(body).encode()}]
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    await app({'type': 'http', 'method': 'POST', 'path': '/api/inventory/add', 'query_string': b'',
+               'headers': [(b'content-type', b'application/json')]}, receive, send)
+    return sent[0]['status']
+
+def test_stock_level_stream_rejects_bad_filters(asgi_app):
+    """Test 400 for non-integer filters and 503 once the subscriber limit is reached."""
+    assert call(asgi_app, 'GET', '/api/stream/stock-levels', query_string=b'product_id=a')[0] == 400
+    asgi_app.stream.max_subscribers = 0
+    status, body = call(asgi_app, 'GET', '/api/stream/stock-levels')
+    assert status == 503
+    asgi_app.stream.stop()
+
+def test_change_feed_long_poll_waits_on_the_event_loop(asgi_app):
+    """Test that the ASGI app serves /api/changes itself: a long-poll waits without a worker thread, so no cap applies."""
+    asgi_app.flask_app.config.update(CHANGE_FEED_POLL_INTERVAL_S=0.05, CHANGE_FEED_GAP_TIMEOUT_S=0)
+    status, body = call(asgi_app, 'GET', '/api/changes')
+    assert status == 200
+    cursor = body['cursor']
+    waiters = asgi_app.flask_app.extensions['change_feed_waiters']
+    while waiters.acquire(blocking=False): # Every WSGI waiter slot taken
+        pass
+    started = time.monotonic()
+    status, body = call(asgi_app, 'GET', '/api/changes', query_string=f"since={cursor}&wait=0.2".encode())
+    assert status == 200
+    assert body['cursor'] == cursor
+    assert time.monotonic() - started >= 0.2
+    assert call(asgi_app, 'GET', '/api/changes', query_string=b'since=abc&wait=1')[0] == 400
+
+def test_startup_refuses_the_legacy_stock_trigger(asgi_app):
+    """Test that lifespan startup fails while trg_update_stock is installed."""
+    with asgi_app.flask_app.app_context():
+        db.session.execute(db.text("CREATE TRIGGER trg_update_stock AFTER INSERT ON inventory_transactions BEGIN SELECT 1; END"))
+        db.session.commit()
+    messages = [{'type': 'lifespan.startup'}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0)
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(asgi_app({'type': 'lifespan'}, receive, send))
+    assert sent[0]['type'] == 'lifespan.startup.failed'
+    assert 'flask projections-drop-trigger' in sent[0]['message']
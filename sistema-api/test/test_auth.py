@@ -0,0 +1,109 @@
+import pytest
+from sqlalchemy import event
+from config import TestingConfig
+from app.db import db
+from app.models import InventoryTransaction, User
+from app.utils.auth import AccessTokens
+from app.utils.exceptions import AuthenticationException
+from .conftest import add_stock, make_seeded_app
+
+
+class AuthConfig(TestingConfig):
+    AUTH_STATUS_CACHE_TTL = 60
+    METRICS_BEARER_TOKEN = 'scrape-token'
+
+# --- Fixtures ---
+@pytest.fixture
+def app_config():
+    return AuthConfig
+
+def login(client):
+    response = client.post('/api/auth/login', json={'identifier': 'picker', 'password': 'secret1'})
+    assert response.status_code == 200
+    return {'Authorization': f"Bearer {response.json['access_token']}"}
+
+def count_user_queries(app):
+    statements = []
+    with app.app_context():
+        event.listen(db.engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: statements.append(statement) if 'FROM users' in statement else None)
+    return statements
+
+# --- Tests ---
+
+def test_login_issues_a_token(test_client):
+    """Test that login returns a bearer token next to the user."""
+    response = test_client.post('/api/auth/login', json={'identifier': 'picker', 'password': 'secret1'})
+    assert response.json['token_type'] == 'Bearer'
+    assert response.json['expires_in'] == 8 * 3600
+    assert response.json['user']['username'] == 'picker'
+
+def test_token_replaces_body_user_and_user_lookup(app, test_client):
+    """Test that an authenticated movement takes its user from the token and skips the user lookup."""
+    headers = login(test_client)
+    user_queries = count_user_queries(app)
+
+    add_stock(test_client, headers=headers, user_id=None) # No user_id in the body
+    add_stock(test_client, headers=headers, user_id=999)
+    # One status query (cold cache) in all; the others load the user for the response after the commit
+    assert len([query for query in user_queries if 'users.tokens_revoked_at \nFROM' in query]) == 1
+    assert len(user_queries) == 3
+    user_queries.clear()
+    add_stock(test_client)
+    assert len(user_queries) == 2 # Without a token: the lookup, then the same load for the response
+
+    with app.app_context():
+        assert {t.user_id for t in db.session.query(InventoryTransaction)} == {1}
+
+def test_requests_without_token_keep_the_body_user(test_client):
+    """Test the fallback for clients that do not send a token yet."""
+    add_stock(test_client)
+    add_stock(test_client, user_id=999, status=404)
+
+def test_invalid_token_is_rejected(test_client):
+    """Test that a tampered token gets 401 before the view runs."""
+    headers = login(test_client)
+    headers['Authorization'] = headers['Authorization'][:-2] + 'xx'
+    response = add_stock(test_client, headers=headers, user_id=None, status=401)
+    assert response.headers['WWW-Authenticate'] == 'Bearer'
+    assert response.json['message'] == 'Invalid access token.'
+
+def test_logout_revokes_the_token(test_client):
+    """Test that logout revokes earlier tokens but not the next login's."""
+    headers = login(test_client)
+    assert test_client.post('/api/auth/logout', headers=headers).status_code == 200
+    assert add_stock(test_client, headers=headers, user_id=None, status=401).json['message'] == 'Access token revoked.'
+    assert test_client.post('/api/auth/logout').status_code == 401
+
+    add_stock(test_client, headers=login(test_client), user_id=None)
+
+def test_deactivated_user_is_rejected_after_the_cache_ttl(app, test_client):
+    """Test that the active-user status is cached, then refreshed."""
+    headers = login(test_client)
+    add_stock(test_client, headers=headers, user_id=None)
+    with app.app_context():
+        db.session.get(User, 1).is_active = False
+        db.session.commit()
+
+    add_stock(test_client, headers=headers, user_id=None) # Still cached
+    app.extensions['auth'].forget(1) # As when the TTL expires
+    assert add_stock(test_client, headers=headers, user_id=None, status=None).json['message'] == 'User account is inactive.'
+
+def test_expired_token(app):
+    """Test that tokens older than AUTH_TOKEN_MAX_AGE are rejected."""
+    tokens = AccessTokens('test-secret-key', max_age=-1)
+    with app.app_context(), pytest.raises(AuthenticationException, match='expired'):
+        tokens.verify(tokens.issue(1))
+
+def test_auth_required():
+    """Test AUTH_REQUIRED: writes need a token, login does not."""
+    class RequiredConfig(AuthConfig):
+        AUTH_REQUIRED = True
+    client = make_seeded_app(RequiredConfig).test_client()
+    add_stock(client, status=401)
+    add_stock(client, headers=login(client), user_id=None)
+    assert client.get('/api/inventory/stock?product_id=1').status_code == 200
+
+def test_other_bearer_tokens_are_left_alone(test_client):
+    """Test that /metrics keeps checking its own bearer token."""
+    assert test_client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'}).status_code == 200
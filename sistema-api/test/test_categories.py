@@ -651,4 +651,52 @@ def test_create_category_whitespace_name_field(mock_create_category, test_client
     )
     mock_create_category.assert_not_called()
     assert response.status_code == 400
-    assert response.json == {'success': False, 'message': 'Category name is required and must be a non-empty string'}
\ No newline at end of file
+    assert response.json == {'success': False, 'message': 'Category name is required and must be a non-empty string'}
+
+
+def test_rebuild_closure_command():
+    """Test that `flask categories-rebuild-closure` backfills the closure of categories written without it."""
+    from config import TestingConfig
+    from app.models import Category, CategoryClosure
+    from .conftest import make_seeded_app
+
+    app = make_seeded_app(TestingConfig, [
+        Category(id=1, name='Tools'), Category(id=2, name='Hand tools', parent_id=1), Category(id=3, name='Hammers', parent_id=2),
+    ])
+    result = app.test_cli_runner().invoke(args=['categories-rebuild-closure'])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == 'Rebuilt category_closure: 6 rows.'
+    with app.app_context():
+        assert sorted(CategoryClosure.query.filter_by(descendant_id=3).with_entities(CategoryClosure.ancestor_id, CategoryClosure.depth)) == [
+            (1, 2), (2, 1), (3, 0)]
+
+
+def test_move_subtree_relinks_the_closure():
+    """Test real (unmocked) closure maintenance: a subtree move re-links every row below it, and a cycle is refused."""
+    from config import TestingConfig
+    from app.models import CategoryClosure
+    from app.services.category_service import CategoryService
+    from .conftest import make_seeded_app
+
+    app = make_seeded_app(TestingConfig, [])
+    with app.app_context():
+        service = CategoryService()
+        tools = service.create_category({'name': 'Tools'})
+        hand_tools = service.create_category({'name': 'Hand tools', 'parent_id': tools.id})
+        hammers = service.create_category({'name': 'Hammers', 'parent_id': hand_tools.id})
+        garden = service.create_category({'name': 'Garden'})
+
+        def closure():
+            return sorted(CategoryClosure.query.with_entities(
+                CategoryClosure.ancestor_id, CategoryClosure.descendant_id, CategoryClosure.depth))
+
+        assert closure() == [(1, 1, 0), (1, 2, 1), (1, 3, 2), (2, 2, 0), (2, 3, 1), (3, 3, 0), (4, 4, 0)]
+
+        service.update_category(hand_tools.id, {'parent_id': garden.id})
+        assert closure() == [(1, 1, 0), (2, 2, 0), (2, 3, 1), (3, 3, 0), (4, 2, 1), (4, 3, 2), (4, 4, 0)]
+        assert sorted(service.get_descendant_ids(garden.id)) == [2, 3, 4]
+
+        with pytest.raises(ConflictException):
+            service.update_category(hand_tools.id, {'parent_id': hammers.id})
+        service.update_category(hand_tools.id, {'parent_id': None})
+        assert closure() == [(1, 1, 0), (2, 2, 0), (2, 3, 1), (3, 3, 0), (4, 4, 0)]
@@ -0,0 +1,123 @@
+import pytest
+import threading
+import time
+from datetime import datetime, timedelta
+from config import TestingConfig
+from app import create_app
+from app.db import db
+from app.models import ChangeLog, Product
+from .conftest import add_stock
+
+
+class ChangesConfig(TestingConfig):
+    CHANGE_FEED_POLL_INTERVAL_S = 0.05
+    CHANGE_FEED_GAP_TIMEOUT_S = 0 # SQLite has no concurrent writers: the head needs no settling
+
+# --- Fixtures ---
+@pytest.fixture
+def app_config():
+    return ChangesConfig
+
+def changes(client, since, **params):
+    response = client.get('/api/changes', query_string={'since': since, **params})
+    assert response.status_code == 200, response.json
+    return response.json
+
+# --- Tests ---
+
+def test_changes_since_a_cursor(test_client):
+    """Test that only the rows changed after the cursor come back, once each, with their current state."""
+    cursor = test_client.get('/api/changes').json['cursor']
+    assert cursor == '2' # The fixture's product and location
+    assert changes(test_client, cursor)['data'] == {'products': [], 'locations': [], 'stock_levels': [], 'transactions': []}
+
+    add_stock(test_client)
+    add_stock(test_client, 2)
+    assert test_client.put('/api/products/1', json={'name': 'Renamed'}).status_code == 200
+    feed = changes(test_client, cursor)
+    assert [product['name'] for product in feed['data']['products']] == ['Renamed']
+    assert [(level['location_id'], level['quantity']) for level in feed['data']['stock_levels']] == [(1, '7.00')]
+    assert sorted(transaction['quantity'] for transaction in feed['data']['transactions']) == ['2.00', '5.00']
+    assert feed['data']['locations'] == []
+    assert not feed['has_more']
+
+    assert changes(test_client, feed['cursor'])['cursor'] == feed['cursor'] # Nothing new
+
+def test_deleted_rows_and_pages(app, test_client):
+    """Test the keys of deleted rows and paging with limit."""
+    cursor = test_client.get('/api/changes').json['cursor']
+    location_id = test_client.post('/api/locations/', json={'name': 'Shelf 2'}).json['data']['id']
+    assert test_client.delete(f'/api/locations/{location_id}').status_code == 200 # Logical delete
+    assert [location['is_active'] for location in changes(test_client, cursor)['data']['locations']] == [False]
+
+    with app.app_context():
+        db.session.delete(db.session.get(Product, 1))
+        db.session.commit()
+    feed = changes(test_client, cursor, limit=1)
+    assert feed['has_more']
+    feed = changes(test_client, feed['cursor'])
+    assert (feed['deleted']['products'], feed['has_more']) == ([1], False)
+
+def test_bulk_statements_ask_for_a_resync(app, test_client):
+    """Test that a change made with a bulk statement names the list to re-fetch."""
+    cursor = test_client.get('/api/changes').json['cursor']
+    with app.app_context():
+        db.session.query(Product).update({'min_stock': 3})
+        db.session.commit()
+    assert changes(test_client, cursor)['resync'] == ['products']
+
+def test_long_poll_returns_when_a_change_arrives(app, test_client):
+    """Test that a waiting request answers soon after a write, and an idle one after `wait`."""
+    cursor = test_client.get('/api/changes').json['cursor']
+    started = time.monotonic()
+    assert changes(test_client, cursor, wait=0.2)['cursor'] == cursor
+    assert time.monotonic() - started >= 0.2
+
+    writer = threading.Timer(0.1, lambda: add_stock(app.test_client()))
+    writer.start()
+    started = time.monotonic()
+    feed = changes(test_client, cursor, wait=10)
+    writer.join()
+    assert time.monotonic() - started < 5
+    assert feed['cursor'] != cursor
+
+def test_long_polls_per_worker_are_capped(app, test_client):
+    """Test 503 with Retry-After for a long-poll once CHANGE_FEED_MAX_WAITERS are waiting; polls without wait still answer."""
+    cursor = test_client.get('/api/changes').json['cursor']
+    waiters = app.extensions['change_feed_waiters']
+    for _ in range(app.config['CHANGE_FEED_MAX_WAITERS']):
+        assert waiters.acquire(blocking=False)
+    try:
+        response = test_client.get('/api/changes', query_string={'since': cursor, 'wait': 10})
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert changes(test_client, cursor)['cursor'] == cursor
+    finally:
+        for _ in range(app.config['CHANGE_FEED_MAX_WAITERS']):
+            waiters.release()
+    assert changes(test_client, cursor, wait=0.1)['cursor'] == cursor
+
+def test_invalid_and_expired_cursors(app, test_client):
+    """Test 400 for a malformed cursor and 410 once the changes after it were pruned."""
+    assert test_client.get('/api/changes?since=abc').status_code == 400
+    add_stock(test_client)
+    with app.app_context():
+        db.session.query(ChangeLog).update({'created_at': datetime.utcnow() - timedelta(days=30)})
+        db.session.commit()
+    add_stock(test_client)
+    result = app.test_cli_runner().invoke(args=['changes-prune'])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == 'Deleted 4 change(s).'
+    assert test_client.get('/api/changes?since=1').status_code == 410
+    assert changes(test_client, test_client.get('/api/changes').json['cursor'])['has_more'] is False
+
+def test_change_feed_disabled():
+    """Test that nothing is logged with CHANGE_FEED_ENABLED off."""
+    class DisabledConfig(TestingConfig):
+        CHANGE_FEED_ENABLED = False
+    app = create_app(config_object=DisabledConfig)
+    with app.app_context():
+        db.create_all()
+        db.session.add(Product(sku='SKU001', name='Product A'))
+        db.session.commit()
+        assert db.session.query(ChangeLog).count() == 0
@@ -0,0 +1,77 @@
+import pytest
+from unittest.mock import patch
+from app import create_app
+
+ORIGIN = 'http://localhost:3000'
+
+# --- Fixtures ---
+@pytest.fixture
+def app():
+    app_instance = create_app(config_object='config.TestingConfig')
+    yield app_instance
+
+@pytest.fixture
+def test_client(app):
+    with app.test_client() as client:
+        yield client
+
+# --- Tests ---
+
+@patch('app.api.inventory.handle_add_stock')
+def test_preflight_is_answered_before_routing(mock_handle, test_client):
+    """Test that a preflight never reaches the view and is cacheable by the browser."""
+    response = test_client.options('/api/inventory/add', headers={
+        'Origin': ORIGIN, 'Access-Control-Request-Method': 'POST', 'Access-Control-Request-Headers': 'content-type',
+    })
+    assert response.status_code == 200
+    assert response.json == {}
+    assert response.headers['Access-Control-Allow-Origin'] == ORIGIN
+    assert 'POST' in response.headers['Access-Control-Allow-Methods']
+    assert 'Content-Type' in response.headers['Access-Control-Allow-Headers']
+    assert response.headers['Access-Control-Max-Age'] == '86400'
+    mock_handle.assert_not_called()
+
+def test_unknown_origins_get_no_cors_headers(test_client):
+    """Test that only the configured origins are allowed."""
+    response = test_client.options('/api/inventory/add', headers={'Origin': 'http://evil.example'})
+    assert 'Access-Control-Allow-Origin' not in response.headers
+
+@patch('app.api.products.product_service.get_all_products', return_value=[])
+def test_responses_get_cors_and_security_headers(mock_get_all, test_client):
+    """Test the precomputed header sets on a regular response, on any blueprint."""
+    response = test_client.get('/api/products/', headers={'Origin': ORIGIN})
+    assert response.status_code == 200
+    assert response.headers['Access-Control-Allow-Origin'] == ORIGIN
+    assert response.headers['Vary'] == 'Origin'
+    assert response.headers['X-Frame-Options'] == 'DENY'
+
+    response = test_client.get('/api/inventory/stock?product_id=abc')
+    assert response.headers['X-Content-Type-Options'] == 'nosniff'
+    assert 'Access-Control-Allow-Origin' not in response.headers
+
+def test_headers_set_by_the_view_are_kept(app):
+    """Test that a view's own value of a security header wins over the default."""
+    @app.route('/cached')
+    def cached():
+        return 'ok', 200, {'Cache-Control': 'max-age=60'}
+
+    response = app.test_client().get('/cached')
+    assert response.headers.getlist('Cache-Control') == ['max-age=60']
+    assert response.headers['X-Frame-Options'] == 'DENY'
+
+@patch('app.api.inventory.handle_add_stock')
+def test_plain_http_is_redirected_without_entering_the_view(mock_handle, test_client):
+    """Test the HTTPS redirect: 301 for reads, 308 (method preserved) for writes."""
+    response = test_client.get('/api/reports/stock-levels?page=2', headers={'X-Forwarded-Proto': 'http'})
+    assert response.status_code == 301
+    assert response.headers['Location'] == 'https://localhost/api/reports/stock-levels?page=2'
+
+    response = test_client.post('/api/inventory/add', json={}, headers={'X-Forwarded-Proto': 'http'})
+    assert response.status_code == 308
+    mock_handle.assert_not_called()
+
+def test_redirect_ignores_forwarded_host(test_client):
+    """Test that a client-sent X-Forwarded-Host cannot pick the redirect target (open redirect)."""
+    response = test_client.get('/api/products/', headers={'X-Forwarded-Proto': 'http', 'X-Forwarded-Host': 'evil.example'})
+    assert response.status_code == 301
+    assert response.headers['Location'] == 'https://localhost/api/products/'
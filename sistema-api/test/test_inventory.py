@@ -474,7 +474,7 @@ def test_transfer_stock_success(mock_create_transfer, test_client):
 
     expected_service_data = transfer_data.copy()
     expected_service_data['quantity'] = 5.0
-    mock_create_transfer.assert_called_once_with(expected_service_data)
+    mock_create_transfer.assert_called_once_with(expected_service_data, user_verified=False)
 
     assert response.status_code == 201
     assert response.json == {
@@ -851,4 +851,58 @@ def test_transfer_stock_negative_quantity(mock_create_transfer, test_client):
 
     mock_create_transfer.assert_not_called() # MODIFIED
     assert response.status_code == 400
-    assert response.json == {'success': False, 'message': 'Quantity must be positive for transfer'}
\ No newline at end of file
+    assert response.json == {'success': False, 'message': 'Quantity must be positive for transfer'}
+# --- GET /api/inventory/barcode and /api/inventory/stock ---
+
+@patch('app.api.inventory.inventory_service.lookup_barcode')
+def test_lookup_barcode_success(mock_lookup, test_client):
+    """Test the barcode lookup endpoint."""
+    mock_lookup.return_value = {'barcode': '7501', 'product': {'id': 1, 'sku': 'SKU001'}, 'stock': []}
+
+    response = test_client.get('/api/inventory/barcode/7501')
+
+    mock_lookup.assert_called_once_with('7501')
+    assert response.status_code == 200
+    assert response.json['data']['product']['sku'] == 'SKU001'
+
+@patch('app.api.inventory.inventory_service.lookup_barcode')
+def test_lookup_barcode_not_found(mock_lookup, test_client):
+    """Test the barcode lookup endpoint with an unknown code."""
+    mock_lookup.side_effect = NotFoundException("No product found for barcode 0000.")
+
+    response = test_client.get('/api/inventory/barcode/0000')
+
+    assert response.status_code == 404
+    assert response.json['success'] is False
+
+@patch('app.api.inventory.inventory_service.get_stock')
+def test_get_stock(mock_get_stock, test_client):
+    """Test the stock query endpoint and its parameter validation."""
+    mock_get_stock.return_value = [{'product_id': 1, 'location_id': 2, 'quantity': '5.00'}]
+
+    response = test_client.get('/api/inventory/stock?product_id=1')
+    mock_get_stock.assert_called_once_with(product_id=1, location_id=None)
+    assert response.status_code == 200
+    assert response.json['data'][0]['quantity'] == '5.00'
+
+    assert test_client.get('/api/inventory/stock?product_id=abc').status_code == 400
+
+def test_transfer_between_locations_of_the_same_database(tmp_path):
+    """Test a real (unmocked) transfer on the unsharded app: the transfer record, both movements and the stock."""
+    from config import TestingConfig
+    from app.db import db
+    from app.models import InventoryTransaction, Location, StockLevel
+    from .conftest import add_stock, make_seeded_app, seed_rows
+
+    app = make_seeded_app(TestingConfig, seed_rows() + [Location(name='Shelf 2')])
+    client = app.test_client()
+    add_stock(client, 10)
+    response = client.post('/api/inventory/transfer', json={
+        'product_id': 1, 'from_location_id': 1, 'to_location_id': 2, 'quantity': 4, 'user_id': 1,
+    })
+    assert response.status_code == 201, response.json
+    transfer_id = response.json['transfer_id']
+    with app.app_context():
+        assert sorted((s.location_id, s.quantity) for s in db.session.query(StockLevel)) == [(1, 6), (2, 4)]
+        references = {t.reference_number for t in db.session.query(InventoryTransaction) if t.reference_number}
+        assert references == {f"Transfer Out {transfer_id}", f"Transfer In {transfer_id}"}
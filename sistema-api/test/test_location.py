@@ -9,7 +9,7 @@ from flask import Flask
 from app.api.locations import locations_bp, location_service
 
 # Import exceptions
-from app.utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException
+from app.utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException, InvalidInputException
 
 # --- Fixtures ---
 @pytest.fixture
@@ -586,4 +586,149 @@ def test_delete_location_unexpected_error(mock_delete, test_client):
 
     mock_delete.assert_called_once_with(1)
     assert response.status_code == 500
-    assert response.json == {'success': False, 'message': 'An internal error occurred'}
\ No newline at end of file
+    assert response.json == {'success': False, 'message': 'An internal error occurred'}
+
+# --- GET /api/locations/{id}/stock Tests (get_location_stock) ---
+@patch('app.api.locations.location_service.get_location_stock')
+def test_get_location_stock_rollup(mock_get_stock, test_client):
+    """Test getting rolled-up stock for a location."""
+    mock_get_stock.return_value = [
+        {'product_id': 1, 'sku': 'SKU001', 'product_name': 'Product A', 'location_id': 1, 'quantity': '25.00', 'location_count': 3}
+    ]
+
+    response = test_client.get('/api/locations/1/stock?rollup=true')
+
+    mock_get_stock.assert_called_once_with(1, rollup=True)
+    assert response.status_code == 200
+    assert response.json['rollup'] is True
+    assert response.json['data'][0]['quantity'] == '25.00'
+
+
+@patch('app.api.locations.location_service.get_location_stock')
+def test_get_location_stock_leaf_only_by_default(mock_get_stock, test_client):
+    """Test that stock is not rolled up unless requested."""
+    mock_get_stock.return_value = []
+
+    response = test_client.get('/api/locations/4/stock')
+
+    mock_get_stock.assert_called_once_with(4, rollup=False)
+    assert response.status_code == 200
+    assert response.json == {'success': True, 'rollup': False, 'data': []}
+
+
+@patch('app.api.locations.location_service.get_location_stock')
+def test_get_location_stock_not_found(mock_get_stock, test_client):
+    """Test getting stock for a location that does not exist."""
+    mock_get_stock.side_effect = NotFoundException("Location with ID 99 not found")
+
+    response = test_client.get('/api/locations/99/stock?rollup=1')
+
+    assert response.status_code == 404
+    assert response.json == {'success': False, 'message': 'Location with ID 99 not found'}
+
+
+# --- GET /api/locations/{id}/capacity Tests (check_location_capacity) ---
+@patch('app.api.locations.capacity_service.check_capacity')
+def test_check_location_capacity_by_product(mock_check, test_client):
+    """Test a putaway capacity check given a product and quantity."""
+    mock_check.return_value = {'location_id': 2, 'fits': True, 'available_volume': '10.0000'}
+
+    response = test_client.get('/api/locations/2/capacity?product_id=5&quantity=3')
+
+    mock_check.assert_called_once_with(2, volume=None, product_id=5, quantity=3.0)
+    assert response.status_code == 200
+    assert response.json['data']['fits'] is True
+
+
+@patch('app.api.locations.capacity_service.check_capacity')
+def test_check_location_capacity_invalid_input(mock_check, test_client):
+    """Test capacity check validation errors."""
+    response = test_client.get('/api/locations/2/capacity?volume=abc')
+    mock_check.assert_not_called()
+    assert response.status_code == 400
+
+    mock_check.side_effect = InvalidInputException("Provide either volume or product_id and quantity.")
+    response = test_client.get('/api/locations/2/capacity')
+    assert response.status_code == 400
+    assert response.json == {'success': False, 'message': 'Provide either volume or product_id and quantity.'}
+
+
+@patch('app.api.locations.capacity_service.check_capacity')
+def test_check_location_capacity_not_found(mock_check, test_client):
+    """Test capacity check for a missing location."""
+    mock_check.side_effect = NotFoundException("Location with ID 9 not found")
+
+    response = test_client.get('/api/locations/9/capacity?volume=1')
+
+    assert response.status_code == 404
+
+
+def test_capacity_rollups_follow_stock_and_moves():
+    """Test real (unmocked) utilization: stock changes roll up to the ancestors, a subtree move shifts them, rebuild() agrees."""
+    from decimal import Decimal
+    from config import TestingConfig
+    from app.models import LocationUtilization, Product, User
+    from app.services.capacity_service import CapacityService
+    from .conftest import PICKER_PASSWORD_HASH, add_stock, make_seeded_app
+
+    app = make_seeded_app(TestingConfig, [
+        Product(sku='SKU001', name='Product A', volume=Decimal('0.5')),
+        User(username='picker', password_hash=PICKER_PASSWORD_HASH),
+    ])
+    client = app.test_client()
+    # Warehouse (1) > Aisle (2) > Bin (3), and Overflow (4)
+    for name, parent_id, capacity in (('Warehouse', None, 100), ('Aisle', 1, 20), ('Bin', 2, 10), ('Overflow', None, 50)):
+        response = client.post('/api/locations/', json={'name': name, 'parent_id': parent_id, 'storage_capacity': capacity})
+        assert response.status_code == 201, response.json
+
+    def utilization():
+        with app.app_context():
+            return {row.location_id: (row.used_volume, row.rollup_volume) for row in LocationUtilization.query}
+
+    add_stock(client, 8, location_id=3)
+    add_stock(client, 2, location_id=2)
+    assert utilization() == {1: (0, 5), 2: (1, 5), 3: (4, 4), 4: (0, 0)}
+    with app.app_context():
+        check = CapacityService().check_capacity(2, product_id=1, quantity=30)
+        assert (Decimal(check['available_volume']), check['fits']) == (15, True)
+        assert CapacityService().check_capacity(1, volume=96)['fits'] is False
+
+    assert client.put('/api/locations/2', json={'parent_id': 4}).status_code == 200
+    incremental = utilization()
+    assert incremental == {1: (0, 0), 2: (1, 5), 3: (4, 4), 4: (0, 5)}
+    with app.app_context():
+        assert CapacityService().check_capacity(4, volume=45)['fits'] is True
+        assert CapacityService().check_capacity(4, volume=46)['fits'] is False
+        CapacityService().rebuild()
+    assert utilization() == incremental
+
+
+def test_check_capacity_rejects_non_finite_values():
+    """Test that NaN and Infinity volumes or quantities are invalid input, not a 500."""
+    from config import TestingConfig
+    from app.services.capacity_service import CapacityService
+    from .conftest import make_seeded_app
+
+    app = make_seeded_app(TestingConfig)
+    with app.app_context():
+        for arguments in ({'volume': float('nan')}, {'volume': 'Infinity'}, {'product_id': 1, 'quantity': float('inf')}, {'product_id': 1, 'quantity': 'NaN'}):
+            with pytest.raises(InvalidInputException):
+                CapacityService().check_capacity(1, **arguments)
+    assert app.test_client().get('/api/locations/1/capacity?volume=nan').status_code == 400
+
+
+def test_rebuild_closure_command():
+    """Test that `flask locations-rebuild-closure` backfills the closure of locations written without it."""
+    from config import TestingConfig
+    from app.models import Location, LocationClosure
+    from .conftest import make_seeded_app
+
+    app = make_seeded_app(TestingConfig, [
+        Location(id=1, name='Warehouse'), Location(id=2, name='Aisle 1', parent_id=1), Location(id=3, name='Bin 1', parent_id=2),
+    ])
+    result = app.test_cli_runner().invoke(args=['locations-rebuild-closure'])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == 'Rebuilt location_closure: 6 rows.'
+    with app.app_context():
+        assert sorted(LocationClosure.query.filter_by(descendant_id=3).with_entities(LocationClosure.ancestor_id, LocationClosure.depth)) == [
+            (1, 2), (2, 1), (3, 0)]
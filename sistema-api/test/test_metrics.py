@@ -0,0 +1,87 @@
+import os
+import subprocess
+import sys
+import pytest
+from unittest.mock import patch
+from prometheus_client import REGISTRY
+from app import create_app
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# --- Fixtures ---
+@pytest.fixture
+def app():
+    app_instance = create_app(config_object='config.TestingConfig')
+    yield app_instance
+
+@pytest.fixture
+def test_client(app):
+    with app.test_client() as client:
+        yield client
+
+def sample(name, **labels):
+    return REGISTRY.get_sample_value(name, labels) or 0
+
+# --- Tests for the request hooks and GET /metrics ---
+
+@patch('app.api.products.product_service.get_all_products')
+def test_requests_are_counted_and_timed(mock_get_all, test_client):
+    """Test that a request updates the counter, the histogram and the in-flight gauge."""
+    mock_get_all.return_value = []
+    labels = {'blueprint': 'products_api', 'endpoint': 'products_api.list_products'}
+    count_before = sample('inventory_http_requests_total', method='GET', status='200', **labels)
+    latency_before = sample('inventory_http_request_duration_seconds_count', **labels)
+
+    assert test_client.get('/api/products/').status_code == 200
+
+    assert sample('inventory_http_requests_total', method='GET', status='200', **labels) == count_before + 1
+    assert sample('inventory_http_request_duration_seconds_count', **labels) == latency_before + 1
+    assert sample('inventory_http_requests_in_flight', **labels) == 0
+
+def test_unmatched_requests_share_one_label(test_client):
+    """Test that 404s for unknown paths do not create a series per path."""
+    labels = {'blueprint': 'none', 'endpoint': 'none', 'method': 'GET', 'status': '404'}
+    before = sample('inventory_http_requests_total', **labels)
+    test_client.get('/no/such/path/1')
+    test_client.get('/no/such/path/2')
+    assert sample('inventory_http_requests_total', **labels) == before + 2
+
+def test_metrics_endpoint_exposes_prometheus_text(test_client):
+    """Test the Prometheus text format output (scrapes themselves are not recorded)."""
+    test_client.get('/api/inventory/stock?product_id=abc')
+    response = test_client.get('/metrics')
+    assert response.status_code == 200
+    assert response.content_type.startswith('text/plain')
+    body = response.get_data(as_text=True)
+    assert '# TYPE inventory_http_request_duration_seconds histogram' in body
+    assert 'endpoint="inventory_api.get_stock"' in body
+    assert 'endpoint="metrics.get_metrics"' not in body
+
+def test_metrics_bearer_token(app, test_client):
+    """Test that scrapes need the bearer token when one is configured."""
+    app.config['METRICS_BEARER_TOKEN'] = 'scrape-token'
+    assert test_client.get('/metrics').status_code == 401
+    response = test_client.get('/metrics', headers={'Authorization': 'Bearer scrape-token'})
+    assert response.status_code == 200
+
+def test_metrics_disabled(app, test_client):
+    app.config['METRICS_ENABLED'] = False
+    assert test_client.get('/metrics').status_code == 404
+
+def test_multiprocess_aggregation(tmp_path):
+    """Test that /metrics sums the samples written by several worker processes."""
+    env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': str(tmp_path), 'PYTHONPATH': BASE_DIR}
+    worker = (
+        "from app import create_app\n"
+        "client = create_app('config.TestingConfig').test_client()\n"
+        "for _ in range(3): client.get('/no/such/path')\n"
+    )
+    for _ in range(2):
+        subprocess.run([sys.executable, '-c', worker], cwd=BASE_DIR, env=env, check=True)
+    scrape = (
+        "from app import create_app\n"
+        "print(create_app('config.TestingConfig').test_client().get('/metrics').get_data(as_text=True))"
+    )
+    output = subprocess.run([sys.executable, '-c', scrape], cwd=BASE_DIR, env=env, check=True,
+                            capture_output=True, text=True).stdout
+    assert 'inventory_http_requests_total{blueprint="none",endpoint="none",method="GET",status="404"} 6.0' in output
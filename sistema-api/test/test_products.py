@@ -1,10 +1,12 @@
 import pytest
 import json
+import io
 from unittest.mock import MagicMock, patch
 from app import create_app, db
 from flask import Flask
 from app.api.products import products_bp, product_service
 from app.utils.exceptions import NotFoundException, ConflictException, DatabaseException
+from app.utils.edge import init_edge
 
 from flask import Flask
 
@@ -13,7 +15,7 @@ from flask import Flask
 from app.api.products import products_bp, product_service
 
 # Import exceptions
-from app.utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException
+from app.utils.exceptions import NotFoundException, ConflictException, DatabaseException, InsufficientStockException, InvalidInputException
 
 # --- Fixtures ---
 @pytest.fixture
@@ -41,6 +43,7 @@ def test_client():
     app = Flask(__name__)
     # Register the blueprint with the correct URL prefix
     app.register_blueprint(products_bp, url_prefix='/api/products')
+    init_edge(app) # Security headers and HTTPS redirects
     with app.test_client() as client:
         yield client
 
@@ -111,6 +114,28 @@ def test_list_products_success_with_filters(mock_get_all, test_client):
     assert len(response.json['data']) == 1
     assert response.json['data'][0]['sku'] == 'SKU001'
 
+@patch('app.api.products.product_service.get_all_products')
+def test_list_products_with_category_descendants(mock_get_all, test_client):
+    """Test that include_descendants is passed along with the category filter."""
+    mock_get_all.return_value = [MockProduct(id=1, sku='SKU001', name='Product A', category_id=7)]
+
+    response = test_client.get('/api/products/?category_id=3&include_descendants=true')
+
+    mock_get_all.assert_called_once_with(
+        filters={'category_id': 3, 'include_descendants': True},
+        pagination={},
+        sorting={}
+    )
+    assert response.status_code == 200
+    assert response.json['data'][0]['category_id'] == 7
+
+    mock_get_all.reset_mock()
+
+    # Ignored unless it is 'true'/'1'
+    response = test_client.get('/api/products/?category_id=3&include_descendants=no')
+    mock_get_all.assert_called_once_with(filters={'category_id': 3}, pagination={}, sorting={})
+    assert response.status_code == 200
+
 @patch('app.api.products.product_service.get_all_products')
 def test_list_products_success_with_pagination_sorting(mock_get_all, test_client):
     """Test listing products successfully with pagination and sorting."""
@@ -820,3 +845,159 @@ def test_command_injection_in_json_payload(mock_create, test_client):
     assert response.json['success'] is False
     assert "Invalid characters detected" in response.json['message'] # O mensaje similar
 
+
+# --- Bulk import ---
+
+IMPORT_REPORT = {'batch_id': 'b1', 'total_rows': 2, 'created': 1, 'updated': 0, 'failed': 1,
+                 'errors': [{'row': 2, 'sku': 'SKU002', 'error': 'unit_price: must be a number'}]}
+
+@patch('app.api.products.product_service.import_products')
+def test_import_products_csv_upload(mock_import, test_client):
+    """Test importing a multipart CSV file; the format is inferred and the stream is decoded as text."""
+    received = {}
+    def read_stream(stream, file_format):
+        received['text'] = stream.read()
+        received['format'] = file_format
+        return IMPORT_REPORT
+    mock_import.side_effect = read_stream
+
+    data = {'file': (io.BytesIO(b'sku,name,unit_price\nSKU001,A,1.5\nSKU002,B,x\n'), 'catalog.csv')}
+    response = test_client.post('/api/products/import', data=data, content_type='multipart/form-data')
+
+    assert response.status_code == 200
+    assert response.json['success'] is True
+    assert response.json['data']['created'] == 1
+    assert response.json['data']['errors'][0]['row'] == 2
+    assert received == {'text': 'sku,name,unit_price\nSKU001,A,1.5\nSKU002,B,x\n', 'format': 'csv'}
+
+@patch('app.api.products.product_service.import_products')
+def test_import_products_ndjson_body(mock_import, test_client):
+    """Test importing NDJSON sent as the raw request body."""
+    mock_import.return_value = IMPORT_REPORT
+
+    response = test_client.post('/api/products/import', data=b'{"sku": "SKU001", "name": "A"}\n',
+                                content_type='application/x-ndjson')
+
+    assert response.status_code == 200
+    assert mock_import.call_args[0][1] == 'ndjson'
+
+def test_import_products_invalid_format(test_client):
+    """Test that an unknown ?format= is rejected."""
+    response = test_client.post('/api/products/import?format=xml', data=b'<products/>')
+
+    assert response.status_code == 400
+    assert response.json['success'] is False
+
+@patch('app.api.products.product_service.import_products')
+def test_import_products_unreadable_file(mock_import, test_client):
+    """Test that a file the service cannot read returns 400."""
+    mock_import.side_effect = InvalidInputException("Could not read import file: bad encoding")
+
+    response = test_client.post('/api/products/import?format=csv', data=b'\xff\xfe')
+
+    assert response.status_code == 400
+    assert 'Could not read import file' in response.json['message']
+
+# --- Bulk update ---
+
+@patch('app.api.products.product_service.bulk_update_products')
+def test_bulk_update_products_by_filter(mock_bulk, test_client):
+    """Test a set-based price change on every product of a supplier."""
+    mock_bulk.return_value = 42
+
+    response = test_client.patch('/api/products/bulk', json={
+        'filter': {'supplier_id': 12},
+        'changes': {'unit_price': {'percent': 4}}
+    })
+
+    mock_bulk.assert_called_once_with(items=None, filters={'supplier_id': 12}, changes={'unit_price': {'percent': 4}})
+    assert response.status_code == 200
+    assert response.json['updated'] == 42
+
+@patch('app.api.products.product_service.bulk_update_products')
+def test_bulk_update_products_by_items(mock_bulk, test_client):
+    """Test updating an explicit list of products."""
+    mock_bulk.return_value = 2
+    items = [{'id': 1, 'unit_price': 10.5}, {'id': 2, 'min_stock': 5}]
+
+    response = test_client.patch('/api/products/bulk', json={'items': items})
+
+    mock_bulk.assert_called_once_with(items=items, filters=None, changes=None)
+    assert response.status_code == 200
+    assert response.json['updated'] == 2
+
+def test_bulk_update_products_invalid_body(test_client):
+    """Test that a body without items or changes is rejected."""
+    response = test_client.patch('/api/products/bulk', json={'filter': {'supplier_id': 12}})
+
+    assert response.status_code == 400
+    assert response.json['success'] is False
+
+@patch('app.api.products.product_service.bulk_update_products')
+def test_bulk_update_products_errors(mock_bulk, test_client):
+    """Test error mapping for bulk updates."""
+    body = {'items': [{'id': 99, 'unit_price': 1}]}
+
+    mock_bulk.side_effect = NotFoundException("Products not found: [99]")
+    assert test_client.patch('/api/products/bulk', json=body).status_code == 404
+
+    mock_bulk.side_effect = InvalidInputException("Field 'sku' cannot be bulk updated.")
+    assert test_client.patch('/api/products/bulk', json=body).status_code == 400
+
+    mock_bulk.side_effect = ConflictException("The change would make unit_cost negative for 1 products.")
+    assert test_client.patch('/api/products/bulk', json=body).status_code == 409
+
+def test_bulk_update_products_rejects_non_finite_values():
+    """Test a real (unmocked) bulk update: NaN and Infinity are rejected before reaching the database."""
+    from config import TestingConfig
+    from app.models import Product
+    from .conftest import make_seeded_app
+
+    app = make_seeded_app(TestingConfig)
+    client = app.test_client()
+    for changes in ({'unit_price': {'percent': 'NaN'}}, {'unit_price': {'amount': 'Infinity'}}, {'unit_cost': {'amount': 'sNaN'}}, {'min_stock': float('inf')}):
+        response = client.patch('/api/products/bulk', json={'filter': {'is_active': True}, 'changes': changes})
+        assert response.status_code == 400, changes
+        assert response.json['message'].startswith('Invalid')
+    response = client.patch('/api/products/bulk', json={'items': [{'id': 1, 'unit_price': '-Infinity'}]})
+    assert response.json['message'] == 'Invalid value for unit_price.'
+
+    with app.app_context():
+        unit_price = Product.query.one().unit_price
+    assert client.patch('/api/products/bulk', json={'filter': {'is_active': True}, 'changes': {'min_stock': 3}}).status_code == 200
+    with app.app_context():
+        assert Product.query.one().unit_price == unit_price
+
+def test_import_products_name_only_required_for_new_skus():
+    """Test a real (unmocked) import: existing SKUs can be updated without a name, new ones need one."""
+    from decimal import Decimal
+    from config import TestingConfig
+    from app.models import Product
+    from app.services.product_service import ProductService
+    from .conftest import make_seeded_app
+
+    app = make_seeded_app(TestingConfig)
+    data = 'sku,name,unit_price\nSKU001,,12.50\nSKU002,,3\nSKU003,Product C,4\n'
+    with app.app_context():
+        report = ProductService().import_products(io.StringIO(data), 'csv')
+        assert (report['created'], report['updated'], report['failed']) == (1, 1, 1)
+        assert report['errors'] == [{'row': 2, 'sku': 'SKU002', 'error': 'name: required for new products'}]
+        product = Product.query.filter_by(sku='SKU001').one()
+        assert (product.name, product.unit_price) == ('Product A', Decimal('12.50'))
+        assert Product.query.filter_by(sku='SKU003').one().name == 'Product C'
+
+def test_import_products_rejects_non_finite_numbers():
+    """Test a real (unmocked) import: nan and inf are per-row errors, the other rows are imported."""
+    from config import TestingConfig
+    from app.models import Product
+    from app.services.product_service import ProductService
+    from .conftest import make_seeded_app
+
+    app = make_seeded_app(TestingConfig)
+    data = 'sku,name,unit_price,volume\nSKU002,Product B,nan,\nSKU003,Product C,4,inf\nSKU004,Product D,-Infinity,\nSKU005,Product E,5,1\n'
+    with app.app_context():
+        report = ProductService().import_products(io.StringIO(data), 'csv')
+        assert (report['created'], report['updated'], report['failed']) == (1, 0, 3)
+        assert [error['error'] for error in report['errors']] == [
+            'unit_price: must be a number', 'volume: must be a number', 'unit_price: must be a number']
+        assert [product.sku for product in Product.query.order_by(Product.sku)] == ['SKU001', 'SKU005']
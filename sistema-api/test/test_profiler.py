@@ -0,0 +1,120 @@
+import os
+import pstats
+import pytest
+import threading
+from unittest.mock import patch
+from config import TestingConfig
+from app import create_app
+from app.utils import profiler as profiler_module
+
+# --- Fixtures ---
+@pytest.fixture
+def app(tmp_path):
+    class ProfilerConfig(TestingConfig):
+        PROFILER_ENABLED = True
+        PROFILER_DIR = str(tmp_path / 'profiles')
+        PROFILER_SAMPLE_INTERVAL_MS = 1
+        INTERNAL_API_TOKEN = 'secret-token'
+
+    app_instance = create_app(config_object=ProfilerConfig)
+    yield app_instance
+    app_instance.extensions['profiler'].disable()
+
+@pytest.fixture
+def test_client(app):
+    with app.test_client() as client:
+        yield client
+
+HEADERS = {'X-Internal-Token': 'secret-token'}
+
+def profiles(test_client):
+    return test_client.get('/api/internal/profiler', headers=HEADERS).json['data']['profiles']
+
+def slow_products(*args, **kwargs):
+    sum(i * i for i in range(300000)) # Some Python work for the sampler to see
+    return []
+
+# --- Tests ---
+
+def test_disabled_profiler_leaves_wsgi_app_untouched(app):
+    """Test that nothing wraps the request path while the profiler is off."""
+    assert app.wsgi_app is app.extensions['edge']
+    plain = create_app(config_object='config.TestingConfig')
+    assert 'profiler' not in plain.extensions
+
+@patch('app.api.products.product_service.get_all_products', side_effect=slow_products)
+def test_stack_profile_for_endpoint(mock_get_all, app, test_client):
+    """Test that only the selected endpoint is profiled, as collapsed stacks."""
+    response = test_client.post('/api/internal/profiler', headers=HEADERS,
+                                json={'mode': 'stack', 'endpoints': ['products_api.list_products']})
+    assert response.status_code == 200
+    assert app.wsgi_app is not app.extensions['edge']
+
+    test_client.get('/api/products/')
+    test_client.get('/api/categories/does-not-matter')
+
+    [profile] = profiles(test_client)
+    assert profile['mode'] == 'stack'
+    assert profile['endpoint'] == 'products_api.list_products'
+    folded = test_client.get(f"/api/internal/profiler/profiles/{profile['name']}", headers=HEADERS).get_data(as_text=True)
+    assert 'slow_products' in folded
+    stack, count = folded.splitlines()[0].rsplit(' ', 1)
+    assert int(count) > 0 and ';' in stack
+
+@patch('app.api.products.product_service.get_all_products', side_effect=slow_products)
+def test_cprofile_profile(mock_get_all, app, test_client):
+    test_client.post('/api/internal/profiler', headers=HEADERS, json={'mode': 'cprofile'})
+    test_client.get('/api/products/')
+    profile = next(p for p in profiles(test_client) if p['endpoint'] == 'products_api.list_products')
+    stats = pstats.Stats(f"{app.config['PROFILER_DIR']}/{profile['name']}")
+    assert any(function == 'slow_products' for _, _, function in stats.stats)
+
+def test_disable_and_expiry(app, test_client):
+    """Test that disabling or letting the settings expire restores the plain wsgi_app."""
+    profiler = app.extensions['profiler']
+    test_client.post('/api/internal/profiler', headers=HEADERS, json={'duration_s': 60})
+    assert test_client.delete('/api/internal/profiler', headers=HEADERS).status_code == 200
+    assert profiler.settings is None and app.wsgi_app is app.extensions['edge']
+
+    profiler.enable(duration=60)
+    profiler.settings['expires_at'] = 0
+    profiler.poll()
+    assert profiler.settings is None
+
+def test_settings_are_shared_between_workers(app):
+    """Test that another process's profiler (same PROFILER_DIR) picks up the settings."""
+    class OtherWorkerConfig(TestingConfig):
+        PROFILER_ENABLED = True
+        PROFILER_DIR = app.config['PROFILER_DIR']
+    other = create_app(config_object=OtherWorkerConfig)
+    app.extensions['profiler'].enable(sample_rate=0.5, duration=60)
+    other.extensions['profiler'].poll()
+    assert other.extensions['profiler'].settings['sample_rate'] == 0.5
+    app.extensions['profiler'].disable()
+    other.extensions['profiler'].poll()
+    assert other.extensions['profiler'].settings is None
+
+def test_enable_validation(test_client):
+    assert test_client.post('/api/internal/profiler', headers=HEADERS, json={'mode': 'perf'}).status_code == 400
+    assert test_client.post('/api/internal/profiler', headers=HEADERS, json={'sample_rate': 0}).status_code == 400
+    response = test_client.post('/api/internal/profiler', headers=HEADERS, json={'endpoints': ['nope.nothing']})
+    assert response.status_code == 400 and 'nope.nothing' in response.json['message']
+
+def test_unknown_profile_download(test_client):
+    response = test_client.get('/api/internal/profiler/profiles/..%2Fsettings.json', headers=HEADERS)
+    assert response.status_code == 404
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs fork')
+def test_forked_worker_polls_once_for_the_last_app(app):
+    """Test that a forked worker starts one settings poller, for the app it serves, however many apps were created."""
+    class OtherAppConfig(TestingConfig):
+        PROFILER_ENABLED = True
+        PROFILER_DIR = app.config['PROFILER_DIR']
+    create_app(config_object=OtherAppConfig)
+    served = create_app(config_object=OtherAppConfig)
+
+    pid = os.fork()
+    if pid == 0: # Only the forking thread and the after-fork callbacks' threads exist here
+        pollers = [thread for thread in threading.enumerate() if thread.name == 'profiler-settings']
+        os._exit(0 if len(pollers) == 1 and profiler_module._current_profiler is served.extensions['profiler'] else 1)
+    assert os.waitpid(pid, 0)[1] == 0
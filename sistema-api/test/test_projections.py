@@ -0,0 +1,165 @@
+import pytest
+from datetime import datetime, timedelta
+from decimal import Decimal
+from config import TestingConfig
+from app.db import db
+from app.models import InventoryTransaction, InventoryValuation, Location, Product, StockAlert, StockLevel, User
+from app.services.projection_service import ProjectionService
+from app.utils.enums import TransactionType
+from app.warmup import warm_up
+from .conftest import PICKER_PASSWORD_HASH, make_seeded_app
+
+
+class ProjectionConfig(TestingConfig):
+    PROJECTION_BATCH_SIZE = 2 # Several worker transactions per run
+
+# --- Fixtures ---
+def projection_rows():
+    return [
+        Product(sku='SKU001', name='Product A', unit_cost=Decimal('2.50'), min_stock=5),
+        Product(sku='SKU002', name='Product B', unit_cost=Decimal('10.00'), min_stock=0),
+        Location(name='Shelf 1'), Location(name='Shelf 2'),
+        User(username='picker', password_hash=PICKER_PASSWORD_HASH),
+    ]
+
+@pytest.fixture
+def app_config():
+    return ProjectionConfig
+
+@pytest.fixture
+def seed():
+    return projection_rows()
+
+def move(client, path, **body):
+    response = client.post(f'/api/inventory/{path}', json={'product_id': 1, 'location_id': 1, 'user_id': 1, **body})
+    assert response.status_code == 201, response.json
+    return response
+
+def snapshot(app):
+    with app.app_context():
+        return {
+            'stock': sorted((s.product_id, s.location_id, s.quantity) for s in db.session.query(StockLevel)),
+            'alerts': sorted((a.product_id, a.location_id, a.quantity, a.is_low) for a in db.session.query(StockAlert)),
+            'valuation': sorted((v.product_id, v.quantity, v.value) for v in db.session.query(InventoryValuation)),
+        }
+
+# --- Tests ---
+
+def test_stock_levels_follow_the_ledger_inline(app, test_client):
+    """Test that stock_levels is updated in the movement's transaction, the other projections by the workers."""
+    move(test_client, 'add', quantity=10)
+    move(test_client, 'remove', quantity=7)
+    assert test_client.post('/api/inventory/remove', json={'product_id': 1, 'location_id': 1, 'user_id': 1, 'quantity': 4}).status_code == 409
+    assert snapshot(app)['stock'] == [(1, 1, 3)]
+    assert snapshot(app)['alerts'] == []
+
+    with app.app_context():
+        assert ProjectionService().catch_up() == {'daily_movements': 2, 'low_stock': 2, 'valuation': 2}
+        assert ProjectionService().catch_up() == {'daily_movements': 0, 'low_stock': 0, 'valuation': 0}
+        alert = db.session.get(StockAlert, (1, 1))
+        assert (alert.quantity, alert.min_stock, alert.is_low) == (3, 5, True)
+        assert alert.low_since is not None
+        assert db.session.get(InventoryValuation, 1).value == Decimal('7.50')
+
+    response = test_client.get('/api/reports/daily-movements?productId=1')
+    assert [(row['quantity_in'], row['quantity_out'], row['net_quantity'], row['movement_count']) for row in response.json['data']] == [
+        ('10.00', '7.00', '3.00', 2)]
+
+def test_adjustments_are_projected(app, test_client):
+    """Test the projections of each movement type, and that an alert clears when stock comes back."""
+    move(test_client, 'add', quantity=4)
+    move(test_client, 'remove', quantity=1)
+    move(test_client, 'add', location_id=2, quantity=1)
+    move(test_client, 'adjust', quantity=-1, notes='Count')
+    move(test_client, 'add', product_id=2, quantity=2)
+    with app.app_context():
+        ProjectionService().catch_up()
+        assert db.session.get(StockAlert, (1, 1)).is_low
+    move(test_client, 'add', quantity=8)
+    with app.app_context():
+        ProjectionService().catch_up(['low_stock'])
+        alert = db.session.get(StockAlert, (1, 1))
+        assert (alert.is_low, alert.low_since) == (False, None)
+
+    state = snapshot(app)
+    assert state['stock'] == [(1, 1, 10), (1, 2, 1), (2, 1, 2)]
+    assert state['valuation'] == [(1, 3, Decimal('7.50')), (2, 2, Decimal('20.00'))] # Not run since the last add
+    assert [item['movement_count'] for item in test_client.get('/api/reports/daily-movements?locationId=1').json['data']] == [3, 1]
+
+def test_rebuild_replays_the_ledger(app, test_client):
+    """Test that a rebuilt projection equals the incrementally maintained one."""
+    move(test_client, 'add', quantity=6)
+    move(test_client, 'remove', quantity=2)
+    move(test_client, 'add', product_id=2, location_id=2, quantity=3)
+    with app.app_context():
+        ProjectionService().catch_up()
+    expected = snapshot(app)
+
+    with app.app_context():
+        db.session.query(StockLevel).update({'quantity': 999})
+        db.session.commit()
+        service = ProjectionService()
+        assert service.rebuild('stock_levels') == 3
+        assert service.rebuild('valuation') == 3
+    assert snapshot(app) == expected
+
+    with app.app_context():
+        positions = {item['name']: (item['position'], item['lag']) for item in ProjectionService().status()}
+        assert positions == {'stock_levels': (3, None), 'daily_movements': (3, 0), 'low_stock': (3, 0), 'valuation': (3, 0)}
+
+def test_stock_levels_maintained_by_workers():
+    """Test that with no inline projection, stock checks still see the movements not projected yet."""
+    class WorkerConfig(ProjectionConfig):
+        PROJECTIONS_INLINE = []
+    app = make_seeded_app(WorkerConfig, projection_rows())
+    with app.app_context():
+        assert ProjectionService().rebuild('stock_levels') == 0
+    client = app.test_client()
+    move(client, 'add', quantity=5)
+    assert snapshot(app)['stock'] == []
+    assert client.post('/api/inventory/remove', json={'product_id': 1, 'location_id': 1, 'user_id': 1, 'quantity': 6}).status_code == 409
+    move(client, 'remove', quantity=5)
+
+    result = app.test_cli_runner().invoke(args=['projections-run', '--name', 'stock_levels'])
+    assert result.exit_code == 0, result.output
+    assert result.output.strip() == 'stock_levels: 2'
+    assert snapshot(app)['stock'] == [(1, 1, 0)]
+
+def test_workers_wait_for_gaps_in_the_ledger(app):
+    """Test that a worker stops before an id that may still be committed, and passes it once it is old."""
+    with app.app_context():
+        now = datetime.utcnow()
+        db.session.add_all([
+            InventoryTransaction(id=1, transaction_type=TransactionType.entrada, product_id=1, location_id=1, quantity=1, user_id=1,
+                                 transaction_date=now, created_at=now),
+            InventoryTransaction(id=3, transaction_type=TransactionType.entrada, product_id=1, location_id=1, quantity=2, user_id=1,
+                                 transaction_date=now, created_at=now),
+        ])
+        db.session.commit()
+        assert ProjectionService().catch_up(['valuation']) == {'valuation': 1}
+        db.session.get(InventoryTransaction, 3).created_at = now - timedelta(minutes=5)
+        db.session.commit()
+        assert ProjectionService().catch_up(['valuation']) == {'valuation': 1}
+        assert db.session.get(InventoryValuation, 1).quantity == 3
+
+def test_legacy_stock_trigger_is_refused_and_dropped(app, test_client):
+    """Test that a database still carrying trg_update_stock stops the workers until the command drops it."""
+    with app.app_context():
+        db.session.execute(db.text(
+            "CREATE TRIGGER trg_update_stock AFTER INSERT ON inventory_transactions BEGIN "
+            "UPDATE stock_levels SET quantity = quantity + NEW.quantity "
+            "WHERE product_id = NEW.product_id AND location_id = NEW.location_id; END"
+        ))
+        db.session.commit()
+    move(test_client, 'add', quantity=5)
+    move(test_client, 'add', quantity=5)
+    assert snapshot(app)['stock'] == [(1, 1, 15)] # The second movement counted twice
+    with pytest.raises(RuntimeError, match='trg_update_stock trigger is still installed on inventory_transactions'):
+        warm_up(app)
+
+    runner = app.test_cli_runner()
+    assert runner.invoke(args=['projections-drop-trigger']).output.strip() == 'Dropped trg_update_stock from inventory_transactions.'
+    assert runner.invoke(args=['projections-drop-trigger']).output.strip() == 'No trg_update_stock trigger found.'
+    warm_up(app)
+    move(test_client, 'remove', quantity=5)
+    assert snapshot(app)['stock'] == [(1, 1, 10)]
@@ -0,0 +1,105 @@
+import pytest
+from app import create_app
+from app.db import db
+from app.models import Product, Category, Supplier, Location, StockLevel
+from app.utils.query_stats import track_queries
+
+# --- Fixtures ---
+@pytest.fixture
+def app():
+    """App on an in-memory SQLite database with products spread over several categories and suppliers."""
+    app_instance = create_app(config_object='config.TestingConfig')
+    with app_instance.app_context():
+        db.create_all()
+        categories = [Category(name=f"Category {i}") for i in range(5)]
+        suppliers = [Supplier(name=f"Supplier {i}") for i in range(5)]
+        location = Location(name='Main')
+        db.session.add_all(categories + suppliers + [location])
+        db.session.flush()
+        products = [
+            Product(sku=f"SKU{i:03d}", name=f"Product {i}", category_id=categories[i % 5].id, supplier_id=suppliers[i % 5].id)
+            for i in range(10)
+        ]
+        db.session.add_all(products)
+        db.session.flush()
+        db.session.add_all([StockLevel(product_id=p.id, location_id=location.id, quantity=5) for p in products])
+        db.session.commit()
+    yield app_instance
+    with app_instance.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def test_client(app):
+    with app.test_client() as client:
+        yield client
+
+# --- Query budgets per endpoint ---
+
+def test_list_products_query_budget(test_client, query_budget):
+    """Test that listing products loads categories and suppliers in the same query."""
+    with query_budget(1):
+        response = test_client.get('/api/products/')
+    assert response.status_code == 200
+    assert {item['category_name'] for item in response.json['data']} == {f"Category {i}" for i in range(5)}
+
+def test_get_product_query_budget(app, test_client, query_budget):
+    with app.app_context():
+        product_id = db.session.query(Product.id).filter(Product.sku == 'SKU001').scalar()
+    with query_budget(3):
+        assert test_client.get(f'/api/products/{product_id}').status_code == 200
+
+def test_list_categories_query_budget(test_client, query_budget):
+    with query_budget(1):
+        assert test_client.get('/api/categories/').status_code == 200
+
+def test_stock_query_budget(test_client, query_budget):
+    with query_budget(1):
+        assert test_client.get('/api/inventory/stock?location_id=1').status_code == 200
+
+def test_query_budget_failure_lists_statements(app, query_budget):
+    """Test that an exceeded budget fails with the repeated statements."""
+    with app.app_context():
+        with pytest.raises(AssertionError) as error:
+            with query_budget(1):
+                for product in Product.query.all():
+                    product.category.name # Lazy load per distinct category
+        assert 'Query budget of 1 exceeded' in str(error.value)
+        assert '5x SELECT' in str(error.value)
+
+# --- N+1 detection and Server-Timing ---
+
+def test_repeated_statements_are_flagged(app):
+    with app.app_context():
+        with track_queries() as stats:
+            for product in Product.query.all():
+                product.supplier.name
+    assert stats.count == 6
+    [(statement, count)] = stats.repeated(5)
+    assert count == 5 and 'FROM suppliers' in statement
+
+def test_n_plus_one_is_logged(app, test_client, capsys):
+    """Test that a request repeating a statement up to the threshold logs a warning."""
+    test_client.get('/api/products/')
+    assert 'Possible N+1' not in capsys.readouterr().out
+
+    app.config['QUERY_N_PLUS_ONE_THRESHOLD'] = 1
+    test_client.get('/api/products/1')
+    assert 'Possible N+1 in GET /api/products/1 (products_api.get_product): 1x SELECT' in capsys.readouterr().out
+
+def test_server_timing_header_in_debug(app, test_client):
+    assert 'Server-Timing' not in test_client.get('/api/products/').headers
+    app.debug = True
+    header = test_client.get('/api/products/').headers['Server-Timing']
+    assert header.startswith('db;dur=') and header.endswith('desc="1 queries"')
+
+def test_executemany_is_not_flagged(app):
+    """Test that a statement sent once with many parameter sets (and its batches) is not taken for an N+1."""
+    with app.app_context():
+        with track_queries() as stats:
+            db.session.execute(db.update(Product), [{'id': i, 'min_stock': 3} for i in range(1, 11)])
+            db.session.execute(db.insert(Location).execution_options(insertmanyvalues_page_size=2).returning(Location.id),
+                               [{'name': f"Bin {i}"} for i in range(6)])
+        db.session.rollback()
+    assert stats.count >= 4 # Every batch is still a round trip
+    assert [statement for statement, count in stats.repeated(2) if 'products' in statement or 'locations' in statement] == []
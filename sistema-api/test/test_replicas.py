@@ -0,0 +1,85 @@
+import pytest
+from config import TestingConfig
+from app import create_app
+from app.db import db
+from app.models import Product
+from app.utils.replicas import PRIMARY_COOKIE, locking_read, replica_reads
+from sqlalchemy import select
+
+# --- Fixtures ---
+@pytest.fixture
+def app(tmp_path):
+    """App with a SQLite primary and two SQLite 'replicas', each holding a different product."""
+    class ReplicaConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        DATABASE_REPLICA_URLS = [f"sqlite:///{tmp_path / 'replica0.db'}", f"sqlite:///{tmp_path / 'replica1.db'}"]
+        INTERNAL_API_TOKEN = 'secret-token'
+
+    app_instance = create_app(config_object=ReplicaConfig)
+    with app_instance.app_context():
+        db.create_all()
+        db.session.add(Product(sku='PRIMARY', name='Primary', min_stock=5))
+        db.session.commit()
+        for index, bind in enumerate(('replica_0', 'replica_1')):
+            db.metadata.create_all(db.engines[bind])
+            with db.engines[bind].begin() as connection:
+                connection.exec_driver_sql(
+                    "INSERT INTO products (sku, name, unit_measure, min_stock, is_active, created_at, updated_at) "
+                    f"VALUES ('REPLICA{index}', 'Replica', 'unidad', 0, 1, '2024-01-01', '2024-01-01')"
+                )
+    yield app_instance
+
+@pytest.fixture
+def test_client(app):
+    with app.test_client() as client:
+        yield client
+
+def listed_skus(client):
+    return [item['sku'] for item in client.get('/api/products/').json['data']]
+
+# --- Tests ---
+
+def test_get_requests_round_robin_over_replicas(test_client):
+    """Test that product listings are served by the replicas in turn."""
+    assert listed_skus(test_client) == ['REPLICA0']
+    assert listed_skus(test_client) == ['REPLICA1']
+    assert listed_skus(test_client) == ['REPLICA0']
+
+def test_writes_go_to_primary_and_pin_client(app, test_client):
+    """Test read-your-writes: after a write the client reads from the primary until the cookie expires."""
+    response = test_client.post('/api/products/', json={'sku': 'NEW', 'name': 'New product'})
+    assert response.status_code == 201
+    assert PRIMARY_COOKIE in response.headers.get('Set-Cookie')
+
+    assert listed_skus(test_client) == ['PRIMARY', 'NEW']
+    # Another client is not pinned
+    assert listed_skus(app.test_client()) in (['REPLICA0'], ['REPLICA1'])
+
+def test_other_blueprints_read_from_primary(app, test_client):
+    """Test that only the configured blueprints are routed to replicas."""
+    app.config['DB_REPLICA_BLUEPRINTS'] = []
+    assert listed_skus(test_client) == ['PRIMARY']
+
+def test_replica_reads_outside_request(app):
+    """Test that replica_reads() (used by ReportService) routes SELECTs but not locking reads."""
+    with app.app_context():
+        with replica_reads():
+            assert db.session.scalars(select(Product.sku)).all() in (['REPLICA0'], ['REPLICA1'])
+            assert db.session.scalars(locking_read(select(Product.sku))).all() == ['PRIMARY']
+            # Pending, then flushed changes: the rest of the transaction must see them
+            db.session.add(Product(sku='PENDING', name='Pending'))
+            assert db.session.scalars(select(Product.sku).order_by(Product.id)).all() == ['PRIMARY', 'PENDING']
+            assert db.session.scalars(select(Product.sku).order_by(Product.id)).all() == ['PRIMARY', 'PENDING']
+            db.session.rollback()
+            assert db.session.scalars(select(Product.sku)).all() in (['REPLICA0'], ['REPLICA1'])
+        assert db.session.scalars(select(Product.sku)).all() == ['PRIMARY']
+
+def test_unhealthy_replica_is_skipped(app, test_client):
+    """Test that a replica marked down is left out of the rotation."""
+    app.extensions['replica_router'].mark_down('replica_0')
+
+    assert listed_skus(test_client) == ['REPLICA1']
+    assert listed_skus(test_client) == ['REPLICA1']
+
+    response = test_client.get('/api/internal/replicas', headers={'X-Internal-Token': 'secret-token'})
+    assert response.json['data'] == [{'bind': 'replica_0', 'healthy': False}, {'bind': 'replica_1', 'healthy': True}]
@@ -10,6 +10,7 @@ from app.api.reports import reports_bp, report_service
 
 # Import exceptions
 from app.utils.exceptions import DatabaseException
+from app.utils.edge import init_edge
 
 # --- Fixtures ---
 @pytest.fixture
@@ -18,6 +19,7 @@ def app():
     app = Flask(__name__)
     app.config['SECRET_KEY'] = 'testing' # Needed for some Flask extensions if used
     app.register_blueprint(reports_bp, url_prefix='/api/reports')
+    init_edge(app) # Answers the preflights
     return app
 
 @pytest.fixture
@@ -269,4 +271,45 @@ def test_sql_injection_in_report_filter(client):
     # Después de implementar la validación de entrada en el API de reportes
     assert response.status_code == 400 # O 422
     assert response.json['success'] is False
-    assert "Invalid" in response.json['message'] # O mensaje más específico
\ No newline at end of file
+    assert "Invalid" in response.json['message'] # O mensaje más específico
+
+# --- GET /api/reports/utilization Tests ---
+@patch('app.api.reports.capacity_service.get_utilization_report')
+def test_get_utilization_report_success(mock_get_utilization, client):
+    """Test getting the fullest locations."""
+    mock_data = [{'location_id': 3, 'location_name': 'Bin 3', 'utilization': 0.95}]
+    mock_get_utilization.return_value = mock_data
+
+    response = client.get('/api/reports/utilization?limit=5')
+
+    mock_get_utilization.assert_called_once_with(order='desc', limit=5)
+    assert response.status_code == 200
+    assert response.json == {'success': True, 'data': mock_data}
+
+
+@patch('app.api.reports.capacity_service.get_utilization_report')
+def test_get_utilization_report_emptiest_and_invalid_params(mock_get_utilization, client):
+    """Test order=asc and validation of order/limit."""
+    mock_get_utilization.return_value = []
+
+    response = client.get('/api/reports/utilization?order=ASC')
+    mock_get_utilization.assert_called_once_with(order='asc', limit=10)
+    assert response.status_code == 200
+
+    mock_get_utilization.reset_mock()
+    response = client.get('/api/reports/utilization?order=sideways')
+    assert response.status_code == 400
+    response = client.get('/api/reports/utilization?limit=abc')
+    assert response.status_code == 400
+    mock_get_utilization.assert_not_called()
+
+
+@patch('app.api.reports.capacity_service.get_utilization_report')
+def test_get_utilization_report_database_error(mock_get_utilization, client):
+    """Test getting the utilization report handles database errors."""
+    mock_get_utilization.side_effect = DatabaseException("Utilization DB Error")
+
+    response = client.get('/api/reports/utilization')
+
+    assert response.status_code == 500
+    assert response.json == {'success': False, 'message': 'Database error occurred while fetching utilization report.'}
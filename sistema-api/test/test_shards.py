@@ -0,0 +1,252 @@
+import pytest
+from unittest.mock import patch
+from sqlalchemy.exc import OperationalError
+from config import TestingConfig
+from app import create_app
+from app.db import db
+from app.models import Product, User
+from app.services.inventory_service import InventoryService
+from app.services.projection_service import ProjectionService
+from app.services.report_service import ReportService
+from app.utils.exceptions import NotFoundException
+from app.utils.webhooks import StubReceiver
+
+# --- Fixtures ---
+@pytest.fixture
+def app(tmp_path):
+    """
+    App with three SQLite shards: the primary (shard 0) and two more. Root locations 1, 2 and 3 are the
+    location groups of shards 1, 2 and 0 (id % 3); location 4 is a child of location 1.
+    """
+    class ShardConfig(TestingConfig):
+        SQLALCHEMY_DATABASE_URI = f"sqlite:///{tmp_path / 'primary.db'}"
+        DATABASE_SHARD_URLS = [f"sqlite:///{tmp_path / 'shard1.db'}", f"sqlite:///{tmp_path / 'shard2.db'}"]
+
+    app_instance = create_app(config_object=ShardConfig)
+    with app_instance.app_context():
+        db.create_all()
+        app_instance.extensions['shard_router'].create_all(db.metadata)
+        db.session.add_all([Product(sku='SKU001', name='Product A'), Product(sku='SKU002', name='Product B'),
+                            User(username='picker', password_hash='x')])
+        db.session.commit()
+    client = app_instance.test_client()
+    for name, parent_id in (('Store 1', None), ('Store 2', None), ('Store 3', None), ('Store 1 shelf', 1)):
+        assert client.post('/api/locations/', json={'name': name, 'parent_id': parent_id}).status_code == 201
+    yield app_instance
+
+@pytest.fixture
+def test_client(app):
+    with app.test_client() as client:
+        yield client
+
+def add_stock(client, location_id, quantity, product_id=1):
+    return client.post('/api/inventory/add', json={'product_id': product_id, 'location_id': location_id, 'quantity': quantity, 'user_id': 1})
+
+def transfer(client, from_location_id, to_location_id, quantity):
+    return client.post('/api/inventory/transfer', json={
+        'product_id': 1, 'from_location_id': from_location_id, 'to_location_id': to_location_id, 'quantity': quantity, 'user_id': 1,
+    })
+
+def rows(app, shard, sql):
+    with app.app_context():
+        with app.extensions['shard_router'].engines[shard].connect() as connection:
+            return [tuple(row) for row in connection.exec_driver_sql(sql)]
+
+def stock(app, shard):
+    return rows(app, shard, 'SELECT location_id, quantity FROM stock_levels ORDER BY location_id')
+
+# --- Tests ---
+
+def test_movements_are_stored_on_their_location_groups_shard(app, test_client):
+    """Test that stock and movements go to the shard of the location's root."""
+    for location_id in (1, 2, 3, 4):
+        assert add_stock(test_client, location_id, 10 * location_id).status_code == 201
+
+    assert stock(app, 1) == [(1, 10), (4, 40)] # Location 4 is in location 1's group
+    assert stock(app, 2) == [(2, 20)]
+    assert stock(app, 0) == [(3, 30)]
+    assert rows(app, 2, 'SELECT location_id FROM inventory_transactions') == [(2,)]
+
+    response = test_client.get('/api/inventory/stock?product_id=1')
+    assert [(item['location_id'], item['quantity'], item['location_name']) for item in response.json['data']] == [
+        (1, '10.00', 'Store 1'), (2, '20.00', 'Store 2'), (3, '30.00', 'Store 3'), (4, '40.00', 'Store 1 shelf'),
+    ]
+    response = test_client.get('/api/locations/1/stock?rollup=true')
+    assert response.json['data'][0]['quantity'] == '50.00'
+
+def test_reference_rows_are_mirrored_after_commit(app, test_client):
+    """Test that catalog and location changes reach every shard, closure rows included."""
+    assert test_client.put('/api/products/1', json={'name': 'Renamed'}).status_code == 200
+    assert test_client.post('/api/products/', json={'sku': 'SKU003', 'name': 'Product C'}).status_code == 201
+    for shard in (1, 2):
+        assert rows(app, shard, 'SELECT sku, name FROM products ORDER BY product_id') == [
+            ('SKU001', 'Renamed'), ('SKU002', 'Product B'), ('SKU003', 'Product C')]
+        assert (1, 4, 1) in rows(app, shard, 'SELECT ancestor_id, descendant_id, depth FROM location_closure')
+
+def test_closure_changes_mirror_only_the_moved_subtree(app, test_client):
+    """Test that moving a category replaces its subtree's closure rows on the shards, not the whole table."""
+    for name, parent_id in (('Tools', None), ('Hand tools', 1), ('Hammers', 2), ('Garden', None)):
+        assert test_client.post('/api/categories/', json={'name': name, 'parent_id': parent_id}).status_code == 201
+    with app.app_context():
+        with app.extensions['shard_router'].engines[1].begin() as connection:
+            # A row only the shard has: a whole-table replace would drop it
+            connection.exec_driver_sql('INSERT INTO category_closure (ancestor_id, descendant_id, depth) VALUES (99, 99, 0)')
+
+    assert test_client.put('/api/categories/2', json={'parent_id': 4}).status_code == 200
+    sql = 'SELECT ancestor_id, descendant_id, depth FROM category_closure WHERE ancestor_id < 99 ORDER BY 1, 2'
+    expected = [(1, 1, 0), (2, 2, 0), (2, 3, 1), (3, 3, 0), (4, 2, 1), (4, 3, 2), (4, 4, 0)]
+    for shard in (0, 1, 2):
+        assert rows(app, shard, sql) == expected
+    assert rows(app, 1, 'SELECT depth FROM category_closure WHERE ancestor_id = 99') == [(0,)]
+
+def test_shards_sync_copies_rows_written_outside_the_session(app):
+    """Test `flask shards-sync` for catalog rows written with raw SQL."""
+    with app.app_context():
+        with db.engine.begin() as connection:
+            connection.exec_driver_sql("UPDATE products SET name = 'Raw' WHERE sku = 'SKU002'")
+    result = app.test_cli_runner().invoke(args=['shards-sync'])
+    assert result.exit_code == 0, result.output
+    assert rows(app, 2, "SELECT name FROM products WHERE sku = 'SKU002'") == [('Raw',)]
+
+def test_transfer_within_a_shard(test_client):
+    """Test that a transfer inside one location group stays a single local transaction."""
+    add_stock(test_client, 1, 10)
+    with patch.object(InventoryService, '_create_cross_shard_transfer') as mock_saga:
+        transfer(test_client, 1, 4, 3)
+    mock_saga.assert_not_called()
+
+def test_cross_shard_transfer(app, test_client):
+    """Test the saga: debit on the source shard, credit on the destination shard, transfer completed."""
+    add_stock(test_client, 1, 10)
+    response = transfer(test_client, 1, 2, 4)
+    assert response.status_code == 201
+    assert response.json['data']['status'] == 'completada'
+
+    assert stock(app, 1) == [(1, 6)]
+    assert stock(app, 2) == [(2, 4)]
+    assert rows(app, 1, 'SELECT status FROM location_transfers') == [('completada',)]
+    assert rows(app, 2, 'SELECT reference_number FROM inventory_transactions') == [('Transfer In 1:1',)]
+
+    assert transfer(test_client, 1, 2, 100).status_code == 409 # Insufficient stock: nothing recorded
+    assert rows(app, 1, 'SELECT COUNT(*) FROM location_transfers') == [(1,)]
+
+def test_cross_shard_transfer_left_pending_is_resolved(app, test_client):
+    """Test that a transfer whose destination was down is completed later, exactly once."""
+    add_stock(test_client, 1, 10)
+    with patch.object(InventoryService, '_receive_transfer', side_effect=OperationalError('INSERT', {}, Exception('down'))):
+        response = transfer(test_client, 1, 2, 4)
+    assert response.json['data']['status'] == 'pendiente'
+    assert stock(app, 1) == [(1, 6)]
+    assert stock(app, 2) == []
+
+    with app.app_context():
+        assert InventoryService().resolve_pending_transfers(older_than_s=3600) == (0, 0) # Too recent
+        assert InventoryService().resolve_pending_transfers(older_than_s=-60) == (1, 0)
+        assert InventoryService().resolve_pending_transfers(older_than_s=-60) == (0, 0)
+    assert stock(app, 2) == [(2, 4)]
+    assert rows(app, 1, 'SELECT status FROM location_transfers') == [('completada',)]
+
+def test_cross_shard_transfer_refused_by_the_destination_is_reverted(app, test_client):
+    """Test the compensation: the stock goes back to the source."""
+    add_stock(test_client, 1, 10)
+    with patch.object(InventoryService, '_receive_transfer', side_effect=NotFoundException('Location gone.')):
+        response = transfer(test_client, 1, 2, 4)
+    assert response.status_code == 404
+    assert stock(app, 1) == [(1, 10)]
+    assert rows(app, 1, 'SELECT status FROM location_transfers') == [('revertida',)]
+
+def test_transactions_and_transfers_api_are_routed_by_location(app, test_client):
+    """Test that /api/transactions/ and /api/transfers/ write to the location's shard, the latter through the saga across shards."""
+    response = test_client.post('/api/transactions/', json={
+        'product_id': 1, 'location_id': 1, 'quantity': 7, 'transaction_type': 'entrada', 'user_id': 1,
+    })
+    assert response.status_code == 201, response.json
+    assert add_stock(test_client, 1, 3).status_code == 201
+    assert stock(app, 0) == []
+    assert stock(app, 1) == [(1, 10)] # One row for the location, with both movements
+
+    body = {'product_id': 1, 'from_location_id': 1, 'quantity': 2, 'user_id': 1}
+    response = test_client.post('/api/transfers/', json={**body, 'to_location_id': 4})
+    assert response.status_code == 201, response.json
+    response = test_client.post('/api/transfers/', json={**body, 'to_location_id': 2})
+    assert response.status_code == 201, response.json
+    assert response.json['data']['status'] == 'completada'
+    assert stock(app, 1) == [(1, 6), (4, 2)]
+    assert stock(app, 2) == [(2, 2)]
+    assert stock(app, 0) == []
+
+def test_reports_gather_every_shard(app, test_client):
+    """Test that report pages are merged across shards in the requested order."""
+    for location_id, quantity in ((1, 5), (2, 50), (3, 20), (4, 30)):
+        add_stock(test_client, location_id, quantity)
+    add_stock(test_client, 2, 1, product_id=2)
+
+    with app.app_context():
+        service = ReportService()
+        page = service.get_stock_levels(pagination={'page': 1, 'limit': 2}, sorting={'quantity': 'desc'})
+        assert [(item['location_id'], item['quantity']) for item in page] == [(2, '50.00'), (4, '30.00')]
+        page = service.get_stock_levels(pagination={'page': 2, 'limit': 2}, sorting={'quantity': 'desc'})
+        assert [(item['location_id'], item['quantity']) for item in page] == [(3, '20.00'), (1, '5.00')]
+        assert [item['location_id'] for item in service.get_stock_levels(filters={'location_id': 2})] == [2, 2]
+        assert len(service.get_transaction_history()) == 5
+
+def test_location_cannot_move_to_another_shard(test_client):
+    """Test that a subtree keeps its shard."""
+    response = test_client.put('/api/locations/4', json={'parent_id': 2})
+    assert response.status_code == 409
+    assert test_client.put('/api/locations/4', json={'parent_id': 1, 'name': 'Shelf'}).status_code == 200
+
+def test_projections_run_on_every_shard(app, test_client):
+    """Test that each shard projects its own ledger."""
+    for location_id in (1, 2, 4):
+        add_stock(test_client, location_id, 5)
+    with app.app_context():
+        assert ProjectionService().catch_up(['valuation']) == {'valuation': 3}
+    assert rows(app, 1, 'SELECT product_id, quantity FROM inventory_valuation') == [(1, 10)]
+    assert rows(app, 2, 'SELECT product_id, quantity FROM inventory_valuation') == [(1, 5)]
+
+def test_webhooks_are_delivered_from_every_shard(app, test_client):
+    """Test that each shard's outbox is delivered, with the shard in the batch id."""
+    deliveries = []
+    receiver = StubReceiver(on_batch=lambda batch, headers: deliveries.append(headers['X-Webhook-Delivery'])).start()
+    try:
+        app.config.update(WEBHOOK_ENDPOINTS={'erp': receiver.url}, WEBHOOK_GAP_TIMEOUT_S=0)
+        app.extensions['webhooks'] = True
+        add_stock(test_client, 1, 5)
+        add_stock(test_client, 2, 5)
+        result = app.test_cli_runner().invoke(args=['webhooks-run'])
+        assert result.output.strip() == 'erp: 4'
+        assert sorted(deliveries) == ['erp:1:1-2', 'erp:2:1-2']
+    finally:
+        receiver.stop()
+
+def test_change_feed_cursor_covers_every_shard(test_client):
+    """Test that changes logged on each shard come back, with one cursor position per shard."""
+    cursor = test_client.get('/api/changes').json['cursor']
+    assert len(cursor.split('.')) == 3
+    add_stock(test_client, 1, 5)
+    add_stock(test_client, 2, 5)
+    feed = test_client.get(f'/api/changes?since={cursor}').json
+    assert sorted(level['location_id'] for level in feed['data']['stock_levels']) == [1, 2]
+    assert test_client.get('/api/changes?since=0').status_code == 410 # A cursor from before the sharding
+
+def test_asgi_movements_are_routed_to_their_shard(app):
+    """Test that movements served by the ASGI app are written to their location group's shard."""
+    pytest.importorskip('aiosqlite')
+    import asyncio
+    from app.asgi import InventoryASGI
+    from .test_asgi import call
+
+    asgi_app = InventoryASGI(app)
+    try:
+        movement = {'product_id': 1, 'location_id': 1, 'quantity': 5, 'user_id': 1}
+        status, body = call(asgi_app, 'POST', '/api/inventory/add', movement)
+        assert status == 201, body
+        status, body = call(asgi_app, 'POST', '/api/inventory/add', {**movement, 'location_id': 2, 'quantity': 3})
+        assert status == 201, body
+        assert stock(app, 1) == [(1, 5)]
+        assert stock(app, 2) == [(2, 3)]
+        assert stock(app, 0) == []
+        assert call(asgi_app, 'GET', '/api/inventory/stock', query_string=b'product_id=1&location_id=2')[1]['data'][0]['quantity'] == '3.00'
+    finally:
+        asyncio.run(asgi_app.dispose())
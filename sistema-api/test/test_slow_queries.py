@@ -0,0 +1,123 @@
+import pytest
+from unittest.mock import MagicMock
+from sqlalchemy import text
+from config import TestingConfig
+from app import create_app
+from app.db import db
+from app.utils.slow_queries import SlowQueryLog
+
+# Takes a few milliseconds on SQLite
+SLOW_SELECT = text(
+    "WITH RECURSIVE counter(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM counter WHERE x < :n) "
+    "SELECT count(*) FROM counter"
+)
+
+# --- Fixtures ---
+@pytest.fixture
+def app():
+    class SlowQueryConfig(TestingConfig):
+        SLOW_QUERY_THRESHOLD_MS = 1
+        SLOW_QUERY_BUFFER_SIZE = 3
+        SLOW_QUERY_EXPLAIN_SAMPLE_RATE = 1.0
+        INTERNAL_API_TOKEN = 'secret-token'
+
+    app_instance = create_app(config_object=SlowQueryConfig)
+    with app_instance.app_context():
+        db.create_all()
+    yield app_instance
+
+@pytest.fixture
+def test_client(app):
+    with app.test_client() as client:
+        yield client
+
+@pytest.fixture
+def slow_log(app):
+    return app.extensions['slow_query_log']
+
+def run_slow_select(app, n=40000, path='/api/transactions/?product_id=7&transaction_type=in'):
+    with app.test_request_context(path):
+        return db.session.execute(SLOW_SELECT, {'n': n}).scalar()
+
+# --- Tests ---
+
+def test_slow_query_is_logged_with_context_and_plan(app, slow_log, capsys):
+    """Test that a slow statement is recorded with its parameters, request and plan."""
+    assert run_slow_select(app) == 40000
+    [entry] = slow_log.entries()
+    assert entry['statement'].startswith('WITH RECURSIVE counter(x)')
+    assert entry['parameters'] == ['40000']
+    assert entry['duration_ms'] >= 1
+    assert entry['request'] == 'GET /api/transactions/?product_id=7&transaction_type=in'
+    assert entry['endpoint'] == 'transactions_api.list_transactions'
+    assert 'SCAN' in entry['plan']
+    assert 'Slow query' in capsys.readouterr().out
+
+def test_plan_sampling_cooldown(app, slow_log):
+    """Test that the same statement is explained at most once per cooldown."""
+    run_slow_select(app)
+    run_slow_select(app)
+    assert [entry['plan'] is not None for entry in reversed(slow_log.entries())].count(True) == 1
+
+def test_plan_not_captured_when_not_sampled(app, slow_log):
+    slow_log.sample_rate = 0
+    run_slow_select(app)
+    assert slow_log.entries()[0]['plan'] is None
+
+def test_writes_are_never_explained(slow_log):
+    assert slow_log.should_explain('UPDATE products SET name = ?') is False
+    assert slow_log.should_explain('  WITH x AS (SELECT 1) SELECT * FROM x') is True
+
+def test_explain_analyze_is_opt_in(slow_log):
+    """Test that PostgreSQL plans are estimated (the query is not run again) unless analyze is set."""
+    connection = MagicMock()
+    connection.dialect.name = 'postgresql'
+    cursor = connection.connection.dbapi_connection.cursor.return_value
+    cursor.fetchall.return_value = [('Seq Scan on products',)]
+
+    assert slow_log.analyze is False
+    assert slow_log.explain(connection, 'SELECT * FROM products', ()) == 'Seq Scan on products'
+    assert cursor.execute.call_args_list[1].args == ('EXPLAIN SELECT * FROM products', ())
+
+    cursor.execute.reset_mock()
+    SlowQueryLog(1, analyze=True).explain(connection, 'SELECT * FROM products', ())
+    assert cursor.execute.call_args_list[1].args == ('EXPLAIN (ANALYZE, BUFFERS) SELECT * FROM products', ())
+
+def test_buffer_is_bounded_and_sorted(app, slow_log):
+    """Test that only the last SLOW_QUERY_BUFFER_SIZE entries are kept, slowest first."""
+    for n in (30000, 10000, 40000, 20000):
+        run_slow_select(app, n)
+    parameters = [entry['parameters'] for entry in slow_log.entries()]
+    assert len(parameters) == 3
+    assert ['30000'] not in parameters
+    durations = [entry['duration_ms'] for entry in slow_log.entries()]
+    assert durations == sorted(durations, reverse=True)
+
+def test_fast_queries_are_ignored(app, slow_log):
+    with app.app_context():
+        db.session.execute(text('SELECT 1'))
+    assert slow_log.entries() == []
+
+def test_slow_queries_endpoint(app, test_client, slow_log):
+    """Test GET/DELETE /api/internal/slow-queries."""
+    headers = {'X-Internal-Token': 'secret-token'}
+    assert test_client.get('/api/internal/slow-queries').status_code == 401
+
+    run_slow_select(app)
+    run_slow_select(app, 20000)
+    response = test_client.get('/api/internal/slow-queries?limit=1', headers=headers)
+    assert response.status_code == 200
+    assert len(response.json['data']) == 1
+
+    assert test_client.delete('/api/internal/slow-queries', headers=headers).status_code == 200
+    assert test_client.get('/api/internal/slow-queries', headers=headers).json['data'] == []
+
+def test_slow_query_log_disabled():
+    class NoSlowQueryLogConfig(TestingConfig):
+        SLOW_QUERY_THRESHOLD_MS = 0
+        INTERNAL_API_TOKEN = 'secret-token'
+
+    app = create_app(config_object=NoSlowQueryLogConfig)
+    assert 'slow_query_log' not in app.extensions
+    response = app.test_client().get('/api/internal/slow-queries', headers={'X-Internal-Token': 'secret-token'})
+    assert response.status_code == 404
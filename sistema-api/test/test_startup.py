@@ -0,0 +1,44 @@
+import os
+import subprocess
+import sys
+from app import create_app
+
+BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+def test_routes_are_registered_on_first_use():
+    """Test that create_app defers the blueprints until the URL map is used."""
+    app = create_app(config_object='config.TestingConfig')
+    assert 'products_api' not in app.blueprints
+
+    rules = {rule.rule for rule in app.url_map.iter_rules()}
+    assert '/api/products/' in rules
+    assert 'products_api' in app.blueprints
+
+def test_first_request_loads_routes():
+    """Test that the first request is routed even though no route was registered yet."""
+    app = create_app(config_object='config.TestingConfig')
+    response = app.test_client().get('/api/internal/pool')
+    assert response.status_code == 404
+    assert response.json['message'] == 'Resource not found'
+
+def test_create_app_does_not_import_routes_or_services():
+    """Test that processes that never route (CLI commands) skip the route modules and services."""
+    code = (
+        "import sys\n"
+        "from app import create_app\n"
+        "create_app('config.TestingConfig')\n"
+        "print(sorted(m for m in sys.modules if m.startswith(('app.api.', 'app.services'))))"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == '[]'
+
+def test_create_app_registers_models():
+    """Test that the metadata is complete without loading routes (create_all, flask db migrate)."""
+    code = (
+        "from app import create_app\n"
+        "from app.db import db\n"
+        "create_app('config.TestingConfig')\n"
+        "print('products' in db.metadata.tables and 'stock_levels' in db.metadata.tables)"
+    )
+    result = subprocess.run([sys.executable, '-c', code], cwd=BASE_DIR, capture_output=True, text=True, check=True)
+    assert result.stdout.strip() == 'True'
@@ -0,0 +1,57 @@
+import asyncio
+from app.utils.stream import CLOSE, RESYNC, StockBroker, listen_dsn
+
+
+def event(product_id, location_id, quantity='1.00'):
+    return {'product_id': product_id, 'location_id': location_id, 'quantity': quantity}
+
+def drain(subscription):
+    items = []
+    while not subscription.queue.empty():
+        items.append(subscription.queue.get_nowait())
+    return items
+
+# --- Tests ---
+
+def test_broker_routes_events_by_filter():
+    """Test that each subscription receives only the events matching its product and location filters."""
+    async def scenario():
+        broker = StockBroker()
+        broker.start(asyncio.get_running_loop())
+        everything = broker.subscribe()
+        product = broker.subscribe(products={1})
+        product_at_location = broker.subscribe(products={1, 2}, locations={5})
+        location = broker.subscribe(locations={6})
+        broker.publish([event(1, 5), event(2, 6), event(3, 6)])
+        await asyncio.sleep(0)
+        result = [drain(subscription) for subscription in (everything, product, product_at_location, location)]
+        broker.unsubscribe(product)
+        assert broker.count == 3 and 1 in broker._by_product
+        return result
+
+    everything, product, product_at_location, location = asyncio.run(scenario())
+    assert len(everything) == 3
+    assert product == [event(1, 5)]
+    assert product_at_location == [event(1, 5)]
+    assert location == [event(2, 6), event(3, 6)]
+
+def test_slow_subscriber_gets_a_resync():
+    """Test that a full queue is replaced by a single resync, and that stop closes the streams."""
+    async def scenario():
+        broker = StockBroker(queue_size=2)
+        broker.start(asyncio.get_running_loop())
+        subscription = broker.subscribe()
+        broker.publish([event(1, 1), event(1, 2), event(1, 3)])
+        await asyncio.sleep(0)
+        overflowed = drain(subscription)
+        broker.stop()
+        return overflowed, drain(subscription)
+
+    overflowed, closed = asyncio.run(scenario())
+    assert overflowed == [RESYNC]
+    assert closed == [CLOSE]
+
+def test_listen_dsn_drops_the_driver():
+    """Test that the LISTEN connection uses a plain PostgreSQL DSN."""
+    assert listen_dsn({'SQLALCHEMY_DATABASE_URI': 'postgresql+psycopg2://u:p@db/inv'}) == 'postgresql://u:p@db/inv'
+    assert listen_dsn({'SQLALCHEMY_DATABASE_URI': 'x', 'STREAM_DATABASE_URL': 'postgresql://u:p@primary/inv'}) == 'postgresql://u:p@primary/inv'
@@ -0,0 +1,106 @@
+import pytest
+from collections import Counter
+from sqlalchemy import func, select
+from app import create_app
+from app.db import db
+from app.models import (
+    Barcode, CategoryClosure, InventoryTransaction, LocationTransfer, LocationUtilization, Product, StockLevel,
+)
+from app.utils.helpers import stock_delta
+
+SEED_ARGS = [
+    'seed-synthetic', '--products', '200', '--transactions', '3000', '--days', '60', '--end-date', '2025-12-31',
+    '--category-depth', '2', '--category-fanout', '3', '--warehouses', '2', '--location-depth', '2',
+    '--suppliers', '5', '--users', '3', '--chunk-size', '500',
+]
+
+# --- Fixtures ---
+@pytest.fixture
+def app():
+    app_instance = create_app(config_object='config.TestingConfig')
+    with app_instance.app_context():
+        db.create_all()
+    yield app_instance
+    with app_instance.app_context():
+        db.session.remove()
+        db.drop_all()
+
+def seed(app, *extra):
+    result = app.test_cli_runner().invoke(args=SEED_ARGS + list(extra))
+    assert result.exit_code == 0, result.output
+    return result
+
+def fingerprint(app):
+    with app.app_context():
+        return db.session.execute(
+            select(InventoryTransaction.product_id, InventoryTransaction.location_id,
+                   InventoryTransaction.transaction_type, InventoryTransaction.quantity,
+                   InventoryTransaction.transaction_date).order_by(InventoryTransaction.id)
+        ).all()
+
+# --- Tests ---
+
+def test_seed_synthetic_generates_the_dataset(app):
+    """Test that the command writes the catalog, hierarchies and movement history."""
+    result = seed(app)
+    assert 'inventory_transactions' in result.output
+
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Product)) == 200
+        assert db.session.scalar(select(func.count()).select_from(Barcode)) >= 200
+        assert db.session.scalar(select(func.count()).select_from(InventoryTransaction)) >= 3000
+        assert db.session.scalar(select(func.count()).select_from(LocationTransfer)) > 0
+        # 3 + 9 categories, each with itself and its root
+        assert db.session.scalar(select(func.count()).select_from(CategoryClosure)) == 12 + 9
+        assert db.session.scalar(select(func.count()).select_from(LocationUtilization)) == 2 + 8
+        dates = db.session.execute(select(func.min(InventoryTransaction.transaction_date),
+                                          func.max(InventoryTransaction.transaction_date))).one()
+        assert dates[0].year == 2025 and dates[0].month == 11 and dates[1].day == 30
+
+def test_seed_synthetic_stock_levels_match_transactions(app):
+    """Test that every stock level equals the net of its transactions and none is negative."""
+    seed(app)
+    with app.app_context():
+        balances = Counter()
+        for transaction in db.session.scalars(select(InventoryTransaction)):
+            balances[(transaction.product_id, transaction.location_id)] += stock_delta(
+                transaction.transaction_type, transaction.quantity)
+        levels = {(level.product_id, level.location_id): level.quantity for level in db.session.scalars(select(StockLevel))}
+
+    assert set(balances) <= set(levels)
+    assert all(levels[key] == balances.get(key, 0) for key in levels)
+    assert min(levels.values()) >= 0
+
+def test_seed_synthetic_popularity_is_skewed(app):
+    """Test that a few SKUs get most of the movements (Zipfian popularity)."""
+    seed(app)
+    with app.app_context():
+        counts = sorted(db.session.execute(
+            select(func.count()).select_from(InventoryTransaction).group_by(InventoryTransaction.product_id)
+        ).scalars(), reverse=True)
+    assert sum(counts[:20]) > sum(counts) / 2
+
+def test_seed_synthetic_is_deterministic(app):
+    """Test that the same seed and options produce the same history."""
+    seed(app)
+    other = create_app(config_object='config.TestingConfig')
+    with other.app_context():
+        db.create_all()
+    seed(other)
+    try:
+        assert fingerprint(app) == fingerprint(other)
+    finally:
+        with other.app_context():
+            db.session.remove()
+            db.drop_all()
+
+def test_seed_synthetic_refuses_an_existing_prefix(app):
+    """Test that seeding twice with the same prefix fails instead of duplicating SKUs."""
+    seed(app)
+    result = app.test_cli_runner().invoke(args=SEED_ARGS)
+    assert result.exit_code != 0
+    assert 'already contains SYN-* products' in result.output
+
+    seed(app, '--prefix', 'SYN2')
+    with app.app_context():
+        assert db.session.scalar(select(func.count()).select_from(Product)) == 400
@@ -447,6 +447,21 @@ def test_get_stock_levels_success_with_filters(mock_get_stock_levels, test_clien
     assert len(response.json['data']) == 1
 
 
+@patch('app.api.transactions.report_service.get_stock_levels')
+def test_get_stock_levels_with_category_descendants(mock_get_stock_levels, test_client):
+    """Test that includeDescendants is passed along with the category filter."""
+    mock_get_stock_levels.return_value = [MockStockLevel(product_id=1, location_id=10, total_quantity=100)]
+
+    response = test_client.get('/api/transactions/stock-levels?categoryId=5&includeDescendants=true')
+
+    mock_get_stock_levels.assert_called_once_with(
+        filters={'category_id': 5, 'include_descendants': True},
+        pagination={},
+        sorting={}
+    )
+    assert response.status_code == 200
+
+
 @patch('app.api.transactions.report_service.get_stock_levels')
 def test_get_stock_levels_invalid_filter_ids(mock_get_stock_levels, test_client):
     """Test getting stock levels with invalid filter IDs."""
@@ -0,0 +1,33 @@
+import gc
+import pytest
+from app import create_app
+from app.db import db
+from app.warmup import preload, after_fork, warm_up
+
+@pytest.fixture
+def app():
+    app_instance = create_app(config_object='config.TestingConfig')
+    yield app_instance
+
+def test_preload_and_after_fork(app):
+    """Test that the master/worker hooks run against the configured engines."""
+    try:
+        preload(app)
+        assert gc.get_freeze_count() > 0
+    finally:
+        gc.unfreeze()
+    after_fork(app)
+    with app.app_context():
+        assert db.session.execute(db.text('SELECT 1')).scalar() == 1
+
+def test_warm_up_with_schema(app, capsys):
+    """Test that warm-up runs the hot queries without errors."""
+    with app.app_context():
+        db.create_all()
+    warm_up(app)
+    assert 'could not reach the database' not in capsys.readouterr().out
+
+def test_warm_up_tolerates_missing_database(app, capsys):
+    """Test that a failing warm-up only logs a warning."""
+    warm_up(app) # No tables yet
+    assert 'could not reach the database' in capsys.readouterr().out
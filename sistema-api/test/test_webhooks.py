@@ -0,0 +1,131 @@
+import pytest
+from datetime import datetime, timedelta
+from config import TestingConfig
+from app.db import db
+from app.models import WebhookEndpoint, WebhookOutbox
+from app.services import WebhookService
+from app.utils.metrics import WEBHOOK_LAG
+from app.utils.webhooks import StubReceiver
+from .conftest import add_stock
+
+UNREACHABLE = 'http://127.0.0.1:1/' # Connection refused
+
+# --- Fixtures ---
+@pytest.fixture
+def receiver():
+    stub = StubReceiver(secret='hook-secret').start()
+    yield stub
+    stub.stop()
+
+@pytest.fixture
+def app_config(receiver):
+    class WebhooksConfig(TestingConfig):
+        WEBHOOK_ENDPOINTS = {'erp': receiver.url}
+        WEBHOOK_SECRET = 'hook-secret'
+        WEBHOOK_GAP_TIMEOUT_S = 0 # SQLite has no concurrent writers
+        WEBHOOK_BACKOFF_BASE_S = 0 # Retry on the next run
+    return WebhooksConfig
+
+def run(app, *args):
+    result = app.test_cli_runner().invoke(args=['webhooks-run', *args])
+    assert result.exit_code == 0, result.output
+    return result.output.strip().splitlines()[-1] # After the failed deliveries logged
+
+# --- Tests ---
+
+def test_movements_are_delivered_from_the_outbox(app, test_client, receiver):
+    """Test that a movement only writes outbox events, and that the dispatcher delivers them once, in order."""
+    add_stock(test_client)
+    add_stock(test_client, 2)
+    assert receiver.batches == [] # Nothing is sent from the request
+    with app.app_context():
+        assert [row.event_type for row in WebhookOutbox.query.order_by(WebhookOutbox.id)] == [
+            'inventory.movement', 'stock_level.changed', 'inventory.movement', 'stock_level.changed',
+        ]
+
+    assert run(app) == 'erp: 4'
+    assert len(receiver.batches) == 1
+    movements = [event['data'] for event in receiver.events if event['type'] == 'inventory.movement']
+    levels = [event['data'] for event in receiver.events if event['type'] == 'stock_level.changed']
+    assert [(movement['transaction_type'], movement['quantity']) for movement in movements] == [('entrada', '5.00'), ('entrada', '2.00')]
+    assert levels[-1] == {'product_id': 1, 'location_id': 1, 'quantity': '7.00'}
+    assert [event['id'] for event in receiver.events] == [1, 2, 3, 4]
+
+    assert run(app) == 'erp: 0'
+    assert len(receiver.batches) == 1
+
+def test_failed_batches_are_retried(app, test_client, receiver):
+    """Test that a rejected batch keeps the endpoint's position and is sent again, whole, on the next run."""
+    add_stock(test_client)
+    receiver.failures = 1
+    assert run(app) == 'erp: 0'
+    with app.app_context():
+        endpoint = db.session.get(WebhookEndpoint, 'erp')
+        assert (endpoint.position, endpoint.attempts, endpoint.last_error) == (0, 1, 'HTTP 503')
+        assert WebhookService().status()[0]['pending'] == 2
+
+    assert run(app) == 'erp: 2'
+    with app.app_context():
+        endpoint = db.session.get(WebhookEndpoint, 'erp')
+        assert (endpoint.position, endpoint.attempts, endpoint.last_error) == (2, 0, None)
+
+def test_backoff_delays_the_next_attempt(app, test_client):
+    """Test that a failing endpoint is not retried before its backoff, and reports its lag."""
+    app.config['WEBHOOK_ENDPOINTS'] = {'erp': UNREACHABLE}
+    app.config['WEBHOOK_BACKOFF_BASE_S'] = 60
+    add_stock(test_client)
+    assert run(app) == 'erp: 0'
+    with app.app_context():
+        endpoint = db.session.get(WebhookEndpoint, 'erp')
+        assert endpoint.attempts == 1
+        assert endpoint.next_attempt_at > datetime.utcnow() + timedelta(seconds=20)
+    assert run(app) == 'erp: 0'
+    with app.app_context():
+        assert db.session.get(WebhookEndpoint, 'erp').attempts == 1 # Not tried again yet
+    assert WEBHOOK_LAG.labels('erp')._value.get() > 0
+
+def test_endpoints_are_batched_independently(app, test_client, receiver):
+    """Test batching per endpoint: a down endpoint does not hold back the others."""
+    app.config['WEBHOOK_ENDPOINTS'] = {'erp': receiver.url, 'shop': UNREACHABLE}
+    app.config['WEBHOOK_BATCH_SIZE'] = 3
+    for quantity in (1, 2, 3):
+        add_stock(test_client, quantity)
+    assert run(app) == 'erp: 6, shop: 0'
+    assert [len(batch['events']) for batch in receiver.batches] == [3, 3]
+
+    result = app.test_cli_runner().invoke(args=['webhooks-status'])
+    assert 'erp: position 6, 0 pending' in result.output
+    assert 'shop: position 0, 6 pending' in result.output and '1 failed attempt(s)' in result.output
+
+    result = app.test_cli_runner().invoke(args=['webhooks-run', '--endpoint', 'unknown'])
+    assert result.exit_code != 0
+
+def test_signature_is_checked(app, test_client, receiver):
+    """Test that the stub receiver rejects bodies signed with another secret."""
+    app.config['WEBHOOK_SECRET'] = 'wrong'
+    add_stock(test_client)
+    assert run(app) == 'erp: 0'
+    assert receiver.batches == []
+    with app.app_context():
+        assert db.session.get(WebhookEndpoint, 'erp').last_error == 'HTTP 401'
+
+def test_prune_keeps_undelivered_events(app, test_client):
+    """Test that pruning only deletes events every endpoint has received."""
+    add_stock(test_client)
+    run(app)
+    add_stock(test_client)
+    with app.app_context():
+        db.session.query(WebhookOutbox).update({'created_at': datetime.utcnow() - timedelta(days=5)})
+        db.session.commit()
+    result = app.test_cli_runner().invoke(args=['webhooks-prune'])
+    assert result.output.strip() == 'Deleted 2 event(s).'
+    with app.app_context():
+        assert [row.id for row in WebhookOutbox.query.order_by(WebhookOutbox.id)] == [3, 4]
+
+def test_no_outbox_without_endpoints(app, test_client):
+    """Test that nothing is written to the outbox when no endpoint is configured, nor for a failed movement."""
+    assert test_client.post('/api/inventory/remove', json={'product_id': 1, 'location_id': 1, 'quantity': 100, 'user_id': 1}).status_code == 409
+    app.extensions['webhooks'] = False
+    add_stock(test_client)
+    with app.app_context():
+        assert WebhookOutbox.query.count() == 0
@@ -0,0 +1,21 @@
+# inventory_api/wsgi.py
+# Production WSGI entry point (gunicorn -c gunicorn.conf.py, or python serve.py).
+
+import os
+from dotenv import load_dotenv
+
+basedir = os.path.abspath(os.path.dirname(__file__))
+load_dotenv(os.path.join(basedir, '.env')) # .flaskenv is for `flask run` (development) only
+
+from app import create_app
+
+# Same environment mapping as run.py, but production by default
+config_mapping = {
+    'development': 'DevelopmentConfig',
+    'testing': 'TestingConfig',
+    'production': 'ProductionConfig'
+}
+config_class_name = config_mapping.get(os.environ.get('FLASK_ENV', 'production'), 'ProductionConfig')
+
+app = create_app(config_object=f'config.{config_class_name}')
+application = app
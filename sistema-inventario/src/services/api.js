@@ -8,14 +8,11 @@ export const API_BASE_URL = process.env.NEXT_PUBLIC_API_BASE_URL || 'http://127.
 
 // Helper function for consistent fetch calls
 export const fetchApi = async (url, options = {}) => {
+  // Access token stored at login (authService.login); the API takes the user from it
+  const token = typeof window !== 'undefined' ? localStorage.getItem('authToken') : null;
   const defaultHeaders = {
     'Content-Type': 'application/json',
-    // Add other default headers here, e.g., Authorization token
-    // You'll need logic to get the token, e.g., from localStorage or a context/state
-    // const token = localStorage.getItem('authToken');
-    // if (token) {
-    //   defaultHeaders['Authorization'] = `Bearer ${token}`;
-    // }
+    ...(token ? { Authorization: `Bearer ${token}` } : {}),
     ...options.headers, // Allow overriding default headers
   };
 
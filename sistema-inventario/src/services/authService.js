@@ -38,6 +38,10 @@ const login = async (identifier, password) => {
     }
 
 
+    if (data && data.access_token) {
+      localStorage.setItem('authToken', data.access_token);
+    }
+
     return data; // Return the successful data
   } catch (error) {
     console.error('Login API call failed:', error);
@@ -80,5 +84,17 @@ const register = async (userData) => {
   }
 };
 
+/**
+ * Revokes the stored access token on the server and forgets it.
+ * @returns {Promise<void>}
+ */
+const logout = async () => {
+  try {
+    await fetchApi('/auth/logout', { method: 'POST' });
+  } finally {
+    localStorage.removeItem('authToken');
+  }
+};
+
 // Export the functions
-export { login, register };
\ No newline at end of file
+export { login, logout, register };
\ No newline at end of file
@@ -0,0 +1,27 @@
+// app/services/changeService.js
+import { fetchApi } from './api';
+
+/**
+ * Fetches the current change feed cursor.
+ * Take it BEFORE loading the full lists, then poll getChanges with it to receive only the deltas.
+ * @returns {Promise<object>} - { success, cursor }
+ */
+export const getChangesCursor = async () => {
+  return fetchApi('/changes');
+};
+
+/**
+ * Fetches the products, locations, stock levels and transactions changed since a cursor.
+ * With `wait` (seconds), the request long-polls: it returns as soon as something changes.
+ * The response carries the next cursor, the changed rows (`data`), the keys of deleted rows (`deleted`)
+ * and the lists to re-fetch entirely (`resync`). A 410 error means the cursor expired: reload the lists.
+ * @param {string} cursor - The cursor returned by the previous call.
+ * @param {object} [options] - { wait, limit }
+ * @returns {Promise<object>} - { success, cursor, has_more, data, deleted, resync }
+ */
+export const getChanges = async (cursor, { wait, limit } = {}) => {
+  const params = new URLSearchParams({ since: cursor });
+  if (wait) params.set('wait', String(wait));
+  if (limit) params.set('limit', String(limit));
+  return fetchApi(`/changes?${params.toString()}`);
+};
@@ -0,0 +1,22 @@
+// app/services/stockStreamService.js
+import { API_BASE_URL } from './api';
+
+/**
+ * Opens the Server-Sent Events stream of stock-level changes (served by the ASGI app).
+ * Open it BEFORE loading the stock levels, so no change is missed in between.
+ * @param {object} filters - { productIds, locationIds } (arrays; omit for every change).
+ * @param {object} handlers - { onStockLevel({ product_id, location_id, quantity }), onResync() }.
+ *   quantity is null when the stock level was deleted; onResync means changes may have been missed: reload the stock levels.
+ * @returns {EventSource} - Call .close() to stop listening. The browser reconnects by itself (and onResync fires again).
+ */
+export const openStockStream = ({ productIds, locationIds } = {}, { onStockLevel, onResync } = {}) => {
+  const params = new URLSearchParams();
+  if (productIds?.length) params.set('product_id', productIds.join(','));
+  if (locationIds?.length) params.set('location_id', locationIds.join(','));
+  const query = params.toString();
+  const source = new EventSource(`${API_BASE_URL}/stream/stock-levels${query ? `?${query}` : ''}`);
+  source.addEventListener('stock_level', (event) => onStockLevel?.(JSON.parse(event.data)));
+  source.addEventListener('resync', () => onResync?.());
+  source.addEventListener('open', () => onResync?.()); // Changes made while disconnected were not sent
+  return source;
+};